@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Request, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi import WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-import time
+from typing import Optional
+import asyncio
 import os
+import uuid
 
 # Get current working directory
 current_dir = os.getcwd()
@@ -12,10 +14,10 @@ print("Current Directory:", current_dir)
 
 
 from .rag.pipeline import Pipeline
-from .rag.ingestor import Ingestor
+from .rag.jobs import IngestJobManager, IngestJobRunning
 
 pipeline = Pipeline()
-ingestor = Ingestor()
+ingest_jobs = IngestJobManager()
 
 
 router = APIRouter()
@@ -23,83 +25,133 @@ router = APIRouter()
 # -------------------------
 # Non-WebSocket endpoint
 # -------------------------
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
 class ChatRequest(BaseModel):
     query: str
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     query: str
     answer: str
+    session_id: str
 
 @router.post("/chat", response_model=ChatResponse, tags=["Chat"])
 async def chat_endpoint(request: ChatRequest):
-    dummy_answer = f"This is a dummy response for: '{request.query}'"
-    return ChatResponse(query=request.query, answer=dummy_answer)
+    session_id = request.session_id or new_session_id()
+    answer = await pipeline.arun(request.query, session_id=session_id)
+    return ChatResponse(query=request.query, answer=answer, session_id=session_id)
 
 # -------------------------
 # WebSocket endpoint
 # -------------------------
 
 @router.websocket("/ws/chat")
-async def websocket_chat(websocket: WebSocket):
+async def websocket_chat(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    One conversation per connection, unless the client resumes a session
+    with `?session_id=...`.
+    """
+    session_id = session_id or new_session_id()
     await websocket.accept()
     try:
         while True:
             data = await websocket.receive_text()
-            dummy_answer = f"This is a dummy WS response for: '{data}'"
-            await websocket.send_text(dummy_answer)
+            async for token in pipeline.astream(data, session_id=session_id):
+                await websocket.send_text(token)
+            await websocket.send_text("[DONE]")
     except WebSocketDisconnect:
         print("Client disconnected from WebSocket")
 
 # -------------------------
 # Streaming endpoint (SSE)
 # -------------------------
-def fake_stream_generator(query: str):
+def format_sse(data: str) -> str:
+    """
+    Frame a payload as a single SSE event, one `data:` line per payload line.
+    """
+    return "".join(f"data: {line}\n" for line in data.split("\n")) + "\n"
+
+async def stream_generator(query: str, session_id: str):
     """
-    Fake generator simulating token-by-token streaming.
+    Forward LLM tokens to the client as SSE events as soon as they are generated.
     """
-    response = pipeline.run(query)
-    tokens = [f"{word} " for word in response.split()]
-    for token in tokens:
-        yield f"data: {token}\n\n"
-        time.sleep(0.05)  # simulate real-time delay
-    yield "data: [DONE]\n\n"
+    async for token in pipeline.astream(query, session_id=session_id):
+        yield format_sse(token)
+    yield format_sse("[DONE]")
 
 @router.get("/chat/stream", tags=["Chat"])
-async def chat_stream(query: str):
+async def chat_stream(query: str, session_id: Optional[str] = None):
     """
     Stream chatbot response in real-time using SSE.
-    Example: /api/chat/stream?query=Hello
+    Example: /api/chat/stream?query=Hello&session_id=abc123
+
+    The session id is echoed back in the `X-Session-ID` header so clients that
+    did not send one can continue the conversation.
     """
-    return StreamingResponse(fake_stream_generator(query), media_type="text/event-stream")
+    session_id = session_id or new_session_id()
+    return StreamingResponse(
+        stream_generator(query, session_id),
+        media_type="text/event-stream",
+        headers={"X-Session-ID": session_id},
+    )
 
 
 
-def run_ingestion_task():
-    """Wrapper for background ingestion with logging & error handling."""
-    try:
-        result = ingestor.ingest()
-        # logger.info(f"Ingestion completed: {result}")
-    except Exception as e:
-        # logger.error(f"Ingestion failed: {e}")
-        pass  # Avoid crashing background thread
+# -------------------------
+# Metrics
+# -------------------------
+@router.get("/metrics/answer-cache", tags=["Metrics"])
+async def answer_cache_metrics():
+    """
+    Answer cache hit rate per tier and latency of hits versus misses.
+    """
+    if pipeline.answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **pipeline.answer_cache.stats()}
+
+
+@router.get("/metrics/query-rewrite", tags=["Metrics"])
+async def query_rewrite_metrics():
+    """
+    Standalone-query rewrites: LLM calls made versus saved by the heuristic and memo cache.
+    """
+    return pipeline.rewriter.stats()
+
 
 # -------------------------
-# Ingestor endpoint (GET with Background Task)
+# Ingestion job endpoints
 # -------------------------
 @router.get("/ingest", tags=["Ingest"])
-async def ingest_endpoint(background_tasks: BackgroundTasks):
+async def ingest_endpoint(full: bool = False):
     """
-    Trigger ingestion in the background (non-blocking).
-    Returns immediately with status message.
+    Start an ingestion job (non-blocking).
+    Returns the job id to poll at /ingest/{job_id}, or 409 if a job is already running.
+    Taking the Redis lock and spawning the job block, so they run off the event loop.
     """
     try:
-        print(f'Ingestion request is accepted...')
-        background_tasks.add_task(run_ingestion_task)
+        job_id = await asyncio.to_thread(ingest_jobs.start, full=full)
+    except IngestJobRunning as e:
         return JSONResponse(
-            content={"status": "started", "message": "Ingestion has been triggered and is running in the background."},
-            status_code=202,  # Accepted, since processing is async
+            content={"status": "running", "message": "An ingestion job is already running.", "job_id": e.job_id},
+            status_code=409,
         )
-
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start ingestion: {str(e)}")
-    
+
+    return JSONResponse(
+        content={"status": "started", "message": "Ingestion job started.", "job_id": job_id},
+        status_code=202,  # Accepted, since processing is async
+    )
+
+
+@router.get("/ingest/{job_id}", tags=["Ingest"])
+async def ingest_status_endpoint(job_id: str):
+    """
+    Status of an ingestion job: phase, docs processed, docs/sec and errors.
+    """
+    job = await asyncio.to_thread(ingest_jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job: {job_id}")
+    return job
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query for exact matching.
+
+    Case, punctuation and runs of whitespace do not change the answer, so
+    "What happened in Dhaka today?" and "what happened in dhaka today" share
+    one entry.
+    """
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", query.lower())).strip()
+
+
+class LatencyStats:
+    """Count, mean and percentiles over a sliding window of latencies."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.count = 0
+        self.total = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self._recent.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        recent = sorted(self._recent)
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))]
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(percentile(0.50) * 1000, 2),
+            "p95_ms": round(percentile(0.95) * 1000, 2),
+        }
+
+
+class AnswerCache:
+    """
+    Two-tier cache of final answers keyed by the standalone query.
+
+    The exact tier matches the normalized query text. The semantic tier
+    reuses an answer when the query embedding is within `similarity_threshold`
+    (cosine) of a cached query's embedding; embeddings live in one
+    preallocated matrix so a lookup is a single matrix-vector product.
+
+    Entries expire after `ttl_seconds`, the least recently used are evicted
+    beyond `max_entries`, and everything is dropped when `generation_fn`
+    reports that ingestion changed the knowledge base. Lookups never call
+    `generation_fn` themselves: callers run `refresh_generation` (or
+    `arefresh_generation`, in a worker thread) before a lookup, so the
+    read happens outside the lock and off the event loop.
+
+    Parameters
+    ----------
+    ttl_seconds : float
+        Lifetime of an entry.
+    max_entries : int
+        Maximum number of cached answers.
+    similarity_threshold : float
+        Minimum cosine similarity for a semantic hit; 1.0 or more disables the tier.
+    generation_fn : Optional[Callable[[], int]]
+        Returns the current ingestion generation.
+    generation_check_seconds : float
+        Minimum time between two `generation_fn` calls.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 600,
+        max_entries: int = 5000,
+        similarity_threshold: float = 0.95,
+        generation_fn: Optional[Callable[[], int]] = None,
+        generation_check_seconds: float = 5.0,
+    ) -> None:
+        self.ttl_seconds = max(1.0, float(ttl_seconds))
+        self.max_entries = max(1, int(max_entries))
+        self.similarity_threshold = float(similarity_threshold)
+        self.generation_fn = generation_fn
+        self.generation_check_seconds = max(0.0, float(generation_check_seconds))
+
+        # key -> (answer, expires_at, matrix slot or None)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+        self._lock = threading.Lock()
+
+        self._generation: Optional[int] = None
+        self._generation_checked_at = float("-inf")
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.hit_latency = LatencyStats()
+        self.miss_latency = LatencyStats()
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold < 1.0
+
+    # ---------------------------
+    # Internal helpers (call with the lock held)
+    # ---------------------------
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+        self._slot_keys = []
+        self._free_slots = []
+
+    def _remove(self, key: str) -> None:
+        _, _, slot = self._entries.pop(key)
+        if slot is not None:
+            self._matrix[slot] = 0.0
+            self._slot_keys[slot] = None
+            self._free_slots.append(slot)
+
+    def _apply_generation(self, generation: int) -> None:
+        if self._generation is not None and generation != self._generation:
+            logger.info("Knowledge base changed (generation %s); clearing answer cache.", generation)
+            self._clear()
+            self.invalidations += 1
+        self._generation = generation
+
+    def _generation_due(self) -> bool:
+        return (
+            self.generation_fn is not None
+            and time.monotonic() - self._generation_checked_at >= self.generation_check_seconds
+        )
+
+    def _alive(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            return False
+        return True
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if vector.ndim != 1 or norm == 0.0:
+            return None
+        return vector / norm
+
+    def _slot_for(self, vector: np.ndarray) -> Optional[int]:
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._slot_keys = [None] * self.max_entries
+            self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        if vector.shape[0] != self._matrix.shape[1] or not self._free_slots:
+            return None
+        slot = self._free_slots.pop()
+        self._matrix[slot] = vector
+        return slot
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+
+    def refresh_generation(self) -> None:
+        """
+        Read the ingestion generation, at most once per
+        `generation_check_seconds`, and drop every entry if it changed.
+        `generation_fn` is called without holding the lock.
+        """
+        with self._lock:
+            if not self._generation_due():
+                return
+            self._generation_checked_at = time.monotonic()
+        try:
+            generation = self.generation_fn()
+        except Exception as e:
+            logger.warning("Could not read the ingestion generation: %s", e)
+            return
+        with self._lock:
+            self._apply_generation(generation)
+
+    async def arefresh_generation(self) -> None:
+        """Async version of `refresh_generation`; the read runs in a worker thread."""
+        if self._generation_due():
+            await asyncio.to_thread(self.refresh_generation)
+
+    def get(self, query: str) -> Optional[str]:
+        """Exact tier: the cached answer for this normalized query, if any."""
+        key = normalize_query(query)
+        with self._lock:
+            if not self._alive(key):
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return self._entries[key][0]
+
+    def get_similar(self, embedding: Sequence[float]) -> Optional[str]:
+        """Semantic tier: the answer of the most similar cached query above the threshold."""
+        if not self.semantic_enabled:
+            return None
+        vector = self._unit(embedding)
+        with self._lock:
+            if vector is None or self._matrix is None or vector.shape[0] != self._matrix.shape[1]:
+                return None
+            # Free slots are zero rows and score 0
+            scores = self._matrix @ vector
+            slot = int(np.argmax(scores))
+            key = self._slot_keys[slot]
+            if key is None or scores[slot] < self.similarity_threshold or not self._alive(key):
+                return None
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return self._entries[key][0]
+
+    def miss(self) -> None:
+        """Count a lookup that found nothing in either tier."""
+        with self._lock:
+            self.misses += 1
+
+    def put(self, query: str, answer: str, embedding: Optional[Sequence[float]] = None) -> None:
+        """
+        Cache an answer.
+
+        Args:
+            query (str): The standalone query the answer was generated for.
+            answer (str): The final answer.
+            embedding (Optional[Sequence[float]]): Query embedding for the semantic tier.
+        """
+        key = normalize_query(query)
+        if not key:
+            return
+        vector = self._unit(embedding) if embedding is not None and self.semantic_enabled else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            slot = self._slot_for(vector) if vector is not None else None
+            if slot is not None:
+                self._slot_keys[slot] = key
+            self._entries[key] = (answer, time.monotonic() + self.ttl_seconds, slot)
+
+    def invalidate(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._clear()
+            self.invalidations += 1
+
+    def record_latency(self, hit: bool, seconds: float) -> None:
+        """Record the end-to-end latency of a request served from (or past) the cache."""
+        with self._lock:
+            (self.hit_latency if hit else self.miss_latency).record(seconds)
+
+    def stats(self) -> Dict[str, object]:
+        """Hit rate per tier and latency for hits versus misses."""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "entries": len(self._entries),
+                "lookups": lookups,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "hit_latency": self.hit_latency.summary(),
+                "miss_latency": self.miss_latency.summary(),
+            }
+
+
+def create_answer_cache() -> Optional[AnswerCache]:
+    """
+    Build the answer cache configured through the environment.
+
+    ANSWER_CACHE_ENABLED turns it on (default) or off; ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_SIMILARITY and
+    ANSWER_CACHE_GENERATION_CHECK_SECONDS tune it. The cache is invalidated
+    through the ingestion generation counter in Redis.
+    """
+    if os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("0", "false", "no", "off"):
+        return None
+
+    from .redis_client import RedisDB
+
+    redis_db = RedisDB()
+    return AnswerCache(
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 600)),
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 5000)),
+        similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95)),
+        generation_fn=redis_db.get_ingest_generation,
+        generation_check_seconds=float(os.getenv("ANSWER_CACHE_GENERATION_CHECK_SECONDS", 5)),
+    )
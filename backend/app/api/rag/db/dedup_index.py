@@ -0,0 +1,235 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from .lexical_index import tokenize
+
+load_dotenv()
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() not in ("0", "false", "no", "off")
+DEDUP_INDEX_PATH = os.getenv(
+    "DEDUP_INDEX_PATH",
+    os.path.join(os.path.dirname(__file__), "dedup_index.sqlite3"),
+)
+# Estimated Jaccard similarity (word bigrams) from which a chunk is a near-duplicate; 1 only drops exact repeats
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", 0.7))
+
+_NON_WORD = re.compile(r"\W+", re.UNICODE)
+_PERMUTATIONS = 64
+_BANDS = 16
+_ROWS = _PERMUTATIONS // _BANDS
+_rng = np.random.default_rng(20240501)
+_SEEDS = _rng.integers(0, 2 ** 63, size=_PERMUTATIONS, dtype=np.uint64)
+_MULTIPLIERS = _rng.integers(0, 2 ** 63, size=_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+# Shorter chunks are too small for a meaningful signature and are only matched exactly
+_MIN_NEAR_TOKENS = 5
+
+
+def normalize_text(text: str) -> str:
+    """Lowercased words separated by single spaces, for exact-duplicate matching."""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def minhash(text: str, shingle_size: int = 2) -> Optional[np.ndarray]:
+    """
+    MinHash signature of a text's word shingles, or None if the text is too
+    short to fingerprint. The share of equal positions in two signatures
+    estimates the Jaccard similarity of their shingle sets.
+    """
+    tokens = tokenize(text)
+    if len(tokens) < _MIN_NEAR_TOKENS:
+        return None
+    shingles = {" ".join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles],
+        dtype=np.uint64,
+    )
+    # One multiply-xorshift hash per permutation; uint64 arithmetic wraps around
+    mixed = (hashes[:, None] ^ _SEEDS) * _MULTIPLIERS
+    return (mixed >> np.uint64(32)).astype(np.uint32).min(axis=0)
+
+
+def _band_keys(signature: np.ndarray) -> List[int]:
+    """One 63-bit key per band of `_ROWS` signature values."""
+    return [
+        int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "big") >> 1
+        for band in signature.reshape(_BANDS, _ROWS)
+    ]
+
+
+def _source(doc: Document) -> Optional[str]:
+    """Article URL of a chunk, if its metadata has one."""
+    source = (doc.metadata or {}).get("url")
+    return str(source) if source else None
+
+
+class DedupIndex:
+    """
+    Fingerprints of indexed chunks, persisted in a SQLite file, used to skip
+    repeated chunks before they are embedded.
+
+    A chunk is a duplicate if its normalized text matches a chunk indexed
+    under another id, or if the MinHash estimate of their word-bigram
+    Jaccard similarity reaches `similarity`. Candidates come from
+    locality-sensitive hashing: 16 bands of 4 signature values, so chunks
+    sharing any band are compared, which finds 99% of pairs at 0.7
+    similarity. The first chunk seen owns the fingerprint until it
+    is released, so boilerplate (site footers, "read more" blocks) is
+    indexed once however many articles repeat it.
+
+    Each skipped chunk is recorded with its owner and its article URL
+    (the document's "url" metadata). Once an owner is released, the
+    articles whose copies it stood for are reported by `orphaned_sources`,
+    so they can be ingested again and index their copy instead.
+
+    Parameters
+    ----------
+    path : str
+        Database file path.
+    similarity : float
+        Near-duplicate threshold; 1 only drops exact repeats.
+    """
+
+    def __init__(self, path: str = DEDUP_INDEX_PATH, similarity: float = DEDUP_SIMILARITY) -> None:
+        self.path = path
+        self.similarity = min(1.0, max(0.0, float(similarity)))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, exact TEXT NOT NULL, signature BLOB);"
+            "CREATE INDEX IF NOT EXISTS idx_chunks_exact ON chunks(exact);"
+            "CREATE TABLE IF NOT EXISTS bands ("
+            "band INTEGER NOT NULL, key INTEGER NOT NULL, id TEXT NOT NULL, PRIMARY KEY (band, key, id)"
+            ") WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS idx_bands_id ON bands(id);"
+            "CREATE TABLE IF NOT EXISTS skipped (id TEXT PRIMARY KEY, owner TEXT NOT NULL, source TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_skipped_source ON skipped(source);"
+        )
+        self._conn.commit()
+
+    def _near_owner(self, signature: np.ndarray, ignore: set) -> Optional[str]:
+        checked = set()
+        for band, key in enumerate(_band_keys(signature)):
+            for doc_id, other in self._conn.execute(
+                "SELECT c.id, c.signature FROM bands b JOIN chunks c ON c.id = b.id WHERE b.band = ? AND b.key = ?",
+                (band, key),
+            ):
+                if doc_id in ignore or doc_id in checked:
+                    continue
+                checked.add(doc_id)
+                if np.mean(np.frombuffer(other, dtype=np.uint32) == signature) >= self.similarity:
+                    return doc_id
+        return None
+
+    def filter(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[Document],
+        ignore: Iterable[str] = (),
+    ) -> List[int]:
+        """
+        Register new chunks and pick the ones worth indexing.
+
+        Args:
+            ids (Sequence[str]): Chunk ids, content-addressed.
+            documents (Sequence[Document]): The chunks.
+            ignore (Iterable[str]): Ids about to be deleted (the chunks an
+                article update replaces); matching them is not a duplicate.
+
+        Returns:
+            List[int]: Positions of the chunks to keep. Chunks already
+            registered under their own id are kept, so re-ingestion is
+            idempotent; repeated ids within the batch are kept once.
+        """
+        ignore = set(ignore)
+        keep: List[int] = []
+        seen = set()
+        sources = {_source(doc) for doc in documents} - {None}
+        with self._lock:
+            # The articles are split afresh, so their earlier skipped chunks are replaced
+            self._conn.executemany("DELETE FROM skipped WHERE source = ?", [(source,) for source in sources])
+            for position, (doc_id, doc) in enumerate(zip(ids, documents)):
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                if self._conn.execute("SELECT 1 FROM chunks WHERE id = ?", (doc_id,)).fetchone():
+                    keep.append(position)
+                    continue
+
+                exact = hashlib.sha256(normalize_text(doc.page_content).encode("utf-8")).hexdigest()
+                owners = {row[0] for row in self._conn.execute("SELECT id FROM chunks WHERE exact = ?", (exact,))}
+                owner = min(owners - ignore, default=None)
+                signature = minhash(doc.page_content) if self.similarity < 1 else None
+                if owner is None and signature is not None:
+                    owner = self._near_owner(signature, ignore)
+                if owner is not None:
+                    if _source(doc) is not None:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO skipped VALUES (?, ?, ?)", (doc_id, owner, _source(doc))
+                        )
+                    continue
+
+                self._conn.execute(
+                    "INSERT INTO chunks VALUES (?, ?, ?)",
+                    (doc_id, exact, signature.tobytes() if signature is not None else None),
+                )
+                if signature is not None:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO bands VALUES (?, ?, ?)",
+                        [(band, key, doc_id) for band, key in enumerate(_band_keys(signature))],
+                    )
+                keep.append(position)
+            self._conn.commit()
+        return keep
+
+    def release(self, ids: Sequence[str], sources: Sequence[str] = ()) -> None:
+        """
+        Forget deleted chunks, so their text can be indexed again.
+
+        Args:
+            ids (Sequence[str]): Ids of the deleted chunks.
+            sources (Sequence[str]): URLs of articles removed altogether,
+                whose skipped chunks are forgotten too.
+        """
+        ids = list(ids)
+        sources = list(sources)
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                self._conn.execute(f"DELETE FROM bands WHERE id IN ({placeholders})", chunk)
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", chunk)
+            self._conn.executemany("DELETE FROM skipped WHERE source = ?", [(source,) for source in sources])
+            self._conn.commit()
+
+    def orphaned_sources(self) -> List[str]:
+        """URLs of articles with a chunk skipped as a duplicate of one since released."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT s.source FROM skipped s LEFT JOIN chunks c ON c.id = s.owner "
+                "WHERE c.id IS NULL ORDER BY s.source"
+            )]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+def create_dedup_index() -> Optional[DedupIndex]:
+    """
+    Build the chunk deduplication index configured through the environment.
+
+    DEDUP_ENABLED turns it on (default) or off; DEDUP_INDEX_PATH sets the
+    SQLite file and DEDUP_SIMILARITY the near-duplicate threshold.
+    """
+    if not DEDUP_ENABLED:
+        return None
+    return DedupIndex(path=DEDUP_INDEX_PATH, similarity=DEDUP_SIMILARITY)
@@ -0,0 +1,283 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from ..utils import TIMESTAMP_FIELD
+
+load_dotenv()
+
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() not in ("0", "false", "no", "off")
+LEXICAL_INDEX_PATH = os.getenv(
+    "LEXICAL_INDEX_PATH",
+    os.path.join(os.path.dirname(__file__), "lexical_index.sqlite3"),
+)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    """
+    a an and are as at be but by for from has have he her his i in is it its of on or she
+    that the their them there they this to was were what when where which who why will with
+    you your about did do does how
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords; numbers and dates are kept."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    Inverted index with BM25 scoring, persisted in a SQLite file.
+
+    Postings (term, doc id, term frequency), document lengths and the
+    corpus statistics are kept in SQLite, so updates are incremental and
+    several processes (API workers, the ingestion job) can share one file.
+    Documents are stored with their metadata so lexical hits can be
+    returned without the vector store, and with their timestamp so searches
+    can be limited to a time window.
+
+    Parameters
+    ----------
+    path : str
+        Database file path.
+    k1 : float
+        BM25 term-frequency saturation.
+    b : float
+        BM25 document-length normalization.
+    max_df_ratio : float
+        Query terms found in more than this share of documents are ignored
+        when the query has rarer terms: their IDF is near zero and their
+        postings are the longest to read.
+    """
+
+    def __init__(
+        self,
+        path: str = LEXICAL_INDEX_PATH,
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_df_ratio: float = 0.5,
+    ) -> None:
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_df_ratio = max_df_ratio
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "id TEXT PRIMARY KEY, length INTEGER NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, doc_id)"
+            ") WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_id);"
+            "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO stats VALUES ('doc_count', 0), ('total_length', 0);"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(docs)")}
+        if "timestamp" not in columns:
+            # Indexes created before chunks carried timestamps
+            self._conn.execute("ALTER TABLE docs ADD COLUMN timestamp REAL")
+        self._conn.commit()
+
+    def _delete_locked(self, ids: Sequence[str]) -> None:
+        for i in range(0, len(ids), 500):
+            chunk = list(ids[i:i + 500])
+            placeholders = ",".join("?" * len(chunk))
+            count, length = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs WHERE id IN ({placeholders})", chunk
+            ).fetchone()
+            if not count:
+                continue
+            self._conn.execute(f"DELETE FROM postings WHERE doc_id IN ({placeholders})", chunk)
+            self._conn.execute(f"DELETE FROM docs WHERE id IN ({placeholders})", chunk)
+            self._conn.execute("UPDATE stats SET value = value - ? WHERE name = 'doc_count'", (count,))
+            self._conn.execute("UPDATE stats SET value = value - ? WHERE name = 'total_length'", (length,))
+
+    def add(self, ids: Sequence[str], documents: Sequence[Document]) -> None:
+        """
+        Index documents, replacing any already indexed under the same ids.
+
+        Args:
+            ids (Sequence[str]): Document ids, shared with the vector store.
+            documents (Sequence[Document]): Documents to index.
+        """
+        rows = []
+        postings = []
+        total_length = 0
+        for doc_id, doc in zip(ids, documents):
+            terms = tokenize(doc.page_content)
+            metadata = doc.metadata or {}
+            rows.append((doc_id, len(terms), doc.page_content, json.dumps(metadata), metadata.get(TIMESTAMP_FIELD)))
+            postings.extend((term, doc_id, tf) for term, tf in Counter(terms).items())
+            total_length += len(terms)
+
+        with self._lock:
+            self._delete_locked(list(ids))
+            self._conn.executemany(
+                "INSERT INTO docs (id, length, text, metadata, timestamp) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+            self._conn.execute("UPDATE stats SET value = value + ? WHERE name = 'doc_count'", (len(rows),))
+            self._conn.execute("UPDATE stats SET value = value + ? WHERE name = 'total_length'", (total_length,))
+            self._conn.commit()
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Remove documents from the index."""
+        with self._lock:
+            self._delete_locked(list(ids))
+            self._conn.commit()
+
+    def delete_before(self, timestamp: float) -> int:
+        """
+        Remove documents timestamped before `timestamp` (epoch seconds).
+
+        Returns:
+            int: Number of documents removed. Undated documents are kept.
+        """
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute("SELECT id FROM docs WHERE timestamp < ?", (timestamp,))]
+            self._delete_locked(ids)
+            self._conn.commit()
+        return len(ids)
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        time_range: Optional[Tuple[Optional[float], Optional[float]]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Rank documents for a query with BM25.
+
+        Args:
+            query (str): Search query.
+            k (int): Number of documents to return.
+            time_range (Optional[Tuple[Optional[float], Optional[float]]]): Only
+                rank documents timestamped within (since, until), epoch
+                seconds; either bound may be None. Undated documents are
+                excluded when a window is given.
+
+        Returns:
+            List[Tuple[Document, float]]: (document, BM25 score) pairs, best first.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            stats = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+            doc_count = stats.get("doc_count", 0)
+            if not doc_count:
+                return []
+            avg_length = stats.get("total_length", 0) / doc_count
+
+            placeholders = ",".join("?" * len(terms))
+            dfs = dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term",
+                list(terms),
+            ).fetchall())
+            # Skip very common terms, unless nothing rarer is left to match on
+            rare = {term: df for term, df in dfs.items() if df <= self.max_df_ratio * doc_count}
+            dfs = rare or dfs
+
+            window = ""
+            bounds: List[float] = []
+            if time_range is not None:
+                since, until = time_range
+                if since is not None:
+                    window += " AND d.timestamp >= ?"
+                    bounds.append(since)
+                if until is not None:
+                    window += " AND d.timestamp <= ?"
+                    bounds.append(until)
+
+            scores: Dict[str, float] = {}
+            for term, df in dfs.items():
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for doc_id, tf, length in self._conn.execute(
+                    "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.doc_id "
+                    "WHERE p.term = ?" + window,
+                    (term, *bounds),
+                ):
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            if not top:
+                return []
+            placeholders = ",".join("?" * len(top))
+            rows = {
+                doc_id: (text, metadata)
+                for doc_id, text, metadata in self._conn.execute(
+                    f"SELECT id, text, metadata FROM docs WHERE id IN ({placeholders})",
+                    [doc_id for doc_id, _ in top],
+                )
+            }
+
+        results = []
+        for doc_id, score in top:
+            text, metadata = rows[doc_id]
+            results.append((Document(page_content=text, metadata=json.loads(metadata)), score))
+        return results
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM stats WHERE name = 'doc_count'").fetchone()[0]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Tuple[Document, float]]],
+    k: int = 60,
+    top_k: int = 4,
+) -> List[Tuple[Document, float]]:
+    """
+    Fuse several rankings with reciprocal rank fusion.
+
+    Each document scores sum(1 / (k + rank)) over the rankings it appears
+    in; documents are matched by content. Scores are divided by the best
+    possible score, so a document ranked first everywhere scores 1.0.
+
+    Args:
+        rankings: Ranked (document, score) lists, best first.
+        k (int): RRF damping constant.
+        top_k (int): Number of documents to return.
+
+    Returns:
+        List[Tuple[Document, float]]: (document, normalized RRF score) pairs, best first.
+    """
+    rankings = [ranking for ranking in rankings if ranking]
+    if not rankings:
+        return []
+    fused: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, (doc, _) in enumerate(ranking, start=1):
+            key = doc.page_content
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+    best = len(rankings) / (k + 1)
+    top = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [(documents[key], score / best) for key, score in top]
+
+
+def create_lexical_index() -> Optional[BM25Index]:
+    """
+    Build the lexical index configured through the environment.
+
+    LEXICAL_INDEX_ENABLED turns it on (default) or off; LEXICAL_INDEX_PATH
+    sets the SQLite file.
+    """
+    if not LEXICAL_INDEX_ENABLED:
+        return None
+    return BM25Index(path=LEXICAL_INDEX_PATH)
@@ -1,6 +1,7 @@
 import redis
 import hashlib
-from typing import Dict, List, Optional
+import json
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -8,7 +9,26 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class RedisDB:
-    """Redis database handler for fetching scraped content."""
+    """Redis database handler for fetching scraped content and tracking ingestion state."""
+
+    INGEST_STATE_KEY = "ingest:state"
+    INGEST_LOCK_KEY = "ingest:lock"
+    INGEST_GENERATION_KEY = "ingest:generation"
+    INGEST_JOB_PREFIX = "ingest:job:"
+
+    # Compare-and-set scripts, so a worker never touches a lock it lost
+    _REFRESH_LOCK_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('expire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    _RELEASE_LOCK_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
     
     def __init__(self):
         self.redis_client = redis.Redis(
@@ -54,5 +74,104 @@ class RedisDB:
             'total_scraped_urls': total_urls,
             'redis_memory_usage': self.redis_client.memory_usage('scraped_urls') if total_urls > 0 else 0
         }
-    
-    
\ No newline at end of file
+
+    def scan_scraped_urls(self, cursor: int = 0, count: int = 500) -> Tuple[int, List[str]]:
+        """
+        One SSCAN step over the scraped URL index.
+
+        Returns the next cursor (0 when the scan is complete) and a batch of
+        URLs. SSCAN may return a URL more than once across steps;
+        `Ingestor.iter_url_batches` walks the index with retried steps.
+        """
+        cursor, urls = self.redis_client.sscan('scraped_urls', cursor=cursor, count=count)
+        return int(cursor), list(urls)
+
+    def get_contents(self, urls: List[str]) -> List[Optional[Dict]]:
+        """Retrieve the content of several URLs in one pipelined round trip."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for url in urls:
+            pipe.hgetall(f"content:{self._get_url_hash(url)}")
+        return [data if data else None for data in pipe.execute()]
+
+    def get_watermarks(self, urls: List[str]) -> List[Optional[Dict]]:
+        """Fetch the change-detection fields of several URLs in one pipelined round trip."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for url in urls:
+            pipe.hmget(f"content:{self._get_url_hash(url)}", 'scraped_at', 'content_length')
+        return [
+            None if scraped_at is None and content_length is None
+            else {'scraped_at': scraped_at, 'content_length': content_length}
+            for scraped_at, content_length in pipe.execute()
+        ]
+
+    def get_ingest_records(self, urls: List[str]) -> List[Optional[Dict]]:
+        """
+        Get the ingestion records (watermark, content hash, chunk ids) of several
+        URLs in one HMGET; None for URLs never ingested.
+        """
+        if not urls:
+            return []
+        raw = self.redis_client.hmget(self.INGEST_STATE_KEY, urls)
+        return [json.loads(record) if record is not None else None for record in raw]
+
+    def scan_ingest_state(self, cursor: int = 0, count: int = 500) -> Tuple[int, Dict[str, Dict]]:
+        """
+        One HSCAN step over the ingestion records.
+
+        Returns the next cursor (0 when the scan is complete) and the records
+        read, keyed by URL. HSCAN may return a URL more than once across steps.
+        """
+        cursor, raw = self.redis_client.hscan(self.INGEST_STATE_KEY, cursor=cursor, count=count)
+        return int(cursor), {url: json.loads(record) for url, record in raw.items()}
+
+    def set_ingest_records(self, records: Dict[str, Dict]) -> None:
+        """Store ingestion records for several URLs at once."""
+        if records:
+            self.redis_client.hset(
+                self.INGEST_STATE_KEY,
+                mapping={url: json.dumps(record) for url, record in records.items()},
+            )
+
+    def delete_ingest_records(self, urls: List[str]) -> None:
+        """Forget the ingestion records of URLs removed from the knowledge base."""
+        if urls:
+            self.redis_client.hdel(self.INGEST_STATE_KEY, *urls)
+
+    def get_ingest_generation(self) -> int:
+        """Counter bumped whenever ingestion changes the knowledge base."""
+        return int(self.redis_client.get(self.INGEST_GENERATION_KEY) or 0)
+
+    def bump_ingest_generation(self) -> int:
+        """Mark the knowledge base as changed; returns the new generation."""
+        return int(self.redis_client.incr(self.INGEST_GENERATION_KEY))
+
+    def acquire_lock(self, key: str, token: str, ttl_seconds: int) -> bool:
+        """Take a lock if nobody holds it (SET NX EX); `token` identifies the holder."""
+        return bool(self.redis_client.set(key, token, nx=True, ex=ttl_seconds))
+
+    def refresh_lock(self, key: str, token: str, ttl_seconds: int) -> bool:
+        """Extend a lock, only if `token` still holds it."""
+        return bool(self.redis_client.eval(self._REFRESH_LOCK_SCRIPT, 1, key, token, ttl_seconds))
+
+    def release_lock(self, key: str, token: str) -> bool:
+        """Release a lock, only if `token` still holds it."""
+        return bool(self.redis_client.eval(self._RELEASE_LOCK_SCRIPT, 1, key, token))
+
+    def get_lock_holder(self, key: str) -> Optional[str]:
+        """Token of the current lock holder, if any."""
+        return self.redis_client.get(key)
+
+    def set_job(self, job_id: str, fields: Dict, ttl_seconds: int) -> None:
+        """Create or update fields of a job status hash; values are JSON encoded."""
+        key = f"{self.INGEST_JOB_PREFIX}{job_id}"
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset(key, mapping={name: json.dumps(value) for name, value in fields.items()})
+        pipe.expire(key, ttl_seconds)
+        pipe.execute()
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job status hash, or None if it is unknown or expired."""
+        raw = self.redis_client.hgetall(f"{self.INGEST_JOB_PREFIX}{job_id}")
+        if not raw:
+            return None
+        return {name: json.loads(value) for name, value in raw.items()}
@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import redis
+from dotenv import load_dotenv
+
+from ..utils import count_tokens
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+History = List[Tuple[str, str]]
+
+
+def trim_history(history: History, max_tokens: int) -> History:
+    """
+    Drop the oldest messages until the history fits within a token budget.
+
+    A leading assistant message without its user turn is dropped as well so the
+    trimmed history always starts with a user message.
+
+    Args:
+        history (History): (role, message) pairs, oldest first.
+        max_tokens (int): Token budget for the whole history.
+
+    Returns:
+        History: The most recent messages that fit the budget.
+    """
+    total = sum(count_tokens(message) for _, message in history)
+    start = 0
+    while start < len(history) and (
+        total > max_tokens or history[start][0] == "assistant"
+    ):
+        total -= count_tokens(history[start][1])
+        start += 1
+    return history[start:]
+
+
+class SessionStore:
+    """
+    In-process conversation history keyed by session id.
+
+    History per session is capped by a token budget, idle sessions expire after
+    a TTL, and the least recently used sessions are evicted once `max_sessions`
+    is reached, so memory stays bounded under sustained traffic.
+
+    Parameters
+    ----------
+    max_history_tokens : int
+        Token budget for the stored history of a single session.
+    ttl_seconds : float
+        Idle time after which a session is forgotten.
+    max_sessions : int
+        Maximum number of sessions kept in memory.
+    """
+
+    def __init__(
+        self,
+        max_history_tokens: int = 2000,
+        ttl_seconds: float = 1800,
+        max_sessions: int = 10000,
+    ) -> None:
+        self.max_history_tokens = max(0, int(max_history_tokens))
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_sessions = max(1, int(max_sessions))
+        self._sessions: "OrderedDict[str, Tuple[float, History]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        """Remove expired sessions and enforce the LRU size limit (lock held)."""
+        # Sessions are kept in access order, so expired ones are at the front
+        while self._sessions:
+            session_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            logger.debug("Expired idle session %s", session_id)
+
+        while len(self._sessions) > self.max_sessions:
+            session_id, _ = self._sessions.popitem(last=False)
+            logger.debug("Evicted least recently used session %s", session_id)
+
+    def get_history(self, session_id: str) -> History:
+        """Return a copy of the history for a session (empty if unknown)."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            self._sessions[session_id] = (now, entry[1])
+            self._sessions.move_to_end(session_id)
+            return list(entry[1])
+
+    def append(self, session_id: str, query: str, response: str) -> None:
+        """Record a user/assistant turn and trim the session to its budget."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            history = list(entry[1]) if entry else []
+            history.extend([("user", query), ("assistant", response)])
+            self._sessions[session_id] = (now, trim_history(history, self.max_history_tokens))
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def clear(self, session_id: str) -> None:
+        """Forget a session."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class RedisSessionStore:
+    """
+    Redis-backed conversation history, shared by every worker.
+
+    Each session is a Redis list of JSON-encoded (role, message) pairs whose
+    TTL is refreshed on every access, so idle sessions expire on their own.
+    Calls block on Redis; async callers run them in a worker thread.
+    Under memory pressure Redis' `volatile-lru` policy evicts the least
+    recently used sessions.
+
+    Parameters
+    ----------
+    redis_client : Optional[redis.Redis]
+        Inject a Redis client for easier testing.
+    max_history_tokens : int
+        Token budget for the stored history of a single session.
+    ttl_seconds : float
+        Idle time after which a session expires.
+    """
+
+    key_prefix = "session:"
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        max_history_tokens: int = 2000,
+        ttl_seconds: float = 1800,
+    ) -> None:
+        self.redis_client = redis_client if redis_client is not None else redis.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6376)),
+            decode_responses=True
+        )
+        self.max_history_tokens = max(0, int(max_history_tokens))
+        self.ttl_seconds = max(1, int(ttl_seconds))
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    def get_history(self, session_id: str) -> History:
+        """Return the history for a session and refresh its TTL."""
+        key = self._key(session_id)
+        pipe = self.redis_client.pipeline()
+        pipe.lrange(key, 0, -1)
+        pipe.expire(key, self.ttl_seconds)
+        items, _ = pipe.execute()
+        return [tuple(json.loads(item)) for item in items]
+
+    def append(self, session_id: str, query: str, response: str) -> None:
+        """
+        Record a user/assistant turn and trim the session to its budget.
+
+        The push, trim and TTL refresh run in one MULTI/EXEC transaction that
+        WATCHes the session, so concurrent appends to the same session retry
+        instead of trimming a list that changed under them.
+        """
+        key = self._key(session_id)
+        turn = [json.dumps(["user", query]), json.dumps(["assistant", response])]
+
+        def _append(pipe) -> None:
+            # Immediate mode until multi(): the read sees the watched list
+            items = pipe.lrange(key, 0, -1) + turn
+            history = [tuple(json.loads(item)) for item in items]
+            dropped = len(history) - len(trim_history(history, self.max_history_tokens))
+            pipe.multi()
+            pipe.rpush(key, *turn)
+            if dropped:
+                pipe.ltrim(key, dropped, -1)
+            pipe.expire(key, self.ttl_seconds)
+
+        self.redis_client.transaction(_append, key)
+
+    def clear(self, session_id: str) -> None:
+        """Forget a session."""
+        self.redis_client.delete(self._key(session_id))
+
+
+def create_session_store():
+    """
+    Build the session store configured through the environment.
+
+    SESSION_BACKEND selects `memory` (default) or `redis`; SESSION_TTL_SECONDS,
+    SESSION_MAX_HISTORY_TOKENS and SESSION_MAX_SESSIONS tune the limits.
+    """
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", 1800))
+    max_history_tokens = int(os.getenv("SESSION_MAX_HISTORY_TOKENS", 2000))
+
+    if backend == "redis":
+        return RedisSessionStore(max_history_tokens=max_history_tokens, ttl_seconds=ttl_seconds)
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+
+    return SessionStore(
+        max_history_tokens=max_history_tokens,
+        ttl_seconds=ttl_seconds,
+        max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", 10000)),
+    )
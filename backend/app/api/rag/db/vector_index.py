@@ -0,0 +1,809 @@
+import json
+import math
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from chromadb import Settings
+from dotenv import load_dotenv
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from ..utils import TIMESTAMP_FIELD
+
+load_dotenv()
+
+# "chroma" (HNSW in ChromaDB) or "numpy" (in-process memory-mapped index)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+VECTOR_STORE_DIR = os.getenv(
+    "VECTOR_STORE_DIR",
+    os.path.join(os.path.dirname(__file__), "knowledge_base"),
+)
+CHROMA_HNSW_M = int(os.getenv("CHROMA_HNSW_M", 128))
+CHROMA_HNSW_CONSTRUCTION_EF = int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", 400))
+CHROMA_HNSW_SEARCH_EF = int(os.getenv("CHROMA_HNSW_SEARCH_EF", 400))
+# "exact", "ivf", or "auto" (exact until NUMPY_IVF_MIN_VECTORS, then IVF)
+NUMPY_INDEX_TYPE = os.getenv("NUMPY_INDEX_TYPE", "auto").lower()
+NUMPY_IVF_NLIST = int(os.getenv("NUMPY_IVF_NLIST", 0))
+NUMPY_IVF_NPROBE = int(os.getenv("NUMPY_IVF_NPROBE", 16))
+NUMPY_IVF_MIN_VECTORS = int(os.getenv("NUMPY_IVF_MIN_VECTORS", 50000))
+# How often a reader checks the files for writes made by another process
+NUMPY_REFRESH_SECONDS = float(os.getenv("NUMPY_REFRESH_SECONDS", 5.0))
+# "none" (one index), "day" or "week" (one index per period of chunk timestamps)
+VECTOR_PARTITION = os.getenv("VECTOR_PARTITION", "none").lower()
+# Partitions whose period ended longer ago than this are dropped; 0 keeps everything
+VECTOR_RETENTION_DAYS = float(os.getenv("VECTOR_RETENTION_DAYS", 0))
+
+_partition_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="partition-search")
+
+
+class VectorIndex(ABC):
+    """
+    Base class for the dense index behind `VectorStore`.
+
+    Subclasses store (id, document, embedding) triples and answer nearest
+    neighbour queries with cosine relevance scores (higher is better),
+    optionally only over documents whose metadata timestamp falls in a
+    (since, until) window.
+    """
+
+    @abstractmethod
+    def upsert(self, ids: Sequence[str], documents: Sequence[Document], embeddings: Sequence[Sequence[float]]) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]) -> None:
+        ...
+
+    @abstractmethod
+    def search(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        time_range: Optional[Tuple[Optional[float], Optional[float]]] = None,
+    ) -> List[Tuple[Document, float]]:
+        ...
+
+    @abstractmethod
+    def drop(self) -> None:
+        """Delete the whole index and its files."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class ChromaIndex(VectorIndex):
+    """
+    ChromaDB collection with an HNSW index, persisted in `persist_directory`.
+
+    Parameters
+    ----------
+    embedding_model : Embedding
+        Embedding function handed to Chroma.
+    persist_directory : str
+        Directory of the Chroma database.
+    collection_name : str
+        Collection holding the index; several can share one database.
+    m : int
+        HNSW graph degree.
+    construction_ef : int
+        HNSW candidate list size while inserting.
+    search_ef : int
+        HNSW candidate list size while searching.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        persist_directory: str = VECTOR_STORE_DIR,
+        collection_name: str = "langchain",
+        m: int = CHROMA_HNSW_M,
+        construction_ef: int = CHROMA_HNSW_CONSTRUCTION_EF,
+        search_ef: int = CHROMA_HNSW_SEARCH_EF,
+    ) -> None:
+        self.dir = persist_directory
+        self.settings = Settings(
+            anonymized_telemetry=False,
+            is_persistent=True,
+            persist_directory=self.dir,
+        )
+        try:
+            self.db = Chroma(
+                collection_name=collection_name,
+                persist_directory=self.dir,
+                client_settings=self.settings,
+                embedding_function=embedding_model,
+                collection_metadata={
+                    "hnsw:space": "cosine",
+                    "hnsw:construction_ef": construction_ef,
+                    "hnsw:search_ef": search_ef,
+                    "hnsw:M": m,
+                    "hnsw:resize_factor": 2.0,
+                },
+            )
+        except Exception as e:
+            print(f"Error creating collection: {str(e)}")
+            raise
+
+    def upsert(self, ids, documents, embeddings) -> None:
+        self.db._collection.upsert(
+            ids=list(ids),
+            embeddings=[list(map(float, vector)) for vector in embeddings],
+            metadatas=[doc.metadata or None for doc in documents],
+            documents=[doc.page_content for doc in documents],
+        )
+
+    def delete(self, ids) -> None:
+        self.db.delete(ids=list(ids))
+
+    @staticmethod
+    def _where(time_range) -> Optional[Dict]:
+        if time_range is None:
+            return None
+        since, until = time_range
+        conditions = []
+        if since is not None:
+            conditions.append({TIMESTAMP_FIELD: {"$gte": since}})
+        if until is not None:
+            conditions.append({TIMESTAMP_FIELD: {"$lte": until}})
+        if len(conditions) > 1:
+            return {"$and": conditions}
+        return conditions[0] if conditions else None
+
+    def search(self, embedding, k: int = 4, time_range=None) -> List[Tuple[Document, float]]:
+        relevance_score_fn = self.db._select_relevance_score_fn()
+        results = self.db.similarity_search_by_vector_with_relevance_scores(
+            embedding=embedding, k=k, filter=self._where(time_range)
+        )
+        return [(doc, relevance_score_fn(distance)) for doc, distance in results]
+
+    def drop(self) -> None:
+        self.db.delete_collection()
+
+    def __len__(self) -> int:
+        return self.db._collection.count()
+
+
+class NumpyIndex(VectorIndex):
+    """
+    In-process index over a memory-mapped float32 matrix.
+
+    Unit-normalized vectors live in `vectors.f32`, one row per slot; ids,
+    texts, metadata, timestamps and IVF list assignments live in
+    `vectors.sqlite3`. Timestamps are also kept in memory so a time window
+    prunes candidates before any vector is scored.
+    Only the pages a search touches are read, so resident memory stays well
+    below the corpus size.
+
+    Small corpora are searched exactly with one matrix-vector product. With
+    IVF the vectors are clustered by spherical k-means and a query scores
+    only the `nprobe` lists closest to it. Lists are retrained once the
+    index has grown fourfold since the last training.
+
+    One process writes (the ingestion job); other processes pick up its
+    writes within `refresh_seconds`. Searches score outside the lock, so
+    each slot records the generation that last wrote it; hits in slots
+    rewritten meanwhile are re-scored before they are returned.
+
+    Parameters
+    ----------
+    persist_directory : str
+        Directory of the index files.
+    index_type : str
+        "exact", "ivf", or "auto" (exact below `ivf_min_vectors`, then IVF).
+    nlist : int
+        Number of IVF lists; 0 picks about sqrt(n).
+    nprobe : int
+        IVF lists scored per query.
+    ivf_min_vectors : int
+        Index size at which "auto" switches to IVF.
+    refresh_seconds : float
+        Minimum time between checks for writes from another process.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    META_FILE = "vectors.sqlite3"
+    CENTROIDS_FILE = "ivf_centroids.npy"
+
+    def __init__(
+        self,
+        persist_directory: str = VECTOR_STORE_DIR,
+        index_type: str = NUMPY_INDEX_TYPE,
+        nlist: int = NUMPY_IVF_NLIST,
+        nprobe: int = NUMPY_IVF_NPROBE,
+        ivf_min_vectors: int = NUMPY_IVF_MIN_VECTORS,
+        refresh_seconds: float = NUMPY_REFRESH_SECONDS,
+    ) -> None:
+        if index_type not in ("exact", "ivf", "auto"):
+            raise ValueError(f"Unknown NUMPY_INDEX_TYPE: {index_type}")
+        self.dir = persist_directory
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = max(1, nprobe)
+        self.ivf_min_vectors = ivf_min_vectors if index_type == "auto" else 1
+        self.refresh_seconds = refresh_seconds
+        os.makedirs(self.dir, exist_ok=True)
+        self._vectors_path = os.path.join(self.dir, self.VECTORS_FILE)
+        self._centroids_path = os.path.join(self.dir, self.CENTROIDS_FILE)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.dir, self.META_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            "slot INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, list INTEGER NOT NULL, "
+            "text TEXT NOT NULL, metadata TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO state VALUES ('dim', 0), ('capacity', 0), ('generation', 0), ('trained_size', 0);"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(rows)")}
+        if "timestamp" not in columns:
+            self._conn.execute("ALTER TABLE rows ADD COLUMN timestamp REAL")
+        self._conn.commit()
+        with self._lock:
+            self._load()
+
+    # ---------------------------
+    # Internal helpers (call with the lock held)
+    # ---------------------------
+
+    def _state(self) -> Dict[str, int]:
+        return dict(self._conn.execute("SELECT name, value FROM state").fetchall())
+
+    def _load(self) -> None:
+        """(Re)read the index from disk."""
+        state = self._state()
+        self._generation = state["generation"]
+        self._trained_size = state["trained_size"]
+        self._checked_at = time.monotonic()
+        self._dim = state["dim"] or None
+        self._capacity = state["capacity"]
+        self._matrix = self._open_matrix(self._capacity) if self._dim else None
+
+        self._slot_of: Dict[str, int] = {}
+        self._live = np.zeros(self._capacity, dtype=bool)
+        self._assign = np.full(self._capacity, -1, dtype=np.int32)
+        self._timestamps = np.full(self._capacity, np.nan)
+        # Generation of each slot's last write; after a reload every slot counts as rewritten
+        self._versions = np.full(self._capacity, self._generation, dtype=np.int64)
+        for slot, doc_id, list_id, timestamp in self._conn.execute("SELECT slot, id, list, timestamp FROM rows"):
+            self._slot_of[doc_id] = slot
+            self._live[slot] = True
+            self._assign[slot] = list_id
+            if timestamp is not None:
+                self._timestamps[slot] = timestamp
+        self._high = int(np.flatnonzero(self._live).max()) + 1 if self._slot_of else 0
+        self._free = sorted(set(range(self._high)) - set(self._slot_of.values()), reverse=True)
+
+        self._centroids = None
+        if self._trained_size and os.path.exists(self._centroids_path):
+            self._centroids = np.load(self._centroids_path)
+        self._lists: Optional[List[np.ndarray]] = None
+
+    def _refresh(self, force: bool = False) -> None:
+        """Reload if another process has written since the last check."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_seconds:
+            return
+        self._checked_at = now
+        generation = self._conn.execute("SELECT value FROM state WHERE name = 'generation'").fetchone()[0]
+        if generation != self._generation:
+            self._load()
+
+    def _open_matrix(self, capacity: int) -> np.memmap:
+        size = capacity * self._dim * 4
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(needed, 2 * self._capacity, 1024)
+        if self._matrix is not None:
+            self._matrix.flush()
+        self._matrix = self._open_matrix(capacity)
+        self._live = np.concatenate([self._live, np.zeros(capacity - self._capacity, dtype=bool)])
+        self._assign = np.concatenate([self._assign, np.full(capacity - self._capacity, -1, dtype=np.int32)])
+        self._timestamps = np.concatenate([self._timestamps, np.full(capacity - self._capacity, np.nan)])
+        self._versions = np.concatenate([self._versions, np.zeros(capacity - self._capacity, dtype=np.int64)])
+        self._capacity = capacity
+        self._conn.execute("UPDATE state SET value = ? WHERE name = 'capacity'", (capacity,))
+
+    def _commit(self) -> None:
+        self._generation += 1
+        self._conn.execute("UPDATE state SET value = ? WHERE name = 'generation'", (self._generation,))
+        self._conn.commit()
+
+    def _in_window(self, slots: np.ndarray, time_range) -> np.ndarray:
+        since, until = time_range
+        timestamps = self._timestamps[slots]
+        # Undated slots are NaN and fail both comparisons
+        return (timestamps >= (-np.inf if since is None else since)) & (
+            timestamps <= (np.inf if until is None else until)
+        )
+
+    def _recheck(
+        self, hits: List[Tuple[int, float]], query: np.ndarray, generation: int, time_range
+    ) -> List[Tuple[int, float]]:
+        """
+        Validate (slot, score) hits scored without the lock against writes since `generation`.
+
+        A slot written since then may hold another document: it is re-scored,
+        or dropped if it was freed or its document left the time window.
+        """
+        checked = []
+        for slot, score in hits:
+            if slot < len(self._versions) and self._versions[slot] <= generation:
+                checked.append((slot, score))
+            elif slot < self._high and self._live[slot] and (
+                time_range is None or self._in_window(np.asarray([slot]), time_range)[0]
+            ):
+                checked.append((slot, float(np.asarray(self._matrix[slot]) @ query)))
+        return sorted(checked, key=lambda hit: hit[1], reverse=True)
+
+    def _nearest_lists(self, vectors: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.full(len(vectors), -1, dtype=np.int32)
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _train(self) -> None:
+        """Cluster the live vectors into IVF lists (spherical k-means)."""
+        live = np.flatnonzero(self._live[:self._high])
+        nlist = self.nlist or int(math.sqrt(len(live)))
+        nlist = max(1, min(nlist, len(live)))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, size=min(len(live), 32 * nlist), replace=False))
+        data = np.asarray(self._matrix[sample])
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+        for _ in range(10):
+            nearest = np.argmax(data @ centroids.T, axis=1)
+            order = np.argsort(nearest, kind="stable")
+            members, starts = np.unique(nearest[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[members] = np.add.reduceat(data[order], starts)
+            empty = np.linalg.norm(sums, axis=1) == 0
+            # Reseed empty lists with random vectors
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        self._centroids = centroids.astype(np.float32)
+
+        for i in range(0, len(live), 65536):
+            chunk = live[i:i + 65536]
+            self._assign[chunk] = self._nearest_lists(np.asarray(self._matrix[chunk]))
+        self._conn.executemany(
+            "UPDATE rows SET list = ? WHERE slot = ?",
+            [(int(self._assign[slot]), int(slot)) for slot in live],
+        )
+        tmp_path = self._centroids_path + ".tmp.npy"
+        np.save(tmp_path, self._centroids)
+        os.replace(tmp_path, self._centroids_path)
+        self._trained_size = len(live)
+        self._conn.execute("UPDATE state SET value = ? WHERE name = 'trained_size'", (self._trained_size,))
+        self._lists = None
+
+    def _list_slots(self) -> List[np.ndarray]:
+        """Live slots of each IVF list, rebuilt lazily after writes."""
+        if self._lists is None:
+            live = np.flatnonzero(self._live[:self._high])
+            assign = self._assign[live]
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(len(self._centroids) + 1))
+            slots = live[order]
+            self._lists = [slots[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))]
+        return self._lists
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+
+    def upsert(self, ids, documents, embeddings) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids) or len(ids) != len(documents):
+            raise ValueError("ids, documents and embeddings must have the same length")
+        if not len(ids):
+            return
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            self._refresh(force=True)
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._conn.execute("UPDATE state SET value = ? WHERE name = 'dim'", (self._dim,))
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({self._dim})")
+
+            # The last occurrence of a repeated id wins
+            latest = {doc_id: i for i, doc_id in enumerate(ids)}
+            rows = sorted(latest.values())
+            slots = []
+            for i in rows:
+                slot = self._slot_of.get(ids[i])
+                if slot is None:
+                    slot = self._free.pop() if self._free else self._high
+                    self._high = max(self._high, slot + 1)
+                slots.append(slot)
+            if self._high > self._capacity:
+                self._grow(self._high)
+
+            slots = np.asarray(slots)
+            batch = vectors[rows]
+            self._matrix[slots] = batch
+            self._matrix.flush()
+            lists = self._nearest_lists(batch)
+            self._live[slots] = True
+            self._assign[slots] = lists
+            timestamps = [(documents[i].metadata or {}).get(TIMESTAMP_FIELD) for i in rows]
+            self._timestamps[slots] = [np.nan if t is None else t for t in timestamps]
+            self._versions[slots] = self._generation + 1
+            for i, slot in zip(rows, slots):
+                self._slot_of[ids[i]] = int(slot)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rows (slot, id, list, text, metadata, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (int(slot), ids[i], int(list_id), documents[i].page_content,
+                     json.dumps(documents[i].metadata or {}), timestamp)
+                    for i, slot, list_id, timestamp in zip(rows, slots, lists, timestamps)
+                ],
+            )
+            self._lists = None
+
+            if self.index_type != "exact" and len(self._slot_of) >= self.ivf_min_vectors and (
+                self._centroids is None or len(self._slot_of) >= 4 * self._trained_size
+            ):
+                self._train()
+            self._commit()
+
+    def delete(self, ids) -> None:
+        with self._lock:
+            self._refresh(force=True)
+            slots = [self._slot_of.pop(doc_id) for doc_id in ids if doc_id in self._slot_of]
+            if not slots:
+                return
+            self._matrix[slots] = 0.0
+            self._live[slots] = False
+            self._versions[slots] = self._generation + 1
+            self._free.extend(slots)
+            self._free.sort(reverse=True)
+            self._conn.executemany("DELETE FROM rows WHERE slot = ?", [(slot,) for slot in slots])
+            self._lists = None
+            self._commit()
+
+    def search(self, embedding, k: int = 4, time_range=None) -> List[Tuple[Document, float]]:
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        with self._lock:
+            self._refresh()
+            if self._matrix is None or not self._slot_of:
+                return []
+            if query.shape[0] != self._dim:
+                raise ValueError(f"Query dimension {query.shape[0]} does not match the index ({self._dim})")
+            matrix, high, live, generation = self._matrix, self._high, self._live, self._generation
+            in_window = None
+            if time_range is not None:
+                in_window = live[:high] & self._in_window(slice(0, high), time_range)
+            candidates = None
+            if self._centroids is not None and self.index_type != "exact":
+                lists = self._list_slots()
+                probe = np.argsort(-(self._centroids @ query))[:self.nprobe]
+                candidates = np.sort(np.concatenate([lists[i] for i in probe]))
+                if in_window is not None:
+                    window = np.flatnonzero(in_window)
+                    # A narrow window is cheaper to scan exactly than to probe
+                    candidates = window if len(window) <= len(candidates) else candidates[in_window[candidates]]
+            elif in_window is not None:
+                candidates = np.flatnonzero(in_window)
+
+        # Scoring runs outside the lock; numpy releases the GIL
+        if candidates is not None:
+            scores = np.asarray(matrix[candidates]) @ query
+        else:
+            candidates = np.arange(high)
+            scores = np.where(live[:high], np.asarray(matrix[:high]) @ query, -np.inf)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        hits = [(int(candidates[i]), float(scores[i])) for i in top]
+
+        with self._lock:
+            if self._generation != generation and self._matrix is not None:
+                hits = self._recheck(hits, query, generation, time_range)
+            placeholders = ",".join("?" * len(hits))
+            rows = {
+                slot: (text, metadata)
+                for slot, text, metadata in self._conn.execute(
+                    f"SELECT slot, text, metadata FROM rows WHERE slot IN ({placeholders})", [slot for slot, _ in hits]
+                )
+            }
+        return [
+            (Document(page_content=rows[slot][0], metadata=json.loads(rows[slot][1])), score)
+            for slot, score in hits
+            if slot in rows
+        ]
+
+    def drop(self) -> None:
+        with self._lock:
+            self._conn.close()
+            self._matrix = None
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._slot_of)
+
+
+class PartitionedIndex(VectorIndex):
+    """
+    Time-partitioned index: one sub-index per day or week of chunk timestamps.
+
+    A chunk goes to the partition of its metadata timestamp (UTC periods,
+    weeks starting on Monday); undated chunks share an "undated" partition.
+    A catalog in `partitions.sqlite3` records each partition's period and
+    the partition of every id, so deletes and re-dated chunks reach the
+    right sub-index. A search fans out, in parallel, only to the partitions
+    overlapping its time window and merges their top-k; the undated
+    partition is only searched without a window.
+
+    Retention drops whole partitions whose period ended before the cutoff:
+    one collection or directory removal instead of a delete per id. Each
+    partition holds a single period, so index size and search latency are
+    bounded by the retention period rather than by how long the scraper has
+    been running.
+
+    Parameters
+    ----------
+    factory : Callable[[str], VectorIndex]
+        Opens, creating it if needed, the sub-index of a partition name.
+    persist_directory : str
+        Directory of the partition catalog.
+    period : str
+        "day" or "week".
+    retention_days : float
+        Age past which `drop_expired` removes partitions; 0 keeps everything.
+    """
+
+    CATALOG_FILE = "partitions.sqlite3"
+    UNDATED = "undated"
+
+    def __init__(
+        self,
+        factory: Callable[[str], VectorIndex],
+        persist_directory: str = VECTOR_STORE_DIR,
+        period: str = "week",
+        retention_days: float = VECTOR_RETENTION_DAYS,
+    ) -> None:
+        if period not in ("day", "week"):
+            raise ValueError(f"Unknown VECTOR_PARTITION: {period}")
+        self.factory = factory
+        self.dir = persist_directory
+        self.period = period
+        self.retention_days = retention_days
+        os.makedirs(self.dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._partitions: Dict[str, VectorIndex] = {}
+        self._conn = sqlite3.connect(os.path.join(self.dir, self.CATALOG_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS partitions (name TEXT PRIMARY KEY, start REAL, end REAL);"
+            "CREATE TABLE IF NOT EXISTS ids (id TEXT PRIMARY KEY, partition TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_ids_partition ON ids(partition);"
+        )
+        self._conn.commit()
+
+    def partition_of(self, timestamp: Optional[float]) -> Tuple[str, Optional[float], Optional[float]]:
+        """(name, start, end) of the partition a timestamp belongs to."""
+        if timestamp is None:
+            return self.UNDATED, None, None
+        start = math.floor(timestamp / 86400) * 86400
+        if self.period == "week":
+            start -= time.gmtime(start).tm_wday * 86400
+        end = start + (7 if self.period == "week" else 1) * 86400
+        return f"{self.period}_{time.strftime('%Y%m%d', time.gmtime(start))}", float(start), float(end)
+
+    def retention_boundary(self, now: Optional[float] = None) -> Optional[float]:
+        """
+        Chunks timestamped before this are past retention, or None without
+        retention. It is the start of the period the cutoff falls in, so it
+        matches exactly what `drop_expired` removes.
+        """
+        if self.retention_days <= 0:
+            return None
+        cutoff = (time.time() if now is None else now) - self.retention_days * 86400
+        return self.partition_of(cutoff)[1]
+
+    # ---------------------------
+    # Internal helpers (call with the lock held)
+    # ---------------------------
+
+    def _open(self, name: str) -> VectorIndex:
+        index = self._partitions.get(name)
+        if index is None:
+            index = self._partitions[name] = self.factory(name)
+        return index
+
+    def _locate(self, ids: Sequence[str]) -> Dict[str, str]:
+        """Partition of each known id."""
+        located: Dict[str, str] = {}
+        for i in range(0, len(ids), 500):
+            chunk = list(ids[i:i + 500])
+            placeholders = ",".join("?" * len(chunk))
+            located.update(self._conn.execute(
+                f"SELECT id, partition FROM ids WHERE id IN ({placeholders})", chunk
+            ).fetchall())
+        return located
+
+    def _delete_located(self, located: Dict[str, str]) -> None:
+        by_partition: Dict[str, List[str]] = {}
+        for doc_id, name in located.items():
+            by_partition.setdefault(name, []).append(doc_id)
+        for name, part_ids in by_partition.items():
+            self._open(name).delete(part_ids)
+        self._conn.executemany("DELETE FROM ids WHERE id = ?", [(doc_id,) for doc_id in located])
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+
+    def upsert(self, ids, documents, embeddings) -> None:
+        boundary = self.retention_boundary()
+        groups: Dict[str, Tuple[List, List, List]] = {}
+        periods: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        target: Dict[str, str] = {}
+        for doc_id, doc, vector in zip(ids, documents, embeddings):
+            name, start, end = self.partition_of((doc.metadata or {}).get(TIMESTAMP_FIELD))
+            if boundary is not None and end is not None and end <= boundary:
+                # Already past retention: the next retention pass would drop it
+                continue
+            group = groups.setdefault(name, ([], [], []))
+            group[0].append(doc_id)
+            group[1].append(doc)
+            group[2].append(vector)
+            periods[name] = (start, end)
+            target[doc_id] = name
+
+        with self._lock:
+            # Chunks whose timestamp moved to another period leave their old partition
+            moved = {
+                doc_id: name for doc_id, name in self._locate(list(ids)).items()
+                if target.get(doc_id) != name
+            }
+            self._delete_located(moved)
+            for name, (part_ids, part_documents, part_embeddings) in groups.items():
+                self._open(name).upsert(part_ids, part_documents, part_embeddings)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO partitions VALUES (?, ?, ?)",
+                [(name, start, end) for name, (start, end) in periods.items()],
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO ids VALUES (?, ?)", list(target.items()))
+            self._conn.commit()
+
+    def delete(self, ids) -> None:
+        with self._lock:
+            self._delete_located(self._locate(list(ids)))
+            self._conn.commit()
+
+    def search(self, embedding, k: int = 4, time_range=None) -> List[Tuple[Document, float]]:
+        if time_range is not None and tuple(time_range) == (None, None):
+            time_range = None
+        since, until = time_range if time_range is not None else (None, None)
+        targets = []
+        with self._lock:
+            rows = self._conn.execute("SELECT name, start, end FROM partitions").fetchall()
+            # Forget partitions dropped by another process
+            for name in set(self._partitions) - {row[0] for row in rows}:
+                del self._partitions[name]
+            for name, start, end in rows:
+                if time_range is not None:
+                    if start is None or (since is not None and end <= since) or (until is not None and start > until):
+                        continue
+                # Partitions entirely inside the window are searched unfiltered
+                inside = start is not None and (since is None or start >= since) and (until is None or end <= until)
+                targets.append((name, self._open(name), None if inside else time_range))
+
+        futures = [
+            (name, _partition_executor.submit(index.search, embedding, k, window))
+            for name, index, window in targets
+        ]
+        results: List[Tuple[Document, float]] = []
+        for name, future in futures:
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                print(f"Error searching partition {name}: {str(e)}")
+        results.sort(key=lambda hit: hit[1], reverse=True)
+        return results[:k]
+
+    def drop_expired(
+        self,
+        now: Optional[float] = None,
+        on_drop: Optional[Callable[[List[str]], None]] = None,
+    ) -> List[str]:
+        """
+        Drop every partition whose period ended before the retention boundary.
+
+        Args:
+            now (Optional[float]): Current time, epoch seconds.
+            on_drop (Optional[Callable[[List[str]], None]]): Called with the
+                chunk ids of each partition, from the id catalog, before it
+                is dropped; if it raises, that partition is kept.
+
+        Returns:
+            List[str]: Names of the dropped partitions.
+        """
+        boundary = self.retention_boundary(now)
+        if boundary is None:
+            return []
+        with self._lock:
+            names = [row[0] for row in self._conn.execute("SELECT name FROM partitions WHERE end <= ?", (boundary,))]
+            for name in names:
+                if on_drop is not None:
+                    on_drop([row[0] for row in self._conn.execute("SELECT id FROM ids WHERE partition = ?", (name,))])
+                self._open(name).drop()
+                del self._partitions[name]
+                self._conn.execute("DELETE FROM ids WHERE partition = ?", (name,))
+                self._conn.execute("DELETE FROM partitions WHERE name = ?", (name,))
+                self._conn.commit()
+        return names
+
+    def partitions(self) -> List[str]:
+        """Names of the current partitions, oldest first, undated last."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT name FROM partitions ORDER BY start IS NULL, start"
+            )]
+
+    def drop(self) -> None:
+        for name in self.partitions():
+            with self._lock:
+                self._open(name).drop()
+                del self._partitions[name]
+        with self._lock:
+            self._conn.executescript("DELETE FROM ids; DELETE FROM partitions;")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ids").fetchone()[0]
+
+
+def create_vector_index(embedding_model, persist_directory: Optional[str] = None) -> VectorIndex:
+    """
+    Build the dense index configured through the environment.
+
+    VECTOR_BACKEND selects `chroma` (default) or `numpy`; VECTOR_STORE_DIR
+    sets the directory. Chroma is tuned with CHROMA_HNSW_M,
+    CHROMA_HNSW_CONSTRUCTION_EF and CHROMA_HNSW_SEARCH_EF, the NumPy index
+    with NUMPY_INDEX_TYPE, NUMPY_IVF_NLIST, NUMPY_IVF_NPROBE,
+    NUMPY_IVF_MIN_VECTORS and NUMPY_REFRESH_SECONDS.
+
+    VECTOR_PARTITION set to `day` or `week` splits the index by chunk
+    timestamp: one Chroma collection per partition, or one NumPy index
+    directory under `partitions/`. VECTOR_RETENTION_DAYS sets how long
+    partitions are kept.
+    """
+    persist_directory = persist_directory or VECTOR_STORE_DIR
+    if VECTOR_BACKEND not in ("chroma", "numpy"):
+        raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND}")
+    if VECTOR_PARTITION == "none":
+        if VECTOR_BACKEND == "chroma":
+            return ChromaIndex(embedding_model, persist_directory)
+        return NumpyIndex(persist_directory)
+
+    if VECTOR_BACKEND == "chroma":
+        def factory(name: str) -> VectorIndex:
+            return ChromaIndex(embedding_model, persist_directory, collection_name=f"kb_{name}")
+    else:
+        def factory(name: str) -> VectorIndex:
+            return NumpyIndex(os.path.join(persist_directory, "partitions", name))
+    return PartitionedIndex(factory, persist_directory, period=VECTOR_PARTITION)
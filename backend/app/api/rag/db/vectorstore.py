@@ -1,77 +1,309 @@
-from typing import List
-from chromadb import Settings
-from langchain_community.vectorstores import Chroma
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+from dotenv import load_dotenv
+from langchain_core.documents import Document
 from ..models.embedding_model import Embedding
+from ..reranker import Reranker, create_reranker
+from ..utils import RELEVANCE_FIELD, TIMESTAMP_FIELD, chunk_id
+from .lexical_index import BM25Index, create_lexical_index, reciprocal_rank_fusion
+from .vector_index import VECTOR_STORE_DIR, PartitionedIndex, VectorIndex, create_vector_index
 
 import sys
 print(f'Sys Path: {sys.path}')
 
+load_dotenv()
+
+# "hybrid" fuses BM25 and dense results, "dense" or "lexical" use one of them
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 4))
+# Hits fetched from each ranking before fusion
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+# Hybrid retrieval answers from the lexical index alone past this embedding delay
+QUERY_EMBED_TIMEOUT_SECONDS = float(os.getenv("QUERY_EMBED_TIMEOUT_SECONDS", 2.0))
+# Recency re-scoring: score * ((1 - weight) + weight * 0.5 ** (age / half-life)); 0 disables
+RECENCY_HALF_LIFE_HOURS = float(os.getenv("RECENCY_HALF_LIFE_HOURS", 72))
+RECENCY_WEIGHT = float(os.getenv("RECENCY_WEIGHT", 0.3))
+# Default time window: only search chunks newer than this; 0 searches everything
+RETRIEVAL_MAX_AGE_HOURS = float(os.getenv("RETRIEVAL_MAX_AGE_HOURS", 0))
+
+_embed_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="query-embed")
 
 
 class VectorStore:
-    def __init__(self):
-        self.embedding_model = Embedding()
-        self.dir = "/home/nahid/Documents/Projects/RagChat/backend/app/api/rag/db/knowledge_base"
-        self.settings = Settings(
-            anonymized_telemetry=False,
-            is_persistent=True,
-            persist_directory=self.dir,
-        )
-        self.db = self._create_collection(
-            embedding=self.embedding_model,
-            dir=self.dir,
-            settings=self.settings
+    def __init__(
+        self,
+        embedding_model: Optional[Embedding] = None,
+        lexical_index: Optional[BM25Index] = None,
+        mode: str = RETRIEVAL_MODE,
+        persist_directory: Optional[str] = None,
+        index: Optional[VectorIndex] = None,
+        reranker: Optional[Reranker] = None,
+    ):
+        self.embedding_model = embedding_model if embedding_model is not None else Embedding()
+        self.lexical_index = lexical_index if lexical_index is not None else create_lexical_index()
+        if mode not in ("hybrid", "dense", "lexical"):
+            raise ValueError(f"Unknown RETRIEVAL_MODE: {mode}")
+        # Without a lexical index only dense retrieval is possible
+        self.mode = mode if self.lexical_index is not None else "dense"
+        self.top_k = RETRIEVAL_TOP_K
+        self.candidates = max(RETRIEVAL_CANDIDATES, RETRIEVAL_TOP_K)
+        self.embed_timeout = QUERY_EMBED_TIMEOUT_SECONDS
+        self.half_life_hours = RECENCY_HALF_LIFE_HOURS
+        self.recency_weight = min(1.0, max(0.0, RECENCY_WEIGHT))
+        self.max_age_hours = RETRIEVAL_MAX_AGE_HOURS
+        self.dir = persist_directory or VECTOR_STORE_DIR
+        self.index = index if index is not None else create_vector_index(self.embedding_model, self.dir)
+        self.reranker = reranker if reranker is not None else create_reranker()
+
+    def _search_by_vector(self, embedding: List[float], k: int = 4, time_range: Optional[Tuple] = None) -> List[Tuple]:
+        """
+        Search the dense index with a precomputed query embedding.
+
+        Args:
+            embedding (List[float]): The query embedding.
+            k (int): Number of documents to return.
+            time_range (Optional[Tuple]): (since, until) epoch-seconds window.
+
+        Returns:
+            List[Tuple]: (document, relevance score) pairs, best first.
+        """
+        return self.index.search(embedding, k=k, time_range=time_range)
+
+    @staticmethod
+    def _with_relevance(hits: List[Tuple], dense: bool) -> List[Tuple]:
+        """
+        Copy each hit's relevance into its metadata under RELEVANCE_FIELD.
+
+        Fusion, recency and reranking replace the score, so the context
+        cutoff reads this instead. Dense hits carry their cosine relevance.
+        BM25 scores are not on a similarity scale, so lexical hits carry None.
+        """
+        return [
+            (Document(page_content=doc.page_content,
+                      metadata={**(doc.metadata or {}), RELEVANCE_FIELD: score if dense else None}), score)
+            for doc, score in hits
+        ]
+
+    def _embed_query(self, query: str) -> List[float]:
+        """Embed a query, giving up after `embed_timeout` seconds."""
+        future = _embed_executor.submit(self.embedding_model.embed_query, query)
+        return future.result(timeout=self.embed_timeout or None)
+
+    def _fuse(self, dense: List[Tuple], lexical: List[Tuple]) -> List[Tuple]:
+        # Dense first: a document in both rankings keeps its dense relevance
+        return reciprocal_rank_fusion(
+            [self._with_relevance(dense, True), self._with_relevance(lexical, False)], k=RRF_K, top_k=self._depth
         )
 
-    def _create_collection(self, embedding, dir: str, settings: Settings):
-        try:
-            db = Chroma(
-                persist_directory=dir,
-                client_settings=settings,
-                embedding_function=embedding,
-                collection_metadata={
-                    "hnsw:space": "cosine",
-                    "hnsw:construction_ef": 400,
-                    "hnsw:search_ef": 400,
-                    "hnsw:M": 128,
-                    "hnsw:resize_factor": 2.0,
-                },
-            )
-            # print(f"Number of documents in collection: {db.count()}", flush=True)
-            return db
-        except Exception as e:
-            print(f"Error creating collection: {str(e)}")
-            raise
+    @property
+    def _recency_enabled(self) -> bool:
+        return self.recency_weight > 0 and self.half_life_hours > 0
 
-    def query(self, query: str) -> List[str]:
+    @property
+    def _depth(self) -> int:
+        """Hits fetched per ranking for fusion, recency or reranking."""
+        if self.reranker is not None:
+            return max(self.candidates, self.reranker.candidates)
+        return self.candidates
+
+    @property
+    def _fetch_k(self) -> int:
+        """Hits fetched from a single index: top_k, unless later stages re-order them."""
+        return self._depth if self._recency_enabled or self.reranker is not None else self.top_k
+
+    def _time_range(self, time_range: Optional[Tuple]) -> Optional[Tuple]:
+        """The given window, else the default max-age window; (None, None) searches everything."""
+        if time_range is not None:
+            return None if tuple(time_range) == (None, None) else tuple(time_range)
+        if self.max_age_hours > 0:
+            return (time.time() - self.max_age_hours * 3600, None)
+        return None
+
+    def _rank(self, results: List[Tuple], now: Optional[float] = None) -> List[Tuple]:
+        """
+        Re-score hits by age and keep the best `top_k`.
+
+        A hit keeps (1 - recency_weight) of its score and earns the rest in
+        proportion to 0.5 ** (age / half-life), so fresh articles win close
+        calls without burying a clearly better older match. Undated hits are
+        treated as one half-life old.
+        """
+        if self._recency_enabled:
+            now = time.time() if now is None else now
+            rescored = []
+            for doc, score in results:
+                timestamp = (doc.metadata or {}).get(TIMESTAMP_FIELD)
+                age_hours = max(0.0, now - timestamp) / 3600 if timestamp is not None else self.half_life_hours
+                decay = 0.5 ** (age_hours / self.half_life_hours)
+                rescored.append((doc, score * (1 - self.recency_weight + self.recency_weight * decay)))
+            results = sorted(rescored, key=lambda hit: hit[1], reverse=True)
+        if self.reranker is not None:
+            return self.reranker.select(results, self.top_k)
+        return results[:self.top_k]
+
+    def query(
+        self,
+        query: str,
+        embedding: Optional[List[float]] = None,
+        time_range: Optional[Tuple] = None,
+    ) -> List[str]:
         """
         Retrieve relevant documents based on the query.
+
+        In hybrid mode BM25 and dense results are fused with reciprocal rank
+        fusion; if the query cannot be embedded in time, the lexical results
+        are used alone. Both indexes only search the time window, and hits
+        are then re-scored by age (see `_rank`).
         
         Args:
             query (str): The search query to find relevant documents.
+            embedding (Optional[List[float]]): The query's embedding, if the
+                caller already has it.
+            time_range (Optional[Tuple]): (since, until) epoch-seconds window;
+                defaults to RETRIEVAL_MAX_AGE_HOURS, (None, None) disables it.
         
         Returns:
             List[str]: A list of documents that match the query.
         """
         try:
-            results = self.db.similarity_search_with_relevance_scores(
-                query=query
-            )
+            time_range = self._time_range(time_range)
+            k = self._fetch_k
+            if self.mode == "lexical":
+                results = self._with_relevance(self.lexical_index.search(query, k=k, time_range=time_range), False)
+            elif self.mode == "dense":
+                if embedding is None:
+                    embedding = self.embedding_model.embed_query(query)
+                results = self._with_relevance(self._search_by_vector(embedding, k=k, time_range=time_range), True)
+            else:
+                lexical = self.lexical_index.search(query, k=self._depth, time_range=time_range)
+                dense = []
+                try:
+                    if embedding is None:
+                        embedding = self._embed_query(query)
+                    dense = self._search_by_vector(embedding, k=self._depth, time_range=time_range)
+                except Exception as e:
+                    print(f"Dense retrieval unavailable, using lexical results only: {str(e) or type(e).__name__}")
+                results = self._fuse(dense, lexical)
+            if self.reranker is not None:
+                results = self.reranker.rerank(query, results)
+            results = self._rank(results)
+            print(f'Retrieved {len(results)} documents for query: {query}', flush=True)
+            return results if results else []
+        except Exception as e:
+            print(f"Error retrieving documents: {str(e)}")
+            return []
+
+    async def aquery(
+        self,
+        query: str,
+        embedding: Optional[List[float]] = None,
+        time_range: Optional[Tuple] = None,
+    ) -> List[str]:
+        """
+        Retrieve relevant documents without blocking the event loop.
+
+        The query is embedded over async HTTP while the lexical search runs;
+        the index searches, which are CPU-bound, run in worker threads.
+
+        Args:
+            query (str): The search query to find relevant documents.
+            embedding (Optional[List[float]]): The query's embedding, if the
+                caller already has it.
+            time_range (Optional[Tuple]): (since, until) epoch-seconds window;
+                defaults to RETRIEVAL_MAX_AGE_HOURS, (None, None) disables it.
+
+        Returns:
+            List[str]: A list of documents that match the query.
+        """
+        try:
+            time_range = self._time_range(time_range)
+            k = self._fetch_k
+            if self.mode == "lexical":
+                results = self._with_relevance(
+                    await asyncio.to_thread(self.lexical_index.search, query, k, time_range), False
+                )
+            elif self.mode == "dense":
+                if embedding is None:
+                    embedding = await self.embedding_model.aembed_query(query)
+                results = self._with_relevance(
+                    await asyncio.to_thread(self._search_by_vector, embedding, k, time_range), True
+                )
+            else:
+                lexical_task = asyncio.ensure_future(
+                    asyncio.to_thread(self.lexical_index.search, query, self._depth, time_range)
+                )
+                dense = []
+                try:
+                    if embedding is None:
+                        embedding = await asyncio.wait_for(
+                            self.embedding_model.aembed_query(query), self.embed_timeout or None
+                        )
+                    dense = await asyncio.to_thread(self._search_by_vector, embedding, self._depth, time_range)
+                except Exception as e:
+                    print(f"Dense retrieval unavailable, using lexical results only: {str(e) or type(e).__name__}")
+                results = self._fuse(dense, await lexical_task)
+            if self.reranker is not None:
+                results = await self.reranker.arerank(query, results)
+            results = self._rank(results)
             print(f'Retrieved {len(results)} documents for query: {query}', flush=True)
             return results if results else []
         except Exception as e:
             print(f"Error retrieving documents: {str(e)}")
             return []
 
-    def add(self, documents: List[str]) -> None:
+    def embed_documents(self, documents: List) -> List[List[float]]:
+        """
+        Embed documents with the store's embedding model.
+
+        Args:
+            documents (List): LangChain Document objects.
+
+        Returns:
+            List[List[float]]: One embedding per document.
+        """
+        return self.embedding_model.embed_documents([doc.page_content for doc in documents])
+
+    @staticmethod
+    def _ids(documents: List) -> List[str]:
+        """Content-addressed ids: the chunk text and its article's source URL."""
+        return [chunk_id(doc.page_content, (doc.metadata or {}).get("source", "")) for doc in documents]
+
+    def add(
+        self,
+        documents: List[str],
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+    ) -> None:
         """
         Add documents to the vector store.
+
+        Writes are upserts: without ids, documents get content-addressed ids,
+        so adding the same chunk again replaces it instead of duplicating it.
+        Repeated ids are written once.
         
         Args:
             documents (List[str]): A list of documents to be added.
+            ids (Optional[List[str]]): Stable ids, one per document.
+            embeddings (Optional[List[List[float]]]): Precomputed embeddings;
+                when given they are written as-is instead of re-embedding.
         """
         try:
-            self.db.add_documents(documents=documents)
+            ids = ids or self._ids(documents)
+            seen = set()
+            positions = [i for i, doc_id in enumerate(ids) if not (doc_id in seen or seen.add(doc_id))]
+            if len(positions) < len(ids):
+                ids = [ids[i] for i in positions]
+                documents = [documents[i] for i in positions]
+                embeddings = [embeddings[i] for i in positions] if embeddings is not None else None
+            if embeddings is None:
+                embeddings = self.embed_documents(documents)
+            self.index.upsert(ids, documents, embeddings)
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, documents)
             print(f"Added {len(documents)} documents to the collection")
         except Exception as e:
             print(f"Error adding documents: {str(e)}")
@@ -85,25 +317,54 @@ class VectorStore:
             document_ids (List[str]): A list of document IDs to be deleted.
         """
         try:
-            self.db.delete(ids=document_ids)
+            self.index.delete(document_ids)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(document_ids)
             print(f"Deleted {len(document_ids)} documents from the collection")
         except Exception as e:
             print(f"Error deleting documents: {str(e)}")
             raise
 
+    def apply_retention(
+        self,
+        now: Optional[float] = None,
+        on_expired: Optional[Callable[[List[str]], None]] = None,
+    ) -> int:
+        """
+        Drop the index partitions past retention, and the same chunks from
+        the lexical index. Only partitioned indexes have a retention period.
+
+        Args:
+            now (Optional[float]): Current time, epoch seconds.
+            on_expired (Optional[Callable[[List[str]], None]]): Called with
+                the ids of each partition's chunks before it is dropped.
+
+        Returns:
+            int: Number of partitions dropped.
+        """
+        if not isinstance(self.index, PartitionedIndex):
+            return 0
+        boundary = self.index.retention_boundary(now)
+        if boundary is None:
+            return 0
+        dropped = self.index.drop_expired(now, on_drop=on_expired)
+        removed = self.lexical_index.delete_before(boundary) if self.lexical_index is not None else 0
+        if dropped or removed:
+            print(f"Retention dropped {len(dropped)} partitions and {removed} lexical entries")
+        return len(dropped)
+
     def update(self, documents: List[str]) -> None:
         """
         Update existing documents in the vector store.
+
+        Documents are matched by content-addressed id (see `add`), so
+        updating an unchanged document rewrites it in place.
         
         Args:
-            documents (List[str]): A list of documents to be updated.
+            documents (List[str]): Documents, or plain texts, to be updated.
         """
         try:
-            document_ids = [f"doc_{i}" for i in range(len(documents))]
-            self.db.upsert(
-                documents=documents,
-                ids=document_ids
-            )
+            self.add([Document(page_content=doc) if isinstance(doc, str) else doc for doc in documents])
             print(f"Updated {len(documents)} documents in the collection")
         except Exception as e:
             print(f"Error updating documents: {str(e)}")
@@ -0,0 +1,254 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+
+class Stage:
+    """
+    One step of a `StagedPipeline`.
+
+    Parameters
+    ----------
+    name : str
+        Name used in progress reports.
+    process : Callable[[Any], Iterable[Any]]
+        Maps one input item to zero or more output items.
+    flush : Optional[Callable[[], Iterable[Any]]]
+        Called once after the last input to emit any buffered outputs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process: Callable[[Any], Iterable[Any]],
+        flush: Optional[Callable[[], Iterable[Any]]] = None,
+    ) -> None:
+        self.name = name
+        self.process = process
+        self.flush = flush
+
+
+class StageStats:
+    """Counters for one stage, updated only by that stage's thread."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.done = False
+
+    def snapshot(self, elapsed: float, backlog: int) -> Dict[str, Any]:
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "items_per_sec": round(self.items_out / elapsed, 2) if elapsed > 0 else 0.0,
+            "busy_seconds": round(self.busy_seconds, 2),
+            "backlog": backlog,
+            "done": self.done,
+        }
+
+
+class StagedPipeline:
+    """
+    Run a source and a chain of stages concurrently, one thread each.
+
+    Stages are connected by bounded queues, so a slow stage applies
+    back-pressure upstream and at most `queue_size` items wait between any
+    two stages: memory stays capped regardless of how much the source yields.
+    The first exception in any stage stops the whole pipeline and is re-raised
+    from `run`.
+
+    Parameters
+    ----------
+    source : Iterable[Any]
+        Items fed into the first stage; consumed on its own thread ("fetch").
+    stages : List[Stage]
+        Stages applied in order.
+    queue_size : int
+        Capacity of each inter-stage queue.
+    progress_interval : float
+        Seconds between progress reports.
+    on_progress : Optional[Callable[[Dict[str, Any]], None]]
+        Receives each progress report; reports are also logged.
+    """
+
+    def __init__(
+        self,
+        source: Iterable[Any],
+        stages: List[Stage],
+        queue_size: int = 8,
+        progress_interval: float = 10.0,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> None:
+        self.source = source
+        self.stages = stages
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress
+        self.queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+        self.stats = [StageStats("fetch")] + [StageStats(stage.name) for stage in stages]
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._started = 0.0
+
+    def _put(self, q: "queue.Queue", item: Any) -> None:
+        while True:
+            if self._stop.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: "queue.Queue") -> Any:
+        while True:
+            if self._stop.is_set():
+                raise PipelineAborted()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _fail(self, stats: StageStats, error: BaseException) -> None:
+        stats.errors += 1
+        if self._error is None:
+            self._error = error
+            logger.error("Ingestion stage '%s' failed: %s", stats.name, error)
+        self._stop.set()
+
+    def _run_source(self) -> None:
+        stats = self.stats[0]
+        out = self.queues[0] if self.queues else None
+        try:
+            iterator = iter(self.source)
+            while True:
+                began = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stats.busy_seconds += time.perf_counter() - began
+                stats.items_out += 1
+                if out is not None:
+                    self._put(out, item)
+            if out is not None:
+                self._put(out, _DONE)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(stats, e)
+        finally:
+            stats.done = True
+
+    def _run_stage(self, index: int) -> None:
+        stage = self.stages[index]
+        stats = self.stats[index + 1]
+        inbox = self.queues[index]
+        out = self.queues[index + 1] if index + 1 < len(self.queues) else None
+
+        def emit(outputs: Optional[Iterable[Any]]) -> None:
+            for output in outputs or ():
+                stats.items_out += 1
+                if out is not None:
+                    self._put(out, output)
+
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    break
+                stats.items_in += 1
+                began = time.perf_counter()
+                outputs = list(stage.process(item) or ())
+                stats.busy_seconds += time.perf_counter() - began
+                emit(outputs)
+            if stage.flush is not None:
+                began = time.perf_counter()
+                outputs = list(stage.flush() or ())
+                stats.busy_seconds += time.perf_counter() - began
+                emit(outputs)
+            if out is not None:
+                self._put(out, _DONE)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(stats, e)
+        finally:
+            stats.done = True
+
+    def progress(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage counters, throughput and queue backlog."""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        report = {}
+        for i, stats in enumerate(self.stats):
+            # Backlog is what waits in front of the stage
+            backlog = self.queues[i - 1].qsize() if i > 0 else 0
+            report[stats.name] = stats.snapshot(elapsed, backlog)
+        return report
+
+    def _report(self) -> None:
+        report = self.progress()
+        logger.info(
+            "Ingestion progress: %s",
+            ", ".join(
+                f"{name} {s['items_out']} ({s['items_per_sec']}/s, backlog {s['backlog']})"
+                for name, s in report.items()
+            ),
+        )
+        if self.on_progress is not None:
+            try:
+                self.on_progress(report)
+            except Exception as e:
+                logger.warning("Progress callback failed: %s", e)
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Run the pipeline to completion.
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+            The final progress report.
+
+        Raises
+        ------
+        BaseException
+            The first error raised by the source or any stage.
+        """
+        self._started = time.perf_counter()
+        threads = [threading.Thread(target=self._run_source, name="ingest-fetch", daemon=True)]
+        threads += [
+            threading.Thread(target=self._run_stage, args=(i,), name=f"ingest-{stage.name}", daemon=True)
+            for i, stage in enumerate(self.stages)
+        ]
+        for thread in threads:
+            thread.start()
+
+        last_report = time.perf_counter()
+        while any(thread.is_alive() for thread in threads):
+            threads[-1].join(timeout=0.2)
+            if time.perf_counter() - last_report >= self.progress_interval:
+                self._report()
+                last_report = time.perf_counter()
+
+        for thread in threads:
+            thread.join()
+
+        self._report()
+        if self._error is not None:
+            raise self._error
+        return self.progress()
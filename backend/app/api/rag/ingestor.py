@@ -1,9 +1,16 @@
+import hashlib
 import logging
 import time
-from typing import Any, Dict, List, Optional, Sequence, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Union
 
+from langchain_core.documents import Document
+
+from .db.dedup_index import DedupIndex, create_dedup_index
 from .db.redis_client import RedisDB
+from .ingest_pipeline import Stage, StagedPipeline
 from .retriever import Retriever
+from .splitter import ParallelSplitter, create_parallel_splitter
+from .utils import TIMESTAMP_FIELD, chunk_id, parse_timestamp
 
 # Configure logging only if no handlers exist (avoid duplicate logs in larger apps)
 if not logging.getLogger().handlers:
@@ -30,21 +37,46 @@ class Ingestor:
         Inject a RedisDB instance for easier testing.
     retriever : Optional[Retriever]
         Inject a Retriever instance for easier testing.
+    dedup_index : Optional[DedupIndex]
+        Fingerprints used to skip duplicate chunks before embedding;
+        defaults to the one configured by DEDUP_ENABLED.
+    splitter : Optional[ParallelSplitter]
+        Splits articles in bulk across worker processes; defaults to the one
+        configured by SPLIT_WORKERS. Without one, articles are split one at a
+        time by the retriever.
     max_retries : int
         Max retry attempts for transient read operations (e.g., Redis).
     backoff_base : float
         Initial backoff delay in seconds for retries (exponential).
+    write_batch_size : int
+        Number of chunks buffered before they are written to the vector store.
+    fetch_batch_size : int
+        Number of URLs read from Redis per SSCAN step and pipelined round trip.
+    queue_size : int
+        Capacity of each queue between ingestion stages.
+    progress_interval : float
+        Seconds between per-stage progress reports during `ingest`.
     """
 
     def __init__(
         self,
         redis_client: Optional[RedisDB] = None,
         retriever: Optional[Retriever] = None,
+        dedup_index: Optional[DedupIndex] = None,
+        splitter: Optional[ParallelSplitter] = None,
         max_retries: int = 3,
         backoff_base: float = 0.2,
+        write_batch_size: int = 256,
+        fetch_batch_size: int = 500,
+        queue_size: int = 8,
+        progress_interval: float = 10.0,
     ) -> None:
         self.max_retries = max(1, int(max_retries))
         self.backoff_base = max(0.0, float(backoff_base))
+        self.write_batch_size = max(1, int(write_batch_size))
+        self.fetch_batch_size = max(1, int(fetch_batch_size))
+        self.queue_size = max(1, int(queue_size))
+        self.progress_interval = max(0.0, float(progress_interval))
 
         try:
             self.redis_client = redis_client if redis_client is not None else RedisDB()
@@ -58,6 +90,9 @@ class Ingestor:
             logger.exception("Failed to initialize Retriever.")
             raise IngestorInitError(f"Retriever initialization failed: {e}") from e
 
+        self.dedup_index = dedup_index if dedup_index is not None else create_dedup_index()
+        self.splitter = splitter if splitter is not None else create_parallel_splitter()
+
     # ---------------------------
     # Internal helpers
     # ---------------------------
@@ -89,10 +124,182 @@ class Ingestor:
         assert last_exc is not None
         raise last_exc
 
+    @staticmethod
+    def _normalize(url: str, raw: Any) -> Optional[Dict[str, Any]]:
+        """Normalize raw Redis content into a dict with at least 'url' and 'content'."""
+        if raw is None:
+            logger.warning("No content returned for url=%s; skipping.", url)
+            return None
+
+        if isinstance(raw, dict):
+            text = raw.get("content")
+            if not text or not str(text).strip():
+                logger.warning("Empty 'content' for url=%s; skipping.", url)
+                return None
+            payload = dict(raw)
+            payload.setdefault("url", url)
+            return payload
+
+        text = str(raw).strip()
+        if not text:
+            logger.warning("Empty content (non-dict) for url=%s; skipping.", url)
+            return None
+        return {"url": url, "content": text}
+
+    @staticmethod
+    def _watermark(item: Dict[str, Any]) -> Dict[str, Optional[str]]:
+        """Change-detection fields written by the scraper alongside the content."""
+        return {
+            "scraped_at": item.get("scraped_at"),
+            "content_length": item.get("content_length"),
+        }
+
+    @staticmethod
+    def _metadata(item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Chunk metadata: the article's URL and title, and its publish and
+        scrape times as epoch seconds. TIMESTAMP_FIELD holds the publish
+        time when the scraper found one, else the scrape time.
+        """
+        url = item.get("url", "unknown")
+        metadata: Dict[str, Any] = {"source": url, "url": url}
+        if item.get("title"):
+            metadata["title"] = str(item["title"])
+        # Chroma metadata values cannot be None, so missing times are left out
+        for field in ("published_at", "scraped_at"):
+            timestamp = parse_timestamp(item.get(field))
+            if timestamp is not None:
+                metadata[field] = timestamp
+        timestamp = metadata.get("published_at", metadata.get("scraped_at"))
+        if timestamp is not None:
+            metadata[TIMESTAMP_FIELD] = timestamp
+        return metadata
+
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        return hashlib.sha256(str(text).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _chunk_ids(url: str, documents: Sequence[Any]) -> List[str]:
+        """Content-addressed vector ids (URL + chunk text), so re-ingestion upserts."""
+        return [chunk_id(doc.page_content, url) for doc in documents]
+
+    def _write(
+        self,
+        documents: List[Any],
+        ids: List[str],
+        stale_ids: List[str],
+        records: Dict[str, Dict[str, Any]],
+        removed_urls: List[str],
+        embeddings: Optional[List[List[float]]] = None,
+    ) -> None:
+        """Upsert new chunks, delete stale ones, then persist the ingestion records."""
+        if documents:
+            self.retriever.ingest(documents, ids=ids, embeddings=embeddings)
+        if stale_ids:
+            self.retriever.delete_documents(stale_ids)
+        if self.dedup_index is not None and (stale_ids or removed_urls):
+            self.dedup_index.release(stale_ids, sources=removed_urls)
+        # Records are written last so a failed write is retried on the next run
+        self.redis_client.set_ingest_records(records)
+        self.redis_client.delete_ingest_records(removed_urls)
+
+    def _apply_retention(self) -> int:
+        """Drop expired partitions; a failure is logged and retried on the next run."""
+        try:
+            return int(self.retriever.apply_retention(
+                on_expired=self.dedup_index.release if self.dedup_index is not None else None
+            ))
+        except Exception as e:
+            logger.warning("Failed to apply retention: %s", e)
+            return 0
+
+    def _requeue_orphans(self) -> int:
+        """
+        Forget the ingestion records of articles with a chunk skipped as a
+        duplicate of one since deleted, so the next run ingests them again
+        and indexes their copy. A failure is logged and retried on the next run.
+        """
+        if self.dedup_index is None:
+            return 0
+        try:
+            urls = self.dedup_index.orphaned_sources()
+            if urls:
+                self._retry(self.redis_client.delete_ingest_records, urls)
+            return len(urls)
+        except Exception as e:
+            logger.warning("Failed to re-queue articles with orphaned duplicates: %s", e)
+            return 0
+
+    def _bump_generation(self) -> None:
+        """Tell readers (e.g. the answer cache) that the knowledge base changed."""
+        try:
+            self._retry(self.redis_client.bump_ingest_generation)
+        except Exception as e:
+            logger.warning("Failed to bump the ingestion generation: %s", e)
+
     # ---------------------------
     # Public API
     # ---------------------------
 
+    def iter_url_batches(self, seen: Optional[Set[str]] = None) -> Iterator[List[str]]:
+        """
+        Walk the scraped URL index with SSCAN, one retried step per batch.
+
+        Parameters
+        ----------
+        seen : Optional[Set[str]]
+            Set the yielded URLs are added to, for callers that need them
+            afterwards; a private one is used if omitted.
+
+        Yields
+        ------
+        List[str]
+            Batches of distinct URLs, at most about `fetch_batch_size` each.
+        """
+        cursor = 0
+        if seen is None:
+            seen = set()
+        while True:
+            try:
+                cursor, urls = self._retry(
+                    self.redis_client.scan_scraped_urls, cursor, self.fetch_batch_size
+                )
+            except Exception as e:
+                logger.exception("Failed to scan scraped URLs in Redis.")
+                raise IngestorError(f"Fetching URLs failed: {e}") from e
+
+            fresh = [url for url in urls if url not in seen]
+            seen.update(fresh)
+            if fresh:
+                yield fresh
+            if cursor == 0:
+                return
+
+    def iter_data(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream contents for scraped URLs from Redis.
+
+        Each batch of URLs is fetched with one pipelined round trip, so
+        processing can start while the rest of the corpus is still being read.
+
+        Yields
+        ------
+        Dict[str, Any]
+            Dicts that at least contain 'url' and 'content'.
+        """
+        for urls in self.iter_url_batches():
+            try:
+                raws = self._retry(self.redis_client.get_contents, urls)
+            except Exception as e:
+                logger.error("Failed to fetch content for %d urls: %s", len(urls), e)
+                continue
+
+            for url, raw in zip(urls, raws):
+                payload = self._normalize(url, raw)
+                if payload is not None:
+                    yield payload
+
     def fetch_data(self) -> List[Dict[str, Any]]:
         """
         Fetch all contents for scraped URLs from Redis.
@@ -104,47 +311,11 @@ class Ingestor:
             - 'url': str
             - 'content': str
         """
-        try:
-            urls: Sequence[str] = self._retry(self.redis_client.get_all_scraped_urls)
-        except Exception as e:
-            logger.exception("Failed to fetch scraped URLs from Redis.")
-            raise IngestorError(f"Fetching URLs failed: {e}") from e
-
-        if not urls:
+        contents = list(self.iter_data())
+        if not contents:
             logger.info("No scraped URLs found in Redis.")
-            return []
-
-        contents: List[Dict[str, Any]] = []
-        for url in urls:
-            try:
-                raw = self._retry(self.redis_client.get_content, url)
-            except Exception as e:
-                logger.error("Failed to fetch content for url=%s: %s", url, e)
-                continue
-
-            if raw is None:
-                logger.warning("No content returned for url=%s; skipping.", url)
-                continue
-
-            # Normalize into a dict with at least 'url' and 'content'
-            if isinstance(raw, dict):
-                text = raw.get("content")
-                if not text or not str(text).strip():
-                    logger.warning("Empty 'content' for url=%s; skipping.", url)
-                    continue
-                payload = dict(raw)
-                payload.setdefault("url", url)
-                contents.append(payload)
-            else:
-                text = str(raw).strip()
-                if not text:
-                    logger.warning("Empty content (non-dict) for url=%s; skipping.", url)
-                    continue
-                contents.append({"url": url, "content": text})
-
         return contents
 
-
     def process_data(self, contents: Sequence[Dict[str, Any]]) -> List[Any]:
         """
         Convert raw contents into retriever documents, ensuring no empty strings.
@@ -155,21 +326,24 @@ class Ingestor:
         Returns:
             List[Any]: A flat list of documents with non-empty content ready for ingestion.
         """
+        if self.splitter is not None:
+            documents = [doc for docs in self._split_many(contents) for doc in docs]
+            if not documents:
+                logger.info("No non-empty documents produced from %d content items.", len(contents))
+            return documents
+
         documents: List[Any] = []
 
         for item in contents:
             url = item.get("url", "unknown")
             text = item.get("content")
-            
-            logger.info("Processing content for url=%s", url)
-            logger.info("Raw content: \n%s", text)            
 
             if not text or not str(text).strip():
                 logger.warning("Skipping item with empty content (url=%s).", url)
                 continue
 
             try:
-                docs = self.retriever.create_documents(str(text))
+                docs = self.retriever.create_documents(str(text), metadata=self._metadata(item))
             except Exception as e:
                 logger.exception("Failed to create documents for url=%s: %s", url, e)
                 continue
@@ -189,59 +363,322 @@ class Ingestor:
                     logger.warning("Skipping single empty document for url=%s", url)
                     continue
                     
-            logger.info("Created %d non-empty documents for url=%s", len(non_empty_docs) if isinstance(docs, list) else 1, url)
+            logger.debug("Created %d non-empty documents for url=%s", len(non_empty_docs) if isinstance(docs, list) else 1, url)
 
         if not documents:
             logger.info("No non-empty documents produced from %d content items.", len(contents))
 
         return documents
 
-    def ingest(self) -> Dict[str, Union[int, str]]:
+    def _split_many(self, contents: Sequence[Dict[str, Any]]) -> List[List[Document]]:
+        """Split many content items at once with the parallel splitter, one document list per item."""
+        texts = [str(item.get("content") or "") for item in contents]
+        return [
+            [Document(page_content=chunk, metadata=self._metadata(item)) for chunk in chunks]
+            for item, chunks in zip(contents, self.splitter.split(texts))
+        ]
+
+    def _iter_changes(
+        self,
+        full: bool,
+        summary: Dict[str, Union[int, str]],
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Full pipeline: fetch -> process -> ingest.
+        Fetch stage: diff the scraped URLs against the ingestion state.
 
-        Returns
-        -------
-        Dict[str, Union[int, str]]
-            Summary including counts of items processed and ingested.
+        Yields one change per URL that needs work: an article to (re)split,
+        a record whose watermark only moved, or a URL whose chunks must go.
+        Ingestion records are read per batch; once every scraped URL has been
+        seen, the records are scanned for URLs no longer scraped.
         """
-        try:
-            contents = self.fetch_data()
-        except IngestorError:
-            # Already logged.
-            raise
-        except Exception as e:
-            logger.exception("Unexpected error during fetch_data: %s", e)
-            raise IngestorError(f"Unexpected error during fetch: {e}") from e
+        seen: Set[str] = set()
+        for batch in self.iter_url_batches(seen):
+            # The batch is already marked as present, so a failed read below
+            # never turns into a deletion
+            try:
+                state = {
+                    url: record
+                    for url, record in zip(batch, self._retry(self.redis_client.get_ingest_records, batch))
+                    if record is not None
+                }
+                known = [url for url in batch if url in state] if not full else []
+                watermarks = dict(zip(known, self._retry(self.redis_client.get_watermarks, known))) if known else {}
+                pending = [
+                    url for url in batch
+                    if url not in watermarks or watermarks[url] != state[url].get("watermark")
+                ]
+                summary["urls_unchanged"] += len(batch) - len(pending)
+                raws = self._retry(self.redis_client.get_contents, pending) if pending else []
+            except Exception as e:
+                logger.error("Failed to fetch content for %d urls: %s", len(batch), e)
+                continue
 
-        try:
-            processed_documents = self.process_data(contents)
-        except Exception as e:
-            logger.exception("Unexpected error during process_data: %s", e)
-            raise IngestorError(f"Unexpected error during processing: {e}") from e
-
-        if not processed_documents:
-            logger.warning("No documents to ingest. Pipeline ends with 0 ingested documents.")
-            return {
-                "urls_found": len(contents),
-                "docs_created": 0,
-                "docs_ingested": 0,
-                "status": "nothing_to_ingest",
+            for url, raw in zip(pending, raws):
+                record = state.get(url)
+
+                item = self._normalize(url, raw)
+                if item is None:
+                    if record is not None:
+                        yield {"url": url, "stale_ids": record.get("ids", []), "removed": True}
+                    continue
+
+                watermark = self._watermark(item)
+                content_hash = self._content_hash(item["content"])
+                if record is not None and not full and record.get("content_hash") == content_hash:
+                    # Re-scraped without changes: only move the watermark forward
+                    summary["urls_unchanged"] += 1
+                    yield {"url": url, "record": dict(record, watermark=watermark)}
+                    continue
+
+                summary["urls_changed" if record is not None else "urls_new"] += 1
+                yield {
+                    "url": url,
+                    "item": item,
+                    "previous": record,
+                    "record": {"watermark": watermark, "content_hash": content_hash},
+                }
+
+        summary["urls_found"] = len(seen)
+        yield from self._iter_removed(seen)
+
+    def _iter_removed(self, seen: Set[str]) -> Iterator[Dict[str, Any]]:
+        """Walk the ingestion records with HSCAN and yield a removal for each URL not in `seen`."""
+        cursor = 0
+        removed: Set[str] = set()
+        while True:
+            try:
+                cursor, records = self._retry(
+                    self.redis_client.scan_ingest_state, cursor, self.fetch_batch_size
+                )
+            except Exception as e:
+                # Removals are only ever delayed: the next run finds them again
+                logger.error("Failed to scan ingestion state; skipping removals: %s", e)
+                return
+
+            for url, record in records.items():
+                if url not in seen and url not in removed:
+                    removed.add(url)
+                    yield {"url": url, "stale_ids": record.get("ids", []), "removed": True}
+            if cursor == 0:
+                return
+
+    def _split(
+        self,
+        change: Dict[str, Any],
+        summary: Dict[str, Union[int, str]],
+        docs: Optional[List[Document]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Split stage: turn an article into chunks with stable ids (`docs` if already split)."""
+        item = change.pop("item", None)
+        if item is None:
+            return [change]
+
+        if docs is None:
+            try:
+                docs = self.process_data([item])
+            except Exception as e:
+                logger.exception("Unexpected error during process_data: %s", e)
+                raise IngestorError(f"Unexpected error during processing: {e}") from e
+
+        url = change["url"]
+        previous = change.pop("previous", None)
+        old_ids = previous.get("ids", []) if previous is not None else []
+        new_ids = self._chunk_ids(url, docs)
+        summary["docs_created"] += len(docs)
+        if self.dedup_index is not None:
+            # Chunks repeating one already indexed (boilerplate, syndicated copies) are not embedded
+            keep = self.dedup_index.filter(new_ids, docs, ignore=old_ids)
+        else:
+            seen: Set[str] = set()
+            keep = [i for i, doc_id in enumerate(new_ids) if not (doc_id in seen or seen.add(doc_id))]
+        summary["docs_duplicate"] += len(docs) - len(keep)
+        docs = [docs[i] for i in keep]
+        new_ids = [new_ids[i] for i in keep]
+        kept = set(new_ids)
+        change["documents"] = docs
+        change["ids"] = new_ids
+        change["stale_ids"] = [i for i in old_ids if i not in kept]
+        change["record"]["ids"] = new_ids
+        return [change]
+
+    def _split_stage(self, summary: Dict[str, Union[int, str]]) -> Stage:
+        """Split stage: per article, or in batches of work units with a parallel splitter."""
+        if self.splitter is None:
+            return Stage("split", lambda change: self._split(change, summary))
+
+        pending: List[Dict[str, Any]] = []
+
+        def flush() -> List[Dict[str, Any]]:
+            try:
+                split = iter(self._split_many([change["item"] for change in pending if "item" in change]))
+            except Exception as e:
+                logger.exception("Failed to split documents: %s", e)
+                raise IngestorError(f"Splitting failed: {e}") from e
+            changes = []
+            for change in pending:
+                changes.extend(self._split(change, summary, next(split) if "item" in change else None))
+            pending.clear()
+            return changes
+
+        def process(change: Dict[str, Any]) -> List[Dict[str, Any]]:
+            pending.append(change)
+            return flush() if len(pending) >= self.splitter.batch_size else []
+
+        return Stage("split", process, lambda: flush() if pending else [])
+
+    def _batch_stage(self) -> Stage:
+        """Embed stage: group changes into write batches and embed their chunks."""
+        pending: List[Dict[str, Any]] = []
+        counts = {"documents": 0}
+
+        def emit() -> List[Dict[str, Any]]:
+            batch: Dict[str, Any] = {
+                "documents": [],
+                "ids": [],
+                "stale_ids": [],
+                "records": {},
+                "removed_urls": [],
+                "embeddings": None,
             }
+            for change in pending:
+                batch["documents"].extend(change.get("documents", []))
+                batch["ids"].extend(change.get("ids", []))
+                batch["stale_ids"].extend(change.get("stale_ids", []))
+                if change.get("removed"):
+                    batch["removed_urls"].append(change["url"])
+                else:
+                    batch["records"][change["url"]] = change["record"]
+            pending.clear()
+            counts["documents"] = 0
+
+            if batch["documents"]:
+                try:
+                    batch["embeddings"] = self.retriever.embed_documents(batch["documents"])
+                except Exception as e:
+                    logger.exception("Failed to embed documents: %s", e)
+                    raise IngestorError(f"Embedding failed: {e}") from e
+            return [batch]
+
+        def process(change: Dict[str, Any]) -> List[Dict[str, Any]]:
+            pending.append(change)
+            counts["documents"] += len(change.get("documents", []))
+            if counts["documents"] >= self.write_batch_size or len(pending) >= self.fetch_batch_size:
+                return emit()
+            return []
 
-        # Ingest (avoid retries by default to prevent duplicate writes)
+        def flush() -> List[Dict[str, Any]]:
+            return emit() if pending else []
+
+        return Stage("embed", process, flush)
+
+    def _write_batch(self, batch: Dict[str, Any], summary: Dict[str, Union[int, str]]) -> List[Any]:
+        """Write stage: upsert, delete and record one batch."""
         try:
-            self.retriever.ingest(processed_documents)
+            self._write(
+                batch["documents"],
+                batch["ids"],
+                batch["stale_ids"],
+                batch["records"],
+                batch["removed_urls"],
+                embeddings=batch["embeddings"],
+            )
         except Exception as e:
             logger.exception("Failed to ingest documents: %s", e)
             raise IngestorError(f"Ingestion failed: {e}") from e
+        summary["docs_ingested"] += len(batch["documents"])
+        summary["docs_deleted"] += len(batch["stale_ids"])
+        summary["urls_removed"] += len(batch["removed_urls"])
+        return []
 
-        ingested_count = len(processed_documents)
-        logger.info("Successfully ingested %d documents.", ingested_count)
-        return {
-            "urls_found": len(contents),
-            "docs_created": ingested_count,
-            "docs_ingested": ingested_count,
-            "status": "ok",
+    def ingest(
+        self,
+        full: bool = False,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Union[int, str]]:
+        """
+        Incremental, streaming pipeline: fetch -> split -> embed -> write.
+
+        Each stage runs on its own thread and hands work to the next through
+        a bounded queue, so memory is capped by `queue_size`,
+        `fetch_batch_size` and `write_batch_size` rather than by corpus size.
+
+        Each ingested URL has a record holding the scraper's watermark
+        (`scraped_at`/`content_length`), a content hash and its chunk ids.
+        URLs with an unchanged watermark are skipped without reading their
+        content, changed URLs are re-split and upserted under content-addressed
+        ids (chunks repeating one already indexed are skipped), and
+        URLs no longer in Redis have their chunks deleted. With a partitioned
+        knowledge base, partitions past retention are dropped afterwards.
+        Articles whose duplicate chunks lost the chunk they repeated (deleted
+        or expired) are re-queued for the next run.
+
+        Parameters
+        ----------
+        full : bool
+            Re-ingest every URL, ignoring the stored watermarks and hashes.
+        on_progress : Optional[Callable[[Dict[str, Any]], None]]
+            Receives the running summary counts, with the per-stage report
+            under 'stages', while ingestion runs.
+
+        Returns
+        -------
+        Dict[str, Union[int, str]]
+            Summary including counts of items processed and ingested, and
+            the final per-stage report under 'stages'.
+        """
+        summary: Dict[str, Any] = {
+            "urls_found": 0,
+            "urls_new": 0,
+            "urls_changed": 0,
+            "urls_unchanged": 0,
+            "urls_removed": 0,
+            "docs_created": 0,
+            "docs_duplicate": 0,
+            "docs_ingested": 0,
+            "docs_deleted": 0,
+            "partitions_dropped": 0,
+            "urls_requeued": 0,
         }
 
+        pipeline = StagedPipeline(
+            source=self._iter_changes(full, summary),
+            stages=[
+                self._split_stage(summary),
+                self._batch_stage(),
+                Stage("write", lambda batch: self._write_batch(batch, summary)),
+            ],
+            queue_size=self.queue_size,
+            progress_interval=self.progress_interval,
+            on_progress=(
+                (lambda stages: on_progress(dict(summary, stages=stages)))
+                if on_progress is not None else None
+            ),
+        )
+        try:
+            summary["stages"] = pipeline.run()
+            summary["partitions_dropped"] = self._apply_retention()
+            summary["urls_requeued"] = self._requeue_orphans()
+        except IngestorError:
+            raise
+        except Exception as e:
+            logger.exception("Ingestion pipeline failed: %s", e)
+            raise IngestorError(f"Ingestion failed: {e}") from e
+        finally:
+            if self.splitter is not None:
+                self.splitter.close()
+            if summary["docs_ingested"] or summary["docs_deleted"] or summary["partitions_dropped"]:
+                self._bump_generation()
+
+        if not summary["docs_ingested"] and not summary["docs_deleted"]:
+            logger.info("Knowledge base is up to date; nothing to ingest.")
+            summary["status"] = "nothing_to_ingest"
+            return summary
+
+        logger.info(
+            "Incremental ingestion done: %d new, %d changed, %d unchanged, %d removed URLs; "
+            "%d documents ingested, %d duplicates skipped, %d deleted.",
+            summary["urls_new"], summary["urls_changed"], summary["urls_unchanged"],
+            summary["urls_removed"], summary["docs_ingested"], summary["docs_duplicate"], summary["docs_deleted"],
+        )
+        summary["status"] = "ok"
+        return summary
@@ -0,0 +1,244 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from .db.redis_client import RedisDB
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "process" keeps ingestion off the web worker's CPU and GIL; "thread" runs it in-process
+INGEST_JOB_MODE = os.getenv("INGEST_JOB_MODE", "process")
+INGEST_LOCK_TTL_SECONDS = int(os.getenv("INGEST_LOCK_TTL_SECONDS", 60))
+INGEST_JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", 7 * 24 * 3600))
+
+ACTIVE_STATUSES = ("queued", "running")
+PIPELINE_PHASES = ("fetch", "split", "embed", "write")
+
+
+class IngestJobRunning(Exception):
+    """Raised when an ingestion is requested while another one holds the lock."""
+
+    def __init__(self, job_id: Optional[str]):
+        super().__init__(f"Ingestion job {job_id} is already running")
+        self.job_id = job_id
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _phase(stages: Dict[str, Dict[str, Any]]) -> str:
+    """The earliest pipeline stage still working; later stages drain behind it."""
+    for name in PIPELINE_PHASES:
+        if not stages.get(name, {}).get("done", False):
+            return name
+    return "finishing"
+
+
+def run_ingest_job(
+    job_id: str,
+    full: bool = False,
+    redis_client: Optional[RedisDB] = None,
+    ingestor=None,
+) -> None:
+    """
+    Run one ingestion, recording its progress in the job's status hash.
+
+    This is the entry point of the worker process, so it builds its own
+    Redis client and Ingestor unless they are injected. The single-flight
+    lock, already taken by `IngestJobManager.start`, is kept alive by a
+    heartbeat and released when the job ends, however it ends.
+    """
+    redis_client = redis_client if redis_client is not None else RedisDB()
+    started = time.perf_counter()
+    stop_heartbeat = threading.Event()
+
+    def heartbeat() -> None:
+        while not stop_heartbeat.wait(INGEST_LOCK_TTL_SECONDS / 3):
+            try:
+                if not redis_client.refresh_lock(RedisDB.INGEST_LOCK_KEY, job_id, INGEST_LOCK_TTL_SECONDS):
+                    logger.warning("Ingestion job %s lost its lock.", job_id)
+            except Exception as e:
+                logger.warning("Failed to refresh ingestion lock for job %s: %s", job_id, e)
+
+    def update(**fields: Any) -> None:
+        try:
+            redis_client.set_job(job_id, fields, INGEST_JOB_TTL_SECONDS)
+        except Exception as e:
+            logger.warning("Failed to update ingestion job %s: %s", job_id, e)
+
+    def on_progress(report: Dict[str, Any]) -> None:
+        elapsed = time.perf_counter() - started
+        stages = report.pop("stages", {})
+        update(
+            phase=_phase(stages),
+            docs_processed=report.get("docs_ingested", 0),
+            docs_per_sec=round(report.get("docs_ingested", 0) / elapsed, 2) if elapsed > 0 else 0.0,
+            counts=report,
+            stages=stages,
+        )
+
+    thread = threading.Thread(target=heartbeat, name=f"ingest-lock-{job_id}", daemon=True)
+    thread.start()
+    update(status="running", phase="starting", started_at=_now(), pid=os.getpid())
+    try:
+        if ingestor is None:
+            from .ingestor import Ingestor
+
+            ingestor = Ingestor(redis_client=redis_client)
+        summary = ingestor.ingest(full=full, on_progress=on_progress)
+        elapsed = time.perf_counter() - started
+        stages = summary.pop("stages", {})
+        update(
+            status="succeeded",
+            phase="done",
+            finished_at=_now(),
+            elapsed_seconds=round(elapsed, 2),
+            docs_processed=summary.get("docs_ingested", 0),
+            docs_per_sec=round(summary.get("docs_ingested", 0) / elapsed, 2) if elapsed > 0 else 0.0,
+            counts=summary,
+            stages=stages,
+        )
+        logger.info("Ingestion job %s finished: %s", job_id, summary)
+    except Exception as e:
+        logger.exception("Ingestion job %s failed.", job_id)
+        update(
+            status="failed",
+            phase="failed",
+            finished_at=_now(),
+            elapsed_seconds=round(time.perf_counter() - started, 2),
+            errors=[{"type": type(e).__name__, "message": str(e), "traceback": traceback.format_exc(limit=5)}],
+        )
+    finally:
+        stop_heartbeat.set()
+        try:
+            redis_client.release_lock(RedisDB.INGEST_LOCK_KEY, job_id)
+        except Exception as e:
+            logger.warning("Failed to release ingestion lock for job %s: %s", job_id, e)
+
+
+class IngestJobManager:
+    """
+    Starts ingestion jobs and reports their status.
+
+    A Redis lock (SET NX with the job id as token) makes ingestion
+    single-flight across every API worker, and job status lives in Redis so
+    any worker can answer status requests.
+
+    Parameters
+    ----------
+    redis_client : Optional[RedisDB]
+        Inject a RedisDB instance for easier testing.
+    mode : Optional[str]
+        "process" runs each job in a spawned process, "thread" in a thread of
+        this process. Defaults to INGEST_JOB_MODE.
+    ingestor : Optional[Ingestor]
+        Ingestor reused by thread-mode jobs; created lazily when omitted.
+    """
+
+    def __init__(self, redis_client: Optional[RedisDB] = None, mode: Optional[str] = None, ingestor=None):
+        self.redis_client = redis_client if redis_client is not None else RedisDB()
+        self.mode = (mode or INGEST_JOB_MODE).lower()
+        if self.mode not in ("process", "thread"):
+            raise ValueError(f"Unknown ingestion job mode: {self.mode}")
+        self._ingestor = ingestor
+
+    def _get_ingestor(self):
+        if self._ingestor is None:
+            from .ingestor import Ingestor
+
+            self._ingestor = Ingestor(redis_client=self.redis_client)
+        return self._ingestor
+
+    def start(self, full: bool = False) -> str:
+        """
+        Start an ingestion job.
+
+        Args:
+            full (bool): Re-ingest everything instead of only changed URLs.
+
+        Returns:
+            str: The new job id.
+
+        Raises:
+            IngestJobRunning: If another ingestion holds the lock.
+        """
+        # Reap finished worker processes
+        multiprocessing.active_children()
+
+        job_id = uuid.uuid4().hex
+        if not self.redis_client.acquire_lock(RedisDB.INGEST_LOCK_KEY, job_id, INGEST_LOCK_TTL_SECONDS):
+            raise IngestJobRunning(self.redis_client.get_lock_holder(RedisDB.INGEST_LOCK_KEY))
+
+        try:
+            self.redis_client.set_job(
+                job_id,
+                {
+                    "job_id": job_id,
+                    "status": "queued",
+                    "phase": "queued",
+                    "mode": self.mode,
+                    "full": full,
+                    "created_at": _now(),
+                    "docs_processed": 0,
+                    "docs_per_sec": 0.0,
+                    "errors": [],
+                },
+                INGEST_JOB_TTL_SECONDS,
+            )
+            if self.mode == "process":
+                # Spawn rather than fork: the server process has threads and an event loop.
+                # Not daemonic, so the job can start the splitter's worker pool; finished
+                # jobs are reaped by active_children() above.
+                context = multiprocessing.get_context("spawn")
+                worker = context.Process(
+                    target=run_ingest_job, args=(job_id, full), name=f"ingest-{job_id}", daemon=False
+                )
+            else:
+                worker = threading.Thread(
+                    target=run_ingest_job,
+                    args=(job_id, full, self.redis_client, self._get_ingestor()),
+                    name=f"ingest-{job_id}",
+                    daemon=True,
+                )
+            worker.start()
+        except Exception:
+            self.redis_client.release_lock(RedisDB.INGEST_LOCK_KEY, job_id)
+            raise
+
+        logger.info("Started ingestion job %s (%s mode).", job_id, self.mode)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a job's status, or None if the job is unknown.
+
+        A job still marked active whose lock is gone has died without
+        reporting (e.g. its process was killed), and is reported as failed.
+        """
+        multiprocessing.active_children()
+
+        job = self.redis_client.get_job(job_id)
+        if job is None:
+            return None
+        if job.get("status") in ACTIVE_STATUSES:
+            if self.redis_client.get_lock_holder(RedisDB.INGEST_LOCK_KEY) != job_id:
+                job = dict(job, status="failed", phase="failed")
+                job["errors"] = list(job.get("errors", [])) + [
+                    {"type": "WorkerLost", "message": "The ingestion worker exited without reporting."}
+                ]
+        return job
+
+    def current(self) -> Optional[str]:
+        """Id of the running job, if any."""
+        return self.redis_client.get_lock_holder(RedisDB.INGEST_LOCK_KEY)
@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import redis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBED_CACHE_BACKEND = os.getenv("EMBED_CACHE_BACKEND", "none").lower()
+EMBED_CACHE_PATH = os.getenv(
+    "EMBED_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "db", "embedding_cache.sqlite3"),
+)
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", 500000))
+EMBED_CACHE_TTL_SECONDS = int(os.getenv("EMBED_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+
+
+def cache_key(model_url: str, text: str) -> str:
+    """Content address of an embedding: hash of the model endpoint and the text."""
+    return hashlib.sha256(f"{model_url}\0{text}".encode("utf-8")).hexdigest()
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    """Pack an embedding as compact float32 bytes."""
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def decode_vector(blob: bytes) -> List[float]:
+    """Unpack float32 bytes written by `encode_vector`."""
+    return np.frombuffer(blob, dtype=np.float32).tolist()
+
+
+class EmbeddingCache(ABC):
+    """
+    Base class for embedding caches keyed by `cache_key`.
+
+    Subclasses implement `_get_many` and `_set_many`; this class keeps the
+    hit/miss counters.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @abstractmethod
+    def _get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    def _set_many(self, items: Dict[str, bytes]) -> None:
+        ...
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings by key.
+
+        Args:
+            keys (List[str]): Cache keys.
+
+        Returns:
+            List[Optional[List[float]]]: The cached vector, or None, per key.
+        """
+        if not keys:
+            return []
+        try:
+            blobs = self._get_many(keys)
+        except Exception as e:
+            logger.warning("Embedding cache lookup failed: %s", e)
+            blobs = [None] * len(keys)
+
+        found = sum(blob is not None for blob in blobs)
+        with self._stats_lock:
+            self.hits += found
+            self.misses += len(keys) - found
+        return [decode_vector(blob) if blob is not None else None for blob in blobs]
+
+    def set_many(self, items: Dict[str, Sequence[float]]) -> None:
+        """
+        Store embeddings by key. Failures are logged, never raised.
+
+        Args:
+            items (Dict[str, Sequence[float]]): Vectors keyed by cache key.
+        """
+        if not items:
+            return
+        try:
+            self._set_many({key: encode_vector(vector) for key, vector in items.items()})
+        except Exception as e:
+            logger.warning("Embedding cache write failed: %s", e)
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the hit rate."""
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class SQLiteEmbeddingCache(EmbeddingCache):
+    """
+    On-disk embedding cache in a single SQLite file.
+
+    Entries record their last access time; when the table grows past
+    `max_entries` the least recently used ones are deleted.
+
+    Parameters
+    ----------
+    path : str
+        Database file path.
+    max_entries : int
+        Maximum number of cached embeddings.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES) -> None:
+        super().__init__()
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # The row count lives in the database, kept by triggers, so every
+        # process sharing the file evicts against the same number
+        self._conn.executescript(
+            "BEGIN IMMEDIATE;"
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access);"
+            "CREATE TABLE IF NOT EXISTS embedding_count (id INTEGER PRIMARY KEY CHECK (id = 1), n INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO embedding_count (id, n) SELECT 1, COUNT(*) FROM embeddings;"
+            "CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings "
+            "BEGIN UPDATE embedding_count SET n = n + 1 WHERE id = 1; END;"
+            "CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings "
+            "BEGIN UPDATE embedding_count SET n = n - 1 WHERE id = 1; END;"
+            "COMMIT;"
+        )
+
+    def _size(self) -> int:
+        return self._conn.execute("SELECT n FROM embedding_count WHERE id = 1").fetchone()[0]
+
+    def _get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return [found.get(key) for key in keys]
+
+    def _set_many(self, items: Dict[str, bytes]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, blob, now) for key, blob in items.items()],
+            )
+            # The insert holds the write lock, so no other process changes the count before commit
+            excess = self._size() - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (excess,),
+                )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size()
+
+
+class RedisEmbeddingCache(EmbeddingCache):
+    """
+    Embedding cache in Redis, shared by every worker and the ingestor.
+
+    Each vector is a binary string under `emb:<key>`. Reads refresh the TTL,
+    so idle entries expire; size is bounded by Redis' `maxmemory` with an
+    LRU eviction policy.
+
+    Parameters
+    ----------
+    redis_client : Optional[redis.Redis]
+        Inject a Redis client (must not decode responses) for easier testing.
+    ttl_seconds : int
+        Idle time after which a cached vector expires.
+    """
+
+    key_prefix = "emb:"
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None, ttl_seconds: int = EMBED_CACHE_TTL_SECONDS) -> None:
+        super().__init__()
+        self.redis_client = redis_client if redis_client is not None else redis.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6376)),
+        )
+        self.ttl_seconds = max(1, int(ttl_seconds))
+
+    def _get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        redis_keys = [f"{self.key_prefix}{key}" for key in keys]
+        blobs = self.redis_client.mget(redis_keys)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for redis_key, blob in zip(redis_keys, blobs):
+            if blob is not None:
+                pipe.expire(redis_key, self.ttl_seconds)
+        pipe.execute()
+        return blobs
+
+    def _set_many(self, items: Dict[str, bytes]) -> None:
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key, blob in items.items():
+            pipe.set(f"{self.key_prefix}{key}", blob, ex=self.ttl_seconds)
+        pipe.execute()
+
+
+def create_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Build the embedding cache configured through the environment.
+
+    EMBED_CACHE_BACKEND selects `none` (default), `sqlite` or `redis`.
+    """
+    if EMBED_CACHE_BACKEND == "none":
+        return None
+    if EMBED_CACHE_BACKEND == "sqlite":
+        return SQLiteEmbeddingCache()
+    if EMBED_CACHE_BACKEND == "redis":
+        return RedisEmbeddingCache()
+    raise ValueError(f"Unknown EMBED_CACHE_BACKEND: {EMBED_CACHE_BACKEND}")
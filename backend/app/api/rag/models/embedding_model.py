@@ -1,15 +1,78 @@
 import os
 import asyncio
+import threading
+import time
 import requests
 import aiohttp
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 from langchain_core.embeddings import Embeddings
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
 from dotenv import load_dotenv
+from .embedding_cache import EmbeddingCache, cache_key, create_embedding_cache
+from .http_client import get_async_session, get_session, get_timeout
 
 load_dotenv()
 BASE_URL = os.getenv("API_URL", "").rstrip("/")
 
+# Batched embedding settings; a batch size of 0 keeps one text per request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 0))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", 256))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", 8))
+EMBED_TARGET_BATCH_SECONDS = float(os.getenv("EMBED_TARGET_BATCH_SECONDS", 1.0))
+
+
+async def gather_or_cancel(*coros):
+    """
+    Like `asyncio.gather`, but the first failure cancels the other tasks.
+
+    Plain `gather` re-raises the first exception while its siblings keep
+    running (and keep sending requests); this waits for them to be cancelled
+    before re-raising, as a TaskGroup would on Python 3.11.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class AdaptiveBatchSize:
+    """
+    Batch size controller that tracks the embedding server's throughput.
+
+    The size doubles while batches complete well inside the target latency,
+    halves when a batch is slower than the target, and halves again on failure,
+    always staying within [min_size, max_size].
+
+    Attributes:
+        size (int): Batch size to use for the next request
+    """
+
+    def __init__(self, initial: int, min_size: int = 1, max_size: int = EMBED_MAX_BATCH_SIZE,
+                 target_seconds: float = EMBED_TARGET_BATCH_SECONDS):
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.target_seconds = target_seconds
+        self.size = min(max(initial, self.min_size), self.max_size)
+        self._lock = threading.Lock()
+
+    def record(self, batch_len: int, elapsed: float) -> None:
+        """Adjust the size after a successful batch of `batch_len` texts."""
+        with self._lock:
+            if elapsed > self.target_seconds:
+                self.size = max(self.min_size, self.size // 2)
+            elif elapsed < self.target_seconds / 2 and batch_len >= self.size:
+                self.size = min(self.max_size, self.size * 2)
+
+    def shrink(self) -> None:
+        """Halve the size after a failed batch."""
+        with self._lock:
+            self.size = max(self.min_size, self.size // 2)
+
 
 class Embedding(Embeddings):
     """
@@ -18,12 +81,22 @@ class Embedding(Embeddings):
     Attributes:
         api_url (str): The URL of the local embedding API endpoint
         api_key (Optional[str]): API key for authentication (if required)
+        batch_api_url (str): The URL of the batch endpoint, which accepts
+            {"texts": [...]} and returns {"embeddings": [...]}
+        batch_size (int): Initial texts per batch request; 0 disables batching
+        max_in_flight (int): Maximum concurrent requests to the embedding server
+        cache (Optional[EmbeddingCache]): Content-addressed cache consulted
+            before calling the API
     """
 
     def __init__(
         self,
         api_url: str = f"{BASE_URL}/api/v1/embed",
         api_key: Optional[str] = None,
+        batch_api_url: str = f"{BASE_URL}/api/v1/embed/batch",
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+        cache: Optional[EmbeddingCache] = None,
     ):
         """
         Initialize the Embedding class.
@@ -31,10 +104,19 @@ class Embedding(Embeddings):
         Args:
             api_url (str): URL of the embedding API endpoint
             api_key (Optional[str]): API key for authentication
+            batch_api_url (str): URL of the batch embedding API endpoint
+            batch_size (int): Initial batch size; 0 sends one text per request
+            max_in_flight (int): Maximum concurrent requests
+            cache (Optional[EmbeddingCache]): Embedding cache; defaults to the
+                one configured by EMBED_CACHE_BACKEND
         """
         super().__init__()
         self.api_url = api_url
         self.api_key = api_key
+        self.batch_api_url = batch_api_url
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.batch_size = AdaptiveBatchSize(batch_size) if batch_size > 0 else None
+        self.cache = cache if cache is not None else create_embedding_cache()
         self.counter = 0
 
         print(f"Embedding API URL: {self.api_url}", flush=True)
@@ -63,7 +145,9 @@ class Embedding(Embeddings):
             headers["Authorization"] = f"Bearer {self.api_key}"
 
         payload = {"text": text}
-        response = requests.post(self.api_url, json=payload, headers=headers)
+        response = get_session().post(
+            self.api_url, json=payload, headers=headers, timeout=get_timeout()
+        )
         response.raise_for_status()  # Raise an error for non-200 responses
         embeddings = response.json().get("embedding", [])
         return embeddings
@@ -103,19 +187,197 @@ class Embedding(Embeddings):
             json_data = await response.json()
             return json_data.get("embedding", [])
 
+    def _headers(self) -> dict:
+        """Build request headers, including authorization if an API key is set."""
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _check_batch(self, texts: List[str], embeddings: List[List[float]]) -> List[List[float]]:
+        """Ensure the server returned exactly one embedding per input text."""
+        if len(embeddings) != len(texts):
+            raise ValueError(
+                f"Embedding server returned {len(embeddings)} embeddings for {len(texts)} texts"
+            )
+        return embeddings
+
+    @retry(
+        stop=stop_after_attempt(3),  # Retry the whole batch up to 3 times
+        wait=wait_fixed(2),
+        retry=retry_if_exception_type(requests.RequestException),
+    )
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Internal method to embed a batch of texts in one request with retry logic.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per text, in order
+        """
+        response = get_session().post(
+            self.batch_api_url, json={"texts": texts}, headers=self._headers(), timeout=get_timeout()
+        )
+        response.raise_for_status()
+        return self._check_batch(texts, response.json().get("embeddings", []))
+
+    @retry(
+        stop=stop_after_attempt(3),  # Retry the whole batch up to 3 times
+        wait=wait_fixed(2),
+        retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError)),
+    )
+    async def _async_embed_batch(
+        self, session: aiohttp.ClientSession, texts: List[str]
+    ) -> List[List[float]]:
+        """
+        Internal asynchronous method to embed a batch of texts in one request with retry logic.
+
+        Args:
+            session (aiohttp.ClientSession): The aiohttp session to use for requests
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per text, in order
+        """
+        async with session.post(
+            self.batch_api_url, json={"texts": texts}, headers=self._headers()
+        ) as response:
+            if response.status != 200:
+                raise aiohttp.ClientError(f"HTTP Error: {response.status}")
+            json_data = await response.json()
+            return self._check_batch(texts, json_data.get("embeddings", []))
+
+    def _embed_batched(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts in adaptively sized batches using at most `max_in_flight` threads.
+
+        Workers pull the next slice of texts from a shared cursor, so the batch
+        size can change between requests as the server speeds up or slows down.
+        Once a batch fails, the other workers take no further slices.
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        cursor = 0
+        cursor_lock = threading.Lock()
+        failed = threading.Event()
+
+        def worker() -> None:
+            nonlocal cursor
+            while True:
+                with cursor_lock:
+                    if failed.is_set() or cursor >= len(texts):
+                        return
+                    start = cursor
+                    cursor = min(len(texts), start + self.batch_size.size)
+                    end = cursor
+                began = time.perf_counter()
+                try:
+                    results[start:end] = self._embed_batch(texts[start:end])
+                except Exception:
+                    failed.set()
+                    self.batch_size.shrink()
+                    raise
+                self.batch_size.record(end - start, time.perf_counter() - began)
+
+        workers = min(self.max_in_flight, len(texts))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(worker) for _ in range(workers)]:
+                future.result()
+        return results
+
+    async def _aembed_batched(self, texts: List[str]) -> List[List[float]]:
+        """Async version of `_embed_batched` using `max_in_flight` worker tasks."""
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        session = get_async_session()
+        cursor = 0
+
+        async def worker() -> None:
+            nonlocal cursor
+            while cursor < len(texts):
+                # Claiming a slice does not await, so it is atomic on the event loop
+                start = cursor
+                cursor = min(len(texts), start + self.batch_size.size)
+                end = cursor
+                began = time.perf_counter()
+                try:
+                    results[start:end] = await self._async_embed_batch(session, texts[start:end])
+                except Exception:
+                    self.batch_size.shrink()
+                    raise
+                self.batch_size.record(end - start, time.perf_counter() - began)
+
+        await gather_or_cancel(*(worker() for _ in range(min(self.max_in_flight, len(texts)))))
+        return results
+
+    def _cache_lookup(self, texts: List[str]):
+        """Return cached vectors (None where missing) and the unique missing texts."""
+        vectors = self.cache.get_many([cache_key(self.api_url, text) for text in texts])
+        # Identical texts within one call are embedded once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        return vectors, missing
+
+    def _cache_fill(self, texts: List[str], vectors: List[Optional[List[float]]],
+                    missing: List[str], fresh: List[List[float]]) -> List[List[float]]:
+        """Store freshly computed vectors and merge them into the lookup result."""
+        computed = dict(zip(missing, fresh))
+        self.cache.set_many({cache_key(self.api_url, text): vector for text, vector in computed.items()})
+        return [vector if vector is not None else computed[text] for text, vector in zip(texts, vectors)]
+
+    def _embed_cached(self, texts: List[str], embed: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """Embed texts through the cache, calling `embed` only for cache misses."""
+        vectors, missing = self._cache_lookup(texts)
+        if not missing:
+            return vectors
+        return self._cache_fill(texts, vectors, missing, embed(missing))
+
+    async def _aembed_cached(self, texts: List[str], embed) -> List[List[float]]:
+        """Async version of `_embed_cached`; cache I/O runs in a worker thread."""
+        vectors, missing = await asyncio.to_thread(self._cache_lookup, texts)
+        if not missing:
+            return vectors
+        fresh = await embed(missing)
+        return await asyncio.to_thread(self._cache_fill, texts, vectors, missing, fresh)
+
+    async def _aembed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts through the API, batched or one request per text."""
+        if self.batch_size is not None:
+            return await self._aembed_batched(texts)
+
+        session = get_async_session()
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def bounded(text: str) -> List[float]:
+            async with semaphore:
+                return await self._async_embed_text(session, text)
+
+        return await gather_or_cancel(*(bounded(text) for text in texts))
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts through the API, batched or one request per text."""
+        if self.batch_size is not None:
+            return self._embed_batched(texts)
+        return [self._embed_text(text) for text in texts]
+
     async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
         """
         Asynchronous method to embed multiple documents with retry logic.
 
+        Uses batched requests when a batch size is configured; otherwise one
+        request per text, with at most `max_in_flight` requests in flight.
+        Cached embeddings are not requested again.
+
         Args:
             texts (List[str]): List of text to embed.
 
         Returns:
             List[List[float]]: List of embeddings.
         """
-        async with aiohttp.ClientSession() as session:
-            tasks = [self._async_embed_text(session, text) for text in texts]
-            return await asyncio.gather(*tasks)
+        if not texts:
+            return []
+        if self.cache is None:
+            return await self._aembed_uncached(texts)
+        return await self._aembed_cached(texts, self._aembed_uncached)
 
     async def aembed_query(self, text: str) -> List[float]:
         """
@@ -127,20 +389,28 @@ class Embedding(Embeddings):
         Returns:
             List[float]: Embedding vector.
         """
-        async with aiohttp.ClientSession() as session:
-            return await self._async_embed_text(session, text)
+        if self.cache is None:
+            return await self._async_embed_text(get_async_session(), text)
+        return (await self.aembed_documents([text]))[0]
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
         Embed multiple documents synchronously with retry logic.
 
+        Uses concurrent batched requests when a batch size is configured.
+        Cached embeddings are not requested again.
+
         Args:
             texts (List[str]): List of text to embed.
 
         Returns:
             List[List[float]]: List of embeddings.
         """
-        return [self._embed_text(text) for text in texts]
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._embed_uncached(texts)
+        return self._embed_cached(texts, self._embed_uncached)
 
     def embed_query(self, text: str) -> List[float]:
         """
@@ -152,6 +422,6 @@ class Embedding(Embeddings):
         Returns:
             List[float]: Embedding vector.
         """
-        return self._embed_text(text)
-    
-    
\ No newline at end of file
+        if self.cache is None:
+            return self._embed_text(text)
+        return self.embed_documents([text])[0]
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Tuple
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection pool settings shared by the LLM and embedding clients
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 32))  # connections per host
+HTTP_POOL_TOTAL = int(os.getenv("HTTP_POOL_TOTAL", 100))  # connections overall (async)
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", 60))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 120))
+
+_session = None
+_session_lock = threading.Lock()
+# aiohttp sessions are bound to the event loop they were created on
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+def get_timeout() -> Tuple[float, float]:
+    """Return the (connect, read) timeout used for synchronous requests."""
+    return (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide `requests.Session` with a keep-alive connection pool.
+
+    Returns:
+        requests.Session: Shared session; safe to use from multiple threads.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_MAXSIZE,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """
+    Return the shared `aiohttp.ClientSession` for the running event loop.
+
+    Returns:
+        aiohttp.ClientSession: Session backed by a pooled keep-alive connector.
+    """
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_TOTAL,
+            limit_per_host=HTTP_POOL_MAXSIZE,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=HTTP_CONNECT_TIMEOUT,
+            sock_read=HTTP_READ_TIMEOUT,
+        )
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        _async_sessions[loop] = session
+    return session
+
+
+async def close_async_session() -> None:
+    """Close the shared async session of the running event loop, if any."""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def close_session() -> None:
+    """Close the shared synchronous session, if any."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
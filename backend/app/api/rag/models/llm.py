@@ -1,14 +1,21 @@
 import requests
+import aiohttp
+import codecs
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 from langchain_core.language_models.llms import BaseLLM
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
-from langchain_core.outputs import Generation, LLMResult
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
 from pydantic import Field, BaseModel as PydanticBaseModel
 from dotenv import load_dotenv
+from .http_client import get_async_session, get_session, get_timeout
 
 load_dotenv()
 BASE_URL = os.getenv("API_URL", "").rstrip("/")
+FALLBACK_RESPONSE = "I'm sorry, I couldn't generate a response. Please try again."
 counter = 0
 
 
@@ -18,15 +25,19 @@ class LLM(BaseLLM, PydanticBaseModel):
 
     Attributes:
         api_url (str): The URL of the local API endpoint
+        stream_url (str): The URL of the streaming generation endpoint, which
+            returns the generated text as a chunked plain-text body
         api_key (Optional[str]): API key for authentication (if required)
     """
 
     api_url: str = Field(default=f"{BASE_URL}/api/v1/generate")
+    stream_url: str = Field(default=f"{BASE_URL}/api/v1/generate_stream")
     api_key: Optional[str] = Field(default=None)
 
     def __init__(
         self,
         api_url: str = f"{BASE_URL}/api/v1/generate",
+        stream_url: str = f"{BASE_URL}/api/v1/generate_stream",
         api_key: Optional[str] = None,
         **kwargs,
     ):
@@ -35,10 +46,18 @@ class LLM(BaseLLM, PydanticBaseModel):
 
         Args:
             api_url (str): URL of the API endpoint
+            stream_url (str): URL of the streaming API endpoint
             api_key (Optional[str]): API key for authentication
         """
         # Use Pydantic's model_construct to properly initialize fields
-        super().__init__(api_url=api_url, api_key=api_key, **kwargs)
+        super().__init__(api_url=api_url, stream_url=stream_url, api_key=api_key, **kwargs)
+
+    def _headers(self) -> Dict[str, str]:
+        """Build request headers, including authorization if an API key is set."""
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
 
     def _call(
         self,
@@ -63,16 +82,16 @@ class LLM(BaseLLM, PydanticBaseModel):
         # print(f'<<Calling LLM: {counter}>>', flush=True)
 
         # Prepare headers
-        headers = {"Content-Type": "application/json"}
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
+        headers = self._headers()
 
         # Prepare payload
         payload = {"query": prompt}
 
         try:
             # Make API request
-            response = requests.post(self.api_url, json=payload, headers=headers)
+            response = get_session().post(
+                self.api_url, json=payload, headers=headers, timeout=get_timeout()
+            )
 
             # Raise an exception for bad responses
             response.raise_for_status()
@@ -85,6 +104,123 @@ class LLM(BaseLLM, PydanticBaseModel):
         except requests.RequestException as e:
             raise ValueError(f"API request failed: {e}")
 
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """
+        Asynchronously call the local API with the given prompt.
+
+        Args:
+            prompt (str): The input prompt
+            stop (Optional[List[str]]): Optional list of stop sequences
+            run_manager (Optional[AsyncCallbackManagerForLLMRun]): Callback manager
+
+        Returns:
+            str: Generated text from the API
+        """
+        payload = {"query": prompt}
+
+        try:
+            async with get_async_session().post(
+                self.api_url, json=payload, headers=self._headers()
+            ) as response:
+                response.raise_for_status()
+                json_data = await response.json()
+                return json_data.get("prediction", "")
+
+        except aiohttp.ClientError as e:
+            raise ValueError(f"API request failed: {e}")
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        """
+        Stream the generated text from the local API as it is produced.
+
+        Args:
+            prompt (str): The input prompt
+            stop (Optional[List[str]]): Optional list of stop sequences
+            run_manager (Optional[CallbackManagerForLLMRun]): Callback manager
+
+        Yields:
+            GenerationChunk: Incremental pieces of the generated text
+        """
+        payload = {"query": prompt}
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        try:
+            with get_session().post(
+                self.stream_url,
+                json=payload,
+                headers=self._headers(),
+                stream=True,
+                timeout=get_timeout(),
+            ) as response:
+                response.raise_for_status()
+                for data in response.iter_content(chunk_size=None):
+                    text = decoder.decode(data)
+                    if not text:
+                        continue
+                    chunk = GenerationChunk(text=text)
+                    if run_manager:
+                        run_manager.on_llm_new_token(text, chunk=chunk)
+                    yield chunk
+
+                # Always emit a final chunk so an empty body is not an error
+                yield GenerationChunk(text=decoder.decode(b"", final=True))
+
+        except requests.RequestException as e:
+            raise ValueError(f"API request failed: {e}")
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """
+        Asynchronously stream the generated text from the local API.
+
+        Args:
+            prompt (str): The input prompt
+            stop (Optional[List[str]]): Optional list of stop sequences
+            run_manager (Optional[AsyncCallbackManagerForLLMRun]): Callback manager
+
+        Yields:
+            GenerationChunk: Incremental pieces of the generated text
+        """
+        payload = {"query": prompt}
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        try:
+            async with get_async_session().post(
+                self.stream_url, json=payload, headers=self._headers()
+            ) as response:
+                response.raise_for_status()
+                async for data in response.content.iter_any():
+                    text = decoder.decode(data)
+                    if not text:
+                        continue
+                    chunk = GenerationChunk(text=text)
+                    if run_manager:
+                        await run_manager.on_llm_new_token(text, chunk=chunk)
+                    yield chunk
+
+                # Always emit a final chunk so an empty body is not an error
+                yield GenerationChunk(text=decoder.decode(b"", final=True))
+
+        except aiohttp.ClientError as e:
+            raise ValueError(f"API request failed: {e}")
+
     def _generate(
         self,
         prompts: List[str],
@@ -110,6 +246,31 @@ class LLM(BaseLLM, PydanticBaseModel):
 
         return LLMResult(generations=generations)
 
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """
+        Asynchronously generate responses for multiple prompts.
+
+        Args:
+            prompts (List[str]): List of input prompts
+            stop (Optional[List[str]]): Optional list of stop sequences
+            run_manager (Optional[AsyncCallbackManagerForLLMRun]): Callback manager
+
+        Returns:
+            LLMResult: Generated responses
+        """
+        generations = []
+        for prompt in prompts:
+            text = await self._acall(prompt, stop, run_manager, **kwargs)
+            generations.append([Generation(text=text)])
+
+        return LLMResult(generations=generations)
+
     @property
     def _llm_type(self) -> str:
         """
@@ -136,10 +297,68 @@ class LLM(BaseLLM, PydanticBaseModel):
         text = llm_response.flatten()
 
         if not text or not text[0].generations:
-            return "I'm sorry, I couldn't generate a response. Please try again."
+            return FALLBACK_RESPONSE
 
         generated_text = text[0].generations[0][0].text
         response = generated_text.replace('"', "")   
         return response
-    
-    
\ No newline at end of file
+
+    async def agenerate_response(self, prompt: str) -> str:
+        """
+        Asynchronously generate the full response for a prompt.
+
+        Args:
+            prompt (str): The constructed prompt
+
+        Returns:
+            str: Generated text, cleaned the same way as `generate_response`
+        """
+        llm_response = await self.agenerate([prompt])
+        text = llm_response.flatten()
+
+        if not text or not text[0].generations:
+            return FALLBACK_RESPONSE
+
+        generated_text = text[0].generations[0][0].text
+        return generated_text.replace('"', "")
+
+    def stream_response(self, prompt: str) -> Iterator[str]:
+        """
+        Stream the response for a prompt token by token.
+
+        Args:
+            prompt (str): The constructed prompt
+
+        Yields:
+            str: Pieces of the generated text, cleaned the same way as
+            `generate_response`
+        """
+        produced = False
+        for token in self.stream(prompt):
+            token = token.replace('"', "")
+            if token:
+                produced = True
+                yield token
+
+        if not produced:
+            yield FALLBACK_RESPONSE
+
+    async def astream_response(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Asynchronously stream the response for a prompt token by token.
+
+        Args:
+            prompt (str): The constructed prompt
+
+        Yields:
+            str: Pieces of the generated text
+        """
+        produced = False
+        async for token in self.astream(prompt):
+            token = token.replace('"', "")
+            if token:
+                produced = True
+                yield token
+
+        if not produced:
+            yield FALLBACK_RESPONSE
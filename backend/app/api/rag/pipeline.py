@@ -1,48 +1,320 @@
-from .models.llm import LLM
-from .prompts import get_chat_prompt, get_standalone_query_generation_prompt
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .db.answer_cache import AnswerCache, create_answer_cache, normalize_query
+from .db.session_store import create_session_store
+from .models.llm import FALLBACK_RESPONSE, LLM
+from .prompts import get_budgeted_chat_prompt
+from .query_rewriter import (
+    REWRITE_SPECULATIVE,
+    REWRITE_TIMEOUT_SECONDS,
+    QueryRewriter,
+    create_query_rewriter,
+)
 from .retriever import Retriever
 
+load_dotenv()
+
+DEFAULT_SESSION_ID = "default"
+# Token budget of the whole chat prompt; history is trimmed to fit
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", 3000))
+
 
 class Pipeline:
-    def __init__(self):
-        self.llm = LLM()
-        self.retriever = Retriever()
-        self.history = []
-
-    def _generate_standalone_query(self, query: str) -> str:
-        """Generate a standalone query if history exists, else return original query."""
-        if not self.history:
-            return query
-
-        prompt = get_standalone_query_generation_prompt(query, history=self.history)
-        standalone_query = self.llm.generate_response(prompt)
+    def __init__(
+        self,
+        llm: Optional[LLM] = None,
+        retriever: Optional[Retriever] = None,
+        session_store=None,
+        answer_cache: Optional[AnswerCache] = None,
+        rewriter: Optional[QueryRewriter] = None,
+        speculative_retrieval: Optional[bool] = None,
+        rewrite_timeout: Optional[float] = None,
+        prompt_max_tokens: Optional[int] = None,
+    ):
+        self.llm = llm if llm is not None else LLM()
+        self.retriever = retriever if retriever is not None else Retriever()
+        self.sessions = session_store if session_store is not None else create_session_store()
+        self.answer_cache = answer_cache if answer_cache is not None else create_answer_cache()
+        self.rewriter = rewriter if rewriter is not None else create_query_rewriter(self.llm)
+        self.speculative_retrieval = (
+            speculative_retrieval if speculative_retrieval is not None else REWRITE_SPECULATIVE
+        )
+        self.rewrite_timeout = rewrite_timeout if rewrite_timeout is not None else REWRITE_TIMEOUT_SECONDS
+        self.prompt_max_tokens = prompt_max_tokens if prompt_max_tokens is not None else PROMPT_MAX_TOKENS
+
+    def get_history(self, session_id: str = DEFAULT_SESSION_ID) -> List[Tuple[str, str]]:
+        """Return the conversation history of a session."""
+        return self.sessions.get_history(session_id)
+
+    def _generate_standalone_query(self, query: str, history: List[Tuple[str, str]]) -> Tuple[str, bool]:
+        """
+        Standalone query for retrieval; the LLM is only asked when the fast paths miss.
+
+        Also returns whether the query stands alone: False when a needed
+        rewrite failed and the raw, conversation-dependent query is used.
+        """
+        standalone_query, standalone = self.rewriter.resolve(query, history)
         print(f"Standalone Query: {standalone_query}")
-        return standalone_query
+        return standalone_query, standalone
+
+    @staticmethod
+    def _report_background_rewrite(task: asyncio.Task) -> None:
+        """Retrieve the outcome of a rewrite left running after a timeout, so failures are not lost."""
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Background query rewrite failed: {task.exception()}")
+
+    async def _agenerate_standalone_query(
+        self, query: str, history: List[Tuple[str, str]]
+    ) -> Tuple[str, bool, Optional[asyncio.Task]]:
+        """
+        Async version of `_generate_standalone_query`.
+
+        With speculative retrieval, context for the raw query is fetched while
+        the LLM rewrites it, and the retrieval task is returned alongside the
+        standalone query. If `rewrite_timeout` expires first, the raw query is
+        used and the rewrite finishes in the background to warm the memo.
+        """
+        standalone_query = self.rewriter.lookup(query, history)
+        standalone = True
+        speculative = None
+        if standalone_query is None:
+            if not self.speculative_retrieval:
+                standalone_query, standalone = await self.rewriter.agenerate(query, history)
+            else:
+                speculative = asyncio.ensure_future(self._aretrieve_context(query))
+                rewrite = asyncio.ensure_future(self.rewriter.agenerate(query, history))
+                try:
+                    standalone_query, standalone = await asyncio.wait_for(
+                        asyncio.shield(rewrite), self.rewrite_timeout or None
+                    )
+                except asyncio.TimeoutError:
+                    print("Standalone query rewrite timed out; using the raw query")
+                    rewrite.add_done_callback(self._report_background_rewrite)
+                    standalone_query, standalone = query, False
+                except BaseException:
+                    speculative.cancel()
+                    raise
+        print(f"Standalone Query: {standalone_query}")
+        return standalone_query, standalone, speculative
+
+    @staticmethod
+    async def _speculative_context(
+        speculative: Optional[asyncio.Task], query: str, standalone_query: str
+    ) -> Optional[str]:
+        """Context of the speculative retrieval if it was for the final query, else None."""
+        if speculative is None:
+            return None
+        if normalize_query(standalone_query) != normalize_query(query):
+            speculative.cancel()
+            return None
+        try:
+            return await speculative
+        except Exception as e:
+            print(f"Speculative retrieval failed: {str(e)}")
+            return None
+
+    def _cached_answer(
+        self, standalone_query: str, standalone: bool = True
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Look the standalone query up in the answer cache.
+
+        The exact tier is tried first. On a miss the query is embedded for the
+        semantic tier, and the embedding is returned so retrieval can reuse it.
+        A query that does not stand alone is never looked up: its answer
+        depends on a conversation the cached one may not share.
+        """
+        if self.answer_cache is None or not standalone:
+            return None, None
+
+        self.answer_cache.refresh_generation()
+        answer = self.answer_cache.get(standalone_query)
+        if answer is not None:
+            return answer, None
+
+        embedding = None
+        if self.answer_cache.semantic_enabled:
+            try:
+                embedding = self.retriever.embed_query(standalone_query)
+                answer = self.answer_cache.get_similar(embedding)
+            except Exception as e:
+                print(f"Answer cache lookup failed: {str(e)}")
+        if answer is None:
+            self.answer_cache.miss()
+        return answer, embedding
+
+    async def _acached_answer(
+        self, standalone_query: str, standalone: bool = True
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """Async version of `_cached_answer`."""
+        if self.answer_cache is None or not standalone:
+            return None, None
+
+        # The generation is read from Redis: keep it off the event loop
+        await self.answer_cache.arefresh_generation()
+        answer = self.answer_cache.get(standalone_query)
+        if answer is not None:
+            return answer, None
+
+        embedding = None
+        if self.answer_cache.semantic_enabled:
+            try:
+                embedding = await self.retriever.aembed_query(standalone_query)
+                answer = self.answer_cache.get_similar(embedding)
+            except Exception as e:
+                print(f"Answer cache lookup failed: {str(e)}")
+        if answer is None:
+            self.answer_cache.miss()
+        return answer, embedding
 
-    def _retrieve_context(self, standalone_query: str) -> str:
+    def _cache_answer(
+        self, standalone_query: str, response: str, embedding: Optional[List[float]], standalone: bool = True
+    ) -> None:
+        """Cache a freshly generated answer, unless generation failed or the query does not stand alone."""
+        if self.answer_cache is None or not standalone or not response.strip() or response == FALLBACK_RESPONSE:
+            return
+        self.answer_cache.put(standalone_query, response, embedding)
+
+    def _record_latency(self, hit: bool, started: float) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.record_latency(hit, time.perf_counter() - started)
+
+    def _retrieve_context(self, standalone_query: str, embedding: Optional[List[float]] = None) -> str:
         """Retrieve context using the retriever."""
-        context = self.retriever.retrieve(standalone_query)
+        context = self.retriever.retrieve(standalone_query, embedding=embedding)
+        print(f"Retrieved context: {context}")
+        return context
+
+    async def _aretrieve_context(self, standalone_query: str, embedding: Optional[List[float]] = None) -> str:
+        """Async version of `_retrieve_context`."""
+        context = await self.retriever.aretrieve(standalone_query, embedding=embedding)
         print(f"Retrieved context: {context}")
         return context
 
-    def _generate_response(self, query: str, context: str) -> str:
+    def _generate_response(self, query: str, context: str, history: List[Tuple[str, str]]) -> str:
         """Generate assistant response based on query, history, and retrieved context."""
-        prompt = get_chat_prompt(query, history=self.history, context=context)
+        prompt = self._build_prompt(query, history, context)
         response = self.llm.generate_response(prompt)
         return response
 
-    def _update_history(self, query: str, response: str) -> None:
-        """Update conversation history with user query and assistant response."""
-        self.history.extend([
-            ("user", query),
-            ("assistant", response),
-        ])
+    def _build_prompt(self, query: str, history: List[Tuple[str, str]], context: str) -> str:
+        """Chat prompt within the token budget; prints the tokens used per section."""
+        prompt, report = get_budgeted_chat_prompt(query, history=history, context=context, max_tokens=self.prompt_max_tokens)
+        print(
+            "Prompt tokens: "
+            + ", ".join(f"{section}={report[section]}" for section in ("system", "context", "history", "query", "total"))
+            + f" (history messages dropped: {report['history_messages_dropped']})"
+        )
+        return prompt
 
-    def run(self, query: str) -> str:
+    def _update_history(self, session_id: str, query: str, response: str) -> None:
+        """Update the session's conversation history with user query and assistant response."""
+        self.sessions.append(session_id, query, response)
+
+    async def _aget_history(self, session_id: str) -> List[Tuple[str, str]]:
+        """Async version of `get_history`; the session store may block on Redis, so it runs in a thread."""
+        return await asyncio.to_thread(self.sessions.get_history, session_id)
+
+    async def _aupdate_history(self, session_id: str, query: str, response: str) -> None:
+        """Async version of `_update_history`."""
+        await asyncio.to_thread(self.sessions.append, session_id, query, response)
+
+    def run(self, query: str, session_id: str = DEFAULT_SESSION_ID) -> str:
         """Run the full RAG pipeline for a given user query."""
-        standalone_query = self._generate_standalone_query(query)
-        context = self._retrieve_context(standalone_query)
-        response = self._generate_response(query, context)
-        self._update_history(query, response)
+        started = time.perf_counter()
+        history = self.sessions.get_history(session_id)
+        standalone_query, standalone = self._generate_standalone_query(query, history)
+        cached, embedding = self._cached_answer(standalone_query, standalone)
+        if cached is not None:
+            self._update_history(session_id, query, cached)
+            self._record_latency(True, started)
+            return cached
+
+        context = self._retrieve_context(standalone_query, embedding)
+        response = self._generate_response(query, context, history)
+        self._cache_answer(standalone_query, response, embedding, standalone)
+        self._update_history(session_id, query, response)
+        self._record_latency(False, started)
         return response
 
+    def stream(self, query: str, session_id: str = DEFAULT_SESSION_ID) -> Iterator[str]:
+        """Run the RAG pipeline, yielding response tokens as the LLM produces them."""
+        started = time.perf_counter()
+        history = self.sessions.get_history(session_id)
+        standalone_query, standalone = self._generate_standalone_query(query, history)
+        cached, embedding = self._cached_answer(standalone_query, standalone)
+        if cached is not None:
+            self._record_latency(True, started)
+            yield cached
+            self._update_history(session_id, query, cached)
+            return
+
+        context = self._retrieve_context(standalone_query, embedding)
+        prompt = self._build_prompt(query, history, context)
+
+        tokens = []
+        for token in self.llm.stream_response(prompt):
+            tokens.append(token)
+            yield token
+
+        response = "".join(tokens)
+        self._record_latency(False, started)
+        self._cache_answer(standalone_query, response, embedding, standalone)
+        self._update_history(session_id, query, response)
+
+    async def arun(self, query: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+        """Run the full RAG pipeline without blocking the event loop."""
+        started = time.perf_counter()
+        history = await self._aget_history(session_id)
+        standalone_query, standalone, speculative = await self._agenerate_standalone_query(query, history)
+        cached, embedding = await self._acached_answer(standalone_query, standalone)
+        if cached is not None:
+            if speculative is not None:
+                speculative.cancel()
+            await self._aupdate_history(session_id, query, cached)
+            self._record_latency(True, started)
+            return cached
+
+        context = await self._speculative_context(speculative, query, standalone_query)
+        if context is None:
+            context = await self._aretrieve_context(standalone_query, embedding)
+        prompt = self._build_prompt(query, history, context)
+        response = await self.llm.agenerate_response(prompt)
+        self._cache_answer(standalone_query, response, embedding, standalone)
+        await self._aupdate_history(session_id, query, response)
+        self._record_latency(False, started)
+        return response
+
+    async def astream(self, query: str, session_id: str = DEFAULT_SESSION_ID) -> AsyncIterator[str]:
+        """Async version of `stream`, yielding response tokens as they arrive."""
+        started = time.perf_counter()
+        history = await self._aget_history(session_id)
+        standalone_query, standalone, speculative = await self._agenerate_standalone_query(query, history)
+        cached, embedding = await self._acached_answer(standalone_query, standalone)
+        if cached is not None:
+            if speculative is not None:
+                speculative.cancel()
+            self._record_latency(True, started)
+            yield cached
+            await self._aupdate_history(session_id, query, cached)
+            return
+
+        context = await self._speculative_context(speculative, query, standalone_query)
+        if context is None:
+            context = await self._aretrieve_context(standalone_query, embedding)
+        prompt = self._build_prompt(query, history, context)
+
+        tokens = []
+        async for token in self.llm.astream_response(prompt):
+            tokens.append(token)
+            yield token
+
+        response = "".join(tokens)
+        self._record_latency(False, started)
+        self._cache_answer(standalone_query, response, embedding, standalone)
+        await self._aupdate_history(session_id, query, response)
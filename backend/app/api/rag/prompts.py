@@ -1,5 +1,8 @@
 from datetime import datetime
 
+from .db.session_store import trim_history
+from .utils import count_tokens
+
 
 def get_chat_prompt(user_input, history=[], context=None):
     today_date = datetime.today().strftime("%d %B %Y")  
@@ -27,6 +30,41 @@ def get_chat_prompt(user_input, history=[], context=None):
     return prompt
 
 
+def get_budgeted_chat_prompt(user_input, history=[], context=None, max_tokens=3000):
+    """
+    Build the chat prompt, trimming the oldest history so the prompt fits `max_tokens`.
+
+    The system text, retrieved context and user input are kept whole; history
+    gets whatever budget is left.
+
+    Returns:
+        Tuple[str, Dict[str, int]]: The prompt and the tokens used per section
+        (system, context, history, query, total), plus history turns kept/dropped.
+    """
+    base = get_chat_prompt(user_input, history=[], context=None)
+    query_tokens = count_tokens(user_input)
+    context_tokens = count_tokens(context) if context else 0
+    history_budget = max(0, max_tokens - count_tokens(base) - context_tokens)
+    trimmed = trim_history(list(history), history_budget)
+
+    prompt = get_chat_prompt(user_input, history=trimmed, context=context)
+    # trim_history counts message text only; drop more turns if headers tip it over
+    while trimmed and count_tokens(prompt) > max_tokens:
+        trimmed = trim_history(trimmed[1:], history_budget)
+        prompt = get_chat_prompt(user_input, history=trimmed, context=context)
+    total = count_tokens(prompt)
+    with_context = count_tokens(get_chat_prompt(user_input, history=[], context=context)) if context else count_tokens(base)
+    report = {
+        "system": count_tokens(base) - query_tokens,
+        "context": with_context - count_tokens(base),
+        "history": total - with_context,
+        "query": query_tokens,
+        "total": total,
+        "history_messages_kept": len(trimmed),
+        "history_messages_dropped": len(history) - len(trimmed),
+    }
+    return prompt, report
+
 
 def get_standalone_query_generation_prompt(user_input, history):
     prompt = (
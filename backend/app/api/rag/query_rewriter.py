@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .db.answer_cache import normalize_query
+from .models.llm import FALLBACK_RESPONSE
+from .prompts import get_standalone_query_generation_prompt
+
+load_dotenv()
+
+# Retrieve on the raw query while the rewrite runs (async pipeline only)
+REWRITE_SPECULATIVE = os.getenv("REWRITE_SPECULATIVE", "false").lower() in ("1", "true", "yes", "on")
+# With speculation, stop waiting for the rewrite after this long; 0 waits for it
+REWRITE_TIMEOUT_SECONDS = float(os.getenv("REWRITE_TIMEOUT_SECONDS", 0))
+
+History = List[Tuple[str, str]]
+
+# Words that point back at something said in an earlier turn
+_REFERRING_WORDS = frozenset(
+    """
+    he she it its it's they them their theirs his her hers him himself herself themselves
+    this that these those there here then former latter above aforementioned
+    same such previous earlier later one ones again else another other others more also too
+    """.split()
+)
+# Openers that only make sense as a follow-up ("what about Sylhet?")
+_FOLLOW_UP_PREFIXES = (
+    "and ", "but ", "so ", "also ", "what about", "how about", "what else",
+    "tell me more", "more on", "more about", "same for", "then ", "anything else",
+)
+_WORD = re.compile(r"[a-z']+")
+# A capitalized word after the first one, or a number: a named subject
+_ENTITY = re.compile(r"(?<=\s)[A-Z][\w'-]*|\d")
+
+
+def needs_rewrite(query: str, history: History) -> bool:
+    """
+    Whether a query may depend on earlier turns and so needs a standalone rewrite.
+
+    The check is deliberately conservative: very short queries, follow-up
+    openers, any referring word (pronouns, "that", "there", "more", ...) and
+    queries naming no entity ("How many people died?") all send the query to
+    the LLM; only self-contained queries skip it.
+    """
+    if not history:
+        return False
+    words = _WORD.findall(query.lower())
+    if len(words) <= 3:
+        return True
+    if normalize_query(query).startswith(_FOLLOW_UP_PREFIXES):
+        return True
+    if any(word in _REFERRING_WORDS for word in words):
+        return True
+    return not _ENTITY.search(query)
+
+
+def history_digest(history: History) -> str:
+    """Stable digest of a conversation history, for use in cache keys."""
+    return hashlib.sha256(json.dumps(history, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class RewriteCache:
+    """
+    LRU + TTL memo of (history digest, normalized query) -> standalone query.
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximum number of memoized rewrites.
+    ttl_seconds : float
+        Lifetime of an entry.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = max(1.0, float(ttl_seconds))
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query: str, history: History) -> Tuple[str, str]:
+        return history_digest(history), normalize_query(query)
+
+    def get(self, query: str, history: History) -> Optional[str]:
+        key = self.key(query, history)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, query: str, history: History, standalone_query: str) -> None:
+        key = self.key(query, history)
+        with self._lock:
+            self._entries[key] = (standalone_query, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class QueryRewriter:
+    """
+    Produces the standalone query of a turn, calling the LLM only when needed.
+
+    A turn is answered, cheapest first, by: no history (first turn), the
+    `needs_rewrite` heuristic, the memo cache, and finally the LLM. When the
+    LLM rewrite fails the raw query is used, which may still depend on the
+    conversation: `resolve` and `generate` report whether the query they
+    return stands alone, so callers can keep it out of shared caches.
+
+    Parameters
+    ----------
+    llm : LLM
+        Model used for the rewrite.
+    cache : Optional[RewriteCache]
+        Memo of previous rewrites; None disables memoization.
+    use_heuristic : bool
+        Skip the rewrite for queries that do not refer to earlier turns.
+    """
+
+    def __init__(self, llm, cache: Optional[RewriteCache] = None, use_heuristic: bool = True) -> None:
+        self.llm = llm
+        self.cache = cache
+        self.use_heuristic = use_heuristic
+        self.turns = 0
+        self.first_turns = 0
+        self.heuristic_skips = 0
+        self.cache_hits = 0
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def lookup(self, query: str, history: History) -> Optional[str]:
+        """
+        The standalone query if it is available without the LLM, else None.
+        """
+        self._count("turns")
+        if not history:
+            self._count("first_turns")
+            return query
+        if self.use_heuristic and not needs_rewrite(query, history):
+            self._count("heuristic_skips")
+            return query
+        if self.cache is not None:
+            cached = self.cache.get(query, history)
+            if cached is not None:
+                self._count("cache_hits")
+                return cached
+        return None
+
+    def _store(self, query: str, history: History, standalone_query: str) -> Tuple[str, bool]:
+        standalone_query = standalone_query.strip()
+        if not standalone_query or standalone_query == FALLBACK_RESPONSE:
+            # A failed rewrite falls back to the raw query and is not memoized
+            return query, False
+        if self.cache is not None:
+            self.cache.put(query, history, standalone_query)
+        return standalone_query, True
+
+    def generate(self, query: str, history: History) -> Tuple[str, bool]:
+        """
+        Rewrite with the LLM, bypassing the fast paths, and memoize the result.
+
+        Returns:
+            Tuple[str, bool]: The standalone query, and False if the rewrite
+            failed and the raw query is returned instead.
+        """
+        self._count("llm_calls")
+        prompt = get_standalone_query_generation_prompt(query, history=history)
+        return self._store(query, history, self.llm.generate_response(prompt))
+
+    async def agenerate(self, query: str, history: History) -> Tuple[str, bool]:
+        """Async version of `generate`."""
+        self._count("llm_calls")
+        prompt = get_standalone_query_generation_prompt(query, history=history)
+        return self._store(query, history, await self.llm.agenerate_response(prompt))
+
+    def resolve(self, query: str, history: History) -> Tuple[str, bool]:
+        """Standalone version of `query` given `history`, and whether it is one (see `generate`)."""
+        standalone_query = self.lookup(query, history)
+        if standalone_query is not None:
+            return standalone_query, True
+        return self.generate(query, history)
+
+    async def aresolve(self, query: str, history: History) -> Tuple[str, bool]:
+        """Async version of `resolve`."""
+        standalone_query = self.lookup(query, history)
+        if standalone_query is not None:
+            return standalone_query, True
+        return await self.agenerate(query, history)
+
+    def rewrite(self, query: str, history: History) -> str:
+        """Standalone version of `query` given the conversation `history`."""
+        return self.resolve(query, history)[0]
+
+    async def arewrite(self, query: str, history: History) -> str:
+        """Async version of `rewrite`."""
+        return (await self.aresolve(query, history))[0]
+
+    def stats(self) -> Dict[str, float]:
+        """LLM rewrite calls made versus turns, and what avoided the rest."""
+        follow_ups = self.turns - self.first_turns
+        return {
+            "turns": self.turns,
+            "first_turns": self.first_turns,
+            "heuristic_skips": self.heuristic_skips,
+            "cache_hits": self.cache_hits,
+            "llm_calls": self.llm_calls,
+            "llm_calls_saved": follow_ups - self.llm_calls,
+            "llm_calls_per_turn": round(self.llm_calls / self.turns, 4) if self.turns else 0.0,
+        }
+
+
+def create_query_rewriter(llm) -> QueryRewriter:
+    """
+    Build the query rewriter configured through the environment.
+
+    REWRITE_HEURISTIC toggles the fast path; REWRITE_CACHE_MAX_ENTRIES (0
+    disables the memo) and REWRITE_CACHE_TTL_SECONDS size the memo.
+    """
+    max_entries = int(os.getenv("REWRITE_CACHE_MAX_ENTRIES", 10000))
+    cache = RewriteCache(
+        max_entries=max_entries,
+        ttl_seconds=float(os.getenv("REWRITE_CACHE_TTL_SECONDS", 3600)),
+    ) if max_entries > 0 else None
+    use_heuristic = os.getenv("REWRITE_HEURISTIC", "true").lower() not in ("0", "false", "no", "off")
+    return QueryRewriter(llm, cache=cache, use_heuristic=use_heuristic)
@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from .db.answer_cache import normalize_query
+from .db.lexical_index import tokenize
+from .models.http_client import get_async_session, get_session, get_timeout
+
+load_dotenv()
+BASE_URL = os.getenv("API_URL", "").rstrip("/")
+
+# "none", "lexical" (query-term overlap) or "cross-encoder" (RERANK_API_URL)
+RERANK_MODE = os.getenv("RERANK_MODE", "none").lower()
+RERANK_API_URL = os.getenv("RERANK_API_URL", f"{BASE_URL}/api/v1/rerank")
+# First-stage hits handed to the reranker
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 20))
+# Past this budget the first-stage order is kept; 0 waits for the scorer
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 150))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 16))
+# Maximal marginal relevance trade-off for the final pick; 1 ranks by relevance only
+RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", 1.0))
+
+_rerank_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rerank")
+
+logger = logging.getLogger(__name__)
+
+Hits = List[Tuple[Document, float]]
+
+
+def chunk_key(doc: Document) -> str:
+    """Content digest identifying a chunk across indexes and ingestion runs."""
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class ScoreCache:
+    """
+    LRU + TTL memo of (normalized query, chunk key) -> rerank score.
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximum number of memoized scores.
+    ttl_seconds : float
+        Lifetime of an entry.
+    """
+
+    def __init__(self, max_entries: int = 50000, ttl_seconds: float = 3600) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = max(1.0, float(ttl_seconds))
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, query: str, keys: Sequence[str]) -> Dict[str, float]:
+        """Cached scores of the given chunks, by key; misses are left out."""
+        query = normalize_query(query)
+        now = time.monotonic()
+        found: Dict[str, float] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get((query, key))
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._entries[(query, key)]
+                    continue
+                self._entries.move_to_end((query, key))
+                found[key] = entry[0]
+        return found
+
+    def put_many(self, query: str, scores: Dict[str, float]) -> None:
+        query = normalize_query(query)
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, score in scores.items():
+                self._entries[(query, key)] = (score, expires)
+                self._entries.move_to_end((query, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Scorer(ABC):
+    """
+    Base class for rerank scorers.
+
+    Subclasses score how well each text answers a query, in [0, 1], higher
+    is better.
+    """
+
+    @abstractmethod
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        ...
+
+    async def ascore(self, query: str, texts: Sequence[str]) -> List[float]:
+        return await asyncio.to_thread(self.score, query, texts)
+
+
+class LexicalScorer(Scorer):
+    """
+    Weighted share of the query's terms, and of its adjacent term pairs,
+    found in each text.
+
+    Terms are weighted by how rare they are among the texts being scored, so
+    a name found in one candidate counts more than a topic word found in
+    all of them; pairs reward texts that keep a name or phrase together.
+    The weights only count query terms that some text contains, so a text
+    matching all of them scores 1.
+
+    Parameters
+    ----------
+    pair_weight : float
+        Share of the score given to adjacent term pairs.
+    """
+
+    def __init__(self, pair_weight: float = 0.3) -> None:
+        self.pair_weight = min(1.0, max(0.0, pair_weight))
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        terms = tokenize(query)
+        unique = set(terms)
+        pairs = set(zip(terms, terms[1:]))
+        tokens = [tokenize(text) for text in texts]
+        term_sets = [set(text_tokens) & unique for text_tokens in tokens]
+        df = Counter(term for found in term_sets for term in found)
+        weights = {term: math.log(1 + (len(texts) + 1) / (count + 1)) for term, count in df.items()}
+        total = sum(weights.values())
+
+        scores = []
+        for text_tokens, found in zip(tokens, term_sets):
+            term_score = sum(weights[term] for term in found) / total if total else 0.0
+            if pairs:
+                pair_score = len(pairs & set(zip(text_tokens, text_tokens[1:]))) / len(pairs)
+                term_score = (1 - self.pair_weight) * term_score + self.pair_weight * pair_score
+            scores.append(term_score)
+        return scores
+
+
+class CrossEncoderScorer(Scorer):
+    """
+    Cross-encoder served over HTTP.
+
+    The endpoint takes {"query": ..., "texts": [...]} and returns
+    {"scores": [...]}, one raw relevance logit per text; logits are mapped
+    to [0, 1] with a sigmoid.
+
+    Parameters
+    ----------
+    api_url : str
+        URL of the rerank endpoint.
+    api_key : Optional[str]
+        Bearer token, if the endpoint requires one.
+    """
+
+    def __init__(self, api_url: str = RERANK_API_URL, api_key: Optional[str] = None) -> None:
+        self.api_url = api_url
+        self.api_key = api_key
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    @staticmethod
+    def _scores(texts: Sequence[str], logits: Sequence[float]) -> List[float]:
+        if len(logits) != len(texts):
+            raise ValueError(f"Rerank server returned {len(logits)} scores for {len(texts)} texts")
+        return [1 / (1 + math.exp(-max(-50.0, min(50.0, float(logit))))) for logit in logits]
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        response = get_session().post(
+            self.api_url, json={"query": query, "texts": list(texts)}, headers=self._headers(), timeout=get_timeout()
+        )
+        response.raise_for_status()
+        return self._scores(texts, response.json().get("scores", []))
+
+    async def ascore(self, query: str, texts: Sequence[str]) -> List[float]:
+        async with get_async_session().post(
+            self.api_url, json={"query": query, "texts": list(texts)}, headers=self._headers()
+        ) as response:
+            if response.status != 200:
+                raise aiohttp.ClientError(f"HTTP Error: {response.status}")
+            return self._scores(texts, (await response.json()).get("scores", []))
+
+
+class Reranker:
+    """
+    Second retrieval stage: rescore the first-stage candidates.
+
+    Scores are memoized per (query, chunk); the chunks missing from the
+    memo are scored in batches of `batch_size`, in parallel. If scoring
+    fails or is not done within `budget_seconds`, the first-stage order is
+    kept; batches that finish late still fill the memo, so the query is
+    reranked when it comes again.
+
+    `select` picks the final hits, by score or, with `mmr_lambda` below 1,
+    by maximal marginal relevance: each pick trades its score against its
+    term overlap with the chunks already picked.
+
+    Parameters
+    ----------
+    scorer : Scorer
+        Relevance model.
+    candidates : int
+        Number of first-stage hits rescored.
+    budget_seconds : float
+        Time allowed for scoring one request; 0 waits for the scorer.
+    batch_size : int
+        Texts per scorer call.
+    cache : Optional[ScoreCache]
+        Memo of previous scores; None disables memoization.
+    mmr_lambda : float
+        Relevance weight of the final pick; 1 disables MMR.
+    """
+
+    def __init__(
+        self,
+        scorer: Scorer,
+        candidates: int = RERANK_CANDIDATES,
+        budget_seconds: float = RERANK_BUDGET_MS / 1000,
+        batch_size: int = RERANK_BATCH_SIZE,
+        cache: Optional[ScoreCache] = None,
+        mmr_lambda: float = RERANK_MMR_LAMBDA,
+    ) -> None:
+        self.scorer = scorer
+        self.candidates = max(1, int(candidates))
+        self.budget_seconds = max(0.0, float(budget_seconds))
+        self.batch_size = max(1, int(batch_size))
+        self.cache = cache
+        self.mmr_lambda = min(1.0, max(0.0, mmr_lambda))
+        self.requests = 0
+        self.cache_hits = 0
+        self.scored = 0
+        self.degraded = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _lookup(self, query: str, hits: Hits) -> Tuple[List[str], Dict[str, float], List[List[int]]]:
+        """Chunk keys, cached scores, and the batches of hit positions left to score."""
+        self._count("requests")
+        keys = [chunk_key(doc) for doc, _ in hits]
+        scores = self.cache.get_many(query, keys) if self.cache is not None else {}
+        self._count("cache_hits", len(scores))
+        missing = [i for i, key in enumerate(keys) if key not in scores]
+        return keys, scores, [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+
+    def _store(self, query: str, keys: List[str], scores: List[float]) -> List[float]:
+        self._count("scored", len(keys))
+        if self.cache is not None:
+            self.cache.put_many(query, dict(zip(keys, scores)))
+        return scores
+
+    def _score_batch(self, query: str, keys: List[str], texts: List[str]) -> List[float]:
+        return self._store(query, keys, self.scorer.score(query, texts))
+
+    async def _ascore_batch(self, query: str, keys: List[str], texts: List[str]) -> List[float]:
+        return self._store(query, keys, await self.scorer.ascore(query, texts))
+
+    @staticmethod
+    def _reorder(hits: Hits, keys: List[str], scores: Dict[str, float]) -> Hits:
+        # The sort is stable, so ties keep their first-stage order
+        return sorted(((doc, scores[key]) for (doc, _), key in zip(hits, keys)), key=lambda hit: hit[1], reverse=True)
+
+    def _degrade(self, hits: Hits, reason: str) -> Hits:
+        self._count("degraded")
+        logger.warning("Reranking skipped, keeping the first-stage order: %s", reason)
+        return hits
+
+    def rerank(self, query: str, hits: Hits) -> Hits:
+        """
+        Rescore the first `candidates` hits and order them by the new scores.
+
+        Args:
+            query (str): The search query.
+            hits (Hits): First-stage (document, score) pairs, best first.
+
+        Returns:
+            Hits: The candidates with rerank scores, best first, or in
+            first-stage order if the budget ran out.
+        """
+        hits = list(hits[:self.candidates])
+        if not hits:
+            return hits
+        keys, scores, batches = self._lookup(query, hits)
+        futures = [
+            (batch, _rerank_executor.submit(
+                self._score_batch, query, [keys[i] for i in batch], [hits[i][0].page_content for i in batch]
+            ))
+            for batch in batches
+        ]
+        if futures:
+            _, pending = wait([future for _, future in futures], timeout=self.budget_seconds or None)
+            if pending:
+                return self._degrade(hits, f"over the {self.budget_seconds * 1000:.0f} ms budget")
+            for batch, future in futures:
+                try:
+                    scores.update(zip((keys[i] for i in batch), future.result()))
+                except Exception as e:
+                    return self._degrade(hits, str(e) or type(e).__name__)
+        return self._reorder(hits, keys, scores)
+
+    async def arerank(self, query: str, hits: Hits) -> Hits:
+        """Async version of `rerank`."""
+        hits = list(hits[:self.candidates])
+        if not hits:
+            return hits
+        keys, scores, batches = self._lookup(query, hits)
+        tasks = [
+            (batch, asyncio.ensure_future(self._ascore_batch(
+                query, [keys[i] for i in batch], [hits[i][0].page_content for i in batch]
+            )))
+            for batch in batches
+        ]
+        if tasks:
+            _, pending = await asyncio.wait([task for _, task in tasks], timeout=self.budget_seconds or None)
+            if pending:
+                # Late batches keep running to fill the memo; their errors are dropped
+                for task in pending:
+                    task.add_done_callback(lambda task: task.cancelled() or task.exception())
+                return self._degrade(hits, f"over the {self.budget_seconds * 1000:.0f} ms budget")
+            for batch, task in tasks:
+                try:
+                    scores.update(zip((keys[i] for i in batch), task.result()))
+                except Exception as e:
+                    return self._degrade(hits, str(e) or type(e).__name__)
+        return self._reorder(hits, keys, scores)
+
+    def select(self, hits: Hits, k: int) -> Hits:
+        """
+        Pick the final `k` hits from ranked ones.
+
+        Args:
+            hits (Hits): (document, score) pairs, best first.
+            k (int): Number of hits to keep.
+
+        Returns:
+            Hits: The top `k`, or the MMR picks when `mmr_lambda` < 1.
+        """
+        if self.mmr_lambda >= 1 or len(hits) <= k:
+            return hits[:k]
+        terms = [set(tokenize(doc.page_content)) for doc, _ in hits]
+        chosen: List[int] = []
+        remaining = list(range(len(hits)))
+        while remaining and len(chosen) < k:
+            best = max(
+                remaining,
+                key=lambda i: self.mmr_lambda * hits[i][1] - (1 - self.mmr_lambda) * max(
+                    (_jaccard(terms[i], terms[j]) for j in chosen), default=0.0
+                ),
+            )
+            chosen.append(best)
+            remaining.remove(best)
+        return [hits[i] for i in chosen]
+
+    def stats(self) -> Dict[str, float]:
+        """Requests reranked, scores served from the memo or the scorer, and budget misses."""
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "scored": self.scored,
+            "degraded": self.degraded,
+            "degraded_rate": round(self.degraded / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+def create_reranker() -> Optional[Reranker]:
+    """
+    Build the reranker configured through the environment.
+
+    RERANK_MODE selects `none` (default), `lexical` or `cross-encoder`
+    (served at RERANK_API_URL). RERANK_CANDIDATES, RERANK_BUDGET_MS,
+    RERANK_BATCH_SIZE and RERANK_MMR_LAMBDA tune the stage;
+    RERANK_CACHE_MAX_ENTRIES (0 disables the memo) and
+    RERANK_CACHE_TTL_SECONDS size the score memo.
+    """
+    if RERANK_MODE == "none":
+        return None
+    if RERANK_MODE == "lexical":
+        scorer: Scorer = LexicalScorer()
+    elif RERANK_MODE == "cross-encoder":
+        scorer = CrossEncoderScorer(api_key=os.getenv("RERANK_API_KEY") or None)
+    else:
+        raise ValueError(f"Unknown RERANK_MODE: {RERANK_MODE}")
+    max_entries = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", 50000))
+    cache = ScoreCache(
+        max_entries=max_entries,
+        ttl_seconds=float(os.getenv("RERANK_CACHE_TTL_SECONDS", 3600)),
+    ) if max_entries > 0 else None
+    return Reranker(scorer, cache=cache)
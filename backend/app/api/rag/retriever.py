@@ -1,13 +1,69 @@
 import logging
-from typing import List, Dict, Any
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Callable, Optional, Tuple, Union
+from dotenv import load_dotenv
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from .db.vectorstore import VectorStore
+from .splitter import SPLIT_MODE, SentenceSplitter, create_text_splitter
+from .utils import RELEVANCE_FIELD, TIMESTAMP_FIELD, count_tokens
+
+load_dotenv()
+
+# Context assembly: token budget, relevance cutoff and near-duplicate threshold
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 1500))
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", 0.2))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.8))
+# Limit retrieval to the window a query names ("today", "past 3 days", ...)
+RETRIEVAL_INFER_TIME_WINDOW = os.getenv("RETRIEVAL_INFER_TIME_WINDOW", "true").lower() not in ("0", "false", "no", "off")
+
+_UNIT_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": 30 * 86400}
+_RELATIVE_WINDOW = re.compile(r"\b(?:last|past|previous)\s+(\d+)\s+(hour|day|week|month)s?\b")
+_TODAY = re.compile(r"\b(?:today|tonight|this morning|this evening)\b")
+_YESTERDAY = re.compile(r"\byesterday\b")
+_WEEK = re.compile(r"\b(?:this|last|past) week\b")
+_MONTH = re.compile(r"\b(?:this|last|past) month\b")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+def infer_time_range(query: str, now: Optional[float] = None) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """
+    Time window named by a query, as (since, until) epoch seconds.
+
+    Recognizes "today", "yesterday", "this/last/past week|month" (taken as
+    the last 7 or 30 days) and "last/past N hours|days|weeks|months". Days
+    start at local midnight.
+
+    Args:
+        query (str): The standalone query.
+        now (Optional[float]): Current time; defaults to time.time().
+
+    Returns:
+        Optional[Tuple[Optional[float], Optional[float]]]: The window, or None if the query names none.
+    """
+    text = query.lower()
+    now = time.time() if now is None else now
+    midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    match = _RELATIVE_WINDOW.search(text)
+    if match:
+        return (now - int(match.group(1)) * _UNIT_SECONDS[match.group(2)], None)
+    if _YESTERDAY.search(text):
+        return (midnight - 86400, midnight)
+    if _TODAY.search(text):
+        return (midnight, None)
+    if _WEEK.search(text):
+        return (now - _UNIT_SECONDS["week"], None)
+    if _MONTH.search(text):
+        return (now - _UNIT_SECONDS["month"], None)
+    return None
+
+
 class Retriever:
     def __init__(self):
         """
@@ -25,12 +81,43 @@ class Retriever:
             raise RuntimeError(f"Retriever initialization failed: {str(e)}") from e
         
   
-    def retrieve(self, query: str) -> str:
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query with the vector store's embedding model.
+
+        Args:
+            query (str): The query to embed.
+
+        Returns:
+            List[float]: The query embedding.
+        """
+        return self.vector_store.embedding_model.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """Async version of `embed_query`."""
+        return await self.vector_store.embedding_model.aembed_query(query)
+
+    @staticmethod
+    def _time_range(query: str, time_range: Optional[Tuple]) -> Optional[Tuple]:
+        if time_range is None and RETRIEVAL_INFER_TIME_WINDOW:
+            time_range = infer_time_range(query)
+            if time_range is not None:
+                logger.info(f"Limiting retrieval to the window named by the query: {time_range}")
+        return time_range
+
+    def retrieve(self, query: str, embedding: Optional[List[float]] = None, time_range: Optional[Tuple] = None) -> str:
         """
         Retrieve relevant documents based on the query using the vector store.
 
+        Without an explicit window, one named by the query ("today", "past 3
+        days") is used; if it holds no matches the search is repeated
+        without it.
+
         Args:
             query (str): The search query to find relevant documents.
+            embedding (Optional[List[float]]): Precomputed query embedding,
+                saving the embedding call when the caller already has it.
+            time_range (Optional[Tuple]): (since, until) epoch-seconds window.
 
         Returns:
             List[str]: A list of documents that match the query.
@@ -45,7 +132,11 @@ class Retriever:
 
         logger.info(f"Retrieving documents for query: {query}")
         try:
-            results = self.vector_store.query(query)
+            time_range = self._time_range(query, time_range)
+            results = self.vector_store.query(query, embedding=embedding, time_range=time_range)
+            if not results and time_range is not None:
+                logger.info("No documents in the time window; searching without it")
+                results = self.vector_store.query(query, embedding=embedding, time_range=(None, None))
             logger.info(f"Retrieved {len(results)} documents")
             
             context = self.prepare_context(results)
@@ -54,13 +145,82 @@ class Retriever:
             logger.error(f"Failed to retrieve documents for query '{query}': {str(e)}")
             raise RuntimeError(f"Document retrieval failed: {str(e)}") from e
 
+    async def aretrieve(
+        self,
+        query: str,
+        embedding: Optional[List[float]] = None,
+        time_range: Optional[Tuple] = None,
+    ) -> str:
+        """
+        Asynchronously retrieve relevant documents based on the query.
+
+        Args:
+            query (str): The search query to find relevant documents.
+            embedding (Optional[List[float]]): Precomputed query embedding.
+            time_range (Optional[Tuple]): (since, until) epoch-seconds window;
+                see `retrieve`.
+
+        Returns:
+            str: Context prepared from the matching documents.
 
-    def ingest(self, documents: List[Document]) -> None:
+        Raises:
+            ValueError: If the query is empty or invalid.
+            RuntimeError: If the vector store query fails.
+        """
+        if not query or not isinstance(query, str):
+            logger.error("Invalid query: Query must be a non-empty string")
+            raise ValueError("Query must be a non-empty string")
+
+        logger.info(f"Retrieving documents for query: {query}")
+        try:
+            time_range = self._time_range(query, time_range)
+            results = await self.vector_store.aquery(query, embedding=embedding, time_range=time_range)
+            if not results and time_range is not None:
+                logger.info("No documents in the time window; searching without it")
+                results = await self.vector_store.aquery(query, embedding=embedding, time_range=(None, None))
+            logger.info(f"Retrieved {len(results)} documents")
+
+            context = self.prepare_context(results)
+            return context
+        except Exception as e:
+            logger.error(f"Failed to retrieve documents for query '{query}': {str(e)}")
+            raise RuntimeError(f"Document retrieval failed: {str(e)}") from e
+
+
+    def embed_documents(self, documents: List[Document]) -> List[List[float]]:
+        """
+        Embed documents ahead of ingestion.
+
+        Args:
+            documents (List[Document]): Documents to embed.
+
+        Returns:
+            List[List[float]]: One embedding per document, in order.
+
+        Raises:
+            RuntimeError: If embedding fails.
+        """
+        try:
+            return self.vector_store.embed_documents(documents)
+        except Exception as e:
+            logger.error(f"Failed to embed documents: {str(e)}")
+            raise RuntimeError(f"Document embedding failed: {str(e)}") from e
+
+    def ingest(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+    ) -> None:
         """
         Add documents to the vector store.
 
         Args:
             documents (List[Document]): A list of LangChain Document objects.
+            ids (Optional[List[str]]): Stable document ids; existing documents
+                with the same ids are replaced.
+            embeddings (Optional[List[List[float]]]): Precomputed embeddings,
+                one per document; computed by the vector store when omitted.
 
         Raises:
             ValueError: If documents list is empty or contains invalid entries.
@@ -76,8 +236,6 @@ class Retriever:
                 logger.info(f"Document type on issue: {type(doc)}")
                 logger.error(f"Invalid document structure: {doc}")
                 raise ValueError("Each document must be a LangChain Document object")
-            else:
-                logger.info(f"Document type: {type(doc)}")
 
             page_content = getattr(doc, "page_content", "").strip()
             metadata = getattr(doc, "metadata", {})
@@ -98,9 +256,17 @@ class Retriever:
             logger.error("Invalid documents: All must contain non-empty 'page_content' and 'metadata'")
             raise ValueError("All documents must contain non-empty 'page_content' and 'metadata'")
 
+        if ids is not None and len(ids) != len(documents):
+            logger.error("Invalid ids: Must provide exactly one id per document")
+            raise ValueError("Ids must match documents one to one")
+
+        if embeddings is not None and len(embeddings) != len(documents):
+            logger.error("Invalid embeddings: Must provide exactly one embedding per document")
+            raise ValueError("Embeddings must match documents one to one")
+
         logger.info(f"Ingesting {len(documents)} documents")
         try:
-            self.vector_store.add(documents)
+            self.vector_store.add(documents, ids=ids, embeddings=embeddings)
             logger.info("Document ingestion completed")
         except Exception as e:
             logger.error(f"Failed to ingest documents: {str(e)}")
@@ -134,6 +300,29 @@ class Retriever:
             logger.error(f"Failed to delete documents with IDs {document_ids}: {str(e)}")
             raise RuntimeError(f"Document deletion failed: {str(e)}") from e
 
+    def apply_retention(self, on_expired: Optional[Callable[[List[str]], None]] = None) -> int:
+        """
+        Drop knowledge-base partitions past the retention period.
+
+        Args:
+            on_expired (Optional[Callable[[List[str]], None]]): Called with
+                the ids of each partition's chunks before it is dropped.
+
+        Returns:
+            int: Number of partitions dropped.
+
+        Raises:
+            RuntimeError: If dropping partitions fails.
+        """
+        try:
+            dropped = self.vector_store.apply_retention(on_expired=on_expired)
+            if dropped:
+                logger.info(f"Dropped {dropped} expired partitions")
+            return dropped
+        except Exception as e:
+            logger.error(f"Failed to apply retention: {str(e)}")
+            raise RuntimeError(f"Retention failed: {str(e)}") from e
+
     def update_documents(self, documents: List[str]) -> None:
         """
         Update existing documents in the vector store.
@@ -161,12 +350,14 @@ class Retriever:
             logger.error(f"Failed to update documents: {str(e)}")
             raise RuntimeError(f"Document update failed: {str(e)}") from e
 
-    def create_documents(self, text: str) -> List[Document]:
+    def create_documents(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> List[Document]:
         """
         Split text into documents using the text splitter, ensuring no empty strings.
 
         Args:
             text (str): Input text to be split.
+            metadata (Optional[Dict[str, Any]]): Metadata copied onto every chunk
+                (e.g. url, title, timestamp); defaults to {"source": "input_text"}.
 
         Returns:
             List[Document]: List of Document objects with non-empty content.
@@ -179,36 +370,43 @@ class Retriever:
             logger.error("Invalid text: Must provide a non-empty string")
             raise ValueError("Text must be a non-empty string")
         
-        if not isinstance(self.text_splitter, RecursiveCharacterTextSplitter):
-            logger.error("Invalid text_splitter: Must be an instance of RecursiveCharacterTextSplitter")
-            raise ValueError("Text splitter must be a RecursiveCharacterTextSplitter")
+        if not isinstance(self.text_splitter, (RecursiveCharacterTextSplitter, SentenceSplitter)):
+            logger.error("Invalid text_splitter: Must be a RecursiveCharacterTextSplitter or SentenceSplitter")
+            raise ValueError("Text splitter must be a RecursiveCharacterTextSplitter or SentenceSplitter")
 
-        logger.info("Creating documents from text")
+        logger.debug("Creating documents from text")
         try:
             texts = self.text_splitter.split_text(text)
+            metadata = metadata or {"source": "input_text"}
             documents = [
-                Document(page_content=chunk, metadata={"source": "input_text"})
+                Document(page_content=chunk, metadata=dict(metadata))
                 for chunk in texts if chunk.strip()
             ]
             if not documents:
                 logger.warning("No non-empty documents created from text")
             else:
-                logger.info(f"Created {len(documents)} non-empty documents")
+                logger.debug(f"Created {len(documents)} non-empty documents")
             return documents
         except Exception as e:
             logger.error(f"Failed to create documents: {str(e)}")
             raise RuntimeError(f"Document creation failed: {str(e)}") from e
 
-    def create_text_splitter(self, chunk_size: int = 1000, chunk_overlap: int = 200) -> RecursiveCharacterTextSplitter:
+    def create_text_splitter(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        mode: str = SPLIT_MODE,
+    ) -> Union[RecursiveCharacterTextSplitter, SentenceSplitter]:
         """
-        Create a RecursiveCharacterTextSplitter.
+        Create a text splitter: recursive character or single-pass sentence splitting.
 
         Args:
             chunk_size (int): Maximum size of each text chunk.
             chunk_overlap (int): Number of characters to overlap between chunks.
+            mode (str): "recursive" or "sentence"; defaults to SPLIT_MODE.
 
         Returns:
-            RecursiveCharacterTextSplitter: Configured text splitter.
+            Union[RecursiveCharacterTextSplitter, SentenceSplitter]: Configured text splitter.
 
         Raises:
             ValueError: If chunk_size or chunk_overlap is invalid.
@@ -226,14 +424,9 @@ class Retriever:
             logger.error(f"Invalid chunk_overlap: {chunk_overlap}. Must be less than chunk_size ({chunk_size})")
             raise ValueError("Chunk overlap must be less than chunk size")
 
-        logger.info(f"Creating text splitter with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
+        logger.info(f"Creating {mode} text splitter with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
         try:
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap,
-                length_function=len,
-                is_separator_regex=False,
-            )
+            text_splitter = create_text_splitter(mode, chunk_size, chunk_overlap)
             logger.info("Text splitter created successfully")
             return text_splitter
         except Exception as e:
@@ -241,36 +434,166 @@ class Retriever:
             raise RuntimeError(f"Text splitter creation failed: {str(e)}") from e
         
 
-    def prepare_context(self, documents: List[Document]) -> str:
+    @staticmethod
+    def _overlap(head: str, tail: str, max_overlap: int = 400, min_overlap: int = 30) -> int:
+        """Length of the longest suffix of `head` that is also a prefix of `tail` (0 if short)."""
+        for size in range(min(len(head), len(tail), max_overlap), min_overlap - 1, -1):
+            if head.endswith(tail[:size]):
+                return size
+        return 0
+
+    @staticmethod
+    def _attribution(doc: Document) -> str:
+        """Source line for a chunk: title, URL and date, when its metadata has a URL."""
+        metadata = doc.metadata or {}
+        url = metadata.get("url")
+        if not url:
+            return ""
+        parts = [metadata["title"], url] if metadata.get("title") else [url]
+        timestamp = metadata.get(TIMESTAMP_FIELD)
+        if timestamp is not None:
+            parts.append(datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d"))
+        return "[Source: " + " | ".join(parts) + "]"
+
+    @staticmethod
+    def _shingles(text: str, size: int = 5) -> set:
+        words = text.lower().split()
+        if len(words) <= size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def assemble_context(
+        self,
+        documents: List[Tuple[Document, float]],
+        max_tokens: Optional[int] = None,
+        min_score: Optional[float] = None,
+        duplicate_threshold: Optional[float] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
         """
-        Prepare context from a list of documents.
+        Assemble retrieval hits into a context that fits a token budget.
+
+        Hits are taken best score first. Hits whose relevance is below
+        `min_score` are dropped: the RELEVANCE_FIELD VectorStore puts in a
+        hit's metadata, else its score, since fused and re-scored scores are
+        not similarities; hits with a None relevance are kept. Near-duplicates
+        are dropped as well: chunks whose word 5-grams are mostly already in
+        the context. Text a chunk shares with an already selected
+        neighbouring window (the splitter overlap) is trimmed. Chunks that do
+        not fit the remaining budget are skipped. Chunks of scraped articles
+        are headed by a source line (title, URL, date), counted in the budget.
 
         Args:
-            documents (List[Document]): List of Document objects.
+            documents (List[Tuple[Document, float]]): (document, relevance score) pairs.
+            max_tokens (Optional[int]): Token budget; defaults to CONTEXT_MAX_TOKENS.
+            min_score (Optional[float]): Minimum relevance; defaults to CONTEXT_MIN_SCORE.
+            duplicate_threshold (Optional[float]): Share of a chunk's 5-grams already
+                selected above which it is dropped; defaults to CONTEXT_DUPLICATE_THRESHOLD.
 
         Returns:
-            str: Concatenated string of document contents.
+            Tuple[str, Dict[str, Any]]: The context and a report of hits kept,
+            hits dropped per reason, and tokens used.
 
         Raises:
-            ValueError: If documents list is empty or contains invalid entries.
+            ValueError: If documents list is empty or not a list.
         """
         if not documents or not isinstance(documents, list):
             logger.error("Invalid documents: Must provide a non-empty list of Document objects")
             raise ValueError("Documents must be a non-empty list of Document objects")
 
-        context = ""
-        for _doc in documents:
-            doc, score = _doc
+        max_tokens = CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+        min_score = CONTEXT_MIN_SCORE if min_score is None else min_score
+        duplicate_threshold = CONTEXT_DUPLICATE_THRESHOLD if duplicate_threshold is None else duplicate_threshold
+
+        report = {
+            "hits": len(documents),
+            "kept": 0,
+            "dropped_low_score": 0,
+            "dropped_duplicate": 0,
+            "dropped_budget": 0,
+            "trimmed_chars": 0,
+            "tokens": 0,
+            "max_tokens": max_tokens,
+        }
+
+        hits = []
+        for item in documents:
+            doc, score = item if isinstance(item, tuple) else (item, None)
             if not isinstance(doc, Document):
                 logger.error(f"Invalid document structure: {doc}")
-                logger.info(f"Document type on issue on context preparing: {type(doc)}")
                 continue
-            context += doc.page_content + "\n\n"
+            hits.append((doc, score))
+        hits.sort(key=lambda hit: hit[1] if hit[1] is not None else float("-inf"), reverse=True)
+
+        selected: List[str] = []
+        entries: List[str] = []
+        seen_shingles: set = set()
+        separator_tokens = count_tokens("\n\n")
+        for doc, score in hits:
+            text = doc.page_content.strip()
+            if not text:
+                continue
+            relevance = (doc.metadata or {}).get(RELEVANCE_FIELD, score)
+            if relevance is not None and relevance < min_score:
+                report["dropped_low_score"] += 1
+                continue
+
+            shingles = self._shingles(text)
+            if shingles and len(shingles & seen_shingles) / len(shingles) >= duplicate_threshold:
+                report["dropped_duplicate"] += 1
+                continue
+
+            # Trim the splitter overlap shared with already selected neighbours
+            original = len(text)
+            for other in selected:
+                text = text[self._overlap(other, text):]
+                cut = self._overlap(text, other)
+                if cut:
+                    text = text[:-cut]
+            text = text.strip()
+            if not text:
+                report["dropped_duplicate"] += 1
+                continue
+
+            attribution = self._attribution(doc)
+            entry = f"{attribution}\n{text}" if attribution else text
+            tokens = count_tokens(entry) + (separator_tokens if entries else 0)
+            if report["tokens"] + tokens > max_tokens:
+                report["dropped_budget"] += 1
+                continue
+
+            report["trimmed_chars"] += original - len(text)
+            report["tokens"] += tokens
+            report["kept"] += 1
+            selected.append(text)
+            entries.append(entry)
+            seen_shingles |= shingles
+
+        return "\n\n".join(entries), report
+
+    def prepare_context(self, documents: List[Tuple[Document, float]], max_tokens: Optional[int] = None) -> str:
+        """
+        Prepare context from a list of retrieval hits within a token budget.
+
+        Args:
+            documents (List[Tuple[Document, float]]): (document, relevance score) pairs.
+            max_tokens (Optional[int]): Token budget; defaults to CONTEXT_MAX_TOKENS.
+
+        Returns:
+            str: The assembled context (see `assemble_context`).
+
+        Raises:
+            ValueError: If documents list is empty or contains invalid entries.
+        """
+        context, report = self.assemble_context(documents, max_tokens=max_tokens)
         
         if not context:
             logger.warning("No valid content found in provided documents")
             return "No relevant documents found related this query."
 
-        logger.info(f"Prepared context with {len(context)} characters")
+        logger.info(
+            "Prepared context with %d tokens from %d/%d hits "
+            "(dropped: %d low score, %d duplicate, %d over budget; %d overlap chars trimmed)",
+            report["tokens"], report["kept"], report["hits"], report["dropped_low_score"],
+            report["dropped_duplicate"], report["dropped_budget"], report["trimmed_chars"],
+        )
         return context
-    
\ No newline at end of file
@@ -0,0 +1,225 @@
+import logging
+import multiprocessing
+import os
+import re
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Union
+
+from dotenv import load_dotenv
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+load_dotenv()
+
+# Chunking: "recursive" (LangChain RecursiveCharacterTextSplitter) or "sentence" (single pass)
+SPLIT_MODE = os.getenv("SPLIT_MODE", "recursive").lower()
+# Worker processes splitting articles during ingestion; 0 splits inline, one article at a time
+SPLIT_WORKERS = int(os.getenv("SPLIT_WORKERS", 0))
+# Articles per work unit sent to a worker
+SPLIT_TASK_SIZE = int(os.getenv("SPLIT_TASK_SIZE", 32))
+
+logger = logging.getLogger(__name__)
+
+# A sentence ends at terminal punctuation (Latin or Bangla danda) or a line
+# break, followed by optional closing quotes/brackets and whitespace. One
+# character class up front keeps the scan fast; no alternation
+_SENTENCE_END = re.compile(r"[.!?।\n][\"'”’)\]]*\s+")
+
+
+class SentenceSplitter:
+    """
+    Single-pass, sentence-aware text splitter.
+
+    Sentences are packed into chunks of at most `chunk_size` characters; the
+    next chunk starts with the trailing sentences of the previous one that
+    fit in `chunk_overlap`. A sentence longer than a chunk is cut at
+    whitespace. Unlike the recursive splitter, the text is scanned once and
+    never re-split with finer separators, and chunks end on sentence
+    boundaries wherever the text has them, not mid-sentence at a space.
+
+    Parameters
+    ----------
+    chunk_size : int
+        Maximum chunk length in characters.
+    chunk_overlap : int
+        Maximum overlap between consecutive chunks in characters.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200) -> None:
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split text into chunks.
+
+        Args:
+            text (str): Input text.
+
+        Returns:
+            List[str]: Non-empty chunks, whitespace-stripped, in text order.
+        """
+        # One regex scan for sentence ends; packing then bisects these offsets,
+        # so the Python work is per chunk rather than per sentence
+        ends = [match.end() for match in _SENTENCE_END.finditer(text)]
+        chunks: List[str] = []
+        start = 0
+        while start < len(text):
+            limit = start + self.chunk_size
+            if limit >= len(text):
+                end = len(text)
+            else:
+                i = bisect_right(ends, limit) - 1
+                end = ends[i] if i >= 0 and ends[i] > start else 0
+                if not end:
+                    # A sentence longer than a chunk: cut at the last whitespace
+                    end = text.rfind(" ", start, limit) + 1
+                    end = end if end > start else limit
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= len(text):
+                break
+            # The next chunk repeats the whole sentences in the last `chunk_overlap` characters
+            j = bisect_left(ends, end - self.chunk_overlap)
+            start = ends[j] if j < len(ends) and start < ends[j] < end else end
+        return chunks
+
+
+def create_text_splitter(
+    mode: str = SPLIT_MODE,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+) -> Union[RecursiveCharacterTextSplitter, SentenceSplitter]:
+    """
+    Build the text splitter for a chunking mode.
+
+    Args:
+        mode (str): "recursive" or "sentence".
+        chunk_size (int): Maximum size of each text chunk.
+        chunk_overlap (int): Number of characters to overlap between chunks.
+
+    Returns:
+        Union[RecursiveCharacterTextSplitter, SentenceSplitter]: The splitter.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode == "sentence":
+        return SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    if mode == "recursive":
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            is_separator_regex=False,
+        )
+    raise ValueError(f"Unknown split mode: {mode}")
+
+
+# Splitter of a pool worker, built once by the pool initializer
+_worker_splitter = None
+
+
+def _init_worker(mode: str, chunk_size: int, chunk_overlap: int) -> None:
+    global _worker_splitter
+    _worker_splitter = create_text_splitter(mode, chunk_size, chunk_overlap)
+
+
+def _split_task(texts: List[str]) -> List[List[str]]:
+    return [[chunk for chunk in _worker_splitter.split_text(text) if chunk.strip()] for text in texts]
+
+
+class ParallelSplitter:
+    """
+    Split many texts at once across a process pool.
+
+    Texts are sent to workers in work units of `task_size` and come back as
+    plain lists of chunk strings, so only text crosses the process boundary;
+    callers attach metadata. The pool is spawned on first use and kept until
+    `close`. With fewer than two workers, or inside a daemonic process (which
+    cannot have children), texts are split inline.
+
+    Parameters
+    ----------
+    mode : str
+        Chunking mode, "recursive" or "sentence".
+    chunk_size : int
+        Maximum size of each text chunk.
+    chunk_overlap : int
+        Number of characters to overlap between chunks.
+    workers : int
+        Worker processes.
+    task_size : int
+        Texts per work unit.
+    """
+
+    def __init__(
+        self,
+        mode: str = SPLIT_MODE,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        workers: int = SPLIT_WORKERS,
+        task_size: int = SPLIT_TASK_SIZE,
+    ) -> None:
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.workers = max(0, workers)
+        self.task_size = max(1, task_size)
+        self._splitter = create_text_splitter(mode, chunk_size, chunk_overlap)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def batch_size(self) -> int:
+        """Texts worth collecting before a call to `split`: one work unit per worker."""
+        return self.task_size * max(1, self.workers)
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers < 2 or multiprocessing.current_process().daemon:
+            return None
+        if self._pool is None:
+            logger.info("Starting %d text splitting workers (%s mode).", self.workers, self.mode)
+            # Spawn rather than fork: ingestion runs alongside other threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.mode, self.chunk_size, self.chunk_overlap),
+            )
+        return self._pool
+
+    def split(self, texts: Sequence[str]) -> List[List[str]]:
+        """
+        Split texts into chunks.
+
+        Args:
+            texts (Sequence[str]): Texts to split.
+
+        Returns:
+            List[List[str]]: The non-empty chunks of each text, in input order.
+        """
+        pool = self._get_pool()
+        if pool is None or len(texts) <= self.task_size:
+            return [[chunk for chunk in self._splitter.split_text(text) if chunk.strip()] for text in texts]
+        units = [list(texts[i:i + self.task_size]) for i in range(0, len(texts), self.task_size)]
+        return [chunks for unit in pool.map(_split_task, units) for chunks in unit]
+
+    def close(self) -> None:
+        """Shut the worker pool down; the next `split` starts a new one."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def create_parallel_splitter() -> Optional[ParallelSplitter]:
+    """
+    Build the bulk splitter configured through the environment.
+
+    SPLIT_WORKERS sets the worker processes (0, the default, disables bulk
+    splitting), SPLIT_MODE the chunking mode and SPLIT_TASK_SIZE the texts
+    per work unit.
+    """
+    if SPLIT_WORKERS <= 0:
+        return None
+    return ParallelSplitter(mode=SPLIT_MODE, workers=SPLIT_WORKERS, task_size=SPLIT_TASK_SIZE)
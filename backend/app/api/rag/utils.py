@@ -0,0 +1,76 @@
+import hashlib
+import math
+from datetime import datetime
+from typing import Any, Optional
+
+# Chunk metadata key holding the article's publish (or else scrape) time, epoch seconds
+TIMESTAMP_FIELD = "timestamp"
+# Metadata key VectorStore puts on hits: the dense cosine relevance, or None for lexical-only hits
+RELEVANCE_FIELD = "relevance"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a piece of text.
+
+    The model server does not expose its tokenizer, so this uses the usual
+    ~4 characters per token approximation for English text. It is only used
+    for budgeting, where a cheap and stable estimate is what matters.
+
+    Args:
+        text (str): Input text.
+
+    Returns:
+        int: Estimated token count.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / 4)
+
+
+def chunk_id(text: str, url: str = "") -> str:
+    """
+    Content-addressed chunk id: a digest of the article URL and chunk text.
+
+    The same chunk of the same article always gets the same id, so writing
+    it again is an idempotent upsert.
+
+    Args:
+        text (str): Chunk text.
+        url (str): URL of the article the chunk comes from.
+
+    Returns:
+        str: 32 hex characters.
+    """
+    return hashlib.sha256(f"{url}\n{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """
+    Convert a scraper timestamp to Unix epoch seconds.
+
+    Accepts epoch numbers (or numeric strings) and ISO 8601 strings. Naive
+    ISO times are taken as local time, which is how the scraper writes
+    `scraped_at`.
+
+    Args:
+        value (Any): Timestamp as stored in Redis.
+
+    Returns:
+        Optional[float]: Epoch seconds, or None if the value is missing or unparseable.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
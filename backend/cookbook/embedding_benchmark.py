@@ -0,0 +1,66 @@
+"""
+Benchmark: ingestion-style embedding of many chunks, per-text vs batched.
+
+Embeds synthetic chunks against the stub server (see stub_server.py), whose
+per-request latency models a network round trip plus a small per-text cost.
+
+    python cookbook/embedding_benchmark.py --texts 3000 --batch-size 32 --max-in-flight 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from stub_server import run_in_thread
+from app.api.rag.models.embedding_model import Embedding
+from app.api.rag.models.http_client import close_async_session
+
+
+def timed(name: str, fn, texts):
+    start = time.perf_counter()
+    vectors = fn(texts)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(texts)
+    print(f"{name:<34} {elapsed:8.2f} s   {len(texts) / elapsed:9.1f} texts/s")
+
+
+async def run_async(embedding: Embedding, texts):
+    start = time.perf_counter()
+    vectors = await embedding.aembed_documents(texts)
+    elapsed = time.perf_counter() - start
+    await close_async_session()
+    return vectors, elapsed
+
+
+def main(args):
+    base_url = run_in_thread(port=args.port, embed_latency=args.latency)
+    texts = [f"Synthetic news chunk {i} about the city council and the budget." for i in range(args.texts)]
+    print(f"{args.texts} texts, {args.latency * 1000:.0f} ms per request")
+
+    sequential = Embedding(api_url=f"{base_url}/api/v1/embed")
+    timed("per-text, sequential (old)", sequential.embed_documents, texts)
+
+    batched = Embedding(
+        api_url=f"{base_url}/api/v1/embed",
+        batch_api_url=f"{base_url}/api/v1/embed/batch",
+        batch_size=args.batch_size,
+        max_in_flight=args.max_in_flight,
+    )
+    timed("batched, threaded", batched.embed_documents, texts)
+
+    vectors, elapsed = asyncio.run(run_async(batched, texts))
+    print(f"{'batched, async':<34} {elapsed:8.2f} s   {len(texts) / elapsed:9.1f} texts/s")
+    print(f"final adaptive batch size: {batched.batch_size.size}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8089)
+    main(parser.parse_args())
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark: per-call overhead of pooled vs unpooled HTTP clients.
+
+Calls the embedding endpoint of a zero-latency stub server (see
+stub_server.py) sequentially, so the measured time is dominated by client
+overhead: connection setup, handshake and session construction.
+
+    python cookbook/http_pool_benchmark.py --calls 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from stub_server import run_in_thread
+from app.api.rag.models.http_client import close_async_session, get_async_session, get_session
+
+
+def timed(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+async def atimed(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        await fn()
+    return (time.perf_counter() - start) / calls
+
+
+def report(name: str, unpooled: float, pooled: float):
+    print(
+        f"{name:<6} unpooled {unpooled * 1000:7.3f} ms/call   pooled {pooled * 1000:7.3f} ms/call   "
+        f"saved {(unpooled - pooled) * 1000:7.3f} ms/call ({unpooled / pooled:4.1f}x)"
+    )
+
+
+async def run_async(url: str, payload: dict, calls: int):
+    async def unpooled():
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=payload) as response:
+                await response.json()
+
+    async def pooled():
+        async with get_async_session().post(url, json=payload) as response:
+            await response.json()
+
+    # Warm up the pool so the first handshake is not counted
+    await pooled()
+    result = await atimed(unpooled, calls), await atimed(pooled, calls)
+    await close_async_session()
+    return result
+
+
+def main(args):
+    base_url = run_in_thread(port=args.port, llm_latency=0, token_delay=0, embed_latency=0)
+    url = f"{base_url}/api/v1/embed"
+    payload = {"text": "Dhaka traffic update"}
+
+    def unpooled():
+        requests.post(url, json=payload).json()
+
+    def pooled():
+        get_session().post(url, json=payload).json()
+
+    pooled()
+    report("sync", timed(unpooled, args.calls), timed(pooled, args.calls))
+    report("async", *asyncio.run(run_async(url, payload, args.calls)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8089)
+    main(parser.parse_args())
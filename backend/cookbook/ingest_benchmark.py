@@ -0,0 +1,160 @@
+"""
+Benchmark: ingest a synthetic corpus and report throughput and peak RSS.
+
+Articles are generated on the fly by an in-memory stand-in for RedisDB, and
+the vector store only counts what it receives, so the numbers reflect the
+ingestion pipeline itself. Run each mode in its own process, since peak RSS
+never goes down:
+
+    python cookbook/ingest_benchmark.py --articles 100000 --mode staged
+    python cookbook/ingest_benchmark.py --articles 100000 --mode legacy
+"""
+import argparse
+import hashlib
+import logging
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.api.rag.ingestor import Ingestor
+from app.api.rag.retriever import Retriever
+
+DIMENSION = 384
+WORDS = (
+    "council budget election river bridge school hospital market football "
+    "police festival minister weather train farmers court students museum"
+).split()
+
+
+def synthetic_article(i: int, paragraphs: int) -> str:
+    rng = random.Random(i)
+    return "\n\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 90))) + "."
+        for _ in range(paragraphs)
+    )
+
+
+class SyntheticRedisDB:
+    """Serves `count` generated articles through the RedisDB bulk-read API."""
+
+    def __init__(self, count: int, paragraphs: int):
+        self.count = count
+        self.paragraphs = paragraphs
+        self.records_written = 0
+
+    def _url(self, i: int) -> str:
+        return f"https://news.example.com/article/{i}"
+
+    def scan_scraped_urls(self, cursor: int = 0, count: int = 500):
+        end = min(cursor + count, self.count)
+        return (0 if end >= self.count else end), [self._url(i) for i in range(cursor, end)]
+
+    def get_contents(self, urls):
+        items = []
+        for url in urls:
+            i = int(url.rsplit("/", 1)[1])
+            text = synthetic_article(i, self.paragraphs)
+            items.append({
+                "url": url,
+                "content": text,
+                "scraped_at": "2024-01-01T00:00:00",
+                "content_length": str(len(text)),
+            })
+        return items
+
+    def get_watermarks(self, urls):
+        return [None for _ in urls]
+
+    def get_ingest_records(self, urls):
+        return [None for _ in urls]
+
+    def scan_ingest_state(self, cursor: int = 0, count: int = 500):
+        return 0, {}
+
+    def set_ingest_records(self, records):
+        self.records_written += len(records)
+
+    def delete_ingest_records(self, urls):
+        pass
+
+    def bump_ingest_generation(self):
+        return 1
+
+
+class CountingRetriever(Retriever):
+    """Real text splitter, fake embeddings, a vector store that only counts."""
+
+    def __init__(self):
+        self.text_splitter = self.create_text_splitter()
+        self.ingested = 0
+
+    def embed_documents(self, documents):
+        return [
+            [hashlib.md5(doc.page_content.encode()).digest()[0] / 255.0] * DIMENSION
+            for doc in documents
+        ]
+
+    def ingest(self, documents, ids=None, embeddings=None):
+        if embeddings is None:
+            embeddings = self.embed_documents(documents)
+        self.ingested += len(documents)
+
+    def delete_documents(self, document_ids):
+        pass
+
+
+def run_legacy(ingestor: Ingestor) -> int:
+    """The old shape: every article, then every chunk, then one write."""
+    contents = ingestor.fetch_data()
+    documents = ingestor.process_data(contents)
+    ingestor.retriever.ingest(documents)
+    return len(documents)
+
+
+def main(args):
+    logging.getLogger().setLevel(logging.WARNING)
+    redis = SyntheticRedisDB(args.articles, args.paragraphs)
+    retriever = CountingRetriever()
+    ingestor = Ingestor(
+        redis_client=redis,
+        retriever=retriever,
+        write_batch_size=args.write_batch_size,
+        fetch_batch_size=args.fetch_batch_size,
+        queue_size=args.queue_size,
+        progress_interval=args.progress_interval,
+    )
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if args.mode == "legacy":
+        chunks = run_legacy(ingestor)
+    else:
+        summary = ingestor.ingest(full=True)
+        chunks = summary["docs_ingested"]
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is reported in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(f"mode: {args.mode}")
+    print(f"articles: {args.articles}, chunks: {chunks}")
+    print(f"elapsed: {elapsed:.1f} s ({args.articles / elapsed:.0f} articles/s)")
+    print(f"peak RSS: {peak / 1024:.0f} MiB (startup {baseline / 1024:.0f} MiB)")
+    if args.mode == "staged":
+        for name, stats in summary["stages"].items():
+            print(f"  {name:<6} {stats['items_in']:>8} in {stats['items_out']:>8} out  busy {stats['busy_seconds']:.1f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=100_000)
+    parser.add_argument("--paragraphs", type=int, default=6)
+    parser.add_argument("--mode", choices=["staged", "legacy"], default="staged")
+    parser.add_argument("--write-batch-size", type=int, default=256)
+    parser.add_argument("--fetch-batch-size", type=int, default=500)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--progress-interval", type=float, default=10.0)
+    main(parser.parse_args())
@@ -0,0 +1,99 @@
+"""
+Concurrent-request load test for the RAG pipeline.
+
+Runs N concurrent chats against a stub model server (see stub_server.py) and
+compares the blocking `Pipeline.run` path, as the endpoints used it before,
+with the async `Pipeline.arun` path, both driven from one event loop the way
+a single uvicorn worker would.
+
+    python cookbook/load_test.py --requests 50 --concurrency 25
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from stub_server import run_in_thread
+from app.api.rag.models.embedding_model import Embedding
+from app.api.rag.models.llm import LLM
+from app.api.rag.pipeline import Pipeline
+
+
+class StubRetriever:
+    """Embeds the query against the stub server and returns a fixed context."""
+
+    def __init__(self, base_url: str):
+        self.embedding = Embedding(api_url=f"{base_url}/api/v1/embed")
+
+    def retrieve(self, query: str) -> str:
+        self.embedding.embed_query(query)
+        return "Stub context about the news of the day."
+
+    async def aretrieve(self, query: str) -> str:
+        await self.embedding.aembed_query(query)
+        return "Stub context about the news of the day."
+
+
+def build_pipeline(base_url: str) -> Pipeline:
+    llm = LLM(api_url=f"{base_url}/api/v1/generate", stream_url=f"{base_url}/api/v1/generate_stream")
+    return Pipeline(llm=llm, retriever=StubRetriever(base_url))
+
+
+async def drive(handler, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(f"What happened in Dhaka today? #{i}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name: str, elapsed: float, latencies, total: int):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{name:<22} {total / elapsed:8.2f} req/s   "
+        f"p50 {statistics.median(latencies) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms"
+    )
+
+
+async def main(args):
+    base_url = run_in_thread(port=args.port, llm_latency=args.llm_latency, embed_latency=args.embed_latency)
+
+    # Every request is a new session so each one is a single-turn chat
+    blocking = build_pipeline(base_url)
+
+    async def blocking_handler(query):
+        # Old endpoint behaviour: a sync pipeline called inside an async handler
+        return blocking.run(query, session_id=query)
+
+    concurrent = build_pipeline(base_url)
+
+    async def async_handler(query):
+        return await concurrent.arun(query, session_id=query)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, LLM latency {args.llm_latency}s")
+    elapsed, latencies = await drive(blocking_handler, args.requests, args.concurrency)
+    report("before (Pipeline.run)", elapsed, latencies, args.requests)
+    elapsed, latencies = await drive(async_handler, args.requests, args.concurrency)
+    report("after (Pipeline.arun)", elapsed, latencies, args.requests)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8089)
+    asyncio.run(main(parser.parse_args()))
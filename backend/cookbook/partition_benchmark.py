@@ -0,0 +1,119 @@
+"""
+Benchmark: index size and query latency over months of simulated scraping.
+
+Each simulated day adds a batch of dated chunks (random unit vectors) to a
+single growing index and to a time-partitioned index with retention. After
+every week retention runs, then both indexes answer the same queries with
+no time window and with a 7-day window. The single index keeps growing; the
+partitioned one stays at about `retention` days of chunks, and a windowed
+query only visits the partitions it overlaps.
+
+    python cookbook/partition_benchmark.py --days 180 --chunks-per-day 2000
+    python cookbook/partition_benchmark.py --backend chroma --days 60 --chunks-per-day 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.documents import Document  # noqa: E402
+
+from app.api.rag.db.vector_index import ChromaIndex, NumpyIndex, PartitionedIndex  # noqa: E402
+
+START = 1_700_000_000.0
+
+
+def directory_mib(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 2 ** 20
+
+
+def make_index(backend: str, directory: str):
+    if backend == "chroma":
+        return ChromaIndex(None, directory)
+    return NumpyIndex(directory, index_type="exact")
+
+
+def make_partitioned(backend: str, directory: str, retention_days: float) -> PartitionedIndex:
+    if backend == "chroma":
+        def factory(name):
+            return ChromaIndex(None, directory, collection_name=f"kb_{name}")
+    else:
+        def factory(name):
+            return NumpyIndex(os.path.join(directory, "partitions", name), index_type="exact")
+    return PartitionedIndex(factory, directory, period="week", retention_days=retention_days)
+
+
+def latencies(index, queries, k: int, time_range=None):
+    times = []
+    for query in queries:
+        t = time.perf_counter()
+        index.search(query.tolist(), k=k, time_range=time_range)
+        times.append(time.perf_counter() - t)
+    times.sort()
+    return times[len(times) // 2] * 1000, times[int(0.99 * (len(times) - 1))] * 1000
+
+
+def main(args):
+    rng = np.random.default_rng(5)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as single_dir, tempfile.TemporaryDirectory() as partitioned_dir:
+        single = make_index(args.backend, single_dir)
+        # Chunks are dated in the simulated past, which the real clock would
+        # treat as expired on upsert, so retention is only switched on while
+        # drop_expired runs against the simulated clock
+        partitioned = make_partitioned(args.backend, partitioned_dir, retention_days=0)
+
+        print(f"{args.backend}, {args.chunks_per_day} chunks/day x {args.dim} dims, weekly partitions, "
+              f"{args.retention:g}-day retention, {args.queries} queries, p50/p99 ms")
+        print(f"{'day':>5} | {'single: vectors':>15} {'MiB':>7} {'all p50':>8} {'all p99':>8} "
+              f"| {'partitioned: vectors':>20} {'MiB':>7} {'all p50':>8} {'all p99':>8} {'7d p50':>7} {'7d p99':>7}")
+        # The clock starts on a Monday so every report falls on a week boundary
+        now = START - (START % 86400) - time.gmtime(START).tm_wday * 86400
+        for day in range(1, args.days + 1):
+            ids = [f"{day}-{i}" for i in range(args.chunks_per_day)]
+            stamps = now + rng.uniform(0, 86400, size=args.chunks_per_day)
+            documents = [Document(page_content=doc_id, metadata={"timestamp": float(stamp)})
+                         for doc_id, stamp in zip(ids, stamps)]
+            vectors = rng.normal(size=(args.chunks_per_day, args.dim)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            for i in range(0, len(ids), 5000):
+                single.upsert(ids[i:i + 5000], documents[i:i + 5000], vectors[i:i + 5000])
+                partitioned.upsert(ids[i:i + 5000], documents[i:i + 5000], vectors[i:i + 5000])
+            now += 86400
+
+            if day % 7:
+                continue
+            partitioned.retention_days = args.retention
+            partitioned.drop_expired(now)
+            partitioned.retention_days = 0
+            if day % args.report_every and day != args.days:
+                continue
+            single_p50, single_p99 = latencies(single, queries, args.k)
+            part_p50, part_p99 = latencies(partitioned, queries, args.k)
+            week_p50, week_p99 = latencies(partitioned, queries, args.k, time_range=(now - 7 * 86400, None))
+            print(f"{day:>5} | {len(single):>15} {directory_mib(single_dir):>7.0f} {single_p50:>8.2f} {single_p99:>8.2f} "
+                  f"| {len(partitioned):>20} {directory_mib(partitioned_dir):>7.0f} {part_p50:>8.2f} "
+                  f"{part_p99:>8.2f} {week_p50:>7.2f} {week_p99:>7.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("numpy", "chroma"), default="numpy")
+    parser.add_argument("--days", type=int, default=182)
+    parser.add_argument("--chunks-per-day", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--retention", type=float, default=30, help="retention in days")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--report-every", type=int, default=28, help="days between reports")
+    main(parser.parse_args())
@@ -0,0 +1,178 @@
+"""
+Benchmark: recall and latency of dense, lexical and hybrid retrieval.
+
+Builds a synthetic news corpus where each article pairs a common topic
+("flood", "election", ...) with a rare entity (a place and a person) and a
+date, then asks entity questions whose answer is one known article.
+
+Without --api-url the dense side uses a simulated embedder that, like real
+dense encoders, captures the topic well and rare names only weakly; its
+query latency is set with --embed-latency. Pass --api-url to use the real
+embedding service instead.
+
+Hybrid retrieval is then rerun with a reranking stage: the lexical scorer,
+and a cross-encoder served by the stub server (see stub_server.py) within
+and over the --rerank-budget-ms budget.
+
+    python cookbook/retrieval_benchmark.py --docs 5000 --queries 300
+    python cookbook/retrieval_benchmark.py --api-url http://localhost:8080/api/v1/embed
+    python cookbook/retrieval_benchmark.py --top-k 2 --rerank-latency 0.03
+"""
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.documents import Document
+from app.api.rag.db.lexical_index import BM25Index, tokenize
+from app.api.rag.db.vectorstore import VectorStore
+from app.api.rag.models.embedding_model import Embedding
+from app.api.rag.reranker import CrossEncoderScorer, LexicalScorer, Reranker
+from stub_server import run_in_thread
+
+DIMENSION = 384
+TOPICS = {
+    "flood": "flood water rivers embankment rain displaced relief",
+    "election": "election votes candidate polling ballot commission results",
+    "cricket": "cricket match runs wickets innings captain series",
+    "budget": "budget taxes allocation finance spending revenue deficit",
+    "metro": "metro rail station line commuters fares transport",
+    "garment": "garment factory workers wages protest export owners",
+    "health": "hospital dengue patients doctors vaccine outbreak",
+    "education": "school students exams teachers results university",
+}
+TOPIC_WORDS = {word for words in TOPICS.values() for word in words.split()}
+SYLLABLES = "ra ma pur gan ja kha li bo sha na ti de ko ru mi ha".split()
+
+
+def name(rng: random.Random, parts: int) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(parts)).capitalize()
+
+
+def build_corpus(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    documents, facts = [], []
+    for i in range(count):
+        topic = rng.choice(list(TOPICS))
+        words = TOPICS[topic].split()
+        place, person = name(rng, 3), f"{name(rng, 2)} {name(rng, 3)}"
+        date = f"{rng.randint(1, 28)} {rng.choice(['March', 'April', 'May', 'June'])} 2024"
+        body = " ".join(rng.choice(words) for _ in range(40))
+        text = f"{place}: {person} spoke about the {topic} on {date}. {body}."
+        documents.append(Document(page_content=text, metadata={"source": f"https://news.example.com/{i}"}))
+        facts.append((topic, place, person))
+    return documents, facts
+
+
+class SimulatedEmbedding:
+    """Hashed bag of words where topic words dominate and rare names barely count."""
+
+    def __init__(self, latency: float, entity_weight: float = 0.15):
+        self.latency = latency
+        self.entity_weight = entity_weight
+
+    def _vector(self, text: str):
+        vector = np.zeros(DIMENSION, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.md5(token.encode()).digest()
+            weight = 1.0 if token in TOPIC_WORDS else self.entity_weight
+            vector[digest[0] * 256 % DIMENSION + digest[1] % 2] += weight if digest[2] % 2 else -weight
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self._vector(text)
+
+    async def aembed_query(self, text):
+        import asyncio
+        await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+
+class DownEmbedding(SimulatedEmbedding):
+    def embed_query(self, text):
+        raise ConnectionError("embedding service down")
+
+
+def run(store: VectorStore, queries, top_k: int):
+    latencies, found = [], 0
+    for query, target in queries:
+        start = time.perf_counter()
+        results = store.query(query)
+        latencies.append(time.perf_counter() - start)
+        found += any(doc.metadata.get("source") == target for doc, _ in results[:top_k])
+    latencies.sort()
+    return found / len(queries), statistics.mean(latencies), latencies[int(0.95 * (len(latencies) - 1))]
+
+
+def main(args):
+    documents, facts = build_corpus(args.docs)
+    rng = random.Random(11)
+    sample = rng.sample(range(len(documents)), args.queries)
+    queries = [
+        (f"What did {facts[i][2]} say about the {facts[i][0]} in {facts[i][1]}?", documents[i].metadata["source"])
+        for i in sample
+    ]
+
+    embedding = Embedding(api_url=args.api_url) if args.api_url else SimulatedEmbedding(args.embed_latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        lexical = BM25Index(os.path.join(tmp, "lexical.sqlite3"))
+        store = VectorStore(embedding_model=embedding, lexical_index=lexical, persist_directory=tmp)
+        start = time.perf_counter()
+        for i in range(0, len(documents), 500):
+            batch = documents[i:i + 500]
+            vectors = embedding.embed_documents([doc.page_content for doc in batch])
+            store.add(batch, ids=[str(i + j) for j in range(len(batch))], embeddings=vectors)
+        print(f"indexed {len(documents)} documents in {time.perf_counter() - start:.1f} s; {len(queries)} queries")
+
+        print(f"{'mode':<26} {'recall@' + str(args.top_k):>9} {'mean ms':>9} {'p95 ms':>8}")
+        for mode in ("dense", "lexical", "hybrid"):
+            store.mode = mode
+            store.top_k = args.top_k
+            recall, mean, p95 = run(store, queries, args.top_k)
+            print(f"{mode:<26} {recall:>9.3f} {mean * 1000:>9.1f} {p95 * 1000:>8.1f}")
+
+        if not args.api_url:
+            store.mode = "hybrid"
+            store.embedding_model = DownEmbedding(0.0)
+            recall, mean, p95 = run(store, queries, args.top_k)
+            print(f"{'hybrid, embedder down':<26} {recall:>9.3f} {mean * 1000:>9.1f} {p95 * 1000:>8.1f}")
+            store.embedding_model = embedding
+
+        base_url = run_in_thread(port=args.port, rerank_latency=args.rerank_latency, rerank_item_latency=0)
+        cross_encoder = CrossEncoderScorer(f"{base_url}/api/v1/rerank")
+        budget = args.rerank_budget_ms / 1000
+        store.mode = "hybrid"
+        for label, reranker in (
+            ("hybrid + lexical rerank", Reranker(LexicalScorer(), budget_seconds=budget)),
+            ("hybrid + cross-encoder", Reranker(cross_encoder, budget_seconds=budget)),
+            ("  over budget", Reranker(cross_encoder, budget_seconds=args.rerank_latency / 2)),
+        ):
+            store.reranker = reranker
+            recall, mean, p95 = run(store, queries, args.top_k)
+            print(f"{label:<26} {recall:>9.3f} {mean * 1000:>9.1f} {p95 * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Simulated query embedding latency (s)")
+    parser.add_argument("--api-url", default=None, help="Use this embedding service instead of the simulation")
+    parser.add_argument("--port", type=int, default=8089, help="Port of the stub rerank server")
+    parser.add_argument("--rerank-latency", type=float, default=0.02, help="Stub cross-encoder latency (s)")
+    parser.add_argument("--rerank-budget-ms", type=float, default=150)
+    main(parser.parse_args())
@@ -0,0 +1,70 @@
+"""
+Replay a conversation log and count standalone-query rewrite LLM calls.
+
+Each user turn of cookbook/conversations.jsonl is replayed through a
+QueryRewriter whose LLM only counts calls, under three configurations:
+always rewriting follow-ups (the old behaviour), the heuristic fast path, and
+the heuristic plus the memo cache. Assistant replies are canned, so identical
+conversations produce identical histories, as they do for suggested
+follow-up questions.
+
+    python cookbook/rewrite_replay.py --log cookbook/conversations.jsonl --repeat 3
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.api.rag.query_rewriter import QueryRewriter, RewriteCache
+
+
+class CountingLLM:
+    """Stands in for the LLM: answers rewrites with the query it was asked about."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_response(self, prompt: str) -> str:
+        self.calls += 1
+        return prompt.rsplit("<|start_header_id|>user<|end_header_id|>\n\n", 1)[1].split("<|eot_id|>", 1)[0]
+
+
+def replay(conversations, rewriter: QueryRewriter) -> None:
+    for turns in conversations:
+        history = []
+        for i, query in enumerate(turns):
+            standalone_query = rewriter.rewrite(query, history)
+            history += [("user", query), ("assistant", f"Answer {i} about {standalone_query}")]
+
+
+def main(args):
+    with open(args.log) as f:
+        conversations = [json.loads(line)["turns"] for line in f if line.strip()] * args.repeat
+
+    configurations = {
+        "always rewrite (old)": lambda llm: QueryRewriter(llm, cache=None, use_heuristic=False),
+        "heuristic": lambda llm: QueryRewriter(llm, cache=None, use_heuristic=True),
+        "heuristic + memo": lambda llm: QueryRewriter(llm, cache=RewriteCache(), use_heuristic=True),
+    }
+
+    turns = sum(len(turns) for turns in conversations)
+    print(f"{len(conversations)} conversations, {turns} turns")
+    print(f"{'configuration':<22} {'LLM calls':>9} {'per turn':>9} {'heuristic':>10} {'memo':>6}")
+    for name, build in configurations.items():
+        llm = CountingLLM()
+        rewriter = build(llm)
+        replay(conversations, rewriter)
+        stats = rewriter.stats()
+        print(
+            f"{name:<22} {llm.calls:>9} {llm.calls / turns:>9.2f} "
+            f"{stats['heuristic_skips']:>10} {stats['cache_hits']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=os.path.join(os.path.dirname(__file__), "conversations.jsonl"))
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the log this many times")
+    main(parser.parse_args())
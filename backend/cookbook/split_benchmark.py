@@ -0,0 +1,83 @@
+"""
+Benchmark: text splitting throughput on a synthetic news corpus.
+
+Compares the recursive character splitter used by the retriever
+(chunk_size=1000, chunk_overlap=200) with the single-pass sentence splitter,
+each inline and across a pool of worker processes, and reports chunks/sec
+and chunk sizes. Pool timings include starting the workers, as an ingestion
+run would. By default articles have their whitespace collapsed the way the
+scraper stores them; `--layout paragraphs` keeps blank lines between
+paragraphs, where the recursive splitter can cut on them.
+
+    python cookbook/split_benchmark.py --articles 20000 --workers 4
+    python cookbook/split_benchmark.py --articles 20000 --layout paragraphs
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.api.rag.splitter import ParallelSplitter  # noqa: E402
+
+WORDS = (
+    "council budget election river bridge school hospital market football police festival minister "
+    "weather train farmers court students museum Dhaka Sylhet Chattogram flood garment workers fares "
+    "metro rail cyclone relief export import prices government opposition report officials said"
+).split()
+
+
+def synthetic_article(rng: random.Random, layout: str = "scraped") -> str:
+    paragraphs = []
+    for _ in range(rng.randint(4, 14)):
+        sentences = []
+        for _ in range(rng.randint(2, 5)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(8, 28))]
+            sentences.append(" ".join(words).capitalize() + rng.choice("..!?."))
+        paragraphs.append(" ".join(sentences))
+    text = "\n\n".join(paragraphs)
+    # The scraper's clean_text collapses every whitespace run to one space
+    return re.sub(r"\s+", " ", text) if layout == "scraped" else text
+
+
+def run(texts, mode: str, workers: int, task_size: int):
+    splitter = ParallelSplitter(mode=mode, workers=workers, task_size=task_size)
+    start = time.perf_counter()
+    chunks = [chunk for batch in range(0, len(texts), splitter.batch_size * 4)
+              for chunk_list in splitter.split(texts[batch:batch + splitter.batch_size * 4])
+              for chunk in chunk_list]
+    elapsed = time.perf_counter() - start
+    splitter.close()
+    return elapsed, chunks
+
+
+def main(args):
+    rng = random.Random(7)
+    texts = [synthetic_article(rng, args.layout) for _ in range(args.articles)]
+    mib = sum(len(text) for text in texts) / 2 ** 20
+    print(f"{args.articles} {args.layout} articles, {mib:.0f} MiB of text, chunk_size=1000, chunk_overlap=200, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'splitter':<10} {'workers':>7} {'seconds':>8} {'chunks':>8} {'chunks/sec':>11} "
+          f"{'mean len':>9} {'speedup':>8}")
+
+    baseline = None
+    for mode in ("recursive", "sentence"):
+        for workers in (0, args.workers):
+            elapsed, chunks = run(texts, mode, workers, args.task_size)
+            rate = len(chunks) / elapsed
+            baseline = baseline or rate
+            print(f"{mode:<10} {workers:>7} {elapsed:>8.2f} {len(chunks):>8} {rate:>11.0f} "
+                  f"{statistics.mean(len(c) for c in chunks):>9.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--layout", choices=("scraped", "paragraphs"), default="scraped")
+    parser.add_argument("--task-size", type=int, default=32, help="articles per work unit")
+    main(parser.parse_args())
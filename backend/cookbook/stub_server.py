@@ -0,0 +1,116 @@
+"""
+Stub LLM / embedding server for local benchmarks.
+
+Serves the same endpoints as the model API the backend talks to, with a
+configurable artificial latency, so the pipeline can be exercised without GPUs:
+
+    POST /api/v1/generate         {"query": ...}  -> {"prediction": ...}
+    POST /api/v1/generate_stream  {"query": ...}  -> chunked plain-text tokens
+    POST /api/v1/embed            {"text": ...}   -> {"embedding": [...]}
+    POST /api/v1/embed/batch      {"texts": [...]} -> {"embeddings": [[...], ...]}
+    POST /api/v1/rerank           {"query": ..., "texts": [...]} -> {"scores": [...]}
+
+The rerank stub scores texts by the share of query words they contain,
+returned as logits like a cross-encoder's.
+
+Run standalone:
+    python cookbook/stub_server.py --port 8089 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import hashlib
+import threading
+import time
+
+from aiohttp import web
+
+ANSWER = "This is a stubbed answer from the local benchmark server about today's news."
+DIMENSION = 384
+
+
+def fake_embedding(text: str, dimension: int = DIMENSION):
+    """Deterministic pseudo-embedding derived from the text hash."""
+    digest = hashlib.sha256(text.encode()).digest()
+    return [digest[i % len(digest)] / 255.0 for i in range(dimension)]
+
+
+def create_app(llm_latency: float = 0.5, token_delay: float = 0.02, embed_latency: float = 0.05,
+               embed_item_latency: float = 0.0005, rerank_latency: float = 0.02,
+               rerank_item_latency: float = 0.001) -> web.Application:
+    async def generate(request):
+        await request.json()
+        await asyncio.sleep(llm_latency)
+        return web.json_response({"prediction": ANSWER})
+
+    async def generate_stream(request):
+        await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+        await response.prepare(request)
+        await asyncio.sleep(llm_latency)
+        for word in ANSWER.split(" "):
+            await response.write(f"{word} ".encode())
+            await asyncio.sleep(token_delay)
+        await response.write_eof()
+        return response
+
+    async def embed(request):
+        payload = await request.json()
+        await asyncio.sleep(embed_latency)
+        return web.json_response({"embedding": fake_embedding(payload["text"])})
+
+    async def embed_batch(request):
+        payload = await request.json()
+        texts = payload["texts"]
+        await asyncio.sleep(embed_latency + embed_item_latency * len(texts))
+        return web.json_response({"embeddings": [fake_embedding(text) for text in texts]})
+
+    async def rerank(request):
+        payload = await request.json()
+        texts = payload["texts"]
+        await asyncio.sleep(rerank_latency + rerank_item_latency * len(texts))
+        words = set(payload["query"].lower().split())
+        scores = [8 * len(words & set(text.lower().split())) / max(1, len(words)) - 4 for text in texts]
+        return web.json_response({"scores": scores})
+
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app.router.add_post("/api/v1/generate", generate)
+    app.router.add_post("/api/v1/generate_stream", generate_stream)
+    app.router.add_post("/api/v1/embed", embed)
+    app.router.add_post("/api/v1/embed/batch", embed_batch)
+    app.router.add_post("/api/v1/rerank", rerank)
+    return app
+
+
+def run_in_thread(port: int = 8089, **kwargs) -> str:
+    """Start the stub server on a daemon thread and return its base URL."""
+    ready = threading.Event()
+
+    def _serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(create_app(**kwargs), access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=_serve, daemon=True).start()
+    if not ready.wait(timeout=10):
+        raise RuntimeError("Stub server failed to start")
+    time.sleep(0.1)
+    return f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    web.run_app(
+        create_app(args.llm_latency, args.token_delay, args.embed_latency),
+        host="127.0.0.1",
+        port=args.port,
+    )
@@ -0,0 +1,122 @@
+"""
+Benchmark: QPS, latency, recall and memory of the dense index backends.
+
+Builds a synthetic clustered corpus of unit vectors, indexes it with each
+backend in a fresh process, then runs perturbed corpus vectors as queries.
+Recall@k is measured against exact brute-force neighbours; memory is the
+largest RSS growth of the process while building and querying (pages of a
+memory-mapped index that were read count as resident).
+
+    python cookbook/vector_backend_benchmark.py --vectors 100000 --dim 384
+    python cookbook/vector_backend_benchmark.py --backends numpy-exact numpy-ivf --nprobe 8 16 32
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+BACKENDS = ("chroma", "numpy-exact", "numpy-ivf")
+
+
+def current_rss_mib() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def build_dataset(count: int, dim: int, queries: int, k: int, seed: int = 3):
+    """Clustered unit vectors, noisy copies as queries, and exact top-k ids."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 500), dim)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=count)]
+    vectors += rng.standard_normal(size=(count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(count, size=queries)
+    noise = rng.standard_normal(size=(queries, dim), dtype=np.float32)
+    query_vectors = vectors[picks] + 0.5 * noise / np.linalg.norm(noise, axis=1, keepdims=True)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    truth = [set(np.argsort(-(vectors @ q))[:k].tolist()) for q in query_vectors]
+    return vectors, query_vectors, truth
+
+
+def make_index(backend: str, directory: str, args):
+    from app.api.rag.db.vector_index import ChromaIndex, NumpyIndex
+
+    if backend == "chroma":
+        return ChromaIndex(None, directory, m=args.hnsw_m, construction_ef=args.hnsw_ef, search_ef=args.hnsw_ef)
+    if backend == "numpy-exact":
+        return NumpyIndex(directory, index_type="exact")
+    return NumpyIndex(directory, index_type="ivf", nlist=args.nlist, nprobe=args.nprobe[0])
+
+
+def run_backend(backend: str, args, results) -> None:
+    from langchain_core.documents import Document
+
+    vectors, query_vectors, truth = build_dataset(args.vectors, args.dim, args.queries, args.k)
+    rss_before = current_rss_mib()
+    with tempfile.TemporaryDirectory() as tmp:
+        index = make_index(backend, tmp, args)
+        rss = rss_before
+        start = time.perf_counter()
+        for i in range(0, len(vectors), 5000):
+            ids = [str(j) for j in range(i, min(i + 5000, len(vectors)))]
+            index.upsert(ids, [Document(page_content=f"doc {j}", metadata={"i": int(j)}) for j in ids],
+                         vectors[i:i + 5000])
+            rss = max(rss, current_rss_mib())
+        build_seconds = time.perf_counter() - start
+
+        for nprobe in (args.nprobe if backend == "numpy-ivf" else [None]):
+            if nprobe is not None:
+                index.nprobe = nprobe
+            latencies, found = [], 0
+            for query, expected in zip(query_vectors, truth):
+                t = time.perf_counter()
+                hits = index.search(query.tolist(), k=args.k)
+                latencies.append(time.perf_counter() - t)
+                found += len(expected & {doc.metadata["i"] for doc, _ in hits})
+            latencies.sort()
+            rss = max(rss, current_rss_mib())
+            results.append({
+                "backend": backend if nprobe is None else f"{backend} (nprobe={nprobe})",
+                "build_s": build_seconds,
+                "qps": len(latencies) / sum(latencies),
+                "p50_ms": latencies[len(latencies) // 2] * 1000,
+                "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+                "recall": found / (len(truth) * args.k),
+                "rss_mib": rss - rss_before,
+            })
+
+
+def main(args):
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k}")
+    print(f"{'backend':<26} {'build s':>8} {'QPS':>8} {'p50 ms':>8} {'p99 ms':>8} {'recall':>7} {'RAM MiB':>8}")
+    for backend in args.backends:
+        results = manager.list()
+        # A fresh process per backend keeps the memory figures independent
+        worker = context.Process(target=run_backend, args=(backend, args, results))
+        worker.start()
+        worker.join()
+        for r in results:
+            print(f"{r['backend']:<26} {r['build_s']:>8.1f} {r['qps']:>8.0f} {r['p50_ms']:>8.2f} "
+                  f"{r['p99_ms']:>8.2f} {r['recall']:>7.3f} {r['rss_mib']:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--hnsw-m", type=int, default=128)
+    parser.add_argument("--hnsw-ef", type=int, default=400)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists; 0 picks about sqrt(n)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    main(parser.parse_args())
@@ -6,7 +6,11 @@ async def ws_chat():
     uri = "ws://127.0.0.1:8000/api/ws/chat"
     async with websockets.connect(uri) as websocket:
         await websocket.send("Hello via WS")
-        response = await websocket.recv()
-        print(response)
+        while True:
+            token = await websocket.recv()
+            if token == "[DONE]":
+                print("\nStreaming complete!")
+                break
+            print(token, end="", flush=True)
 
 asyncio.run(ws_chat())
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import chat, health
+from app.api.rag.models.http_client import close_async_session, close_session
 
 # Create FastAPI instance
 app = FastAPI(title="RAG Chatbot API", version="0.1.0")
@@ -12,12 +13,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Session-ID"],
 )
 
 # Include routers
 app.include_router(health.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
 
+# Release pooled keep-alive connections to the model servers
+@app.on_event("shutdown")
+async def close_http_clients():
+    await close_async_session()
+    close_session()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -0,0 +1,1551 @@
+import asyncio
+import multiprocessing
+import unittest
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
+import sys
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# Add backend root to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.documents import Document
+
+from app.api.rag.db.answer_cache import AnswerCache
+from app.api.rag.db.dedup_index import DedupIndex, minhash
+from app.api.rag.db.lexical_index import BM25Index, reciprocal_rank_fusion
+from app.api.rag.db.redis_client import RedisDB
+from app.api.rag.db.vector_index import NumpyIndex, PartitionedIndex
+from app.api.rag.db.vectorstore import VectorStore
+from app.api.rag.db.session_store import RedisSessionStore, SessionStore, trim_history
+from app.api.rag.utils import count_tokens
+from app.api.rag.models import http_client
+from app.api.rag.models.embedding_cache import EmbeddingCache, RedisEmbeddingCache, SQLiteEmbeddingCache, cache_key, encode_vector
+from app.api.rag.models.embedding_model import AdaptiveBatchSize, Embedding
+from app.api.rag.models.llm import FALLBACK_RESPONSE, LLM
+from app.api.rag.ingestor import Ingestor, IngestorError
+from app.api.rag.ingest_pipeline import Stage, StagedPipeline
+from app.api.rag.jobs import IngestJobManager, IngestJobRunning
+from app.api.rag.pipeline import Pipeline
+from app.api.rag.prompts import get_budgeted_chat_prompt
+from app.api.rag.retriever import Retriever, infer_time_range
+from app.api.rag.query_rewriter import QueryRewriter, RewriteCache, needs_rewrite
+from app.api.rag.reranker import LexicalScorer, Reranker, ScoreCache, Scorer
+from app.api.rag.splitter import ParallelSplitter, SentenceSplitter
+
+
+class TestLLMStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.llm = LLM(api_url='http://llm.test/generate', stream_url='http://llm.test/generate_stream')
+
+    @patch('app.api.rag.models.llm.get_session')
+    def test_stream_yields_chunks_incrementally(self, mock_get_session):
+        mock_post = mock_get_session.return_value.post
+        mock_response = MagicMock()
+        mock_response.raise_for_status.return_value = None
+        # A multi-byte character split across two network chunks
+        mock_response.iter_content.return_value = [b'Hello', b' wor', b'ld \xc3', b'\xa9']
+        mock_post.return_value.__enter__.return_value = mock_response
+
+        tokens = list(self.llm.stream_response('prompt'))
+
+        self.assertEqual(tokens, ['Hello', ' wor', 'ld ', 'é'])
+        self.assertEqual(mock_post.call_args.args[0], 'http://llm.test/generate_stream')
+        self.assertTrue(mock_post.call_args.kwargs['stream'])
+
+    @patch('app.api.rag.models.llm.get_session')
+    def test_stream_empty_response_falls_back(self, mock_get_session):
+        mock_post = mock_get_session.return_value.post
+        mock_response = MagicMock()
+        mock_response.raise_for_status.return_value = None
+        mock_response.iter_content.return_value = []
+        mock_post.return_value.__enter__.return_value = mock_response
+
+        tokens = list(self.llm.stream_response('prompt'))
+        self.assertEqual(len(tokens), 1)
+        self.assertIn("couldn't generate", tokens[0])
+
+
+class TestHTTPClientPool(unittest.IsolatedAsyncioTestCase):
+
+    def test_sync_session_is_shared(self):
+        self.assertIs(http_client.get_session(), http_client.get_session())
+
+    async def test_async_session_is_shared_per_loop(self):
+        session = http_client.get_async_session()
+        try:
+            self.assertIs(session, http_client.get_async_session())
+            self.assertEqual(session.connector.limit_per_host, http_client.HTTP_POOL_MAXSIZE)
+        finally:
+            await http_client.close_async_session()
+        self.assertTrue(session.closed)
+
+
+class TestBatchedEmbedding(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.embedding = Embedding(api_url='http://embed.test', batch_api_url='http://embed.test/batch',
+                                   batch_size=4, max_in_flight=3)
+        self.batches = []
+
+        def fake_batch(texts):
+            self.batches.append(list(texts))
+            return [[float(text)] for text in texts]
+
+        self.fake_batch = fake_batch
+
+    def test_batched_embedding_preserves_order(self):
+        self.embedding._embed_batch = Mock(side_effect=self.fake_batch)
+        texts = [str(i) for i in range(10)]
+
+        vectors = self.embedding.embed_documents(texts)
+
+        self.assertEqual(vectors, [[float(i)] for i in range(10)])
+        self.assertTrue(all(len(batch) <= AdaptiveBatchSize(4).max_size for batch in self.batches))
+        self.assertLess(len(self.batches), len(texts))
+
+    async def test_async_batched_embedding_preserves_order(self):
+        async def fake_async_batch(session, texts):
+            return self.fake_batch(texts)
+
+        self.embedding._async_embed_batch = fake_async_batch
+        with patch('app.api.rag.models.embedding_model.get_async_session'):
+            vectors = await self.embedding.aembed_documents([str(i) for i in range(9)])
+
+        self.assertEqual(vectors, [[float(i)] for i in range(9)])
+
+    async def test_async_batch_failure_cancels_other_workers(self):
+        started = []
+
+        async def failing_batch(session, texts):
+            started.append(texts[0])
+            if texts[0] == '0':
+                raise ValueError('embedding server down')
+            await asyncio.sleep(0.05)
+            return self.fake_batch(texts)
+
+        self.embedding._async_embed_batch = failing_batch
+        with patch('app.api.rag.models.embedding_model.get_async_session'):
+            with self.assertRaises(ValueError):
+                await self.embedding.aembed_documents([str(i) for i in range(40)])
+        await asyncio.sleep(0.1)
+
+        # Only the first batch of each of the 3 workers was ever sent
+        self.assertEqual(len(started), 3)
+        self.assertEqual(asyncio.all_tasks(), {asyncio.current_task()})
+
+    def test_batch_failure_stops_other_workers(self):
+        started = []
+
+        def failing_batch(texts):
+            started.append(texts[0])
+            if texts[0] == '0':
+                time.sleep(0.02)
+                raise ValueError('embedding server down')
+            time.sleep(0.05)
+            return self.fake_batch(texts)
+
+        self.embedding._embed_batch = Mock(side_effect=failing_batch)
+        with self.assertRaises(ValueError):
+            self.embedding.embed_documents([str(i) for i in range(40)])
+
+        # Workers busy when the first batch failed finish it, then take no further slice
+        self.assertEqual(len(started), 3)
+
+    def test_adaptive_batch_size(self):
+        size = AdaptiveBatchSize(8, max_size=32, target_seconds=1.0)
+        size.record(8, 0.1)
+        self.assertEqual(size.size, 16)
+        size.record(16, 2.0)
+        self.assertEqual(size.size, 8)
+        size.shrink()
+        self.assertEqual(size.size, 4)
+        for _ in range(10):
+            size.record(size.size, 0.1)
+        self.assertEqual(size.size, 32)
+
+    def test_mismatched_batch_response_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.embedding._check_batch(['a', 'b'], [[0.1]])
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = SQLiteEmbeddingCache(os.path.join(self.tmpdir.name, 'cache.sqlite3'), max_entries=3)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip_and_counters(self):
+        self.cache.set_many({'a': [0.5, 0.25]})
+
+        self.assertEqual(self.cache.get_many(['a', 'b']), [[0.5, 0.25], None])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    @patch('app.api.rag.models.embedding_cache.time.time')
+    def test_least_recently_used_entries_are_evicted(self, mock_time):
+        for i, key in enumerate(['a', 'b', 'c']):
+            mock_time.return_value = i
+            self.cache.set_many({key: [float(i)]})
+        mock_time.return_value = 10
+        self.cache.get_many(['a'])
+        mock_time.return_value = 11
+        self.cache.set_many({'d': [3.0]})
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c', 'd']), [[0.0], None, [2.0], [3.0]])
+
+    @patch('app.api.rag.models.embedding_cache.time.time')
+    def test_caches_sharing_a_file_evict_against_one_count(self, mock_time):
+        other = SQLiteEmbeddingCache(self.cache.path, max_entries=3)
+        for i, (cache, key) in enumerate([(self.cache, 'a'), (other, 'b'), (self.cache, 'c'), (other, 'd')]):
+            mock_time.return_value = i
+            cache.set_many({key: [float(i)]})
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(len(other), 3)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c', 'd']), [None, [1.0], [2.0], [3.0]])
+
+    def test_incomplete_cache_cannot_be_constructed(self):
+        class GetOnlyCache(EmbeddingCache):
+            def _get_many(self, keys):
+                return [None] * len(keys)
+
+        with self.assertRaises(TypeError):
+            GetOnlyCache()
+
+    def test_embedding_only_requests_cache_misses(self):
+        embedding = Embedding(api_url='http://embed.test', cache=self.cache)
+        embedding._embed_text = Mock(side_effect=lambda text: [float(len(text))])
+
+        first = embedding.embed_documents(['aa', 'bbb', 'aa'])
+        second = embedding.embed_documents(['bbb', 'c'])
+
+        self.assertEqual(first, [[2.0], [3.0], [2.0]])
+        self.assertEqual(second, [[3.0], [1.0]])
+        self.assertEqual([c.args[0] for c in embedding._embed_text.call_args_list], ['aa', 'bbb', 'c'])
+
+    def test_keys_depend_on_model_url(self):
+        self.assertNotEqual(cache_key('http://a/embed', 'text'), cache_key('http://b/embed', 'text'))
+
+    def test_redis_cache_refreshes_ttl_on_hit(self):
+        mock_client = Mock()
+        mock_client.mget.return_value = [encode_vector([1.0]), None]
+        cache = RedisEmbeddingCache(redis_client=mock_client, ttl_seconds=60)
+
+        self.assertEqual(cache.get_many(['a', 'b']), [[1.0], None])
+        mock_client.pipeline.return_value.expire.assert_called_once_with('emb:a', 60)
+
+
+class TestPipelineStreaming(unittest.TestCase):
+
+    def setUp(self):
+        with patch('app.api.rag.pipeline.LLM'), patch('app.api.rag.pipeline.Retriever'), \
+                patch('app.api.rag.pipeline.create_answer_cache', return_value=None):
+            self.pipeline = Pipeline()
+        self.pipeline.retriever.retrieve = Mock(return_value='context')
+        self.pipeline.llm.stream_response = Mock(return_value=iter(['Dhaka ', 'is ', 'sunny.']))
+
+    def test_stream_passes_tokens_through_and_updates_history(self):
+        tokens = list(self.pipeline.stream('Weather?'))
+
+        self.assertEqual(tokens, ['Dhaka ', 'is ', 'sunny.'])
+        self.assertEqual(self.pipeline.get_history(), [('user', 'Weather?'), ('assistant', 'Dhaka is sunny.')])
+
+
+class TestPipelineAsync(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.llm = Mock()
+        self.retriever = Mock()
+        with patch('app.api.rag.pipeline.create_answer_cache', return_value=None):
+            self.pipeline = Pipeline(llm=self.llm, retriever=self.retriever, session_store=SessionStore())
+
+    async def test_arun_uses_async_llm_and_retriever(self):
+        self.llm.agenerate_response = AsyncMock(return_value='Answer')
+        self.retriever.aretrieve = AsyncMock(return_value='context')
+
+        response = await self.pipeline.arun('Question?')
+
+        self.assertEqual(response, 'Answer')
+        self.retriever.aretrieve.assert_awaited_once_with('Question?', embedding=None)
+        self.retriever.retrieve.assert_not_called()
+        self.llm.generate_response.assert_not_called()
+        self.assertEqual(self.pipeline.get_history(), [('user', 'Question?'), ('assistant', 'Answer')])
+
+    async def test_arun_rewrites_query_when_history_exists(self):
+        self.pipeline.sessions.append('s1', 'Tell me about the flood', 'It hit Sylhet.')
+        self.llm.agenerate_response = AsyncMock(side_effect=['Sylhet flood casualties', 'Twelve people.'])
+        self.retriever.aretrieve = AsyncMock(return_value='context')
+
+        response = await self.pipeline.arun('How many died?', session_id='s1')
+
+        self.assertEqual(response, 'Twelve people.')
+        self.retriever.aretrieve.assert_awaited_once_with('Sylhet flood casualties', embedding=None)
+
+
+    async def test_session_store_is_called_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        callers = []
+        self.pipeline.sessions = Mock()
+        self.pipeline.sessions.get_history.side_effect = lambda *a: callers.append(threading.get_ident()) or []
+        self.pipeline.sessions.append.side_effect = lambda *a: callers.append(threading.get_ident())
+        self.llm.agenerate_response = AsyncMock(return_value='Answer')
+        self.retriever.aretrieve = AsyncMock(return_value='context')
+
+        async def tokens(prompt):
+            yield 'Answer'
+        self.llm.astream_response = tokens
+
+        await self.pipeline.arun('Question?')
+        [token async for token in self.pipeline.astream('Question?')]
+
+        self.assertEqual(len(callers), 4)
+        self.assertNotIn(loop_thread, callers)
+
+    async def test_sessions_do_not_share_history(self):
+        self.llm.agenerate_response = AsyncMock(return_value='Answer')
+        self.retriever.aretrieve = AsyncMock(return_value='context')
+
+        await self.pipeline.arun('First user question', session_id='a')
+        await self.pipeline.arun('Second user question', session_id='b')
+
+        # Session b had no history, so no standalone-query rewrite was needed
+        self.assertEqual(self.llm.agenerate_response.await_count, 2)
+        self.assertEqual(self.pipeline.get_history('b'), [('user', 'Second user question'), ('assistant', 'Answer')])
+
+
+class TestAnswerCache(unittest.TestCase):
+
+    def test_exact_tier_matches_normalized_query(self):
+        cache = AnswerCache()
+        cache.put('What happened in Dhaka today?', 'A rally.')
+
+        self.assertEqual(cache.get('  what happened in DHAKA today '), 'A rally.')
+        self.assertIsNone(cache.get('What happened in Sylhet today?'))
+
+    def test_semantic_tier_uses_cosine_threshold(self):
+        cache = AnswerCache(similarity_threshold=0.9)
+        cache.put('dhaka news today', 'A rally.', [1.0, 0.0, 0.0])
+
+        self.assertEqual(cache.get_similar([0.95, 0.1, 0.0]), 'A rally.')
+        self.assertIsNone(cache.get_similar([0.0, 1.0, 0.0]))
+
+    @patch('app.api.rag.db.answer_cache.time.monotonic')
+    def test_entries_expire(self, mock_monotonic):
+        mock_monotonic.return_value = 100.0
+        cache = AnswerCache(ttl_seconds=10)
+        cache.put('q', 'a', [1.0, 0.0])
+
+        mock_monotonic.return_value = 111.0
+        self.assertIsNone(cache.get('q'))
+        self.assertIsNone(cache.get_similar([1.0, 0.0]))
+
+    def test_new_ingest_generation_clears_cache(self):
+        generation = [1]
+        cache = AnswerCache(generation_fn=lambda: generation[0], generation_check_seconds=0)
+        cache.refresh_generation()
+        cache.put('q', 'a')
+        self.assertEqual(cache.get('q'), 'a')
+
+        generation[0] = 2
+        cache.refresh_generation()
+        self.assertIsNone(cache.get('q'))
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_eviction_frees_embedding_slots(self):
+        cache = AnswerCache(max_entries=2)
+        cache.put('a', '1', [1.0, 0.0])
+        cache.put('b', '2', [0.0, 1.0])
+        cache.put('c', '3', [0.7, 0.7])
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get_similar([0.7, 0.7]), '3')
+        self.assertEqual(cache.stats()['entries'], 2)
+
+
+class TestPipelineAnswerCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.llm = Mock()
+        self.llm.agenerate_response = AsyncMock(return_value='Answer')
+        self.retriever = Mock()
+        self.retriever.aretrieve = AsyncMock(return_value='context')
+        self.retriever.aembed_query = AsyncMock(side_effect=lambda q: [1.0, 0.0] if 'dhaka' in q.lower() else [0.0, 1.0])
+        self.cache = AnswerCache(similarity_threshold=0.9)
+        self.pipeline = Pipeline(llm=self.llm, retriever=self.retriever,
+                                 session_store=SessionStore(), answer_cache=self.cache)
+
+    async def test_repeated_question_is_served_from_cache(self):
+        await self.pipeline.arun('What happened in Dhaka?', session_id='a')
+        response = await self.pipeline.arun('what happened in dhaka', session_id='b')
+
+        self.assertEqual(response, 'Answer')
+        self.assertEqual(self.llm.agenerate_response.await_count, 1)
+        self.assertEqual(self.cache.stats()['exact_hits'], 1)
+        self.assertEqual(self.pipeline.get_history('b')[-1], ('assistant', 'Answer'))
+
+    async def test_similar_question_hits_semantic_tier_and_miss_reuses_embedding(self):
+        await self.pipeline.arun('Dhaka news', session_id='a')
+        self.retriever.aretrieve.assert_awaited_once_with('Dhaka news', embedding=[1.0, 0.0])
+
+        await self.pipeline.arun('Latest from Dhaka', session_id='b')
+
+        self.assertEqual(self.llm.agenerate_response.await_count, 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['semantic_hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_latency']['count'], 1)
+
+    async def test_generation_is_read_off_the_event_loop(self):
+        threads = []
+        self.cache.generation_fn = lambda: threads.append(threading.current_thread()) or 1
+
+        await self.pipeline.arun('Dhaka news', session_id='a')
+
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    async def test_fallback_answers_are_not_cached(self):
+        self.llm.agenerate_response = AsyncMock(return_value=FALLBACK_RESPONSE)
+
+        await self.pipeline.arun('Dhaka news')
+
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+class TestQueryRewriter(unittest.TestCase):
+
+    HISTORY = [('user', 'Tell me about the flood in Sylhet'), ('assistant', 'It displaced thousands.')]
+
+    def setUp(self):
+        self.llm = Mock()
+        self.llm.generate_response.return_value = 'How many people died in the Sylhet flood?'
+        self.rewriter = QueryRewriter(self.llm, cache=RewriteCache())
+
+    def test_heuristic_flags_only_dependent_queries(self):
+        self.assertTrue(needs_rewrite('How many died?', self.HISTORY))
+        self.assertTrue(needs_rewrite('What did the minister say about it?', self.HISTORY))
+        self.assertTrue(needs_rewrite('What about Chittagong and Cox Bazar?', self.HISTORY))
+        self.assertTrue(needs_rewrite('How many people were injured?', self.HISTORY))
+        self.assertFalse(needs_rewrite('What is the budget for Dhaka metro rail?', self.HISTORY))
+        self.assertFalse(needs_rewrite('How many died?', []))
+
+    def test_self_contained_query_skips_llm(self):
+        result = self.rewriter.rewrite('Who won the Dhaka mayoral election?', self.HISTORY)
+
+        self.assertEqual(result, 'Who won the Dhaka mayoral election?')
+        self.llm.generate_response.assert_not_called()
+
+    def test_rewrite_is_memoized_per_history(self):
+        self.rewriter.rewrite('How many died?', self.HISTORY)
+        self.rewriter.rewrite('how many died', self.HISTORY)
+        self.rewriter.rewrite('How many died?', self.HISTORY + [('user', 'x'), ('assistant', 'y')])
+
+        self.assertEqual(self.llm.generate_response.call_count, 2)
+        stats = self.rewriter.stats()
+        self.assertEqual((stats['cache_hits'], stats['llm_calls']), (1, 2))
+
+    def test_failed_rewrite_falls_back_to_raw_query(self):
+        self.llm.generate_response.return_value = FALLBACK_RESPONSE
+
+        self.assertEqual(self.rewriter.rewrite('How many died?', self.HISTORY), 'How many died?')
+        self.assertEqual(len(self.rewriter.cache), 0)
+        self.assertEqual(self.rewriter.resolve('How many died?', self.HISTORY), ('How many died?', False))
+
+
+class TestSpeculativeRetrieval(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.llm = Mock()
+        self.retriever = Mock()
+        self.retriever.aretrieve = AsyncMock(return_value='context')
+        self.sessions = SessionStore()
+        self.sessions.append('s', 'Tell me about the flood in Sylhet', 'It displaced thousands.')
+
+    def pipeline(self, **kwargs):
+        return Pipeline(llm=self.llm, retriever=self.retriever, session_store=self.sessions,
+                        answer_cache=AnswerCache(similarity_threshold=1.0),
+                        rewriter=QueryRewriter(self.llm), speculative_retrieval=True, **kwargs)
+
+    async def test_speculative_context_is_reused_when_rewrite_keeps_query(self):
+        self.llm.agenerate_response = AsyncMock(side_effect=['How many died?', 'Twelve.'])
+
+        await self.pipeline().arun('How many died?', session_id='s')
+
+        self.retriever.aretrieve.assert_awaited_once_with('How many died?', embedding=None)
+
+    async def test_speculative_context_is_discarded_when_rewrite_differs(self):
+        self.llm.agenerate_response = AsyncMock(side_effect=['Sylhet flood deaths', 'Twelve.'])
+
+        await self.pipeline().arun('How many died?', session_id='s')
+
+        self.assertEqual(
+            [c.args[0] for c in self.retriever.aretrieve.await_args_list],
+            ['How many died?', 'Sylhet flood deaths'],
+        )
+
+    async def test_slow_rewrite_falls_back_to_raw_query(self):
+        async def generate(prompt):
+            if 'Standalone Query' in prompt:
+                await asyncio.sleep(0.5)
+                return 'Sylhet flood deaths'
+            return 'Twelve.'
+        self.llm.agenerate_response = AsyncMock(side_effect=generate)
+
+        response = await self.pipeline(rewrite_timeout=0.05).arun('How many died?', session_id='s')
+
+        self.assertEqual(response, 'Twelve.')
+        self.retriever.aretrieve.assert_awaited_once_with('How many died?', embedding=None)
+
+    async def test_raw_query_fallback_is_kept_out_of_the_answer_cache(self):
+        async def generate(prompt):
+            if 'Standalone Query' in prompt:
+                await asyncio.sleep(0.5)
+                return 'Sylhet flood deaths'
+            return 'Twelve people died in the Sylhet flood.' if 'Sylhet' in prompt else 'Which event do you mean?'
+        self.llm.agenerate_response = AsyncMock(side_effect=generate)
+        pipeline = self.pipeline(rewrite_timeout=0.05)
+
+        await pipeline.arun('How many died?', session_id='s')
+        self.assertEqual(pipeline.answer_cache.stats()['entries'], 0)
+        response = await pipeline.arun('How many died?', session_id='b')
+
+        self.assertEqual(response, 'Which event do you mean?')
+
+
+class TestContextAssembly(unittest.TestCase):
+
+    def setUp(self):
+        # Context assembly needs no vector store
+        self.retriever = Retriever.__new__(Retriever)
+
+    @staticmethod
+    def hit(text, score):
+        return Document(page_content=text, metadata={'source': 'input_text'}), score
+
+    def test_hits_are_ordered_by_score_and_cut_off(self):
+        context, report = self.retriever.assemble_context(
+            [self.hit('low relevance text', 0.1), self.hit('second best', 0.6), self.hit('best match', 0.9)],
+            min_score=0.2,
+        )
+
+        self.assertEqual(context, 'best match\n\nsecond best')
+        self.assertEqual(report['dropped_low_score'], 1)
+
+    def test_near_duplicates_are_dropped_and_window_overlap_trimmed(self):
+        words = [f'word{i}' for i in range(300)]
+        first = ' '.join(words[:150])
+        second = ' '.join(words[120:270])
+        context, report = self.retriever.assemble_context(
+            [self.hit(first, 0.9), self.hit(first + ' extra', 0.8), self.hit(second, 0.7)],
+            min_score=0.0,
+        )
+
+        self.assertEqual(report['dropped_duplicate'], 1)
+        self.assertGreater(report['trimmed_chars'], 0)
+        self.assertEqual(context.split().count('word130'), 1)
+        self.assertIn('word269', context)
+
+    def test_budget_is_respected(self):
+        hits = [self.hit(f'chunk {i} ' + 'x' * 400, 0.9 - i / 100) for i in range(10)]
+
+        context, report = self.retriever.assemble_context(hits, max_tokens=250, min_score=0.0)
+
+        self.assertLessEqual(count_tokens(context), 250)
+        self.assertEqual(report['kept'] + report['dropped_budget'], 10)
+
+    def test_prepare_context_falls_back_when_nothing_is_relevant(self):
+        self.assertEqual(
+            self.retriever.prepare_context([self.hit('text', 0.01)]),
+            'No relevant documents found related this query.',
+        )
+
+    def test_prompt_history_is_trimmed_to_budget(self):
+        history = [('user', 'a' * 800), ('assistant', 'b' * 800), ('user', 'c' * 40), ('assistant', 'd' * 40)]
+
+        prompt, report = get_budgeted_chat_prompt('Question?', history, 'context ' * 100, max_tokens=600)
+
+        self.assertLessEqual(report['total'], 600)
+        self.assertEqual(report['history_messages_dropped'], 2)
+        self.assertNotIn('a' * 800, prompt)
+        self.assertEqual(
+            report['total'], report['system'] + report['context'] + report['history'] + report['query']
+        )
+
+
+class TestLexicalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'lexical.sqlite3')
+        self.index = BM25Index(self.path)
+        self.index.add(
+            ['a', 'b', 'c'],
+            [
+                Document(page_content='Flood in Sylhet displaces thousands', metadata={'source': 's'}),
+                Document(page_content='Dhaka metro rail opens new line in Uttara', metadata={'source': 'd'}),
+                Document(page_content='Cricket: Bangladesh beat India in Mirpur', metadata={'source': 'c'}),
+            ],
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_exact_entities_rank_first(self):
+        results = self.index.search('What happened in Uttara?', k=2)
+
+        self.assertEqual(results[0][0].page_content, 'Dhaka metro rail opens new line in Uttara')
+        self.assertEqual(results[0][0].metadata, {'source': 'd'})
+        self.assertEqual(len(results), 1)
+
+    def test_upsert_and_delete_are_incremental_and_persisted(self):
+        self.index.add(['b'], [Document(page_content='Metro rail fares cut', metadata={'source': 'd'})])
+        self.index.delete(['c'])
+
+        reopened = BM25Index(self.path)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(reopened.search('Uttara'), [])
+        self.assertEqual(reopened.search('Mirpur'), [])
+        self.assertEqual(reopened.search('fares')[0][0].page_content, 'Metro rail fares cut')
+
+    def test_reciprocal_rank_fusion_rewards_agreement(self):
+        a, b, c = (Document(page_content=t) for t in 'abc')
+        fused = reciprocal_rank_fusion([[(a, 0.9), (b, 0.8)], [(b, 3.0), (c, 2.0)]], top_k=3)
+
+        self.assertEqual([doc.page_content for doc, _ in fused], ['b', 'a', 'c'])
+        self.assertLessEqual(fused[0][1], 1.0)
+
+
+class TestHybridRetrieval(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = BM25Index(os.path.join(self.tmp.name, 'lexical.sqlite3'))
+        self.embedding = Mock()
+        with patch('app.api.rag.db.vector_index.Chroma') as mock_chroma:
+            self.store = VectorStore(embedding_model=self.embedding, lexical_index=self.index,
+                                     mode='hybrid', persist_directory=self.tmp.name)
+        self.db = mock_chroma.return_value
+        self.db._select_relevance_score_fn.return_value = lambda distance: 1 - distance
+        self.dense_doc = Document(page_content='Monsoon floods hit the north east', metadata={'source': 'x'})
+        self.db.similarity_search_by_vector_with_relevance_scores.return_value = [(self.dense_doc, 0.2)]
+        self.embedding.embed_documents.return_value = [[0.3, 0.4]]
+        self.store.add([Document(page_content='Sylhet flood toll rises to 12', metadata={'source': 'y'})], ids=['y'])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hybrid_fuses_dense_and_lexical_hits(self):
+        self.embedding.embed_query.return_value = [0.1, 0.2]
+
+        results = self.store.query('Sylhet flood')
+
+        self.assertEqual({doc.page_content for doc, _ in results},
+                         {'Monsoon floods hit the north east', 'Sylhet flood toll rises to 12'})
+
+    def test_irrelevant_dense_hit_is_dropped_despite_its_fused_rank(self):
+        self.embedding.embed_query.return_value = [0.1, 0.2]
+        # Cosine distance 0.95, relevance 0.05
+        self.db.similarity_search_by_vector_with_relevance_scores.return_value = [(self.dense_doc, 0.95)]
+
+        results = self.store.query('Sylhet flood')
+        context, report = Retriever.__new__(Retriever).assemble_context(results, min_score=0.2)
+
+        # Ranked first by the dense index, so its fused score alone would pass
+        self.assertGreater(dict((doc.page_content, score) for doc, score in results)[self.dense_doc.page_content], 0.2)
+        self.assertEqual(report['dropped_low_score'], 1)
+        self.assertEqual(context, 'Sylhet flood toll rises to 12')
+
+    async def test_falls_back_to_lexical_when_embedding_is_down(self):
+        self.embedding.aembed_query = AsyncMock(side_effect=ConnectionError('embedder down'))
+
+        results = await self.store.aquery('Sylhet flood')
+
+        self.assertEqual([doc.page_content for doc, _ in results], ['Sylhet flood toll rises to 12'])
+
+    async def test_falls_back_to_lexical_when_embedding_is_slow(self):
+        async def slow(query):
+            await asyncio.sleep(1)
+            return [0.1, 0.2]
+        self.embedding.aembed_query = AsyncMock(side_effect=slow)
+        self.store.embed_timeout = 0.05
+
+        results = await self.store.aquery('Sylhet flood')
+
+        self.assertEqual([doc.page_content for doc, _ in results], ['Sylhet flood toll rises to 12'])
+        self.db.similarity_search_by_vector_with_relevance_scores.assert_not_called()
+
+
+class TestNumpyIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(1)
+        self.vectors = rng.normal(size=(400, 16)).astype(np.float32)
+        self.ids = [f'doc-{i}' for i in range(len(self.vectors))]
+        self.documents = [Document(page_content=f'text {i}', metadata={'i': i}) for i in range(len(self.vectors))]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_exact_search_upsert_delete_and_reopen(self):
+        index = NumpyIndex(self.tmp.name, index_type='exact')
+        index.upsert(self.ids, self.documents, self.vectors)
+        index.upsert(['doc-3'], [Document(page_content='replaced', metadata={'i': 3})], [self.vectors[3]])
+        index.delete(['doc-5'])
+
+        doc, score = index.search(self.vectors[3], k=1)[0]
+        self.assertEqual(doc.page_content, 'replaced')
+        self.assertAlmostEqual(score, 1.0, places=5)
+        self.assertNotEqual(index.search(self.vectors[5], k=1)[0][0].metadata['i'], 5)
+        self.assertEqual(len(NumpyIndex(self.tmp.name, index_type='exact')), 399)
+
+    def test_slot_reused_while_scoring_is_rescored(self):
+        index = NumpyIndex(self.tmp.name, index_type='exact')
+        index.upsert(self.ids, self.documents, self.vectors)
+        matrix = index._matrix
+        replacement = -self.vectors[3]
+
+        class RacingMatrix:
+            """Lets doc-3's slot go to another document right after the search reads it."""
+            def __getitem__(self, key):
+                data = np.array(matrix[key])
+                index._matrix = matrix
+                index.delete(['doc-3'])
+                index.upsert(['new'], [Document(page_content='new')], [replacement])
+                return data
+
+        index._matrix = RacingMatrix()
+        hits = index.search(self.vectors[3], k=400)
+
+        scores = {doc.page_content: score for doc, score in hits}
+        self.assertNotIn('text 3', scores)
+        self.assertAlmostEqual(scores['new'], -1.0, places=5)
+        self.assertEqual(hits[0][0].page_content, index.search(self.vectors[3], k=1)[0][0].page_content)
+
+    def test_ivf_finds_the_nearest_vectors(self):
+        index = NumpyIndex(self.tmp.name, index_type='ivf', nlist=8, nprobe=4)
+        index.upsert(self.ids, self.documents, self.vectors)
+
+        hits = sum(index.search(self.vectors[i], k=1)[0][0].metadata['i'] == i for i in range(0, 400, 10))
+        self.assertGreaterEqual(hits, 36)
+
+    def test_reader_picks_up_writes_from_another_instance(self):
+        reader = NumpyIndex(self.tmp.name, index_type='exact', refresh_seconds=0)
+        writer = NumpyIndex(self.tmp.name, index_type='exact')
+        writer.upsert(self.ids[:10], self.documents[:10], self.vectors[:10])
+
+        self.assertEqual(reader.search(self.vectors[7], k=1)[0][0].page_content, 'text 7')
+
+
+class TestPartitionedIndex(unittest.TestCase):
+
+    NOW = 1_700_000_000.0  # Tuesday 2023-11-14
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.searched = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def index(self, retention_days=0):
+        def factory(name):
+            index = NumpyIndex(os.path.join(self.tmp.name, 'partitions', name), index_type='exact')
+            search = index.search
+            index.search = lambda *args: self.searched.append(name) or search(*args)
+            return index
+        return PartitionedIndex(factory, self.tmp.name, period='week', retention_days=retention_days)
+
+    def add(self, index, days_ago):
+        ids = [f'{days}d' for days in days_ago]
+        documents = [Document(page_content=f'{days} days old', metadata={'timestamp': self.NOW - days * 86400})
+                     for days in days_ago]
+        index.upsert(ids, documents, np.ones((len(ids), 4), dtype=np.float32))
+
+    def test_search_only_visits_partitions_in_the_window(self):
+        index = self.index()
+        self.add(index, [0, 1, 7, 14, 30])
+        index.upsert(['undated'], [Document(page_content='undated')], [[1, 1, 1, 1]])
+
+        self.assertEqual(index.partitions()[:2], ['week_20231009', 'week_20231030'])
+        hits = index.search([1, 1, 1, 1], k=10, time_range=(self.NOW - 86400, None))
+        self.assertEqual(sorted(d.page_content for d, _ in hits), ['0 days old', '1 days old'])
+        self.assertEqual(self.searched, ['week_20231113'])
+        self.assertEqual(len(index.search([1, 1, 1, 1], k=10)), 6)
+
+    def test_redated_and_deleted_chunks_leave_their_partition(self):
+        index = self.index()
+        self.add(index, [0, 14])
+        index.upsert(['0d'], [Document(page_content='moved', metadata={'timestamp': self.NOW - 14 * 86400})],
+                     [[1, 1, 1, 1]])
+        index.delete(['14d'])
+
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.search([1, 1, 1, 1], k=10, time_range=(self.NOW - 86400, None)), [])
+        self.assertEqual(index.search([1, 1, 1, 1], k=10)[0][0].page_content, 'moved')
+
+    def test_retention_drops_whole_partitions(self):
+        index = self.index()
+        self.add(index, [0, 7, 14, 30])
+        lexical = BM25Index(os.path.join(self.tmp.name, 'lexical.sqlite3'))
+        lexical.add(['0d', '30d'], [Document(page_content='days old', metadata={'timestamp': self.NOW - d * 86400})
+                                   for d in (0, 30)])
+        store = VectorStore(embedding_model=Mock(), lexical_index=lexical, index=index)
+        index.retention_days = 10
+
+        expired = []
+        self.assertEqual(store.apply_retention(now=self.NOW, on_expired=expired.extend), 1)
+        self.assertEqual(expired, ['30d'])
+        self.assertEqual(index.partitions(), ['week_20231030', 'week_20231106', 'week_20231113'])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.tmp.name, 'partitions'))), index.partitions())
+        self.assertEqual(lexical.search('days', k=5)[0][0].metadata['timestamp'], self.NOW)
+        self.assertEqual(len(lexical), 1)
+        # Against the real clock this chunk is long past retention, so it is not written
+        index.upsert(['late'], [Document(page_content='late', metadata={'timestamp': self.NOW})], [[1, 1, 1, 1]])
+        self.assertEqual(len(index), 3)
+
+
+class TestRecencyRetrieval(unittest.TestCase):
+
+    NOW = 1_700_000_000.0
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.documents = [
+            Document(page_content='Sylhet flood toll rises', metadata={'url': 'old', 'timestamp': self.NOW - 10 * 86400}),
+            Document(page_content='Sylhet flood waters recede', metadata={'url': 'new', 'timestamp': self.NOW - 3600}),
+            Document(page_content='Sylhet flood relief arrives', metadata={'url': 'undated'}),
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_time_window_is_inferred_from_the_query(self):
+        since, until = infer_time_range('What happened in Sylhet yesterday?', now=self.NOW)
+        self.assertEqual(until - since, 86400)
+        self.assertEqual(infer_time_range('flood news from the past 3 days', now=self.NOW), (self.NOW - 3 * 86400, None))
+        self.assertIsNone(infer_time_range('Sylhet flood toll', now=self.NOW))
+
+    def test_indexes_only_search_the_window(self):
+        lexical = BM25Index(os.path.join(self.tmp.name, 'lexical.sqlite3'))
+        lexical.add(['old', 'new', 'undated'], self.documents)
+        dense = NumpyIndex(self.tmp.name, index_type='exact')
+        dense.upsert(['old', 'new', 'undated'], self.documents, np.eye(3, dtype=np.float32) + 0.1)
+        window = (self.NOW - 86400, None)
+
+        self.assertEqual([d.metadata['url'] for d, _ in lexical.search('Sylhet flood', k=3, time_range=window)], ['new'])
+        self.assertEqual([d.metadata['url'] for d, _ in dense.search([1, 1, 1], k=3, time_range=window)], ['new'])
+        self.assertEqual(len(dense.search([1, 1, 1], k=3)), 3)
+
+    def test_time_decay_promotes_fresh_hits_in_close_calls(self):
+        store = VectorStore.__new__(VectorStore)
+        store.top_k, store.half_life_hours, store.recency_weight, store.reranker = 3, 72, 0.3, None
+        old, new, undated = self.documents
+
+        ranked = store._rank([(old, 0.80), (new, 0.75), (undated, 0.78)], now=self.NOW)
+        self.assertEqual([d.metadata['url'] for d, _ in ranked], ['new', 'undated', 'old'])
+        ranked = store._rank([(old, 0.95), (new, 0.40)], now=self.NOW)
+        self.assertEqual(ranked[0][0].metadata['url'], 'old')
+
+    def test_context_chunks_are_attributed(self):
+        retriever = Retriever.__new__(Retriever)
+        doc = Document(page_content='Waters recede.', metadata={'url': 'https://n.example/1', 'title': 'Flood update',
+                                                               'timestamp': self.NOW})
+
+        context, _ = retriever.assemble_context([(doc, 0.9)])
+
+        self.assertEqual(context, '[Source: Flood update | https://n.example/1 | 2023-11-14]\nWaters recede.')
+
+
+class TestReranker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.hits = [
+            (Document(page_content='Flood relief reaches Sunamganj villages'), 0.9),
+            (Document(page_content='Cricket series opens in Chattogram'), 0.8),
+            (Document(page_content='Sylhet flood waters recede, says Karim Uddin'), 0.7),
+            (Document(page_content='Sylhet flood waters recede, Karim Uddin says'), 0.6),
+        ]
+
+    class SlowScorer(Scorer):
+        def __init__(self, delay):
+            self.delay = delay
+            self.batches = []
+
+        def score(self, query, texts):
+            self.batches.append(list(texts))
+            time.sleep(self.delay)
+            return [float('Sylhet' in text) for text in texts]
+
+    def test_lexical_rerank_orders_by_query_terms_and_memoizes(self):
+        scorer = Mock(wraps=LexicalScorer())
+        reranker = Reranker(scorer, batch_size=3, cache=ScoreCache(), budget_seconds=5)
+
+        ranked = reranker.rerank('What did Karim Uddin say about the Sylhet flood?', self.hits)
+        self.assertTrue(ranked[0][0].page_content.startswith('Sylhet flood'))
+        self.assertEqual(ranked[-1][0].page_content, 'Cricket series opens in Chattogram')
+        self.assertEqual([len(c.args[1]) for c in scorer.score.call_args_list], [3, 1])
+
+        reranker.rerank('what did Karim Uddin say about the Sylhet flood', self.hits)
+        self.assertEqual(scorer.score.call_count, 2)
+        self.assertEqual(reranker.stats()['cache_hits'], 4)
+
+    def test_over_budget_keeps_first_stage_order_and_fills_the_memo(self):
+        scorer = self.SlowScorer(0.2)
+        reranker = Reranker(scorer, cache=ScoreCache(), budget_seconds=0.05)
+
+        self.assertEqual(reranker.rerank('Sylhet', self.hits), self.hits)
+        time.sleep(0.3)
+        self.assertEqual(reranker.rerank('Sylhet', self.hits)[0][0].page_content, self.hits[2][0].page_content)
+        self.assertEqual(reranker.stats()['degraded'], 1)
+        self.assertEqual(len(scorer.batches), 1)
+
+    async def test_async_rerank_respects_the_budget(self):
+        self.assertEqual(await Reranker(self.SlowScorer(0.2), budget_seconds=0.05).arerank('Sylhet', self.hits), self.hits)
+        ranked = await Reranker(self.SlowScorer(0.0), batch_size=2).arerank('Sylhet', self.hits)
+        self.assertEqual({doc.page_content for doc, _ in ranked[:2]}, {doc.page_content for doc, _ in self.hits[2:]})
+
+    def test_mmr_skips_near_duplicates(self):
+        reranker = Reranker(LexicalScorer(), mmr_lambda=0.5)
+        ranked = [(self.hits[i][0], score) for i, score in ((2, 0.9), (3, 0.85), (0, 0.6), (1, 0.2))]
+
+        picked = reranker.select(ranked, 2)
+        self.assertEqual([doc.page_content for doc, _ in picked], [self.hits[2][0].page_content, self.hits[0][0].page_content])
+        self.assertEqual(Reranker(LexicalScorer()).select(ranked, 2), ranked[:2])
+
+
+class TestSessionStore(unittest.TestCase):
+
+    def test_trim_history_keeps_most_recent_turns(self):
+        history = [('user', 'a' * 40), ('assistant', 'b' * 40), ('user', 'c' * 40), ('assistant', 'd' * 40)]
+        self.assertEqual(trim_history(history, 25), history[2:])
+
+    def test_history_is_capped_by_token_budget(self):
+        store = SessionStore(max_history_tokens=30)
+        for i in range(10):
+            store.append('s', f'question {i} ' * 3, f'answer {i} ' * 3)
+
+        history = store.get_history('s')
+        self.assertEqual(history[-1][1], 'answer 9 ' * 3)
+        self.assertEqual(history[0][0], 'user')
+        self.assertLess(len(history), 20)
+
+    def test_least_recently_used_session_is_evicted(self):
+        store = SessionStore(max_sessions=2)
+        store.append('a', 'q', 'r')
+        store.append('b', 'q', 'r')
+        store.get_history('a')
+        store.append('c', 'q', 'r')
+
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get_history('b'), [])
+        self.assertNotEqual(store.get_history('a'), [])
+
+    @patch('app.api.rag.db.session_store.time.monotonic')
+    def test_idle_sessions_expire(self, mock_monotonic):
+        store = SessionStore(ttl_seconds=60)
+        mock_monotonic.return_value = 0
+        store.append('a', 'q', 'r')
+        mock_monotonic.return_value = 61
+
+        self.assertEqual(store.get_history('a'), [])
+        self.assertEqual(len(store), 0)
+
+    def test_redis_store_trims_and_refreshes_ttl_in_one_transaction(self):
+        mock_client = Mock()
+        pipe = Mock()
+        pipe.lrange.return_value = ['["user", "' + 'x' * 80 + '"]', '["assistant", "y"]']
+        mock_client.transaction.side_effect = lambda func, *keys: func(pipe)
+        store = RedisSessionStore(redis_client=mock_client, max_history_tokens=10, ttl_seconds=60)
+
+        store.append('s', 'q', 'r')
+
+        # The session key is WATCHed, and push, trim and expire all follow MULTI
+        self.assertEqual(mock_client.transaction.call_args.args[1:], ('session:s',))
+        self.assertEqual([name for name, _, _ in pipe.method_calls],
+                         ['lrange', 'multi', 'rpush', 'ltrim', 'expire'])
+        pipe.rpush.assert_called_once_with('session:s', '["user", "q"]', '["assistant", "r"]')
+        pipe.ltrim.assert_called_once_with('session:s', 2, -1)
+        pipe.expire.assert_called_once_with('session:s', 60)
+
+
+class FakeRedisDB:
+    """In-memory stand-in for RedisDB with the same scraped-content layout."""
+
+    def __init__(self):
+        self.contents = {}
+        self.state = {}
+        self.locks = {}
+        self.jobs = {}
+
+    def put(self, url, content, scraped_at):
+        self.contents[url] = {'url': url, 'content': content, 'scraped_at': scraped_at,
+                              'content_length': str(len(content))}
+
+    def scan_scraped_urls(self, cursor=0, count=500):
+        # Two SSCAN steps that overlap by one URL, like a real rehashing scan
+        urls = sorted(self.contents)
+        if cursor == 0 and len(urls) > 1:
+            return 1, urls[:len(urls) // 2 + 1]
+        return 0, urls[len(urls) // 2:] if len(urls) > 1 else urls
+
+    def get_contents(self, urls):
+        return [self.contents.get(url) for url in urls]
+
+    def get_watermarks(self, urls):
+        return [
+            {'scraped_at': data['scraped_at'], 'content_length': data['content_length']} if data else None
+            for data in (self.contents.get(url) for url in urls)
+        ]
+
+    def get_ingest_records(self, urls):
+        return [dict(self.state[url]) if url in self.state else None for url in urls]
+
+    def scan_ingest_state(self, cursor=0, count=500):
+        # Overlapping HSCAN steps, as for scraped URLs
+        urls = sorted(self.state)
+        if cursor == 0 and len(urls) > 1:
+            return 1, {url: dict(self.state[url]) for url in urls[:len(urls) // 2 + 1]}
+        return 0, {url: dict(self.state[url]) for url in (urls[len(urls) // 2:] if len(urls) > 1 else urls)}
+
+    def set_ingest_records(self, records):
+        self.state.update(records)
+
+    def delete_ingest_records(self, urls):
+        for url in urls:
+            self.state.pop(url, None)
+
+    def bump_ingest_generation(self):
+        self.generation = getattr(self, 'generation', 0) + 1
+        return self.generation
+
+    def acquire_lock(self, key, token, ttl_seconds):
+        return self.locks.setdefault(key, token) == token
+
+    def refresh_lock(self, key, token, ttl_seconds):
+        return self.locks.get(key) == token
+
+    def release_lock(self, key, token):
+        if self.locks.get(key) != token:
+            return False
+        del self.locks[key]
+        return True
+
+    def get_lock_holder(self, key):
+        return self.locks.get(key)
+
+    def set_job(self, job_id, fields, ttl_seconds):
+        self.jobs.setdefault(job_id, {}).update(fields)
+
+    def get_job(self, job_id):
+        return dict(self.jobs[job_id]) if job_id in self.jobs else None
+
+
+class TestRedisBulkFetch(unittest.TestCase):
+
+    def setUp(self):
+        with patch('app.api.rag.db.redis_client.redis.Redis') as mock_redis:
+            self.mock_client = Mock()
+            mock_redis.return_value = self.mock_client
+            self.db = RedisDB()
+
+    def test_scan_step_and_contents_use_sscan_and_pipelined_hgetall(self):
+        self.mock_client.sscan.return_value = (7, ['http://a', 'http://b'])
+        pipe = self.mock_client.pipeline.return_value
+        pipe.execute.return_value = [{'content': 'A'}, {}]
+
+        cursor, urls = self.db.scan_scraped_urls(0, 2)
+
+        self.assertEqual((cursor, urls), (7, ['http://a', 'http://b']))
+        self.mock_client.sscan.assert_called_once_with('scraped_urls', cursor=0, count=2)
+        self.assertEqual(self.db.get_contents(urls), [{'content': 'A'}, None])
+        self.assertEqual(pipe.hgetall.call_count, 2)
+        self.mock_client.hgetall.assert_not_called()
+
+    def test_ingest_records_are_read_per_batch(self):
+        self.mock_client.hmget.return_value = ['{"ids": ["x"]}', None]
+        self.mock_client.hscan.return_value = (0, {'http://a': '{"ids": ["x"]}'})
+
+        records = self.db.get_ingest_records(['http://a', 'http://b'])
+        cursor, scanned = self.db.scan_ingest_state(0, 100)
+
+        self.assertEqual(records, [{'ids': ['x']}, None])
+        self.mock_client.hmget.assert_called_once_with(RedisDB.INGEST_STATE_KEY, ['http://a', 'http://b'])
+        self.assertEqual((cursor, scanned), (0, {'http://a': {'ids': ['x']}}))
+        self.mock_client.hgetall.assert_not_called()
+
+
+class TestIncrementalIngestion(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = FakeRedisDB()
+        self.retriever = Mock()
+        self.retriever.create_documents.side_effect = lambda text, metadata=None: [
+            Document(page_content=part, metadata=metadata) for part in text.split('|')
+        ]
+        self.retriever.apply_retention.return_value = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dedup = DedupIndex(os.path.join(self.tmp.name, 'dedup.sqlite3'))
+        self.ingestor = Ingestor(redis_client=self.redis, retriever=self.retriever, dedup_index=self.dedup)
+
+    def ingested_ids(self):
+        return [i for c in self.retriever.ingest.call_args_list for i in c.kwargs['ids']]
+
+    def test_first_run_ingests_everything_with_stable_ids(self):
+        self.redis.put('http://a', 'one|two', 't1')
+        self.redis.put('http://b', 'three', 't1')
+
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['urls_new'], 2)
+        self.assertEqual(summary['docs_ingested'], 3)
+        self.assertEqual(len(set(self.ingested_ids())), 3)
+        self.assertEqual(set(self.redis.state), {'http://a', 'http://b'})
+
+    def test_unchanged_urls_are_skipped_without_reading_content(self):
+        self.redis.put('http://a', 'one|two', 't1')
+        self.ingestor.ingest()
+        self.retriever.reset_mock()
+        self.redis.get_contents = Mock(side_effect=AssertionError('content should not be read'))
+
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['status'], 'nothing_to_ingest')
+        self.assertEqual(summary['urls_unchanged'], 1)
+        self.retriever.ingest.assert_not_called()
+
+    def test_changed_url_is_upserted_and_shrunk_chunks_deleted(self):
+        self.redis.put('http://a', 'one|two|three', 't1')
+        self.ingestor.ingest()
+        first_ids = self.ingested_ids()
+        self.retriever.reset_mock()
+
+        self.redis.put('http://a', 'one|changed', 't2')
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['urls_changed'], 1)
+        self.assertEqual(self.ingested_ids()[0], first_ids[0])
+        self.assertNotIn(self.ingested_ids()[1], first_ids)
+        self.retriever.delete_documents.assert_called_once_with(first_ids[1:])
+
+    def test_rescraped_but_identical_content_only_moves_watermark(self):
+        self.redis.put('http://a', 'one', 't1')
+        self.ingestor.ingest()
+        self.retriever.reset_mock()
+
+        self.redis.put('http://a', 'one', 't2')
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['urls_unchanged'], 1)
+        self.retriever.ingest.assert_not_called()
+        self.assertEqual(self.redis.state['http://a']['watermark']['scraped_at'], 't2')
+
+    def test_iter_data_streams_each_url_once(self):
+        for i in range(5):
+            self.redis.put(f'http://{i}', f'text {i}', 't1')
+
+        items = list(self.ingestor.iter_data())
+
+        self.assertEqual(sorted(item['url'] for item in items), [f'http://{i}' for i in range(5)])
+
+    def test_failed_batch_read_does_not_delete_urls(self):
+        self.redis.put('http://a', 'one', 't1')
+        self.ingestor.ingest()
+        self.retriever.reset_mock()
+        self.ingestor.max_retries = 1
+        self.redis.get_watermarks = Mock(side_effect=ConnectionError('redis down'))
+
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['urls_removed'], 0)
+        self.retriever.delete_documents.assert_not_called()
+        self.assertIn('http://a', self.redis.state)
+
+    def test_removed_urls_are_deleted(self):
+        self.redis.put('http://a', 'one|two', 't1')
+        self.ingestor.ingest()
+        ids = self.ingested_ids()
+        del self.redis.contents['http://a']
+
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['urls_removed'], 1)
+        self.retriever.delete_documents.assert_called_once_with(ids)
+        self.assertEqual(self.redis.state, {})
+
+    def test_removals_found_by_overlapping_state_scan_are_deleted_once(self):
+        for url in ['http://a', 'http://b', 'http://c']:
+            self.redis.put(url, url[-1], 't1')
+        self.ingestor.ingest()
+        self.retriever.reset_mock()
+        del self.redis.contents['http://b']
+        del self.redis.contents['http://c']
+
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['urls_found'], 1)
+        self.assertEqual(summary['urls_removed'], 2)
+        deleted = [i for c in self.retriever.delete_documents.call_args_list for i in c.args[0]]
+        self.assertEqual(len(deleted), len(set(deleted)))
+        self.assertEqual(set(self.redis.state), {'http://a'})
+
+    def test_embeddings_are_computed_once_and_passed_to_the_store(self):
+        self.retriever.embed_documents.side_effect = lambda docs: [[float(len(d.page_content))] for d in docs]
+        self.redis.put('http://a', 'one|two', 't1')
+
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(self.retriever.ingest.call_args.kwargs['embeddings'], [[3.0], [3.0]])
+        self.assertEqual(summary['stages']['write']['items_in'], 1)
+
+    def test_write_batches_are_bounded(self):
+        self.ingestor.write_batch_size = 2
+        for i in range(5):
+            self.redis.put(f'http://{i}', f'x{i}|y{i}', 't1')
+
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['docs_ingested'], 10)
+        self.assertTrue(all(len(c.args[0]) <= 2 for c in self.retriever.ingest.call_args_list))
+
+    def test_stage_failure_is_raised_and_records_are_not_written(self):
+        self.retriever.embed_documents.side_effect = RuntimeError('embedder down')
+        self.redis.put('http://a', 'one', 't1')
+
+        with self.assertRaises(IngestorError):
+            self.ingestor.ingest()
+        self.assertEqual(self.redis.state, {})
+
+    def test_boilerplate_repeated_across_articles_is_embedded_once(self):
+        footer = ('Read more news from Dhaka and the rest of the country on our website every day, '
+                  'follow us on Facebook and subscribe to the newsletter for breaking news alerts')
+        self.redis.put('http://a', f'Flood waters recede in Sylhet|{footer}', 't1')
+        self.redis.put('http://b', f'Metro fares rise in Dhaka|{footer}|{footer}', 't1')
+        self.redis.put('http://c', f'Garment workers protest|{footer.replace("every day", "daily")}', 't1')
+
+        summary = self.ingestor.ingest()
+
+        texts = [d.page_content for c in self.retriever.ingest.call_args_list for d in c.args[0]]
+        self.assertEqual(sum('Read more' in text for text in texts), 1)
+        self.assertEqual(summary['docs_duplicate'], 3)
+        self.assertEqual(len(set(self.ingested_ids())), len(self.ingested_ids()))
+
+    def test_released_chunks_can_be_indexed_again(self):
+        self.redis.put('http://a', 'shared text', 't1')
+        self.ingestor.ingest()
+        del self.redis.contents['http://a']
+        self.ingestor.ingest()
+        self.retriever.reset_mock()
+
+        self.redis.put('http://b', 'shared text', 't1')
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['docs_ingested'], 1)
+
+    def test_skipped_copy_is_indexed_once_its_owner_is_removed(self):
+        self.redis.put('http://a', 'Flood toll|shared wire report', 't1')
+        self.redis.put('http://b', 'Fare rise|shared wire report', 't1')
+        self.ingestor.ingest()
+        self.assertEqual(self.redis.state['http://b']['ids'], self.ingested_ids()[2:3])
+        self.retriever.reset_mock()
+
+        del self.redis.contents['http://a']
+        summary = self.ingestor.ingest()
+        self.assertEqual(summary['urls_requeued'], 1)
+        self.ingestor.ingest()
+
+        texts = [d.page_content for c in self.retriever.ingest.call_args_list for d in c.args[0]]
+        self.assertEqual(texts, ['Fare rise', 'shared wire report'])
+        self.assertEqual(self.redis.state['http://b']['ids'], self.ingested_ids())
+        self.assertEqual(self.dedup.orphaned_sources(), [])
+
+    def test_retention_releases_expired_chunks(self):
+        self.redis.put('http://a', 'shared text', 't1')
+        self.ingestor.ingest()
+        expired = self.ingested_ids()
+        self.retriever.apply_retention.side_effect = lambda on_expired: on_expired(expired) or 1
+        self.assertEqual(self.ingestor.ingest()['partitions_dropped'], 1)
+        self.retriever.apply_retention.side_effect = None
+
+        self.redis.put('http://b', 'shared text', 't1')
+        summary = self.ingestor.ingest()
+
+        self.assertEqual(summary['docs_ingested'], 1)
+
+    def test_parallel_splitter_splits_articles_in_batches(self):
+        splitter = ParallelSplitter(mode='sentence', chunk_size=40, chunk_overlap=0, workers=0, task_size=2)
+        ingestor = Ingestor(
+            redis_client=self.redis, retriever=self.retriever, dedup_index=self.dedup, splitter=splitter,
+        )
+        self.redis.put('http://a', 'Rain fell in Sylhet. Rivers rose overnight.', 't1')
+        self.redis.put('http://b', 'Fares rose in Dhaka.', 't1')
+        self.redis.put('http://c', ' ', 't1')
+
+        summary = ingestor.ingest()
+
+        self.retriever.create_documents.assert_not_called()
+        docs = [d for c in self.retriever.ingest.call_args_list for d in c.args[0]]
+        self.assertEqual(summary['docs_ingested'], 3)
+        self.assertEqual([d.page_content for d in docs if d.metadata['url'] == 'http://a'],
+                         ['Rain fell in Sylhet.', 'Rivers rose overnight.'])
+
+    def test_chunks_carry_url_title_and_timestamps(self):
+        self.redis.put('http://a', 'one|two', '2024-05-01T10:00:00+00:00')
+        self.redis.contents['http://a']['title'] = 'Flood update'
+
+        self.ingestor.ingest()
+
+        metadata = self.retriever.ingest.call_args.args[0][0].metadata
+        self.assertEqual(metadata['url'], 'http://a')
+        self.assertEqual(metadata['title'], 'Flood update')
+        self.assertEqual(metadata['scraped_at'], 1714557600.0)
+        self.assertEqual(metadata['timestamp'], 1714557600.0)
+
+
+class TestDedupIndex(unittest.TestCase):
+
+    TEXT = ('Floodwaters in Sylhet began to recede on Tuesday after a week of heavy rain, '
+            'officials said, as relief reached thousands of displaced families in Sunamganj.')
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = DedupIndex(os.path.join(self.tmp.name, 'dedup.sqlite3'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_minhash_is_similar_for_near_duplicates_only(self):
+        near = self.TEXT.replace('Tuesday', 'Wednesday')
+        other = 'The cricket board named a new captain for the home series against Sri Lanka next month.'
+        self.assertGreaterEqual((minhash(self.TEXT) == minhash(near)).mean(), 0.7)
+        self.assertLess((minhash(self.TEXT) == minhash(other)).mean(), 0.2)
+        self.assertIsNone(minhash('Read more'))
+
+    def test_exact_and_near_duplicates_are_skipped_but_own_ids_kept(self):
+        docs = [Document(page_content=text) for text in (
+            self.TEXT, self.TEXT.upper(), self.TEXT + ' Read more.', 'Cricket captain named.',
+        )]
+
+        self.assertEqual(self.index.filter(['a', 'b', 'c', 'd'], docs), [0, 3])
+        self.assertEqual(self.index.filter(['a'], docs[:1]), [0])
+        self.assertEqual(self.index.filter(['e'], docs[:1], ignore=['a']), [0])
+        self.index.release(['a', 'e'])
+        self.assertEqual(self.index.filter(['b'], docs[1:2]), [0])
+
+
+class TestTextSplitting(unittest.TestCase):
+
+    TEXT = ('Floodwaters in Sylhet began to recede on Tuesday. Relief reached Sunamganj! '
+            'Officials said more rain is expected? ' * 20)
+
+    def test_sentence_splitter_packs_whole_sentences_with_overlap(self):
+        chunks = SentenceSplitter(chunk_size=120, chunk_overlap=40).split_text(self.TEXT)
+
+        self.assertTrue(all(len(chunk) <= 120 for chunk in chunks))
+        self.assertTrue(all(chunk[-1] in '.!?' for chunk in chunks))
+        # The last sentence of a chunk fits in the overlap and opens the next one
+        self.assertTrue(chunks[0].endswith('Officials said more rain is expected?'))
+        self.assertTrue(chunks[1].startswith('Officials said more rain is expected?'))
+
+    def test_sentence_splitter_cuts_long_sentences_at_whitespace(self):
+        chunks = SentenceSplitter(chunk_size=50, chunk_overlap=0).split_text('word ' * 40)
+
+        self.assertTrue(all(len(chunk) <= 50 for chunk in chunks))
+        self.assertEqual(' '.join(chunks).split(), ['word'] * 40)
+
+    def test_worker_pool_matches_inline_splitting_in_order(self):
+        texts = [f'Article {i}. ' + self.TEXT for i in range(6)]
+        inline = ParallelSplitter(mode='recursive', workers=0).split(texts)
+        pooled = ParallelSplitter(mode='recursive', workers=2, task_size=2)
+        self.addCleanup(pooled.close)
+
+        self.assertEqual(pooled.split(texts), inline)
+        self.assertTrue(inline[0][0].startswith('Article 0.'))
+
+
+class RecordingSplitter(ParallelSplitter):
+    """ParallelSplitter noting whether a split went to its worker pool."""
+
+    pooled = False
+
+    def _get_pool(self):
+        pool = super()._get_pool()
+        self.pooled = self.pooled or pool is not None
+        return pool
+
+
+def _ingest_in_job_process(job_id, full):
+    """Stands in for run_ingest_job in a job process: ingests with a pooled splitter, exits 0 if the pool ran."""
+    from app.api.rag.jobs import run_ingest_job
+
+    with tempfile.TemporaryDirectory() as tmp:
+        redis = FakeRedisDB()
+        for i in range(6):
+            redis.put(f'http://{i}', f'Article {i}. ' + 'Some words here. ' * 20, 't1')
+        retriever = Mock()
+        retriever.create_documents.side_effect = lambda text, metadata=None: [Document(page_content=text)]
+        retriever.embed_documents.side_effect = lambda docs: [[1.0] for _ in docs]
+        retriever.apply_retention.return_value = 0
+        splitter = RecordingSplitter(mode='recursive', workers=2, task_size=2)
+        ingestor = Ingestor(redis_client=redis, retriever=retriever,
+                            dedup_index=DedupIndex(os.path.join(tmp, 'dedup.sqlite3')), splitter=splitter)
+        run_ingest_job(job_id, full, redis_client=redis, ingestor=ingestor)
+        sys.exit(0 if splitter.pooled and redis.get_job(job_id)['status'] == 'succeeded' else 1)
+
+
+class TestIngestJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = FakeRedisDB()
+        self.retriever = Mock()
+        self.retriever.create_documents.side_effect = lambda text, metadata=None: [
+            Document(page_content=part, metadata=metadata) for part in text.split('|')
+        ]
+        self.retriever.apply_retention.return_value = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dedup = DedupIndex(os.path.join(self.tmp.name, 'dedup.sqlite3'))
+        self.ingestor = Ingestor(redis_client=self.redis, retriever=self.retriever, dedup_index=self.dedup)
+        self.manager = IngestJobManager(redis_client=self.redis, mode='thread', ingestor=self.ingestor)
+
+    def wait(self, job_id):
+        for _ in range(200):
+            job = self.manager.get(job_id)
+            if job['status'] not in ('queued', 'running'):
+                return job
+            time.sleep(0.01)
+        self.fail('job did not finish')
+
+    def test_process_job_can_use_the_splitter_pool(self):
+        spawn = multiprocessing.get_context('spawn')
+        workers = []
+
+        def process(*args, **kwargs):
+            workers.append(multiprocessing.context.SpawnProcess(*args, **kwargs))
+            return workers[-1]
+
+        manager = IngestJobManager(redis_client=self.redis, mode='process')
+        with patch('app.api.rag.jobs.run_ingest_job', _ingest_in_job_process), \
+                patch.object(spawn, 'Process', side_effect=process):
+            manager.start()
+        workers[0].join(120)
+
+        self.assertFalse(workers[0].daemon)
+        self.assertEqual(workers[0].exitcode, 0)
+
+    def test_job_reports_progress_and_releases_lock(self):
+        self.redis.put('http://a', 'one|two', 't1')
+
+        job = self.wait(self.manager.start())
+
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['phase'], 'done')
+        self.assertEqual(job['docs_processed'], 2)
+        self.assertIn('docs_per_sec', job)
+        self.assertIsNone(self.manager.current())
+
+    def test_second_job_is_rejected_while_one_holds_the_lock(self):
+        self.redis.acquire_lock('ingest:lock', 'other-job', 60)
+
+        with self.assertRaises(IngestJobRunning) as ctx:
+            self.manager.start()
+        self.assertEqual(ctx.exception.job_id, 'other-job')
+
+    def test_failure_is_recorded_and_lock_released(self):
+        self.redis.put('http://a', 'one', 't1')
+        self.retriever.ingest.side_effect = RuntimeError('store down')
+
+        job = self.wait(self.manager.start())
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('store down', job['errors'][0]['message'])
+        self.assertEqual(self.redis.locks, {})
+
+    def test_job_without_lock_is_reported_as_lost(self):
+        self.redis.set_job('dead', {'job_id': 'dead', 'status': 'running', 'errors': []}, 60)
+
+        job = self.manager.get('dead')
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['errors'][-1]['type'], 'WorkerLost')
+
+
+class TestStagedPipeline(unittest.TestCase):
+
+    def test_stages_run_in_order_and_flush(self):
+        out = []
+        buffer = []
+
+        def batch(item):
+            buffer.append(item)
+            if len(buffer) == 3:
+                result = [list(buffer)]
+                buffer.clear()
+                return result
+            return []
+
+        pipeline = StagedPipeline(
+            source=range(7),
+            stages=[
+                Stage('double', lambda x: [x * 2]),
+                Stage('batch', batch, lambda: [list(buffer)] if buffer else []),
+                Stage('sink', lambda b: out.append(b)),
+            ],
+            queue_size=1,
+        )
+        report = pipeline.run()
+
+        self.assertEqual(out, [[0, 2, 4], [6, 8, 10], [12]])
+        self.assertEqual(report['fetch']['items_out'], 7)
+        self.assertEqual(report['batch']['items_out'], 3)
+
+    def test_source_is_throttled_by_a_slow_stage(self):
+        produced = []
+        consumed = []
+        gaps = []
+
+        def source():
+            for i in range(50):
+                produced.append(i)
+                yield i
+
+        def slow(item):
+            gaps.append(len(produced) - len(consumed))
+            consumed.append(item)
+            return []
+
+        StagedPipeline(source=source(), stages=[Stage('slow', slow)], queue_size=2).run()
+
+        self.assertEqual(len(consumed), 50)
+        # Never more than the queue plus the items in hand run ahead
+        self.assertLessEqual(max(gaps), 4)
+
+    def test_first_error_stops_the_pipeline(self):
+        def source():
+            i = 0
+            while True:
+                yield i
+                i += 1
+
+        def boom(item):
+            if item == 5:
+                raise ValueError('bad item')
+            return [item]
+
+        pipeline = StagedPipeline(source=source(), stages=[Stage('boom', boom)], queue_size=2)
+        with self.assertRaises(ValueError):
+            pipeline.run()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,7 @@ import React, { useState, useRef, useEffect } from 'react'
 import { Send, RotateCcw } from 'lucide-react'
 import MessageBubble from './MessageBubble'
 import Loader from './Loader'
-import { sendMessageStream } from '@/services/api'
+import { sendMessageStream, generateSessionId } from '@/services/api'
 
 interface Message {
   id: string
@@ -25,6 +25,7 @@ export default function ChatBox() {
   const [inputText, setInputText] = useState('')
   const [isLoading, setIsLoading] = useState(false)
   const messagesEndRef = useRef<HTMLDivElement>(null)
+  const sessionIdRef = useRef<string>(generateSessionId())
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
@@ -59,18 +60,18 @@ export default function ChatBox() {
     let firstTokenReceived = false // reset per message
 
     try {
-      await sendMessageStream(currentQuery, (token: string) => {
+      await sendMessageStream(currentQuery, sessionIdRef.current, (token: string) => {
         // Hide loader on first token
         if (!firstTokenReceived) {
           setIsLoading(false)
           firstTokenReceived = true
         }
 
-        // Append token with a space for proper word spacing
+        // Tokens arrive with their own spacing from the model
         setMessages(prev =>
           prev.map(msg =>
             msg.id === botMessageId
-              ? { ...msg, text: msg.text + token + " " }
+              ? { ...msg, text: msg.text + token }
               : msg
           )
         )
@@ -90,6 +91,8 @@ export default function ChatBox() {
   }
 
   const clearChat = () => {
+    // Start a fresh conversation on the backend as well
+    sessionIdRef.current = generateSessionId()
     setMessages([{
       id: '1',
       text: "Chat cleared! Ready to verify your news or rumors with credible sources.",
@@ -41,9 +41,10 @@ apiClient.interceptors.response.use(
 // ----------------------------
 export async function sendMessageStream(
   query: string,
+  sessionId: string,
   onMessage: (token: string) => void
 ): Promise<void> {
-  const url = `http://127.0.0.1:8000/api/chat/stream?query=${encodeURIComponent(query)}`;
+  const url = `http://127.0.0.1:8000/api/chat/stream?query=${encodeURIComponent(query)}&session_id=${encodeURIComponent(sessionId)}`;
 
   const response = await fetch(url, {
     method: "GET",
@@ -58,23 +59,31 @@ export async function sendMessageStream(
 
   const reader = response.body.getReader();
   const decoder = new TextDecoder("utf-8");
+  let buffer = "";
 
   try {
     while (true) {
       const { value, done } = await reader.read();
       if (done) break;
 
-      const chunk = decoder.decode(value, { stream: true });
-      const lines = chunk.split("\n");
+      buffer += decoder.decode(value, { stream: true });
 
-      for (const line of lines) {
-        if (line.startsWith("data: ")) {
-          const data = line.replace("data: ", "").trim();
-          if (data === "[DONE]") {
-            return;
-          }
-          onMessage(data);
+      // Events are separated by a blank line; keep any partial event buffered
+      const events = buffer.split("\n\n");
+      buffer = events.pop() ?? "";
+
+      for (const event of events) {
+        // Tokens keep their own whitespace; multi-line tokens span several data lines
+        const data = event
+          .split("\n")
+          .filter((line) => line.startsWith("data: "))
+          .map((line) => line.slice("data: ".length))
+          .join("\n");
+
+        if (data === "[DONE]") {
+          return;
         }
+        onMessage(data);
       }
     }
   } finally {
@@ -0,0 +1,112 @@
+"""
+Benchmark: two-phase crawl-then-scrape vs the fused crawl-and-scrape pass.
+
+The two-phase run is the old main.py flow: the crawler downloads every page
+for its links, then WebScraper downloads each discovered page again for its
+content. The fused run parses each page once for both and stores it as it
+goes. Both write to an in-memory stand-in for RedisDB and crawl the same
+local stub sites; the report shows requests per stored page, total time and
+the time until the first page was stored.
+
+    python cookbook/pipeline_benchmark.py --domains 2 --pages 20
+    python cookbook/pipeline_benchmark.py --domains 4 --pages 50 --skip-two-phase
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.crawler import AsyncURLCrawler  # noqa: E402
+from src.pipeline import CrawlScraper  # noqa: E402
+from src.scrapper import WebScraper  # noqa: E402
+from stub_site import run_in_thread  # noqa: E402
+
+
+class MemoryDB:
+    """RedisDB stand-in recording when each page was stored."""
+
+    def __init__(self):
+        self.stored = {}
+
+    def is_url_scraped(self, url):
+        return url in self.stored
+
+    def get_content(self, url):
+        return None
+
+    def store_content(self, url, content, title="", published_at=""):
+        self.stored[url] = time.monotonic()
+        return True
+
+    def get_validators(self, url):
+        return {}
+
+    def get_validators_many(self, urls):
+        return [{} for _ in urls]
+
+    def store_validators(self, url, etag="", last_modified=""):
+        return True
+
+    def store_links(self, url, links):
+        return True
+
+
+def two_phase(sites, args, db):
+    crawler = AsyncURLCrawler()
+    scraper = WebScraper()
+    scraper.db = db
+    for worker in (crawler, scraper):
+        worker.request_delay = args.delay
+    crawler.max_pages_per_domain = args.pages
+    # Both pipelines walk links rather than the stub's sitemaps, so only the fetch pattern differs
+    crawler.feed_paths = []
+    logging.getLogger().setLevel(logging.WARNING)
+    urls = crawler.crawl_multiple_domains([url for url, _ in sites])
+    scraper.scrape_urls(list(urls))
+
+
+def fused(sites, args, db):
+    crawler = CrawlScraper(db=db)
+    crawler.request_delay = args.delay
+    crawler.max_pages_per_domain = args.pages
+    crawler.feed_paths = []
+    logging.getLogger().setLevel(logging.WARNING)
+    crawler.run([url for url, _ in sites])
+
+
+def main(args):
+    sites = [
+        run_in_thread(args.port + i, articles=args.articles, latency=args.latency)
+        for i in range(args.domains)
+    ]
+    runs = [("two-phase", two_phase)] if not args.skip_two_phase else []
+    runs.append(("fused", fused))
+
+    print(f"{args.domains} sites, {args.pages} pages/domain, {args.latency * 1000:.0f} ms latency, "
+          f"{args.delay:g} s per-host delay")
+    print(f"{'pipeline':<10} {'stored':>7} {'requests':>9} {'req/stored':>11} {'seconds':>8} {'first stored':>13}")
+    for name, run in runs:
+        db = MemoryDB()
+        started = time.monotonic()
+        run(sites, args, db)
+        elapsed = time.monotonic() - started
+        requests = sum(1 for _, hits in sites for t, _ in hits if t >= started)
+        first = min(db.stored.values()) - started if db.stored else float("nan")
+        print(f"{name:<10} {len(db.stored):>7} {requests:>9} {requests / max(1, len(db.stored)):>11.2f} "
+              f"{elapsed:>8.2f} {first:>12.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--domains", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=20, help="page budget per domain")
+    parser.add_argument("--articles", type=int, default=200, help="articles per site")
+    parser.add_argument("--latency", type=float, default=0.05, help="server response latency in seconds")
+    parser.add_argument("--delay", type=float, default=0.5, help="REQUEST_DELAY, seconds between requests to a host")
+    parser.add_argument("--port", type=int, default=8090, help="port of the first site")
+    parser.add_argument("--skip-two-phase", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,121 @@
+"""
+Benchmark: bytes transferred per scheduled run, link walking vs feeds with conditional requests.
+
+Each mode scrapes fresh copies of the local stub sites twice: a cold run
+into an empty store, then, after every site publishes `--new` articles and
+revises `--revised` old ones, a warm run like the next cron run. The
+link-walking mode is the scraper before conditional fetching: it follows
+links from the front page and downloads every page in full. The
+conditional mode walks links too, as for sites without feeds, but
+revalidates pages with If-None-Match and skips the links of unchanged ones.
+The feed mode reads the sites' sitemaps and RSS feed, skips entries not
+modified since they were fetched and revalidates the rest. All keep state
+in an in-memory stand-in for RedisDB. Bytes are response bodies as
+sent by the sites; `--page-kib` pads HTML pages towards the weight of real
+news pages, which the stub's bare markup is far below.
+
+    python cookbook/refresh_benchmark.py --domains 2 --articles 200
+    python cookbook/refresh_benchmark.py --domains 2 --articles 200 --page-kib 80
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.pipeline import CrawlScraper  # noqa: E402
+from stub_site import create_app, publish, revise, run_in_thread  # noqa: E402
+
+
+class MemoryDB:
+    """RedisDB stand-in; with `validators=False` it records none, as before conditional fetching."""
+
+    def __init__(self, validators=True):
+        self.validators = validators
+        self.content = {}
+        self.fetch = {}
+
+    def is_url_scraped(self, url):
+        return url in self.content
+
+    def get_content(self, url):
+        return self.content.get(url)
+
+    def store_content(self, url, content, title="", published_at=""):
+        self.content[url] = {"content": content, "title": title}
+        return True
+
+    def get_validators(self, url):
+        return dict(self.fetch.get(url, {}))
+
+    def get_validators_many(self, urls):
+        return [self.get_validators(url) for url in urls]
+
+    def store_validators(self, url, etag="", last_modified=""):
+        if self.validators:
+            self.fetch.setdefault(url, {}).update(etag=etag, last_modified=last_modified, fetched_at=str(time.time()))
+        return True
+
+    def store_links(self, url, links):
+        if self.validators:
+            self.fetch.setdefault(url, {})["links"] = "\n".join(sorted(links))
+        return True
+
+
+def crawl(sites, args, db, feeds):
+    crawler = CrawlScraper(db=db)
+    crawler.request_delay = args.delay
+    crawler.max_pages_per_domain = args.pages
+    if not feeds:
+        crawler.feed_paths = []
+    logging.getLogger().setLevel(logging.WARNING)
+    started = time.monotonic()
+    stats = crawler.run([url for url, _ in sites])
+    elapsed = time.monotonic() - started
+    sent = sum(size for app in args.apps for t, size in app["sent"] if t >= started)
+    return stats, sent, elapsed
+
+
+def main(args):
+    print(f"{args.domains} sites, {args.articles} articles each, then {args.new} new and {args.revised} revised "
+          f"per site, {args.pages} pages/domain, {args.page_kib} KiB page padding")
+    print(f"{'mode':<11} {'run':<5} {'requests':>9} {'304s':>6} {'KiB sent':>9} {'stored':>7} {'updated':>8} "
+          f"{'seconds':>8}")
+    port = args.port
+    warm = {}
+    for mode, feeds, validators in (("link-walk", False, False), ("conditional", False, True),
+                                    ("feeds", True, True)):
+        args.apps = [create_app(args.articles + args.new, args.latency, unpublished=args.new,
+                                padding=args.page_kib * 1024)
+                     for _ in range(args.domains)]
+        sites = [run_in_thread(port + i, app=app) for i, app in enumerate(args.apps)]
+        port += args.domains
+        db = MemoryDB(validators=validators)
+        for run in ("cold", "warm"):
+            if run == "warm":
+                for app in args.apps:
+                    publish(app, args.new)
+                    revise(app, range(0, args.articles, max(1, args.articles // max(1, args.revised)))[:args.revised])
+            stats, sent, elapsed = crawl(sites, args, db, feeds)
+            warm[mode] = sent
+            print(f"{mode:<11} {run:<5} {stats['requests']:>9} {stats['not_modified']:>6} {sent / 1024:>9.1f} "
+                  f"{stats['success']:>7} {stats['updated']:>8} {elapsed:>8.2f}")
+    print(f"warm run: conditional sends {warm['link-walk'] / max(1, warm['conditional']):.1f}x and feeds "
+          f"{warm['link-walk'] / max(1, warm['feeds']):.1f}x fewer bytes than link walking")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--domains", type=int, default=2)
+    parser.add_argument("--articles", type=int, default=200, help="articles per site at the cold run")
+    parser.add_argument("--new", type=int, default=10, help="articles each site publishes before the warm run")
+    parser.add_argument("--revised", type=int, default=5, help="old articles each site revises before the warm run")
+    parser.add_argument("--pages", type=int, default=1000, help="page budget per domain")
+    parser.add_argument("--latency", type=float, default=0.01, help="server response latency in seconds")
+    parser.add_argument("--delay", type=float, default=0.02, help="REQUEST_DELAY, seconds between requests to a host")
+    parser.add_argument("--page-kib", type=int, default=0, help="KiB of inline script added to each HTML page")
+    parser.add_argument("--port", type=int, default=8090, help="port of the first site")
+    main(parser.parse_args())
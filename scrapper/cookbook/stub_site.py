@@ -0,0 +1,273 @@
+"""
+Stub news site for local crawler benchmarks.
+
+Serves a small, deterministic news site with a configurable response latency
+and records each request, so crawl speed, politeness and crawl quality can
+be measured without touching real sites:
+
+    /                              front page: latest articles, tags
+    /page/<n>                      older articles, ten per page
+    /news/<yyyy>/<mm>/<dd>/<slug>  an article, ten published per day up to
+                                   today, linking to related articles, its
+                                   tag and author
+    /tag/<name>?page=<n>           articles with a tag
+    /author/<name>?page=<n>        articles by an author
+    /sitemap.xml                   sitemap index, one sitemap per day
+    /sitemaps/<yyyy-mm-dd>.xml     that day's articles with <lastmod>
+    /rss.xml                       the twenty latest articles
+
+Like real sites, links to the same article come in several spellings: with
+tracking parameters, a #comments fragment or a trailing slash. Every
+response carries an ETag and answers a matching If-None-Match with an empty
+304; articles also send Last-Modified. `publish` and `revise` change the
+site between benchmark runs.
+
+Run standalone:
+    python cookbook/stub_site.py --port 8090 --articles 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from email.utils import formatdate
+from typing import Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+TAGS = ["politics", "economy", "sports", "weather", "education", "health"]
+AUTHORS = ["staff", "desk", "correspondent"]
+PER_PAGE = 10
+PER_DAY = 10
+ARTICLE_ID = re.compile(r"^/news/\d{4}/\d{2}/\d{2}/story-about-[a-z]+-(\d+)/?$")
+
+
+def article_date(i: int, articles: int) -> date:
+    return date.today() - timedelta(days=(articles - 1 - i) // PER_DAY)
+
+
+def article_path(i: int, articles: int) -> str:
+    return f"/news/{article_date(i, articles):%Y/%m/%d}/story-about-{TAGS[i % len(TAGS)]}-{i}"
+
+
+def article_link(i: int, articles: int, variant: int) -> str:
+    """One of the spellings sites use for the same article link."""
+    path = article_path(i, articles)
+    return [path, f"{path}?utm_source=site&utm_medium=web", f"{path}#comments", f"{path}/"][variant % 4]
+
+
+def article_id(path: str):
+    """Article number of a request path, or None for other pages."""
+    match = ARTICLE_ID.match(path)
+    return int(match.group(1)) if match else None
+
+
+def article_html(i: int, articles: int, revision: int = 0, published: Optional[int] = None) -> str:
+    tag = TAGS[i % len(TAGS)]
+    author = AUTHORS[i % len(AUTHORS)]
+    related = [(i * 7 + k * 13) % articles for k in range(1, 4)]
+    related = [r for r in related if published is None or r < published]
+    paragraphs = "".join(
+        f"<p>Report {i}, paragraph {p}: officials said the {tag} story developed further on the day.</p>"
+        for p in range(6)
+    ) + "".join(f"<p>Update {r}: the {tag} story was revised with new details.</p>" for r in range(revision))
+    links = "".join(
+        f'<li><a href="{article_link(r, articles, i + k)}">Related story {r}</a></li>'
+        for k, r in enumerate(related)
+    )
+    return (
+        f"<html><head><title>Story {i} | Stub News</title>"
+        f'<meta property="article:published_time" content="2024-05-01T{i % 24:02d}:00:00+00:00"></head>'
+        f'<body><nav><a href="/">Home</a> <a href="/tag/{tag}">{tag}</a></nav>'
+        f"<article><h1>Story {i}</h1>{paragraphs}"
+        f'<p>By <a href="/author/{author}">{author}</a></p></article>'
+        f"<aside><ul>{links}</ul></aside></body></html>"
+    )
+
+
+def listing_html(title: str, ids: List[int], articles: int, extra: str = "") -> str:
+    links = "".join(
+        f'<li><a href="{article_link(i, articles, k)}">Story {i}</a></li>' for k, i in enumerate(ids)
+    )
+    tags = "".join(f'<a href="/tag/{tag}">{tag}</a> ' for tag in TAGS)
+    authors = "".join(f'<a href="/author/{author}">{author}</a> ' for author in AUTHORS)
+    return (
+        f"<html><head><title>{title}</title></head><body><nav>{tags}{authors}</nav>"
+        f"<ul>{links}</ul>{extra}</body></html>"
+    )
+
+
+def create_app(articles: int = 200, latency: float = 0.05, unpublished: int = 0, padding: int = 0) -> web.Application:
+    """
+    Build the site; `app['hits']` collects (monotonic time, path and query) per request.
+
+    The last `unpublished` articles are hidden until `publish`. `app['sent']`
+    collects (monotonic time, body bytes) per response. `padding` adds that
+    many bytes of inline script to every HTML page, as real news pages carry.
+    """
+    boilerplate = f"<script>/*{'x' * padding}*/</script>" if padding else ""
+    hits: List[Tuple[float, str]] = []
+    sent: List[Tuple[float, int]] = []
+    started = time.time()
+    site = {"articles": articles, "published": articles - unpublished, "revisions": {}, "modified": {}}
+
+    def newest() -> List[int]:
+        return list(range(site["published"] - 1, -1, -1))
+
+    def modified(i: int) -> float:
+        day = datetime.combine(article_date(i, articles), datetime.min.time(), timezone.utc)
+        return site["modified"].get(i, min(started, day.timestamp()))
+
+    async def page(request, body: str, content_type: str = "text/html", last_modified: Optional[float] = None):
+        hits.append((time.monotonic(), request.path_qs))
+        await asyncio.sleep(latency)
+        if content_type == "text/html":
+            body = body.replace("</body>", f"{boilerplate}</body>")
+        etag = f'"{hashlib.blake2b(body.encode(), digest_size=8).hexdigest()}"'
+        headers = {"ETag": etag}
+        if last_modified is not None:
+            headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+        if request.headers.get("If-None-Match") == etag:
+            sent.append((time.monotonic(), 0))
+            return web.Response(status=304, headers=headers)
+        sent.append((time.monotonic(), len(body.encode())))
+        return web.Response(text=body, content_type=content_type, headers=headers)
+
+    def listing(request, title: str, ids: List[int], base: str):
+        n = int(request.query.get("page", 1))
+        chunk = ids[(n - 1) * PER_PAGE:n * PER_PAGE]
+        if not chunk:
+            raise web.HTTPNotFound()
+        return page(request, listing_html(title, chunk, articles, f'<a href="{base}{n + 1}">Older</a>'))
+
+    async def front(request):
+        return await page(request, listing_html("Stub News", newest()[:PER_PAGE], articles,
+                                                '<a href="/page/2">Older</a>'))
+
+    async def older(request):
+        n = int(request.match_info["n"])
+        ids = newest()[(n - 1) * PER_PAGE:n * PER_PAGE]
+        if not ids:
+            raise web.HTTPNotFound()
+        return await page(request, listing_html(f"Page {n}", ids, articles, f'<a href="/page/{n + 1}">Older</a>'))
+
+    async def news(request):
+        i = article_id(request.path)
+        if i is None or not 0 <= i < site["published"] or request.path.rstrip("/") != article_path(i, articles):
+            raise web.HTTPNotFound()
+        return await page(request, article_html(i, articles, site["revisions"].get(i, 0), site["published"]), last_modified=modified(i))
+
+    async def tag(request):
+        name = request.match_info["name"]
+        ids = [i for i in newest() if TAGS[i % len(TAGS)] == name]
+        return await listing(request, name, ids, f"/tag/{name}?page=")
+
+    async def author(request):
+        name = request.match_info["name"]
+        ids = [i for i in newest() if AUTHORS[i % len(AUTHORS)] == name]
+        return await listing(request, name, ids, f"/author/{name}?page=")
+
+    def iso(timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+    async def sitemap_index(request):
+        days = {}
+        for i in newest():
+            day = article_date(i, articles)
+            days[day] = max(days.get(day, 0), modified(i))
+        entries = "".join(
+            f"<sitemap><loc>{request.url.origin()}/sitemaps/{day:%Y-%m-%d}.xml</loc>"
+            f"<lastmod>{iso(lastmod)}</lastmod></sitemap>"
+            for day, lastmod in days.items()
+        )
+        return await page(request, f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns='
+                                   f'"http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>',
+                          "application/xml")
+
+    async def day_sitemap(request):
+        day = request.match_info["day"]
+        ids = [i for i in newest() if f"{article_date(i, articles):%Y-%m-%d}" == day]
+        if not ids:
+            raise web.HTTPNotFound()
+        entries = "".join(
+            f"<url><loc>{request.url.origin()}{article_path(i, articles)}</loc>"
+            f"<lastmod>{iso(modified(i))}</lastmod></url>"
+            for i in ids
+        )
+        return await page(request, f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns='
+                                   f'"http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>',
+                          "application/xml")
+
+    async def rss(request):
+        items = "".join(
+            f"<item><title>Story {i}</title><link>{request.url.origin()}{article_path(i, articles)}</link>"
+            f"<pubDate>{formatdate(modified(i), usegmt=True)}</pubDate></item>"
+            for i in newest()[:20]
+        )
+        return await page(request, f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                                   f"<title>Stub News</title>{items}</channel></rss>", "application/rss+xml")
+
+    app = web.Application()
+    app["hits"] = hits
+    app["sent"] = sent
+    app["site"] = site
+    app.router.add_get("/", front)
+    app.router.add_get("/page/{n:\\d+}", older)
+    app.router.add_get("/news/{path:.+}", news)
+    app.router.add_get("/tag/{name}", tag)
+    app.router.add_get("/author/{name}", author)
+    app.router.add_get("/sitemap.xml", sitemap_index)
+    app.router.add_get("/sitemaps/{day}.xml", day_sitemap)
+    app.router.add_get("/rss.xml", rss)
+    return app
+
+
+def publish(app: web.Application, count: int) -> List[int]:
+    """Publish the next `count` hidden articles; returns their ids."""
+    site = app["site"]
+    ids = list(range(site["published"], min(site["articles"], site["published"] + count)))
+    site["published"] += len(ids)
+    site["modified"].update((i, time.time()) for i in ids)
+    return ids
+
+
+def revise(app: web.Application, ids: Iterable[int]) -> None:
+    """Add an update paragraph to published articles, changing their body and modification time."""
+    site = app["site"]
+    for i in ids:
+        site["revisions"][i] = site["revisions"].get(i, 0) + 1
+        site["modified"][i] = time.time()
+
+
+def run_in_thread(port: int = 8090, app: Optional[web.Application] = None, **kwargs) -> Tuple[str, List[Tuple[float, str]]]:
+    """Start the site (or `app`) on a daemon thread; return its base URL and its request log."""
+    ready = threading.Event()
+    app = app if app is not None else create_app(**kwargs)
+
+    def _serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=_serve, daemon=True).start()
+    if not ready.wait(timeout=10):
+        raise RuntimeError("Stub site failed to start")
+    time.sleep(0.1)
+    return f"http://127.0.0.1:{port}/", app["hits"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--padding", type=int, default=0, help="bytes of inline script per HTML page")
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.articles, args.latency, padding=args.padding), host="127.0.0.1", port=args.port)
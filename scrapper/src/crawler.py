@@ -1,14 +1,22 @@
+import asyncio
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-from typing import Set, List
+from typing import Dict, Optional, Set, List, Tuple
 import time
 import os
 from dotenv import load_dotenv
-from .utils import is_valid_url, get_domain, normalize_url, rate_limit, setup_logging
+from .extract import extract_page
+from .feeds import FeedEntry, parse_feed
+from .frontier import URLFrontier
+from .utils import canonicalize_url, is_valid_url, get_domain, normalize_url, rate_limit, setup_logging
 
 load_dotenv()
 
+# Content types accepted for sitemaps and feeds
+FEED_TYPES = ('xml', 'rss', 'atom')
+
 class URLCrawler:
     """Crawls websites to discover URLs."""
     
@@ -18,7 +26,9 @@ class URLCrawler:
             'User-Agent': os.getenv('USER_AGENT', 'Mozilla/5.0 (compatible; WebScraper/1.0)')
         })
         self.max_pages_per_domain = int(os.getenv('MAX_PAGES_PER_DOMAIN', 50))
+        self.max_depth = int(os.getenv('MAX_DEPTH', 3))
         self.request_delay = float(os.getenv('REQUEST_DELAY', 1))
+        self.html_engine = os.getenv('HTML_ENGINE', 'lxml')
         self.logger = setup_logging()
         
     @rate_limit(1)  # Basic rate limiting
@@ -34,72 +44,65 @@ class URLCrawler:
     
     def extract_links(self, url: str, html_content: str) -> Set[str]:
         """Extract all valid links from HTML content."""
-        links = set()
-        
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Find all anchor tags with href attributes
-            for link in soup.find_all('a', href=True):
-                href = link['href'].strip()
-                
-                # Skip empty hrefs, javascript, mailto, etc.
-                if not href or href.startswith(('javascript:', 'mailto:', 'tel:', '#')):
-                    continue
-                
-                # Normalize the URL
-                absolute_url = normalize_url(href, url)
-                
-                # Validate the URL
-                if is_valid_url(absolute_url):
-                    links.add(absolute_url)
-        
+            if self.html_engine == 'lxml':
+                return extract_page(html_content, url, collect_text=False)['links']
+            return self.links_from_soup(url, BeautifulSoup(html_content, 'html.parser'))
         except Exception as e:
             self.logger.error(f"Error extracting links from {url}: {e}")
+            return set()
+    
+    def links_from_soup(self, url: str, soup: BeautifulSoup) -> Set[str]:
+        """Extract all valid links from a parsed page."""
+        links = set()
+        
+        # Find all anchor tags with href attributes
+        for link in soup.find_all('a', href=True):
+            href = link['href'].strip()
+            
+            # Skip empty hrefs, javascript, mailto, etc.
+            if not href or href.startswith(('javascript:', 'mailto:', 'tel:', '#')):
+                continue
+            
+            # Normalize the URL
+            absolute_url = normalize_url(href, url)
+            
+            # Validate the URL
+            if is_valid_url(absolute_url):
+                links.add(absolute_url)
         
         return links
     
     def crawl_domain(self, base_url: str) -> Set[str]:
-        """Crawl a domain starting from base URL."""
+        """Crawl a domain starting from base URL, most article-like and shallowest URLs first."""
         discovered_urls = set()
-        to_visit = {base_url}
-        visited = set()
-        domain = get_domain(base_url)
+        frontier = URLFrontier(self.max_depth)
+        frontier.push(base_url)
+        domain = get_domain(canonicalize_url(base_url))
         
         self.logger.info(f"Starting crawl of domain: {domain}")
         
-        while to_visit and len(discovered_urls) < self.max_pages_per_domain:
-            current_url = to_visit.pop()
-            
-            if current_url in visited:
-                continue
-                
-            # Only crawl URLs from the same domain
-            if get_domain(current_url) != domain:
-                continue
+        while frontier and len(discovered_urls) < self.max_pages_per_domain:
+            current_url, depth = frontier.pop()
             
             try:
                 self.logger.info(f"Crawling: {current_url}")
                 response = self._fetch_page(current_url)
-                visited.add(current_url)
                 discovered_urls.add(current_url)
                 
                 # Extract links from the page
                 new_links = self.extract_links(current_url, response.text)
                 
-                # Add new links to visit queue (same domain only)
+                # Queue new links (same domain only); the frontier drops ones already seen
                 for link in new_links:
-                    if (get_domain(link) == domain and 
-                        link not in visited and 
-                        link not in to_visit):
-                        to_visit.add(link)
+                    if get_domain(link) == domain:
+                        frontier.push(link, depth + 1)
                 
                 # Respect rate limiting
                 time.sleep(self.request_delay)
                 
             except Exception as e:
                 self.logger.error(f"Failed to crawl {current_url}: {e}")
-                visited.add(current_url)  # Mark as visited to avoid retry
                 continue
         
         self.logger.info(f"Crawling completed. Discovered {len(discovered_urls)} URLs for {domain}")
@@ -117,3 +120,304 @@ class URLCrawler:
                 self.logger.error(f"Failed to crawl domain {base_url}: {e}")
         
         return all_urls
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                # Waiting inside the lock queues later callers behind this one
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1.0
+                self.updated = time.monotonic()
+            self.tokens -= 1
+
+
+class AsyncURLCrawler(URLCrawler):
+    """
+    Crawls many domains concurrently with asyncio.
+
+    Every host gets a token bucket refilled once per `REQUEST_DELAY` seconds
+    (bursts of `HOST_BURST`), so politeness delays only apply between
+    requests to the same host. Domains are crawled in parallel, each by up
+    to `DOMAIN_CONCURRENCY` workers taking URLs from a shared priority
+    frontier, and at most `MAX_CONCURRENCY` requests are in flight overall.
+
+    A domain that publishes a sitemap or RSS/Atom feed at one of
+    `FEED_PATHS` is crawled from their entries instead of by following
+    links. Requests are conditional when `cached_validators` knows the
+    page's ETag or Last-Modified, so unchanged pages come back as an empty
+    304; when walking links, each page's outlinks are kept with its
+    validators and an unchanged page's links are followed from there, so a
+    304 on the home page still reaches changed section pages below it. The
+    validator hooks are no-ops here; `CrawlScraper` keeps them in Redis.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.max_concurrency = int(os.getenv('MAX_CONCURRENCY', 16))
+        self.domain_concurrency = int(os.getenv('DOMAIN_CONCURRENCY', 2))
+        self.host_burst = float(os.getenv('HOST_BURST', 1))
+        self.timeout = float(os.getenv('REQUEST_TIMEOUT', 10))
+        self.feed_paths = [path.strip() for path in os.getenv('FEED_PATHS', '/sitemap.xml,/rss.xml').split(',')
+                           if path.strip()]
+        self.max_feeds = int(os.getenv('MAX_FEEDS', 50))
+        self.transfer: Dict[str, int] = {'requests': 0, 'not_modified': 0, 'bytes': 0}
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = get_domain(url)
+        if host not in self._buckets:
+            rate = 1 / self.request_delay if self.request_delay > 0 else 0
+            self._buckets[host] = TokenBucket(rate, self.host_burst)
+        return self._buckets[host]
+
+    def cached_validators(self, url: str) -> Dict[str, str]:
+        """ETag and Last-Modified from the last fetch of a URL, sent as conditional headers."""
+        return {}
+
+    def store_validators(self, url: str, validators: Dict[str, str]) -> None:
+        """Remember a URL's validators once its response has been handled."""
+
+    def store_links(self, url: str, links: Set[str]) -> None:
+        """Remember a page's outlinks, returned under 'links' by `cached_validators`, for when it comes back 304."""
+
+    def fresh_urls(self, entries: List[FeedEntry]) -> Set[str]:
+        """URLs of the feed entries fetched since they were last modified, which need not be requested."""
+        return set()
+
+    def page_not_modified(self, url: str, validators: Dict[str, str]) -> None:
+        """Handle a page the server reported unchanged (304)."""
+
+    def parse_page(self, url: str, html: str, validators: Dict[str, str]) -> Set[str]:
+        """Handle a fetched page and return its links; runs in a worker thread."""
+        return self.extract_links(url, html)
+
+    async def _fetch(
+        self,
+        http: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        url: str,
+        types: Tuple[str, ...] = ('html',),
+    ) -> Tuple[int, Optional[str], Dict[str, str]]:
+        """
+        Fetch a URL once the host's bucket and the global cap allow.
+
+        Returns the status, the body (None on 304 or when the Content-Type
+        matches none of `types`) and the response's validators; on 304 they
+        also hold the page's stored outlinks under 'links', one per line.
+        """
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.cached_validators, url)
+        headers = {}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        await self._bucket(url).acquire()
+        async with semaphore:
+            async with http.get(url, headers=headers) as response:
+                self.transfer['requests'] += 1
+                validators = {
+                    'etag': response.headers.get('ETag', cached.get('etag', '')),
+                    'last_modified': response.headers.get('Last-Modified', cached.get('last_modified', '')),
+                }
+                if response.status == 304:
+                    self.transfer['not_modified'] += 1
+                    return response.status, None, dict(validators, links=cached.get('links', ''))
+                response.raise_for_status()
+                if not any(t in response.headers.get('Content-Type', 'text/html') for t in types):
+                    return response.status, None, validators
+                self.transfer['bytes'] += len(await response.read())
+                return response.status, await response.text(errors='replace'), validators
+
+    async def _read_feeds(
+        self,
+        http: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        base_url: str,
+    ) -> Optional[Tuple[List[FeedEntry], List[Tuple[str, Dict[str, str], Set[str]]], Set[str]]]:
+        """
+        Entries of a domain's sitemaps and feeds, or None if it publishes none.
+
+        Nested sitemaps modified since they were last read are fetched too,
+        newest first, up to `MAX_FEEDS` documents in all.
+        Also returns each document read in full with its validators and the
+        URLs it lists, and the documents that need no reading (304 or fresh).
+        """
+        loop = asyncio.get_running_loop()
+        domain = get_domain(canonicalize_url(base_url))
+        queue = [canonicalize_url(urljoin(base_url, path)) for path in self.feed_paths]
+        entries: List[FeedEntry] = []
+        documents = []
+        settled: Set[str] = set()
+        found = False
+
+        for _ in range(self.max_feeds):
+            if not queue:
+                break
+            feed_url = queue.pop(0)
+            try:
+                status, xml, validators = await self._fetch(http, semaphore, feed_url, FEED_TYPES)
+            except Exception as e:
+                self.logger.debug(f"No feed at {feed_url}: {e}")
+                continue
+            if status == 304:
+                found = True
+                settled.add(feed_url)
+                continue
+            if xml is None:
+                continue
+            items, sitemaps = await loop.run_in_executor(None, parse_feed, xml)
+            items = [(canonicalize_url(url), modified) for url, modified in items]
+            sitemaps = [(canonicalize_url(url), modified) for url, modified in sitemaps]
+            items = [item for item in items if get_domain(item[0]) == domain]
+            sitemaps = [item for item in sitemaps if get_domain(item[0]) == domain]
+            if not items and not sitemaps:
+                continue
+            found = True
+            fresh = await loop.run_in_executor(None, self.fresh_urls, sitemaps)
+            settled.update(fresh)
+            # Most recently modified sitemaps first, so MAX_FEEDS cuts off the stalest
+            sitemaps.sort(key=lambda item: item[1] or 0, reverse=True)
+            queue.extend(url for url, _ in sitemaps if url not in fresh and url not in queue)
+            entries.extend(items)
+            documents.append((feed_url, validators, {url for url, _ in items + sitemaps}))
+
+        if not found:
+            return None
+        self.logger.info(f"Read {len(documents)} feeds with {len(entries)} entries for {domain}")
+        return entries, documents, settled
+
+    async def crawl_domain_async(
+        self,
+        http: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        base_url: str,
+    ) -> Set[str]:
+        """Crawl a domain from its feeds, or from base URL by following links, with the given session and cap."""
+        discovered_urls = set()
+        in_flight = [0]
+        frontier = URLFrontier(self.max_depth)
+        domain = get_domain(canonicalize_url(base_url))
+        changed = asyncio.Condition()
+        loop = asyncio.get_running_loop()
+
+        self.logger.info(f"Starting crawl of domain: {domain}")
+
+        feeds = await self._read_feeds(http, semaphore, base_url)
+        follow_links = feeds is None
+        if follow_links:
+            frontier.push(base_url)
+        else:
+            entries, documents, settled = feeds
+            fresh = await loop.run_in_executor(None, self.fresh_urls, entries)
+            settled.update(fresh)
+            for url, modified in entries:
+                if url not in fresh:
+                    frontier.push(url, 1, modified)
+
+        async def next_url() -> Optional[Tuple[str, int]]:
+            """Highest-priority URL, waiting while fetches in flight may still add links; None when done."""
+            async with changed:
+                while True:
+                    # Pages being fetched count against the budget, so workers never overshoot it
+                    if len(discovered_urls) + in_flight[0] >= self.max_pages_per_domain:
+                        return None
+                    if frontier:
+                        in_flight[0] += 1
+                        return frontier.pop()
+                    if not in_flight[0]:
+                        return None
+                    await changed.wait()
+
+        async def worker():
+            while True:
+                item = await next_url()
+                if item is None:
+                    return
+                current_url, depth = item
+                try:
+                    self.logger.info(f"Crawling: {current_url}")
+                    status, html, validators = await self._fetch(http, semaphore, current_url)
+                    discovered_urls.add(current_url)
+                    new_links: Set[str] = set()
+                    if status == 304:
+                        await loop.run_in_executor(None, self.page_not_modified, current_url, validators)
+                        # The pages an unchanged page links to may still have changed
+                        new_links = set(validators['links'].split())
+                    elif html is not None:
+                        # Parse off the event loop so other domains keep fetching
+                        new_links = await loop.run_in_executor(
+                            None, self.parse_page, current_url, html, validators
+                        )
+                        if follow_links:
+                            await loop.run_in_executor(None, self.store_links, current_url, new_links)
+                    for link in new_links if follow_links else ():
+                        if get_domain(link) == domain:
+                            frontier.push(link, depth + 1)
+                except Exception as e:
+                    self.logger.error(f"Failed to crawl {current_url}: {e}")
+                finally:
+                    async with changed:
+                        in_flight[0] -= 1
+                        changed.notify_all()
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.domain_concurrency))))
+
+        if not follow_links:
+            # A feed is only marked read once every entry it lists was handled, so entries left
+            # over by the page budget are found again next run; nested sitemaps come after their index
+            done = discovered_urls | settled
+            for feed_url, validators, listed in reversed(documents):
+                if listed <= done:
+                    await loop.run_in_executor(None, self.store_validators, feed_url, validators)
+                    done.add(feed_url)
+
+        self.logger.info(f"Crawling completed. Discovered {len(discovered_urls)} URLs for {domain}")
+        return discovered_urls
+
+    async def crawl_multiple_domains_async(self, base_urls: List[str]) -> Set[str]:
+        """Crawl multiple domains concurrently."""
+        # Buckets hold asyncio locks, which belong to one event loop
+        self._buckets = {}
+        self.transfer = {key: 0 for key in self.transfer}
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        connector = aiohttp.TCPConnector(limit=max(1, self.max_concurrency))
+        async with aiohttp.ClientSession(
+            headers={'User-Agent': self.session.headers['User-Agent']},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=connector,
+        ) as http:
+            results = await asyncio.gather(
+                *(self.crawl_domain_async(http, semaphore, base_url) for base_url in base_urls),
+                return_exceptions=True,
+            )
+
+        all_urls = set()
+        for base_url, result in zip(base_urls, results):
+            if isinstance(result, BaseException):
+                self.logger.error(f"Failed to crawl domain {base_url}: {result}")
+            else:
+                all_urls.update(result)
+        return all_urls
+
+    def crawl_multiple_domains(self, base_urls: List[str]) -> Set[str]:
+        """Crawl multiple domains concurrently (blocking wrapper)."""
+        return asyncio.run(self.crawl_multiple_domains_async(base_urls))
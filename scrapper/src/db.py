@@ -1,7 +1,8 @@
 import redis
 import json
 import hashlib
-from typing import Dict, List, Optional
+import time
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -32,7 +33,7 @@ class RedisDB:
         """Generate a hash for URL to use as Redis key."""
         return hashlib.md5(url.encode()).hexdigest()
     
-    def store_content(self, url: str, content: str, title: str = "") -> bool:
+    def store_content(self, url: str, content: str, title: str = "", published_at: str = "") -> bool:
         """Store scraped content in Redis."""
         try:
             key = f"content:{self._get_url_hash(url)}"
@@ -41,6 +42,7 @@ class RedisDB:
                 'title': title,
                 'content': content,
                 'scraped_at': datetime.now().isoformat(),
+                'published_at': published_at,
                 'content_length': len(content)
             }
             
@@ -68,6 +70,48 @@ class RedisDB:
         """Check if URL has already been scraped."""
         return self.redis_client.sismember('scraped_urls', url)
     
+    def get_validators(self, url: str) -> Dict[str, str]:
+        """Get the ETag, Last-Modified, fetch time (fetched_at) and outlinks (links) recorded for a URL."""
+        try:
+            return self.redis_client.hgetall(f"fetch:{self._get_url_hash(url)}") or {}
+        except Exception as e:
+            print(f"Error retrieving validators for {url}: {e}")
+            return {}
+    
+    def get_validators_many(self, urls: List[str]) -> List[Dict[str, str]]:
+        """Get the validators of several URLs in one pipelined round trip; {} for unknown URLs."""
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for url in urls:
+                pipe.hgetall(f"fetch:{self._get_url_hash(url)}")
+            return [data or {} for data in pipe.execute()]
+        except Exception as e:
+            print(f"Error retrieving validators for {len(urls)} URLs: {e}")
+            return [{} for _ in urls]
+    
+    def store_validators(self, url: str, etag: str = "", last_modified: str = "") -> bool:
+        """Record a URL's ETag and Last-Modified for conditional requests, stamped with the fetch time."""
+        try:
+            self.redis_client.hset(f"fetch:{self._get_url_hash(url)}", mapping={
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': time.time()
+            })
+            return True
+        except Exception as e:
+            print(f"Error storing validators for {url}: {e}")
+            return False
+    
+    def store_links(self, url: str, links: Iterable[str]) -> bool:
+        """Record a page's outlinks next to its validators, one per line, to follow them when it comes back 304."""
+        try:
+            self.redis_client.hset(f"fetch:{self._get_url_hash(url)}", 'links', '\n'.join(sorted(links)))
+            return True
+        except Exception as e:
+            print(f"Error storing links for {url}: {e}")
+            return False
+    
     def get_all_scraped_urls(self) -> List[str]:
         """Get list of all scraped URLs."""
         return list(self.redis_client.smembers('scraped_urls'))
@@ -88,6 +132,10 @@ class RedisDB:
                 key = f"content:{self._get_url_hash(url)}"
                 self.redis_client.delete(key)
             
+            # Delete conditional request validators
+            for key in self.redis_client.scan_iter('fetch:*'):
+                self.redis_client.delete(key)
+            
             # Delete URL index
             self.redis_client.delete('scraped_urls')
             return True
@@ -0,0 +1,162 @@
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+from lxml import etree
+from .utils import clean_text, is_valid_url, normalize_url
+
+# Subtrees left out of the title and text, as WebScraper.content_from_soup decomposes them
+SKIPPED_TAGS = {'script', 'style', 'nav', 'footer', 'header'}
+# Main-content selectors in order of preference, as in WebScraper.content_from_soup
+CONTENT_SELECTORS = ['main', 'article', '.content', '.post', '.entry', '.main-content', '#content', '#main']
+# Meta tags holding the publish time, in order of preference, as in WebScraper.extract_published_at
+PUBLISHED_META = [
+    ('property', 'article:published_time'),
+    ('property', 'og:published_time'),
+    ('name', 'pubdate'),
+    ('name', 'date'),
+    ('itemprop', 'datePublished'),
+]
+
+_TAG_SELECTORS = {s for s in CONTENT_SELECTORS if s[0] not in '.#'}
+_CLASS_SELECTORS = {s[1:] for s in CONTENT_SELECTORS if s[0] == '.'}
+_ID_SELECTORS = {s[1:] for s in CONTENT_SELECTORS if s[0] == '#'}
+
+
+class _PageTarget:
+    """
+    lxml parser target collecting everything extraction needs in one pass.
+
+    The parser calls `start`, `data` and `end` as it reads the page and no
+    tree is built. Text is appended to a buffer for each open element whose
+    text is wanted: the first title, the body, and the first element
+    matching each content selector, all outside SKIPPED_TAGS. Links and
+    publish-time tags are collected from the whole page.
+    """
+
+    def __init__(self, collect_text: bool = True):
+        self.collect_text = collect_text
+        self.skip = 0
+        # Per open element: whether it is a skipped tag, and the text buffers it opened
+        self.stack: List[tuple] = []
+        self.buffers: List[List[str]] = []
+        self.document: List[str] = []
+        self.title: Optional[List[str]] = None
+        self.body: Optional[List[str]] = None
+        self.candidates: Dict[str, List[str]] = {}
+        self.hrefs: List[str] = []
+        self.meta: Dict[tuple, str] = {}
+        self.time: Optional[str] = None
+
+    def start(self, tag, attrib):
+        if tag == 'a':
+            href = attrib.get('href')
+            if href is not None:
+                self.hrefs.append(href)
+        elif tag == 'meta':
+            for spec in PUBLISHED_META:
+                if spec not in self.meta and attrib.get(spec[0]) == spec[1]:
+                    self.meta[spec] = attrib.get('content') or ''
+        elif tag == 'time' and self.time is None and 'datetime' in attrib:
+            self.time = attrib['datetime']
+
+        skipped = tag in SKIPPED_TAGS
+        if skipped:
+            self.skip += 1
+        opened = 0
+        if self.collect_text and not self.skip:
+            matched = []
+            if tag in _TAG_SELECTORS:
+                matched.append(tag)
+            if _CLASS_SELECTORS and 'class' in attrib:
+                matched.extend('.' + name for name in attrib['class'].split() if name in _CLASS_SELECTORS)
+            if 'id' in attrib and attrib['id'] in _ID_SELECTORS:
+                matched.append('#' + attrib['id'])
+            matched = [selector for selector in matched if selector not in self.candidates]
+            if matched:
+                # One buffer serves every selector the element is the first match of
+                buffer = []
+                for selector in matched:
+                    self.candidates[selector] = buffer
+                self.buffers.append(buffer)
+                opened += 1
+            if tag == 'title' and self.title is None:
+                self.title = []
+                self.buffers.append(self.title)
+                opened += 1
+            elif tag == 'body' and self.body is None:
+                self.body = []
+                self.buffers.append(self.body)
+                opened += 1
+        self.stack.append((skipped, opened))
+
+    def end(self, tag):
+        if not self.stack:
+            return
+        skipped, opened = self.stack.pop()
+        if skipped:
+            self.skip -= 1
+        if opened:
+            del self.buffers[-opened:]
+
+    def data(self, text):
+        if self.collect_text and not self.skip:
+            self.document.append(text)
+            for buffer in self.buffers:
+                buffer.append(text)
+
+    def close(self):
+        return self
+
+
+def extract_page(html: str, url: str = '', collect_text: bool = True) -> Dict[str, object]:
+    """
+    Title, publish time, text content and links of a page, parsed once with lxml.
+
+    Gives the same fields as WebScraper.content_from_soup plus 'links', the
+    valid absolute links as URLCrawler.links_from_soup finds them (hrefs
+    resolved against `url`). Text comes from the first of CONTENT_SELECTORS
+    that matches, else the body, with SKIPPED_TAGS left out. With
+    `collect_text=False` only links and publish time are collected.
+    """
+    target = _PageTarget(collect_text)
+    if html and html.strip():
+        parser = etree.HTMLParser(target=target, encoding='utf-8')
+        etree.fromstring(html.encode('utf-8', errors='replace'), parser)
+
+    published_at = next((target.meta[spec] for spec in PUBLISHED_META if target.meta.get(spec)), '')
+    if not published_at and target.time:
+        published_at = target.time
+
+    content_text = ''
+    for selector in CONTENT_SELECTORS:
+        if selector in target.candidates:
+            content_text = ''.join(target.candidates[selector])
+            break
+    if not content_text:
+        content_text = ''.join(target.body if target.body is not None else target.document)
+
+    return {
+        'title': clean_text(''.join(target.title)) if target.title else '',
+        'content': clean_text(content_text),
+        'published_at': published_at.strip(),
+        'links': _resolve_links(target.hrefs, url),
+    }
+
+
+def _resolve_links(hrefs: List[str], url: str) -> Set[str]:
+    """Valid absolute URLs of a page's hrefs, as URLCrawler.links_from_soup resolves them."""
+    base = urlparse(url)
+    origin = f'{base.scheme}://{base.netloc}' if base.scheme and base.netloc else ''
+    links: Set[str] = set()
+    # Pages repeat links (menus, teasers), and resolving them is most of the cost
+    for href in dict.fromkeys(href.strip() for href in hrefs):
+        # Skip empty hrefs, javascript, mailto, etc.
+        if not href or href.startswith(('javascript:', 'mailto:', 'tel:', '#')):
+            continue
+        if origin and href[0] == '/' and not href.startswith('//') and '/.' not in href:
+            # Root-relative without dot segments: urljoin would only prepend the origin
+            links.add(origin + href)
+            continue
+        absolute_url = normalize_url(href, url)
+        if is_valid_url(absolute_url):
+            links.add(absolute_url)
+    return links
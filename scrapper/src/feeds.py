@@ -0,0 +1,86 @@
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+# (url, last modified as a unix timestamp or None)
+FeedEntry = Tuple[str, Optional[float]]
+
+
+def parse_date(text: Optional[str]) -> Optional[float]:
+    """
+    Timestamp of a sitemap/Atom (ISO 8601) or RSS (RFC 822) date; None if absent or malformed.
+
+    A bare date such as a sitemap's `2024-05-01` stands for the end of that
+    day, the latest moment it may denote, so a page fetched earlier that day
+    is not taken to be up to date.
+    """
+    text = (text or '').strip()
+    if not text:
+        return None
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        if len(text) == 10:
+            parsed += timedelta(days=1, seconds=-1)
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(text)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _local(tag: str) -> str:
+    """Tag name without its XML namespace."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child_text(element: ET.Element, *names: str) -> Optional[str]:
+    for child in element:
+        if _local(child.tag) in names and child.text:
+            return child.text.strip()
+    return None
+
+
+def parse_feed(xml: str) -> Tuple[List[FeedEntry], List[FeedEntry]]:
+    """
+    Article URLs and nested sitemaps listed by a sitemap, RSS or Atom feed.
+
+    Returns `(entries, sitemaps)`, each a list of `(url, modified)` where
+    `modified` comes from <lastmod>, <pubDate> or <updated>/<published>.
+    Only a sitemap index lists nested sitemaps. Unparseable documents yield
+    two empty lists.
+    """
+    try:
+        root = ET.fromstring(xml.strip())
+    except ET.ParseError:
+        return [], []
+
+    entries: List[FeedEntry] = []
+    sitemaps: List[FeedEntry] = []
+    kind = _local(root.tag)
+
+    if kind in ('urlset', 'sitemapindex'):
+        target = sitemaps if kind == 'sitemapindex' else entries
+        for item in root:
+            loc = _child_text(item, 'loc')
+            if loc:
+                target.append((loc, parse_date(_child_text(item, 'lastmod'))))
+    elif kind == 'rss':
+        for item in root.iter():
+            if _local(item.tag) == 'item':
+                link = _child_text(item, 'link')
+                if link:
+                    entries.append((link, parse_date(_child_text(item, 'pubDate', 'date'))))
+    elif kind == 'feed':
+        for item in root:
+            if _local(item.tag) != 'entry':
+                continue
+            links = [child for child in item if _local(child.tag) == 'link']
+            # Atom entries may carry several links; the page itself is rel="alternate" (the default)
+            href = next((link.get('href') for link in links if link.get('rel', 'alternate') == 'alternate'), None)
+            if href:
+                entries.append((href.strip(), parse_date(_child_text(item, 'updated', 'published'))))
+    return entries, sitemaps
@@ -1,9 +1,8 @@
 import os
 import sys
 from pathlib import Path
-from .crawler import URLCrawler
-from .scrapper import WebScraper
 from .db import RedisDB
+from .pipeline import CrawlScraper
 from .utils import setup_logging
 
 def load_base_urls(file_path: str = "data/base_urls.txt") -> list:
@@ -27,8 +26,7 @@ def main():
     
     # Initialize components
     db = RedisDB()
-    crawler = URLCrawler()
-    scraper = WebScraper()
+    crawler = CrawlScraper(db=db)
     
     # Test Redis connection
     if not db.test_connection():
@@ -45,22 +43,21 @@ def main():
     
     logger.info(f"Loaded {len(base_urls)} base URLs")
     
-    # Crawl URLs
-    logger.info("Phase 1: Crawling URLs...")
-    discovered_urls = crawler.crawl_multiple_domains(base_urls)
-    logger.info(f"Discovered {len(discovered_urls)} URLs to scrape")
-    
-    # Scrape content
-    logger.info("Phase 2: Scraping content...")
-    stats = scraper.scrape_urls(list(discovered_urls))
+    # Crawl and scrape in one pass; articles are stored as they are fetched
+    logger.info("Crawling and scraping...")
+    stats = crawler.run(base_urls)
     
     # Print final statistics
     db_stats = db.get_stats()
     logger.info("=== SCRAPING COMPLETED ===")
-    logger.info(f"URLs discovered: {len(discovered_urls)}")
+    logger.info(f"Pages fetched: {stats['discovered']}")
+    logger.info(f"Requests: {stats['requests']} ({stats['not_modified']} not modified), "
+                f"{stats['bytes'] / 1024:.0f} KiB downloaded")
     logger.info(f"Successfully scraped: {stats['success']}")
+    logger.info(f"Updated: {stats['updated']}")
     logger.info(f"Failed: {stats['failed']}")
-    logger.info(f"Skipped (already scraped): {stats['skipped']}")
+    logger.info(f"Skipped (unchanged): {stats['skipped']}")
+    logger.info(f"Skipped (no content): {stats['empty']}")
     logger.info(f"Total URLs in database: {db_stats['total_scraped_urls']}")
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+import threading
+from typing import Dict, List, Optional, Set
+from bs4 import BeautifulSoup
+from .crawler import AsyncURLCrawler
+from .db import RedisDB
+from .extract import extract_page
+from .feeds import FeedEntry
+from .scrapper import WebScraper
+
+
+class CrawlScraper(AsyncURLCrawler):
+    """
+    Crawls and scrapes in one pass: every page is fetched and parsed once.
+
+    Each fetched page is parsed once, by the lxml extractor or into a single
+    BeautifulSoup tree (`HTML_ENGINE=soup`), yielding both its outlinks,
+    which feed the crawl frontier, and its article content, which is
+    written to Redis straight away. The scraped corpus
+    therefore grows while the crawl is still running.
+
+    Each URL's ETag and Last-Modified are kept in Redis, so pages scraped on
+    earlier runs are revalidated with conditional requests: unchanged ones
+    cost a 304 and changed ones are stored again. When walking links, each
+    page's outlinks are kept there too, to be followed past a 304. Feed entries not modified
+    since their last fetch are not requested at all.
+    """
+
+    # Feed entries whose validators are read per pipelined round trip
+    validators_batch_size = 1000
+
+    def __init__(self, scraper: Optional[WebScraper] = None, db: Optional[RedisDB] = None):
+        super().__init__()
+        self.scraper = scraper if scraper is not None else WebScraper()
+        self.db = db if db is not None else self.scraper.db
+        self.stats: Dict[str, int] = {'success': 0, 'updated': 0, 'failed': 0, 'skipped': 0, 'empty': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, outcome: str) -> None:
+        with self._stats_lock:
+            self.stats[outcome] += 1
+
+    def cached_validators(self, url: str) -> Dict[str, str]:
+        return self.db.get_validators(url)
+
+    def store_validators(self, url: str, validators: Dict[str, str]) -> None:
+        self.db.store_validators(url, validators.get('etag', ''), validators.get('last_modified', ''))
+
+    def store_links(self, url: str, links: Set[str]) -> None:
+        self.db.store_links(url, links)
+
+    def fresh_urls(self, entries: List[FeedEntry]) -> Set[str]:
+        """Feed entries fetched since they were modified, reading validators one pipelined batch at a time."""
+        fresh = set()
+        dated = [(url, modified) for url, modified in entries if modified is not None]
+        for i in range(0, len(dated), self.validators_batch_size):
+            batch = dated[i:i + self.validators_batch_size]
+            for (url, modified), validators in zip(batch, self.db.get_validators_many([url for url, _ in batch])):
+                fetched_at = validators.get('fetched_at')
+                # Feed dates have at best one-second precision: an edit in the second of the fetch is not fresh
+                if fetched_at is not None and float(fetched_at) > modified + 1:
+                    fresh.add(url)
+        return fresh
+
+    def page_not_modified(self, url: str, validators: Dict[str, str]) -> None:
+        # Re-stamp the fetch time, so feed entries not modified since are not requested again
+        self.store_validators(url, validators)
+        self._count('skipped')
+
+    def parse_page(self, url: str, html: str, validators: Dict[str, str]) -> Set[str]:
+        """Extract links and content from one parse of the page, and store new or changed content."""
+        links: Set[str] = set()
+        try:
+            if self.html_engine == 'lxml':
+                extracted = extract_page(html, url)
+                links = extracted['links']
+            else:
+                soup = BeautifulSoup(html, 'html.parser')
+                # Links first: content extraction removes nav, header and footer
+                links = self.links_from_soup(url, soup)
+                extracted = self.scraper.content_from_soup(soup)
+        except Exception as e:
+            self.logger.error(f"Error extracting content from {url}: {e}")
+            self._count('failed')
+            return links
+        if not extracted['content']:
+            self.store_validators(url, validators)
+            self._count('empty')
+            return links
+
+        # Pages come back in full when they changed or the server sends no validators
+        stored = self.db.get_content(url) if self.db.is_url_scraped(url) else None
+        if stored and stored.get('content') == extracted['content']:
+            self.store_validators(url, validators)
+            self._count('skipped')
+            return links
+
+        if self.db.store_content(
+            url=url,
+            content=extracted['content'],
+            title=extracted['title'],
+            published_at=extracted['published_at']
+        ):
+            # Validators are only kept once the content is stored, so a failed write is retried in full
+            self.store_validators(url, validators)
+            self.logger.info(f"Successfully {'updated' if stored else 'scraped and stored'}: {url}")
+            self._count('updated' if stored else 'success')
+        else:
+            self.logger.error(f"Failed to store content for: {url}")
+            self._count('failed')
+        return links
+
+    def run(self, base_urls: List[str]) -> Dict[str, int]:
+        """Crawl and scrape all domains; returns counts, with 'discovered' for pages fetched and the transfer totals."""
+        self.stats = {outcome: 0 for outcome in self.stats}
+        discovered = self.crawl_multiple_domains(base_urls)
+        return dict(self.stats, discovered=len(discovered), **self.transfer)
@@ -4,11 +4,15 @@ from typing import Dict, Optional
 import time
 import os
 from dotenv import load_dotenv
+from .extract import extract_page
 from .utils import clean_text, setup_logging, rate_limit
 from .db import RedisDB
 
 load_dotenv()
 
+# Default of WebScraper.scrape_url's `validators`: look them up in Redis
+_LOOKUP = object()
+
 class WebScraper:
     """Scrapes web pages and extracts text content."""
     
@@ -18,68 +22,108 @@ class WebScraper:
             'User-Agent': os.getenv('USER_AGENT', 'Mozilla/5.0 (compatible; WebScraper/1.0)')
         })
         self.request_delay = float(os.getenv('REQUEST_DELAY', 1))
+        self.html_engine = os.getenv('HTML_ENGINE', 'lxml')
         self.db = RedisDB()
         self.logger = setup_logging()
         
     @rate_limit(1)
-    def _fetch_page(self, url: str) -> requests.Response:
-        """Fetch a single page with rate limiting."""
+    def _fetch_page(self, url: str, validators: Optional[Dict[str, str]] = None) -> requests.Response:
+        """Fetch a single page with rate limiting, conditionally if validators are given."""
+        headers = {}
+        if validators and validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators and validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
         try:
-            response = self.session.get(url, timeout=15)
+            response = self.session.get(url, timeout=15, headers=headers)
             response.raise_for_status()
             return response
         except requests.RequestException as e:
             self.logger.error(f"Failed to fetch {url}: {e}")
             raise
     
+    @staticmethod
+    def extract_published_at(soup: BeautifulSoup) -> str:
+        """Find the article's publish time in common meta tags, or ''."""
+        for attrs in (
+            {'property': 'article:published_time'},
+            {'property': 'og:published_time'},
+            {'name': 'pubdate'},
+            {'name': 'date'},
+            {'itemprop': 'datePublished'},
+        ):
+            tag = soup.find('meta', attrs=attrs)
+            if tag and tag.get('content'):
+                return tag['content'].strip()
+        time_tag = soup.find('time', attrs={'datetime': True})
+        return time_tag['datetime'].strip() if time_tag else ""
+
     def extract_content(self, html_content: str) -> Dict[str, str]:
-        """Extract title and text content from HTML."""
+        """Extract title, publish time and text content from HTML."""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
-            
-            # Extract title
-            title_tag = soup.find('title')
-            title = clean_text(title_tag.get_text()) if title_tag else ""
-            
-            # Extract main content
-            # Try to find main content areas first
-            content_selectors = [
-                'main', 'article', '.content', '.post', '.entry',
-                '.main-content', '#content', '#main'
-            ]
-            
-            content_text = ""
-            for selector in content_selectors:
-                content_elem = soup.select_one(selector)
-                if content_elem:
-                    content_text = content_elem.get_text()
-                    break
-            
-            # If no specific content area found, use body
-            if not content_text:
-                body = soup.find('body')
-                content_text = body.get_text() if body else soup.get_text()
-            
-            # Clean the extracted content
-            clean_content = clean_text(content_text)
-            
-            return {
-                'title': title,
-                'content': clean_content
-            }
-            
+            if self.html_engine == 'lxml':
+                page = extract_page(html_content)
+                return {'title': page['title'], 'content': page['content'], 'published_at': page['published_at']}
+            return self.content_from_soup(BeautifulSoup(html_content, 'html.parser'))
         except Exception as e:
             self.logger.error(f"Error extracting content: {e}")
-            return {'title': '', 'content': ''}
+            return {'title': '', 'content': '', 'published_at': ''}
+
+    def content_from_soup(self, soup: BeautifulSoup) -> Dict[str, str]:
+        """Extract title, publish time and text content from a parsed page (removes its nav, footer, etc.)."""
+        published_at = self.extract_published_at(soup)
+        
+        # Remove script and style elements
+        for script in soup(["script", "style", "nav", "footer", "header"]):
+            script.decompose()
+        
+        # Extract title
+        title_tag = soup.find('title')
+        title = clean_text(title_tag.get_text()) if title_tag else ""
+        
+        # Extract main content
+        # Try to find main content areas first
+        content_selectors = [
+            'main', 'article', '.content', '.post', '.entry',
+            '.main-content', '#content', '#main'
+        ]
+        
+        content_text = ""
+        for selector in content_selectors:
+            content_elem = soup.select_one(selector)
+            if content_elem:
+                content_text = content_elem.get_text()
+                break
+        
+        # If no specific content area found, use body
+        if not content_text:
+            body = soup.find('body')
+            content_text = body.get_text() if body else soup.get_text()
+        
+        # Clean the extracted content
+        clean_content = clean_text(content_text)
+        
+        return {
+            'title': title,
+            'content': clean_content,
+            'published_at': published_at
+        }
     
-    def scrape_url(self, url: str) -> bool:
-        """Scrape a single URL and store in database."""
-        # Check if already scraped
-        if self.db.is_url_scraped(url):
+    def stored_validators(self, url: str) -> Optional[Dict[str, str]]:
+        """Validators of a scraped URL ({} if it has none), or None if the URL was never scraped."""
+        return self.db.get_validators(url) if self.db.is_url_scraped(url) else None
+    
+    def scrape_url(self, url: str, validators=_LOOKUP) -> bool:
+        """
+        Scrape a single URL and store in database, revalidating it if scraped before.
+        
+        `validators` are the URL's `stored_validators`, for callers that
+        already looked them up; by default they are read here.
+        """
+        if validators is _LOOKUP:
+            validators = self.stored_validators(url)
+        # Scraped URLs are refetched conditionally; without validators there is nothing cheap to ask
+        if validators == {}:
             self.logger.info(f"URL already scraped: {url}")
             return True
         
@@ -87,7 +131,12 @@ class WebScraper:
             self.logger.info(f"Scraping: {url}")
             
             # Fetch the page
-            response = self._fetch_page(url)
+            response = self._fetch_page(url, validators)
+            if response.status_code == 304:
+                self.db.store_validators(url, validators.get('etag', ''), validators.get('last_modified', ''))
+                self.logger.info(f"URL not modified: {url}")
+                time.sleep(self.request_delay)
+                return True
             
             # Extract content
             extracted = self.extract_content(response.text)
@@ -96,10 +145,14 @@ class WebScraper:
             success = self.db.store_content(
                 url=url,
                 content=extracted['content'],
-                title=extracted['title']
+                title=extracted['title'],
+                published_at=extracted['published_at']
             )
             
             if success:
+                self.db.store_validators(
+                    url, response.headers.get('ETag', ''), response.headers.get('Last-Modified', '')
+                )
                 self.logger.info(f"Successfully scraped and stored: {url}")
             else:
                 self.logger.error(f"Failed to store content for: {url}")
@@ -122,11 +175,12 @@ class WebScraper:
         for i, url in enumerate(urls, 1):
             self.logger.info(f"Progress: {i}/{len(urls)}")
             
-            if self.db.is_url_scraped(url):
+            validators = self.stored_validators(url)
+            if validators == {}:
                 stats['skipped'] += 1
                 continue
                 
-            success = self.scrape_url(url)
+            success = self.scrape_url(url, validators)
             if success:
                 stats['success'] += 1
             else:
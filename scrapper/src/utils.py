@@ -1,9 +1,12 @@
 import re
 import time
 import logging
-from urllib.parse import urljoin, urlparse
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
 from typing import Optional, Set
 
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'igshid', 'mc_cid', 'mc_eid', 'ref', 'ref_src', 'cmpid'}
+
 def setup_logging() -> logging.Logger:
     """Set up logging configuration."""
     logging.basicConfig(
@@ -40,7 +43,7 @@ def is_valid_url(url: str) -> bool:
 def get_domain(url: str) -> Optional[str]:
     """Extract domain from URL."""
     try:
-        return urlparse(url).netloc
+        return urlparse(url).netloc or None
     except:
         return None
 
@@ -48,6 +51,28 @@ def normalize_url(url: str, base_url: str) -> str:
     """Normalize and resolve relative URLs."""
     return urljoin(base_url, url)
 
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of a URL, so spellings of the same page compare equal.
+
+    Lowercases scheme and host, drops default ports, the fragment, tracking
+    parameters (utm_* and TRACKING_PARAMS) and a trailing slash, and sorts
+    the remaining query parameters.
+    """
+    parts = urlparse(url)
+    scheme = parts.scheme.lower()
+    host = parts.netloc.lower()
+    if (scheme, host.rsplit(':', 1)[-1]) in (('http', '80'), ('https', '443')):
+        host = host.rsplit(':', 1)[0]
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunparse((scheme, host, path, parts.params, urlencode(query), ''))
+
 def rate_limit(delay: float):
     """Simple rate limiting decorator."""
     def decorator(func):
@@ -1,35 +1,82 @@
+import asyncio
+import time
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 import sys
 import os
 
-# Add src to path for testing
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from aiohttp import web
+from bs4 import BeautifulSoup
+from aiohttp.test_utils import TestServer
 
-from scrapper import WebScraper
-from crawler import URLCrawler
-from db import RedisDB
-from utils import clean_text, is_valid_url, get_domain
+# Add the project root to path for testing; src is a package with relative imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.scrapper import WebScraper
+from src.crawler import AsyncURLCrawler, TokenBucket, URLCrawler
+from src.db import RedisDB
+from src.extract import extract_page
+from src.feeds import parse_date, parse_feed
+from src.frontier import URLFrontier, score_url
+from src.pipeline import CrawlScraper
+from src.utils import canonicalize_url, clean_text, is_valid_url, get_domain
 
 class TestWebScraper(unittest.TestCase):
     
     def setUp(self):
         self.scraper = WebScraper()
     
-    @patch('scrapper.requests.Session.get')
+    @patch('src.scrapper.requests.Session.get')
     def test_scrape_url_success(self, mock_get):
         # Mock response
         mock_response = Mock()
         mock_response.text = '<html><title>Test</title><body>Test content</body></html>'
         mock_response.raise_for_status.return_value = None
+        mock_response.headers = {'ETag': '"v1"'}
         mock_get.return_value = mock_response
         
         # Mock database
         self.scraper.db.is_url_scraped = Mock(return_value=False)
         self.scraper.db.store_content = Mock(return_value=True)
+        self.scraper.db.store_validators = Mock(return_value=True)
         
         result = self.scraper.scrape_url('http://example.com')
         self.assertTrue(result)
+        self.scraper.db.store_validators.assert_called_once_with('http://example.com', '"v1"', '')
+    
+    @patch('src.scrapper.requests.Session.get')
+    def test_scraped_url_is_revalidated_conditionally(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 304
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+        
+        self.scraper.request_delay = 0
+        self.scraper.db.is_url_scraped = Mock(return_value=True)
+        self.scraper.db.get_validators = Mock(return_value={'etag': '"v1"', 'last_modified': ''})
+        self.scraper.db.store_content = Mock(return_value=True)
+        self.scraper.db.store_validators = Mock(return_value=True)
+        
+        self.assertTrue(self.scraper.scrape_url('http://example.com'))
+        self.assertEqual(mock_get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+        self.scraper.db.store_content.assert_not_called()
+    
+    @patch('src.scrapper.requests.Session.get')
+    def test_scrape_urls_looks_up_validators_once_per_url(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 304
+        mock_get.return_value = mock_response
+        
+        self.scraper.request_delay = 0
+        self.scraper.db.is_url_scraped = Mock(side_effect=lambda url: url != 'http://example.com/new')
+        self.scraper.db.get_validators = Mock(side_effect=lambda url: {} if url.endswith('old') else {'etag': '"v1"'})
+        self.scraper.db.store_validators = Mock(return_value=True)
+        
+        stats = self.scraper.scrape_urls(['http://example.com/a', 'http://example.com/old'])
+        
+        self.assertEqual(stats, {'success': 1, 'failed': 0, 'skipped': 1})
+        self.assertEqual(self.scraper.db.is_url_scraped.call_count, 2)
+        self.assertEqual(self.scraper.db.get_validators.call_count, 2)
     
     def test_extract_content(self):
         html = '<html><title>Test Title</title><body><p>Test content here</p></body></html>'
@@ -62,11 +109,282 @@ class TestURLCrawler(unittest.TestCase):
         self.assertIn('https://example.com/page1', links)
         self.assertIn('https://example.com/page2', links)
 
+async def start_site(test_case, pages, sitemap=None, revisions=None):
+    """
+    Serve /0../pages-1, each an article linking to the next two; returns its URL and request times.
+
+    Pages send an ETag, bumped by `revisions[i]`, and honour If-None-Match.
+    `sitemap` lists page numbers at /sitemap.xml, all modified in 2024.
+    """
+    hits = []
+    revisions = revisions if revisions is not None else {}
+
+    async def page(request):
+        i = int(request.match_info['i'] or 0)
+        hits.append(time.monotonic())
+        etag = f'"{i}-{revisions.get(i, 0)}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        links = ''.join(f'<a href="/{j}">{j}</a>' for j in (i + 1, i + 2) if j < pages)
+        text = f'Story {i} text' + ' updated' * revisions.get(i, 0)
+        return web.Response(
+            text=f'<html><title>Story {i}</title><body><nav>{links}</nav><article>{text}</article></body></html>',
+            content_type='text/html',
+            headers={'ETag': etag},
+        )
+
+    async def sitemap_xml(request):
+        if sitemap is None:
+            raise web.HTTPNotFound()
+        urls = ''.join(f'<url><loc>{request.url.origin()}/{i}</loc><lastmod>2024-05-01</lastmod></url>'
+                       for i in sitemap)
+        return web.Response(text=f'<urlset>{urls}</urlset>', content_type='application/xml')
+
+    app = web.Application()
+    app.router.add_get('/sitemap.xml', sitemap_xml)
+    app.router.add_get('/{i:\\d*}', page)
+    server = TestServer(app)
+    await server.start_server()
+    test_case.addAsyncCleanup(server.close)
+    return str(server.make_url('/0')), hits
+
+
+class TestAsyncURLCrawler(unittest.IsolatedAsyncioTestCase):
+
+    async def start_site(self, pages):
+        return await start_site(self, pages)
+
+    async def test_token_bucket_spaces_requests(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.14)
+
+    async def test_domains_crawl_concurrently_with_per_host_delay(self):
+        sites = [await self.start_site(pages=10) for _ in range(3)]
+        crawler = AsyncURLCrawler()
+        crawler.request_delay = 0.1
+        crawler.max_pages_per_domain = 5
+
+        started = time.monotonic()
+        urls = await crawler.crawl_multiple_domains_async([url for url, _ in sites])
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(len(urls), 15)
+        for _, hits in sites:
+            self.assertEqual(len(hits), 5)
+            # Arrival times also include connection setup, hence the slack
+            self.assertGreaterEqual(min(b - a for a, b in zip(hits, hits[1:])), 0.075)
+        # Sequential domains would need at least 3 x 4 delays
+        self.assertLess(elapsed, 1.0)
+
+
+class MemoryDB:
+    """Just enough of RedisDB for CrawlScraper."""
+
+    def __init__(self):
+        self.content = {}
+        self.fetch = {}
+
+    def is_url_scraped(self, url):
+        return url in self.content
+
+    def get_content(self, url):
+        return self.content.get(url)
+
+    def store_content(self, url, content, title="", published_at=""):
+        self.content[url] = {'content': content, 'title': title}
+        return True
+
+    def get_validators(self, url):
+        return dict(self.fetch.get(url, {}))
+
+    def get_validators_many(self, urls):
+        return [self.get_validators(url) for url in urls]
+
+    def store_validators(self, url, etag="", last_modified=""):
+        self.fetch.setdefault(url, {}).update(etag=etag, last_modified=last_modified, fetched_at=str(time.time()))
+        return True
+
+    def store_links(self, url, links):
+        self.fetch.setdefault(url, {})['links'] = '\n'.join(sorted(links))
+        return True
+
+
+class TestCrawlScraper(unittest.IsolatedAsyncioTestCase):
+
+    async def test_each_page_is_fetched_once_and_stored_as_crawled(self):
+        url, hits = await start_site(self, pages=6)
+        db = Mock()
+        db.is_url_scraped.side_effect = lambda u: u.endswith('/3')
+        db.get_content.return_value = {'content': 'Story 3 text'}
+        db.get_validators.return_value = {}
+        db.store_content.return_value = True
+        crawler = CrawlScraper(scraper=WebScraper(), db=db)
+        crawler.request_delay = 0
+
+        urls = await crawler.crawl_multiple_domains_async([url])
+
+        self.assertEqual(len(urls), 6)
+        self.assertEqual(len(hits), 6)
+        self.assertEqual(crawler.stats['success'], 5)
+        self.assertEqual(crawler.stats['skipped'], 1)
+        stored = db.store_content.call_args_list[0].kwargs
+        self.assertEqual(stored['title'], 'Story 0')
+        self.assertEqual(stored['content'], 'Story 0 text')
+
+    async def test_unchanged_pages_cost_a_304_and_changed_ones_are_updated(self):
+        revisions = {}
+        url, hits = await start_site(self, pages=3, revisions=revisions)
+        db = MemoryDB()
+        crawler = CrawlScraper(scraper=WebScraper(), db=db)
+        crawler.request_delay = 0
+
+        first = await asyncio.to_thread(crawler.run, [url])
+        revisions[0] = 1
+        second = await asyncio.to_thread(crawler.run, [url])
+
+        self.assertEqual((first['success'], first['not_modified']), (3, 0))
+        self.assertEqual(len(hits), 6)
+        self.assertEqual(second['not_modified'], 2)
+        self.assertEqual((second['updated'], second['skipped']), (1, 2))
+        self.assertIn('updated', db.content[url]['content'])
+
+    async def test_section_behind_an_unchanged_home_page_is_still_walked(self):
+        articles = ['flood-toll-rises']
+
+        async def page(request):
+            if request.path == '/':
+                body, etag = '<a href="/national">National</a>', '"home"'
+            elif request.path == '/national':
+                body, etag = ''.join(f'<a href="/news/{a}">{a}</a>' for a in articles), f'"{len(articles)}"'
+            else:
+                body, etag = f'<article>Story {request.path}</article>', '"story"'
+            if request.headers.get('If-None-Match') == etag:
+                return web.Response(status=304, headers={'ETag': etag})
+            return web.Response(text=f'<html><body>{body}</body></html>', content_type='text/html',
+                                headers={'ETag': etag})
+
+        app = web.Application()
+        app.router.add_get('/{path:.*}', page)
+        server = TestServer(app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        db = MemoryDB()
+        crawler = CrawlScraper(scraper=WebScraper(), db=db)
+        crawler.request_delay = 0
+
+        await asyncio.to_thread(crawler.run, [str(server.make_url('/'))])
+        articles.append('metro-fares-rise')
+        second = await asyncio.to_thread(crawler.run, [str(server.make_url('/'))])
+
+        self.assertEqual(second['not_modified'], 2)
+        self.assertIn(str(server.make_url('/news/metro-fares-rise')), db.content)
+
+    async def test_sitemap_entries_replace_link_walking_and_are_fetched_until_fresh(self):
+        url, hits = await start_site(self, pages=6, sitemap=[0, 4])
+        db = MemoryDB()
+        crawler = CrawlScraper(scraper=WebScraper(), db=db)
+        crawler.request_delay = 0
+
+        urls = await crawler.crawl_multiple_domains_async([url])
+        # Fetched since their 2024 lastmod, so the next run does not request them
+        again = await crawler.crawl_multiple_domains_async([url])
+
+        self.assertEqual({u.rsplit('/', 1)[-1] for u in urls}, {'0', '4'})
+        self.assertEqual(len(hits), 2)
+        self.assertEqual(again, set())
+
+
+class TestExtract(unittest.TestCase):
+
+    def setUp(self):
+        self.scraper = WebScraper()
+        self.crawler = URLCrawler()
+
+    def test_matches_the_soup_engine(self):
+        pages = [
+            '<html><head><title>T &amp; x</title><meta name="date" content=" 2024-01-01 "></head><body>'
+            '<header><a href="/h">h</a><title>no</title></header><div id="main"><article class="post">A <b>bold</b>'
+            ' claim<script>var x=1</script></article></div><footer>f</footer></body></html>',
+            '<html><body><main><nav>x</nav></main><p>Body text</p><time datetime="2024-05-01">May</time></body></html>',
+            '<html><body><div class="entry main-content"><p>one<p>two</div><a href="tel:1">t</a>'
+            '<a href=" https://x.org/a ">x</a><a href="../up">up</a><a href="/a/b?c=1#d">d</a></body>',
+            '<html><body><article>a<!-- hidden -->b</article></body></html>',
+        ]
+        for html in pages:
+            soup = BeautifulSoup(html, 'html.parser')
+            expected = dict(links=self.crawler.links_from_soup('https://example.com/x/y', soup),
+                            **self.scraper.content_from_soup(soup))
+            self.assertEqual(extract_page(html, 'https://example.com/x/y'), expected)
+
+    def test_links_only(self):
+        page = extract_page('<p>Text <a href="/a">a</a></p>', 'https://example.com/', collect_text=False)
+        self.assertEqual(page['content'], '')
+        self.assertEqual(page['links'], {'https://example.com/a'})
+
+
+class TestFeeds(unittest.TestCase):
+
+    def test_parse_sitemaps_and_feeds(self):
+        index = ('<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"><sitemap>'
+                 '<loc>https://example.com/s1.xml</loc><lastmod>2024-05-01T10:00:00Z</lastmod></sitemap></sitemapindex>')
+        urlset = ('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"><url><loc> https://example.com/a </loc>'
+                  '</url></urlset>')
+        rss = ('<rss version="2.0"><channel><item><link>https://example.com/b</link>'
+               '<pubDate>Wed, 01 May 2024 10:00:00 GMT</pubDate></item></channel></rss>')
+        atom = ('<feed xmlns="http://www.w3.org/2005/Atom"><entry><link rel="edit" href="https://example.com/edit"/>'
+                '<link href="https://example.com/c"/><updated>2024-05-01T10:00:00+00:00</updated></entry></feed>')
+        may_first = 1714557600.0
+
+        self.assertEqual(parse_feed(index), ([], [('https://example.com/s1.xml', may_first)]))
+        self.assertEqual(parse_feed(urlset), ([('https://example.com/a', None)], []))
+        self.assertEqual(parse_feed(rss), ([('https://example.com/b', may_first)], []))
+        self.assertEqual(parse_feed(atom), ([('https://example.com/c', may_first)], []))
+        self.assertEqual(parse_feed('<html><body>Not a feed'), ([], []))
+
+    def test_bare_dates_mean_the_end_of_the_day(self):
+        self.assertEqual(parse_date('2024-05-01') - parse_date('2024-05-01T00:00:00Z'), 86399)
+        self.assertIsNone(parse_date('soon'))
+
+
+class TestURLFrontier(unittest.TestCase):
+
+    def test_articles_come_before_listings_and_deeper_pages(self):
+        frontier = URLFrontier(max_depth=3)
+        frontier.push('https://example.com/tag/politics', 1)
+        frontier.push('https://example.com/page/2', 1)
+        frontier.push('https://example.com/about', 1)
+        frontier.push('https://example.com/news/2024/05/01/river-levels-fall-in-sylhet', 2)
+        frontier.push('https://example.com/news/2024/05/02/metro-fares-rise-in-dhaka', 1)
+
+        order = [frontier.pop()[0] for _ in range(len(frontier))]
+
+        self.assertEqual(order[:2], [
+            'https://example.com/news/2024/05/02/metro-fares-rise-in-dhaka',
+            'https://example.com/news/2024/05/01/river-levels-fall-in-sylhet',
+        ])
+        self.assertEqual(order[-2:], ['https://example.com/tag/politics', 'https://example.com/page/2'])
+
+    def test_fresh_articles_score_higher(self):
+        now = time.time()
+        url = 'https://example.com/news/flood-waters-recede-in-sylhet'
+        self.assertGreater(score_url(url, 1, published=now - 3600), score_url(url, 1, published=now - 60 * 86400))
+
+    def test_spellings_of_a_page_are_queued_once_and_depth_is_capped(self):
+        frontier = URLFrontier(max_depth=2)
+        self.assertTrue(frontier.push('https://example.com/news/a-b-c-d', 1))
+        self.assertFalse(frontier.push('https://example.com/news/a-b-c-d/?utm_source=x#comments', 1))
+        self.assertFalse(frontier.push('https://example.com/deep', 3))
+        self.assertEqual(len(frontier), 1)
+
+
 class TestRedisDB(unittest.TestCase):
     
     def setUp(self):
         # Mock Redis client
-        with patch('db.redis.Redis') as mock_redis:
+        with patch('src.db.redis.Redis') as mock_redis:
             self.mock_client = Mock()
             mock_redis.return_value = self.mock_client
             self.db = RedisDB()
@@ -90,6 +408,17 @@ class TestRedisDB(unittest.TestCase):
         
         self.mock_client.sismember.assert_called_once_with('scraped_urls', 'http://example.com')
 
+    def test_get_validators_many_uses_one_pipeline(self):
+        pipe = self.mock_client.pipeline.return_value
+        pipe.execute.return_value = [{'etag': '"v1"', 'fetched_at': '1.0'}, {}]
+        
+        result = self.db.get_validators_many(['http://example.com/a', 'http://example.com/b'])
+        
+        self.assertEqual(result, [{'etag': '"v1"', 'fetched_at': '1.0'}, {}])
+        self.assertEqual(pipe.hgetall.call_count, 2)
+        pipe.execute.assert_called_once()
+        self.mock_client.hgetall.assert_not_called()
+
 class TestUtils(unittest.TestCase):
     
     def test_clean_text(self):
@@ -103,6 +432,14 @@ class TestUtils(unittest.TestCase):
         self.assertFalse(is_valid_url('not-a-url'))
         self.assertFalse(is_valid_url('javascript:void(0)'))
     
+    def test_canonicalize_url(self):
+        self.assertEqual(
+            canonicalize_url('HTTPS://Example.com:443/news/story/?utm_source=fb&b=2&a=1&fbclid=x#comments'),
+            'https://example.com/news/story?a=1&b=2',
+        )
+        self.assertEqual(canonicalize_url('http://example.com'), 'http://example.com/')
+        self.assertEqual(canonicalize_url('http://example.com:8080/a/'), 'http://example.com:8080/a')
+
     def test_get_domain(self):
         self.assertEqual(get_domain('https://example.com/path'), 'example.com')
         self.assertEqual(get_domain('http://test.org:8080'), 'test.org:8080')